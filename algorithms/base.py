@@ -6,20 +6,165 @@ import sys
 from abc import ABC, abstractmethod
 from pathlib import Path
 import json
+import copy
 import datetime
+import threading
+
+import numpy as np
 
 # Sử dụng logger được cấu hình từ file chính (test.py)
 # Lấy logger theo tên của module này để dễ dàng theo dõi log
 base_logger = logging.getLogger(__name__) # Lấy logger với tên là "algorithms.base"
 
+NUM_SCORES = 100 # Số lượng số dự đoán (00-99), cũng là độ dài mảng điểm
+SCORE_KEYS = tuple(f"{i:02d}" for i in range(NUM_SCORES))
+_SCORE_KEY_INDEX = {key: i for i, key in enumerate(SCORE_KEYS)}
+
+
+def scores_dict_to_array(scores_dict):
+    """
+    Chuyển dict điểm {'00': x, ..., '99': y} (kết quả của `predict()`) thành mảng float64[100].
+
+    Chỉ nhận key dạng chuỗi 2 chữ số và giá trị kiểu số, giống quy tắc kiểm tra
+    khi tổng hợp điểm; số không có trong dict nhận điểm 0.0.
+
+    Returns:
+        np.ndarray | None: Mảng điểm, hoặc None nếu đầu vào không phải dict hoặc rỗng
+                           (tương đương "thuật toán không có dự đoán").
+    """
+    if not isinstance(scores_dict, dict) or not scores_dict:
+        return None
+    scores = np.zeros(NUM_SCORES, dtype=np.float64)
+    for num_str, value in scores_dict.items():
+        idx = _SCORE_KEY_INDEX.get(num_str)
+        if idx is not None and isinstance(value, (int, float, np.number)):
+            scores[idx] = float(value)
+    return scores
+
+
+def scores_matrix_row(scores_matrix, row: int):
+    """Hàng `row` của ma trận điểm từ `predict_range()`, hoặc None nếu là hàng NaN (không có dự đoán)."""
+    if scores_matrix is None:
+        return None
+    scores = scores_matrix[row]
+    return None if np.isnan(scores).all() else scores
+
+
+def predict_range_matrices(algorithms: dict, dates, store, history_ends=None) -> dict:
+    """
+    Gọi `predict_range()` của từng thuật toán cho cùng danh sách ngày.
+
+    Args:
+        algorithms (dict): {tên: instance thuật toán}.
+
+    Returns:
+        dict: {tên: ma trận float64[len(dates), 100]}, hoặc None với thuật toán bị lỗi.
+    """
+    matrices = {}
+    for name, algorithm in algorithms.items():
+        try:
+            matrices[name] = algorithm.predict_range(dates, store, history_ends)
+        except Exception as e:
+            base_logger.error(f"predict_range thất bại cho '{name}': {e}", exc_info=True)
+            matrices[name] = None
+    return matrices
+
+
+def scores_array_to_dict(scores) -> dict:
+    """Chuyển mảng điểm float[100] về dạng dict {'00': float, ..., '99': float}."""
+    return dict(zip(SCORE_KEYS, np.asarray(scores, dtype=np.float64).tolist()))
+
+
+class LinearDecomposition:
+    """
+    Phân rã điểm của một thuật toán trên một danh sách ngày (kết quả của `decompose_range()`):
+
+        điểm[t, n] = Σ_i hệ_số_i · features[i, t, n]  (+ phần phi tuyến `finalize`)
+
+    với hệ_số_i = hằng số × tích các tham số của hạng i. Các ma trận đặc trưng chỉ phụ thuộc
+    các tham số "cấu trúc" (`structural`, ví dụ độ dài cửa sổ) nên một lần phân rã dùng được
+    cho mọi bộ tham số có cùng các giá trị đó: điểm của bộ mới chỉ còn là một phép co tensor.
+
+    Các hạng được cộng dồn lần lượt theo thứ tự khai báo: nếu thuật toán khai báo đúng thứ tự
+    predict() cộng điểm (và đặc trưng là số nguyên), kết quả trùng từng bit với predict_range().
+
+    Args:
+        terms (list): Mỗi phần tử là (hằng số, tuple tên tham số); hệ số được tính bằng cách lấy
+                      hằng số nhân lần lượt với từng tham số.
+        features (np.ndarray): float[len(terms), n_days, 100].
+        params (dict): Bộ tham số đầy đủ lúc phân rã (giá trị mặc định cho `scores()`).
+        structural (list): Tên các tham số mà `features` phụ thuộc (phải trùng khi dùng lại).
+        valid (np.ndarray, optional): bool[n_days] - ngày có dự đoán (False -> hàng NaN).
+        finalize (callable, optional): finalize(scores, params) sửa tại chỗ ma trận điểm
+            float64[n_days, 100] cho phần phi tuyến (ví dụ phạt theo top của các ngày trước,
+            tính tuần tự theo ngày); chỉ đọc tham số từ `params`.
+    """
+
+    def __init__(self, terms, features, params, structural, valid=None, finalize=None):
+        self.terms = [(float(scale), tuple(names)) for scale, names in terms]
+        self.features = np.asarray(features)
+        self.params = copy.deepcopy(dict(params))
+        self.structural = {name: self.params.get(name) for name in structural}
+        self.n_days = self.features.shape[1] if self.features.ndim == 3 else 0
+        self.valid = np.ones(self.n_days, dtype=bool) if valid is None else np.asarray(valid, dtype=bool)
+        self.finalize = finalize
+
+    def resolve(self, params) -> dict:
+        """Bộ tham số đầy đủ: `params` thay cho giá trị lúc phân rã (tham số lạ bị bỏ qua, như with_parameters)."""
+        resolved = dict(self.params)
+        resolved.update({name: value for name, value in params.items() if name in self.params})
+        return resolved
+
+    def matches(self, params) -> bool:
+        """True nếu `params` có cùng các tham số cấu trúc (dùng lại được các ma trận đặc trưng)."""
+        resolved = self.resolve(params)
+        return all(resolved.get(name) == value for name, value in self.structural.items())
+
+    def coefficients(self, params) -> list:
+        """Hệ số (float) của từng hạng cho bộ tham số `params`."""
+        resolved = self.resolve(params)
+        coefficients = []
+        for scale, names in self.terms:
+            coefficient = scale
+            for name in names:
+                coefficient *= float(resolved[name])
+            coefficients.append(coefficient)
+        return coefficients
+
+    def scores(self, params):
+        """
+        Ma trận điểm float64[n_days, 100] cho `params` (giống `predict_range()` với bộ tham số đó).
+
+        Raises:
+            ValueError: Nếu tham số cấu trúc khác lúc phân rã.
+        """
+        if not self.matches(params):
+            raise ValueError("Tham số cấu trúc khác lúc phân rã, cần gọi lại decompose_range().")
+        scores = np.zeros((self.n_days, NUM_SCORES), dtype=np.float64)
+        term_scores = np.empty_like(scores)
+        for coefficient, feature in zip(self.coefficients(params), self.features):
+            np.multiply(feature, coefficient, out=term_scores, dtype=np.float64)
+            scores += term_scores
+        if self.finalize is not None:
+            self.finalize(scores, self.resolve(params))
+        scores[~self.valid] = np.nan
+        return scores
+
+
 class BaseAlgorithm(ABC):
     """
     Lớp cơ sở trừu tượng cho tất cả các thuật toán dự đoán xổ số.
 
     Mỗi thuật toán cụ thể cần kế thừa từ lớp này và triển khai
     phương thức `predict()`.
+
+    Thuật toán có thể tùy chọn hỗ trợ giao thức tính tăng dần (streaming) bằng cách
+    đặt `supports_streaming = True` và triển khai `reset()`, `update(draw)`, `score(next_date)`.
+    Khi đó `predict_range()` chỉ nạp thêm các kỳ quay mới thay vì quét lại toàn bộ lịch sử.
     """
 
+    supports_streaming = False
+
     def __init__(self, data_results_list=None, cache_dir=None):
         """
         Khởi tạo thuật toán cơ sở.
@@ -46,6 +191,14 @@ class BaseAlgorithm(ABC):
         }
         self._raw_results_list = data_results_list if data_results_list is not None else []
 
+        # Trạng thái của bộ nạp streaming trong predict_range() (xem _predict_range_streaming).
+        # Cùng một instance có thể được nhiều luồng kiểm thử dùng chung nên mọi truy cập
+        # vào trạng thái này đều đi qua _stream_lock.
+        self._stream_lock = threading.Lock()
+        self._stream_key = None
+        self._stream_pos = 0
+        self._stream_last_date = None
+
         # Xử lý thư mục cache: đảm bảo là đối tượng Path và tồn tại
         self.cache_dir = Path(cache_dir) if cache_dir else None
         if self.cache_dir:
@@ -76,6 +229,35 @@ class BaseAlgorithm(ABC):
         # Lớp con có thể ghi đè phương thức này hoặc chỉ cập nhật self.config trong __init__ của nó
         return self.config
 
+    def with_parameters(self, params: dict):
+        """
+        Tạo một instance MỚI cùng lớp (cùng dữ liệu, cùng cache_dir) với các tham số
+        trong `params` thay cho giá trị mặc định, không cần sửa/ghi lại file nguồn.
+
+        Giống cách trình tối ưu sửa mã nguồn: chỉ các tham số đã có trong
+        config['parameters'] mới được cập nhật, tham số lạ bị bỏ qua. Instance mới
+        được khởi tạo lại từ đầu nên không mang theo trạng thái của instance hiện tại.
+
+        Args:
+            params (dict): {tên tham số: giá trị mới}.
+
+        Returns:
+            BaseAlgorithm: Instance mới đã áp dụng tham số.
+        """
+        clone = self.__class__(data_results_list=self._raw_results_list, cache_dir=self.cache_dir)
+        clone_params = clone.config.get('parameters')
+        if not isinstance(clone_params, dict):
+            return clone
+        ignored = []
+        for name, value in params.items():
+            if name in clone_params:
+                clone_params[name] = copy.deepcopy(value)
+            else:
+                ignored.append(name)
+        if ignored:
+            clone._log('warning', f"with_parameters: bỏ qua tham số không có trong config: {ignored}")
+        return clone
+
     @abstractmethod
     def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
         """
@@ -100,6 +282,136 @@ class BaseAlgorithm(ABC):
         """
         raise NotImplementedError("Phương thức predict() phải được triển khai bởi lớp con.")
 
+    def predict_array(self, date_to_predict: datetime.date, historical_results: list):
+        """
+        Giống `predict()` nhưng trả về mảng NumPy float64[100] (chỉ số i ứng với số i).
+
+        Mặc định chuyển đổi từ kết quả dict của `predict()`. Lớp con có thể ghi đè
+        để tính trực tiếp trên mảng (nhanh hơn); các bộ máy kiểm thử hiệu suất
+        luôn gọi phương thức này.
+
+        Returns:
+            np.ndarray | None: Mảng điểm delta, hoặc None nếu không có dự đoán.
+        """
+        return scores_dict_to_array(self.predict(date_to_predict, historical_results))
+
+    def predict_range(self, dates, store, history_ends=None):
+        """
+        Dự đoán cho nhiều ngày một lượt, trả về ma trận điểm float64[len(dates), 100].
+
+        Args:
+            dates (list): Các ngày cần dự đoán, theo thứ tự các bộ máy kiểm thử sẽ duyệt
+                          (thường tăng dần; thuật toán có trạng thái nhận đúng thứ tự này).
+            store (DrawStore): Kho dữ liệu kết quả (engine/draw_store.py).
+            history_ends (list, optional): Với mỗi ngày, số hàng đầu tiên của `store` dùng
+                          làm lịch sử. Mặc định là mọi ngày có dữ liệu TRƯỚC ngày dự đoán.
+
+        Returns:
+            np.ndarray: Hàng i là điểm delta cho `dates[i]`; hàng NaN nếu ngày đó
+                        không có dự đoán (predict trả về rỗng hoặc lỗi).
+
+        Mặc định gọi `predict_array()` lần lượt từng ngày. Lớp con có thể ghi đè bằng
+        cách tính cửa sổ trượt trên các mảng của `store` để không phải quét lại lịch sử.
+        """
+        if self.supports_streaming:
+            return self._predict_range_streaming(dates, store, history_ends)
+
+        scores = np.full((len(dates), NUM_SCORES), np.nan, dtype=np.float64)
+        for i, date_to_predict in enumerate(dates):
+            history_end = store.rows_before(date_to_predict)
+            if history_ends is not None:
+                history_end = min(history_end, history_ends[i])
+            try:
+                day_scores = self.predict_array(date_to_predict, store.history_rows(history_end))
+            except Exception as e:
+                self._log('error', f"predict_range: lỗi khi dự đoán ngày {date_to_predict}: {e}")
+                continue
+            if day_scores is not None:
+                scores[i] = day_scores
+        return scores
+
+    def decompose_range(self, dates, store, history_ends=None):
+        """
+        (Tùy chọn) Phân rã điểm của `predict_range()` trên các ngày này thành tổ hợp tuyến tính
+        của các ma trận đặc trưng (xem LinearDecomposition), để trình tối ưu chấm bộ tham số mới
+        bằng một phép co tensor thay vì dự đoán lại từng ngày.
+
+        Cùng tham số với `predict_range()`; kết quả tương ứng với một instance mới (chưa có
+        trạng thái) dùng `config['parameters']` hiện tại.
+
+        Returns:
+            LinearDecomposition | None: Mặc định None (thuật toán không hỗ trợ phân rã).
+        """
+        return None
+
+    # --- Giao thức streaming (tùy chọn) ---
+
+    def reset(self):
+        """Xóa trạng thái streaming, chuẩn bị nạp lại từ kỳ quay đầu tiên."""
+        raise NotImplementedError("Thuật toán không hỗ trợ streaming (reset).")
+
+    def update(self, draw: dict):
+        """
+        Nạp thêm MỘT kỳ quay vào trạng thái. Các kỳ được nạp theo thứ tự ngày tăng dần.
+
+        Args:
+            draw (dict): Bản ghi {'date': date_obj, 'result': dict} như trong historical_results.
+        """
+        raise NotImplementedError("Thuật toán không hỗ trợ streaming (update).")
+
+    def score(self, next_date: datetime.date):
+        """
+        Điểm delta cho `next_date` dựa trên các kỳ đã nạp (tương đương `predict_array()`
+        với lịch sử là toàn bộ các kỳ đã nạp qua `update()`).
+
+        Returns:
+            np.ndarray | None: Mảng điểm float64[100], hoặc None nếu không có dự đoán.
+        """
+        raise NotImplementedError("Thuật toán không hỗ trợ streaming (score).")
+
+    def _predict_range_streaming(self, dates, store, history_ends=None):
+        """
+        predict_range() cho thuật toán hỗ trợ streaming: chỉ nạp các kỳ còn thiếu giữa hai
+        ngày liên tiếp. Trạng thái được giữ giữa các lần gọi (ví dụ khi bộ máy kiểm thử
+        chia khoảng ngày thành nhiều khối) và tự reset khi dữ liệu, tham số thay đổi
+        hoặc ngày đi lùi.
+
+        Mỗi lần gọi giữ _stream_lock từ đầu đến cuối: hai luồng dùng chung instance sẽ chạy
+        lần lượt thay vì nạp xen kẽ vào cùng một trạng thái.
+        """
+        with self._stream_lock:
+            return self._predict_range_streaming_locked(dates, store, history_ends)
+
+    def _predict_range_streaming_locked(self, dates, store, history_ends=None):
+        scores = np.full((len(dates), NUM_SCORES), np.nan, dtype=np.float64)
+        # Khóa theo nội dung dữ liệu (store.version) chứ không theo id(store): id có thể được
+        # dùng lại cho một kho khác sau khi kho cũ bị thu hồi.
+        stream_key = (store.version, len(store), repr(self.config.get('parameters')))
+        records = store.records
+        for i, date_to_predict in enumerate(dates):
+            history_end = store.rows_before(date_to_predict)
+            if history_ends is not None:
+                history_end = min(history_end, history_ends[i])
+            if (self._stream_key != stream_key or history_end < self._stream_pos
+                    or (self._stream_last_date is not None and date_to_predict < self._stream_last_date)):
+                self.reset()
+                self._stream_key = stream_key
+                self._stream_pos = 0
+                self._stream_last_date = None
+            try:
+                while self._stream_pos < history_end:
+                    self.update(records[self._stream_pos])
+                    self._stream_pos += 1
+                day_scores = self.score(date_to_predict)
+            except Exception as e:
+                self._log('error', f"predict_range (streaming): lỗi khi dự đoán ngày {date_to_predict}: {e}")
+                self._stream_key = None
+                continue
+            self._stream_last_date = date_to_predict
+            if day_scores is not None:
+                scores[i] = day_scores
+        return scores
+
     def get_results_in_range(self, start_date: datetime.date, end_date: datetime.date) -> list:
         """
         Lấy danh sách các kết quả lịch sử nằm trong một khoảng thời gian cụ thể (bao gồm cả ngày bắt đầu và kết thúc).
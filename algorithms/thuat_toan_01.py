@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
-from algorithms.base import BaseAlgorithm
+from algorithms.base import BaseAlgorithm, LinearDecomposition
 import datetime
 import logging
+import bisect
 from collections import Counter
 
+import numpy as np
+
 class HistoryAppearancePointAlgorithm(BaseAlgorithm):
+    # Tham số quyết định bản thân các đặc trưng (cửa sổ, phạm vi láng giềng)
+    DECOMPOSITION_STRUCTURAL = ('short_term_days', 'frequency_window_short', 'frequency_window_long', 'neighbor_range')
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config = {
@@ -206,6 +212,119 @@ class HistoryAppearancePointAlgorithm(BaseAlgorithm):
         self._log('info', f"Prediction completed for {date_to_predict}. Top 3: {sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]}")
         return scores
 
+    def decompose_range(self, dates, store, history_ends=None):
+        """
+        Phân rã predict() trên các ngày `dates`: mỗi khoản cộng điểm là (hằng số × tích tham số)
+        nhân với một đặc trưng nguyên (0/1 hoặc số đếm) chỉ phụ thuộc lịch sử và các tham số cửa sổ.
+        Các hạng được khai báo theo đúng thứ tự predict() cộng điểm (ngắn hạn theo từng ngày,
+        tần suất, láng giềng theo từng offset, chu kỳ theo từng mốc ngày, vắng mặt, phạt ngày trước)
+        nên điểm trùng từng bit với predict().
+
+        Phần "phạt lặp lại trong Top 3" không làm đổi điểm (previous_tops lưu khóa chuỗi '07'
+        còn bảng đếm được tra theo số nguyên) nên không có phần phi tuyến.
+
+        Returns:
+            LinearDecomposition | None: None nếu dữ liệu có bản ghi bất thường (trùng ngày, giải đặc biệt
+                                        hoặc số không hợp lệ) - khi đó dùng predict_range() thông thường.
+        """
+        params = self.config.get('parameters', {})
+        short_term_days = params.get('short_term_days', 14)
+        freq_window_short = params.get('frequency_window_short', 45)
+        freq_window_long = params.get('frequency_window_long', 180)
+        neighbor_range = params.get('neighbor_range', 5)
+        if short_term_days != int(short_term_days):
+            raise ValueError(f"short_term_days={short_term_days} không phải số nguyên, không phân rã được.")
+
+        n_rows = len(store)
+        if len(store.index) != n_rows:
+            return None
+        # Số và giải đặc biệt của từng hàng đọc đúng như predict()
+        presence = np.zeros((n_rows, 100), dtype=bool)
+        special = np.zeros(n_rows, dtype=np.int64)
+        for row, record in enumerate(store.records):
+            result_dict = record.get('result', {})
+            numbers = self.extract_numbers_from_dict(result_dict)
+            try:
+                special_num = int(str(result_dict.get('special', '00'))[-2:])
+            except (ValueError, TypeError, AttributeError):
+                return None
+            if not 0 <= special_num <= 99 or any(not 0 <= num <= 99 for num in numbers):
+                return None
+            presence[row, list(numbers)] = True
+            special[row] = special_num
+        special_onehot = np.zeros((n_rows, 100), dtype=bool)
+        special_onehot[np.arange(n_rows), special] = True
+        presence_cumsum = np.zeros((n_rows + 1, 100), dtype=np.int64)
+        np.cumsum(presence, axis=0, out=presence_cumsum[1:])
+        special_cumsum = np.zeros((n_rows + 1, 100), dtype=np.int64)
+        np.cumsum(special_onehot, axis=0, out=special_cumsum[1:])
+        # Hàng gần nhất (<= r) có số xuất hiện, -1 nếu chưa từng
+        last_seen = np.maximum.accumulate(np.where(presence, np.arange(n_rows)[:, None], -1), axis=0)
+        store_dates = store.dates
+
+        # Hạng = (hằng số, tên tham số), theo thứ tự cộng của predict()
+        short_days = list(range(1, int(short_term_days) + 1))  # ngắn hạn: từ ngày gần nhất
+        neighbor_offsets = [offset for offset in range(-neighbor_range, neighbor_range + 1) if offset != 0]
+        cycle_days = sorted(list(range(7, 29, 7)) + list(range(30, 181, 30)), reverse=True)  # theo thứ tự lịch sử
+        terms = []
+        for days_ago in short_days:
+            day_weight = 1 - 0.08 * days_ago
+            terms += [(day_weight, ('base_point_short',)), (day_weight, ('base_point_short', 'special_multiplier'))]
+        terms += [(1.0, ('frequency_weight_short',)), (1.0, ('frequency_weight_long',)),
+                  (1.0, ('bonus_freq_5',)), (1.0, ('special_freq_multiplier',))]
+        terms += [(1 - 0.1 * abs(offset), ('neighbor_bonus',)) for offset in neighbor_offsets]
+        terms += [(1.0, ('cycle_7_bonus',) if days_ago <= 28 else ('cycle_30_bonus',)) for days_ago in cycle_days]
+        terms += [(1.0, ('increment',)), (1.0, ('bonus_after_3_days',)), (1.0, ('bonus_long_absence',)),
+                  (1.0, ('deduction_if_appeared_last_day',))]
+
+        # Đặc trưng là số nguyên nhỏ nên float32 vẫn chính xác tuyệt đối
+        features = np.zeros((len(terms), len(dates), 100), dtype=np.float32)
+        short_f = features[:2 * len(short_days)]
+        (freq_short_f, freq_long_f, freq_5_f, special_freq_f) = features[2 * len(short_days):2 * len(short_days) + 4]
+        neighbor_start = 2 * len(short_days) + 4
+        cycle_start = neighbor_start + len(neighbor_offsets)
+        (days_since_f, after_3_f, long_absence_f, last_day_f) = features[cycle_start + len(cycle_days):]
+        for i, date_to_predict in enumerate(dates):
+            end = store.rows_before(date_to_predict)
+            if history_ends is not None:
+                end = min(end, history_ends[i])
+            if end <= 0:
+                continue
+
+            for k, days_ago in enumerate(short_days):
+                row = store.row_of(date_to_predict - datetime.timedelta(days=days_ago))
+                if row is not None and row < end:
+                    short_f[2 * k, i] = presence[row] & ~special_onehot[row]
+                    short_f[2 * k + 1, i] = presence[row] & special_onehot[row]
+
+            freq_short_start = min(bisect.bisect_left(store_dates, date_to_predict - datetime.timedelta(days=freq_window_short)), end)
+            freq_long_start = min(bisect.bisect_left(store_dates, date_to_predict - datetime.timedelta(days=freq_window_long)), end)
+            freq_short = presence_cumsum[end] - presence_cumsum[freq_short_start]
+            freq_long = presence_cumsum[end] - presence_cumsum[freq_long_start]
+            freq_short_f[i] = freq_short
+            freq_long_f[i] = freq_long
+            freq_5_f[i] = freq_short > 5
+            special_freq_f[i] = (special_cumsum[end] - special_cumsum[freq_short_start]) > 5
+
+            special_last = int(special[end - 1])
+            for k, offset in enumerate(neighbor_offsets):
+                features[neighbor_start + k, i, (special_last + offset) % 100] = 1
+
+            for k, days_ago in enumerate(cycle_days):
+                row = store.row_of(date_to_predict - datetime.timedelta(days=days_ago))
+                if row is not None and row < end:
+                    features[cycle_start + k, i] = presence[row]
+
+            seen_row = last_seen[end - 1]
+            days_since = np.where(seen_row >= 0, end - 1 - seen_row, end)
+            days_since_f[i] = days_since
+            after_3_f[i] = days_since >= 3
+            long_absence_f[i] = (days_since >= 15) & (freq_long > 10)
+            if (date_to_predict - store_dates[end - 1]).days == 1:
+                last_day_f[i] = presence[end - 1]
+
+        return LinearDecomposition(terms, features, params, self.DECOMPOSITION_STRUCTURAL)
+
 # Kiểm tra thử
 if __name__ == "__main__":
     import json
@@ -4,11 +4,15 @@ import datetime
 import logging
 from collections import Counter
 
+import numpy as np
+
 class DaysSinceLastAppearanceAlgorithm(BaseAlgorithm):
     """
     Thuật toán 1: Cộng điểm dựa trên số ngày một con số chưa xuất hiện,
     với các mốc thưởng và điểm cộng dồn.
     """
+    supports_streaming = True
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.config = {
@@ -23,18 +27,11 @@ class DaysSinceLastAppearanceAlgorithm(BaseAlgorithm):
                 "progressive_increment": 0.1     # Điểm cộng thêm mỗi ngày sau mốc progressive_start_day
             }
         }
+        self.reset()
         self._log('debug', f"{self.__class__.__name__} initialized.")
 
-    def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
-        """Tính điểm dựa trên số ngày chưa xuất hiện."""
-        self._log('debug', f"Starting prediction for: {date_to_predict}")
-        scores = {f'{i:02d}': 0.0 for i in range(100)}
-
-        if not historical_results:
-            self._log('warning', "No historical data provided.")
-            return scores
-
-        # Lấy tham số
+    def _read_parameters(self):
+        """Đọc tham số từ config, dùng giá trị mặc định nếu không hợp lệ."""
         params = self.config.get('parameters', {})
         try:
             base_inc = float(params.get('base_increment_per_day', 0.1))
@@ -52,6 +49,19 @@ class DaysSinceLastAppearanceAlgorithm(BaseAlgorithm):
             last_day_mult = 0.05
             prog_start_day = 15
             prog_inc = 0.1
+        return base_inc, milestone_bonus, milestones, last_day_mult, prog_start_day, prog_inc
+
+    def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
+        """Tính điểm dựa trên số ngày chưa xuất hiện."""
+        self._log('debug', f"Starting prediction for: {date_to_predict}")
+        scores = {f'{i:02d}': 0.0 for i in range(100)}
+
+        if not historical_results:
+            self._log('warning', "No historical data provided.")
+            return scores
+
+        # Lấy tham số
+        base_inc, milestone_bonus, milestones, last_day_mult, prog_start_day, prog_inc = self._read_parameters()
 
         # Lọc và sắp xếp lịch sử (chỉ cần làm một lần)
         history = [r for r in historical_results if isinstance(r.get('date'), datetime.date) and r['date'] < date_to_predict]
@@ -129,6 +139,41 @@ class DaysSinceLastAppearanceAlgorithm(BaseAlgorithm):
         self._log('info', f"DaysSinceLastAppearance prediction completed for {date_to_predict}.")
         return scores
 
+    # --- Giao thức streaming ---
+
+    def reset(self):
+        """Xóa trạng thái: chưa nạp kỳ quay nào."""
+        self._draw_count = 0
+        self._last_seen_row = np.full(100, -1, dtype=np.int64)  # Thứ tự kỳ gần nhất có số, -1 = chưa có
+        self._last_day_numbers = []
+
+    def update(self, draw: dict):
+        """Ghi nhận một kỳ quay mới (kỳ gần nhất)."""
+        numbers = [num for num in self.extract_numbers_from_dict(draw.get('result', {})) if 0 <= num <= 99]
+        self._last_seen_row[numbers] = self._draw_count
+        self._last_day_numbers = numbers
+        self._draw_count += 1
+
+    def score(self, next_date: datetime.date):
+        """Điểm cho `next_date` từ các kỳ đã nạp, trùng khớp với `predict()`."""
+        if self._draw_count == 0:
+            return np.zeros(100, dtype=np.float64)
+        base_inc, milestone_bonus, milestones, last_day_mult, prog_start_day, prog_inc = self._read_parameters()
+
+        # Số ngày chưa xuất hiện: 0 = có mặt ở kỳ gần nhất; chưa từng xuất hiện = số kỳ đã nạp
+        seen = self._last_seen_row >= 0
+        days_absent = np.where(seen, self._draw_count - 1 - self._last_seen_row, self._draw_count)
+
+        # Cùng thứ tự phép cộng như predict() để kết quả trùng khớp tuyệt đối
+        day_scores = days_absent * base_inc
+        for milestone in sorted(milestones):
+            day_scores = np.where(days_absent >= milestone, day_scores + milestone_bonus, day_scores)
+        n = days_absent - prog_start_day
+        progressive_bonus_total = prog_inc * n * (n + 1) / 2
+        day_scores = np.where(days_absent >= prog_start_day, day_scores + progressive_bonus_total, day_scores)
+        day_scores[self._last_day_numbers] += last_day_mult  # Mỗi số chỉ đếm 1 lần trong ngày
+        return day_scores
+
 # Kiểm tra thử (cần file sample_data.json phù hợp)
 if __name__ == "__main__":
     import json
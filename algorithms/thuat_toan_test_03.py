@@ -2,8 +2,11 @@
 from algorithms.base import BaseAlgorithm
 import datetime
 import logging
+import bisect
 from collections import Counter, defaultdict
 
+import numpy as np
+
 class ThirtyDayFrequencyPenaltyAlgorithm(BaseAlgorithm):
     """
     Thuật toán 3: Trừ điểm cho các số ít xuất hiện và cộng điểm
@@ -23,12 +26,8 @@ class ThirtyDayFrequencyPenaltyAlgorithm(BaseAlgorithm):
         }
         self._log('debug', f"{self.__class__.__name__} initialized.")
 
-    def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
-        """Tính điểm dựa trên tần suất xuất hiện 30 ngày."""
-        self._log('debug', f"Starting prediction for: {date_to_predict}")
-        scores = {f'{i:02d}': 0.0 for i in range(100)}
-
-        # Lấy tham số
+    def _read_parameters(self):
+        """Đọc tham số từ config, dùng giá trị mặc định nếu không hợp lệ."""
         params = self.config.get('parameters', {})
         try:
             hist_days = int(params.get('history_days', 30))
@@ -41,6 +40,15 @@ class ThirtyDayFrequencyPenaltyAlgorithm(BaseAlgorithm):
             min_penalty = -0.1
             penalty_inc = -0.1
             never_bonus = 0.5
+        return hist_days, min_penalty, penalty_inc, never_bonus
+
+    def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
+        """Tính điểm dựa trên tần suất xuất hiện 30 ngày."""
+        self._log('debug', f"Starting prediction for: {date_to_predict}")
+        scores = {f'{i:02d}': 0.0 for i in range(100)}
+
+        # Lấy tham số
+        hist_days, min_penalty, penalty_inc, never_bonus = self._read_parameters()
 
         # Lọc lịch sử cho 30 ngày
         start_date_limit = date_to_predict - datetime.timedelta(days=hist_days)
@@ -98,6 +106,48 @@ class ThirtyDayFrequencyPenaltyAlgorithm(BaseAlgorithm):
         self._log('info', f"ThirtyDayFrequencyPenalty prediction completed for {date_to_predict}.")
         return scores
 
+    def predict_range(self, dates, store, history_ends=None):
+        """
+        Bản cửa sổ trượt của `predict()` cho nhiều ngày: số ngày xuất hiện trong cửa sổ
+        [ngày - history_days, ngày) lấy từ tổng tích lũy của store, không quét lại lịch sử.
+        Kết quả trùng khớp với gọi `predict()` từng ngày.
+        """
+        hist_days, min_penalty, penalty_inc, never_bonus = self._read_parameters()
+        scores = np.zeros((len(dates), 100), dtype=np.float64)
+        presence_cumsum = store.presence_cumsum()
+        store_dates = store.dates
+
+        for i, date_to_predict in enumerate(dates):
+            end_row = bisect.bisect_left(store_dates, date_to_predict)
+            if history_ends is not None:
+                end_row = min(end_row, history_ends[i])
+            start_date_limit = date_to_predict - datetime.timedelta(days=hist_days)
+            start_row = min(bisect.bisect_left(store_dates, start_date_limit), end_row)
+            if start_row >= end_row:
+                scores[i, :] = never_bonus
+                continue
+
+            number_counts = presence_cumsum[end_row] - presence_cumsum[start_row]
+            scores[i] = self._window_scores(number_counts, min_penalty, penalty_inc, never_bonus)
+        return scores
+
+    @staticmethod
+    def _window_scores(number_counts, min_penalty, penalty_inc, never_bonus):
+        """Điểm cho 100 số từ số ngày xuất hiện trong cửa sổ (mảng int[100])."""
+        day_scores = np.zeros(100, dtype=np.float64)
+        appeared = number_counts > 0
+        day_scores[~appeared] = never_bonus
+
+        # Nhóm tần suất tăng dần, điểm phạt cộng dồn theo đúng thứ tự như predict()
+        sorted_frequencies, group_index = np.unique(number_counts[appeared], return_inverse=True)
+        group_penalties = []
+        current_penalty = min_penalty
+        for _ in range(len(sorted_frequencies)):
+            group_penalties.append(current_penalty)
+            current_penalty += penalty_inc
+        day_scores[appeared] = np.asarray(group_penalties, dtype=np.float64)[group_index]
+        return day_scores
+
 # Kiểm tra thử (cần file sample_data.json phù hợp)
 if __name__ == "__main__":
     import json
@@ -0,0 +1,535 @@
+# --- START OF FILE engine/backtest.py ---
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import datetime
+
+import numpy as np
+
+from algorithms.base import predict_range_matrices
+from engine.draw_store import NUM_NUMBERS
+from engine.scoring import BASE_SCORE, WeightSnapshot, build_score_tensor, combine_score_tensor
+from engine.evaluator import SORT_MODE_DESC, RankingEvaluation, rank_matrix
+
+backtest_logger = logging.getLogger(__name__)
+
+# Số ngày mỗi lần gọi predict_range() (giữ tiến trình/dừng đủ mượt)
+PREDICT_RANGE_CHUNK_DAYS = 30
+
+
+def compute_score_chunks(name, algorithm, dates, store, chunk_days=PREDICT_RANGE_CHUNK_DAYS,
+                         history_ends=None, should_stop=None):
+    """
+    Ma trận điểm của MỘT thuật toán theo từng khối `chunk_days` ngày, dùng làm
+    `precomputed_chunks` cho Backtest (ví dụ thuật toán kết hợp không đổi giữa các lần thử).
+
+    Returns:
+        list | None: Danh sách ma trận (None cho khối bị lỗi), hoặc None nếu bị dừng giữa chừng.
+    """
+    chunks = []
+    for chunk_start in range(0, len(dates), chunk_days):
+        if should_stop is not None and should_stop():
+            return None
+        chunk_ends = None if history_ends is None else history_ends[chunk_start:chunk_start + chunk_days]
+        chunks.append(predict_range_matrices({name: algorithm}, dates[chunk_start:chunk_start + chunk_days],
+                                             store, chunk_ends)[name])
+    return chunks
+
+
+def slice_score_chunks(chunks, n_days, start, chunk_days=PREDICT_RANGE_CHUNK_DAYS):
+    """
+    Chia lại các khối ma trận điểm (cùng dạng compute_score_chunks, tổng `n_days` ngày) cho các ngày
+    từ vị trí `start` trở đi - dùng khi chạy Backtest trên một đoạn cuối của danh sách ngày mà không
+    phải dự đoán lại.
+
+    Ngày thuộc khối lỗi (None) thành hàng NaN; khối mới là None khi mọi ngày của nó đều thuộc khối lỗi.
+    """
+    if start == 0:
+        return list(chunks)
+    scores = np.full((n_days, NUM_NUMBERS), np.nan, dtype=np.float64)
+    failed = np.zeros(n_days, dtype=bool)
+    for chunk_index, chunk in enumerate(chunks):
+        block = slice(chunk_index * chunk_days, min((chunk_index + 1) * chunk_days, n_days))
+        if chunk is None:
+            failed[block] = True
+        else:
+            scores[block] = chunk
+    return [None if failed[day:day + chunk_days].all() else scores[day:day + chunk_days]
+            for day in range(start, n_days, chunk_days)]
+
+
+def performance_summary(result, missing_days=0) -> dict:
+    """
+    Thống kê hiệu suất dạng dict của trình tối ưu từ một BacktestResult.
+
+    Args:
+        result (BacktestResult): Kết quả Backtest(require_scores=True).
+        missing_days (int): Số ngày trong khoảng kiểm thử không chạy được (thiếu lịch sử/kết quả),
+                            được cộng vào 'errors'.
+    """
+    evaluation = result.evaluation
+    total_tested = evaluation.n_days
+    stats = {'total_days_tested': total_tested, 'hits_top_1': 0, 'hits_top_3': 0, 'hits_top_5': 0,
+             'hits_top_10': 0, 'errors': 0, 'avg_top10_repetition': 0.0,
+             'max_top10_repetition_count': 0, 'top10_repetition_details': {}}
+    stats['errors'] = missing_days + result.algorithm_errors + int(np.count_nonzero(~result.tested))
+    for k in (1, 3, 5, 10):
+        stats[f'hits_top_{k}'] = evaluation.top_hits(k)
+    for k in (1, 3, 5, 10):
+        stats[f'acc_top_{k}_pct'] = (stats[f'hits_top_{k}'] / total_tested) * 100.0 if total_tested > 0 else 0.0
+    if total_tested > 0:
+        (stats['avg_top10_repetition'], stats['max_top10_repetition_count'],
+         stats['top10_repetition_details']) = evaluation.top10_repetition()
+    return stats
+
+
+def run_streak(backtest, start_date, max_results_date=None, streak_limit=0, top_k=3, check_interrupt=None):
+    """
+    Chuỗi ngày trúng liên tiếp (ít nhất một số top `top_k` có trong kết quả ngày kế tiếp)
+    bắt đầu từ `start_date`, dự đoán từng ngày một bằng `backtest` (nên dùng chunk_days=1:
+    chuỗi dừng ngay khi trượt nên không cần dự đoán trước).
+
+    Args:
+        check_interrupt (callable, optional): Gọi trước mỗi ngày; trả về "stopped" hoặc
+            "time_limit" để dừng, None để tiếp tục.
+
+    Returns:
+        tuple: (độ dài chuỗi, lý do kết thúc, ngày cuối cùng). Lý do: "streak_broken",
+               "streak_limit_reached", "end_of_data", "missing_history", "prediction_error",
+               "stopped" (chuỗi = -1) hoặc "time_limit" (chuỗi = -2).
+    """
+    store = backtest.store
+    one_day = datetime.timedelta(days=1)
+    current_streak = 0
+    predict_date = start_date
+    while True:
+        interrupt_reason = check_interrupt() if check_interrupt is not None else None
+        if interrupt_reason == "stopped":
+            return -1, "stopped", predict_date
+        if interrupt_reason == "time_limit":
+            return -2, "time_limit", predict_date
+        check_date = predict_date + one_day
+        actual_row = store.row_of(check_date)
+        if predict_date not in store.index:
+            return current_streak, "missing_history", predict_date
+        if actual_row is None or (max_results_date is not None and check_date > max_results_date):
+            return current_streak, "end_of_data", predict_date
+        try:
+            day_chunk = next(backtest.iter_chunks([predict_date], target_rows=[actual_row]))
+        except Exception as e:
+            backtest_logger.error(f"Lỗi dự đoán ngày {predict_date}: {e}", exc_info=True)
+            return current_streak, "prediction_error", predict_date
+        if not store.presence[actual_row].any():
+            predict_date = check_date
+            continue
+        if store.presence[actual_row, day_chunk.ranked[0, :top_k]].any():
+            current_streak += 1
+            if streak_limit > 0 and current_streak >= streak_limit:
+                return current_streak, "streak_limit_reached", predict_date
+            predict_date = check_date
+        else:
+            return current_streak, "streak_broken", predict_date
+
+
+DAY_MISS = 0         # Dự đoán trượt (chuỗi bị ngắt)
+DAY_HIT = 1          # Trúng ít nhất một số top k
+DAY_NO_RESULT = 2    # Ngày kế tiếp có bản ghi nhưng không có số nào: bỏ qua, chuỗi không ngắt
+DAY_NO_HISTORY = 3   # Ngày dự đoán không có trong dữ liệu (chuỗi dừng: missing_history)
+DAY_NO_TARGET = 4    # Không có kết quả ngày kế tiếp / vượt ngày cuối (chuỗi dừng: end_of_data)
+
+_DAY_STOP_REASONS = {DAY_MISS: "streak_broken", DAY_NO_HISTORY: "missing_history", DAY_NO_TARGET: "end_of_data"}
+
+
+class HitVector:
+    """
+    Trạng thái trúng/trượt top k của MỌI ngày dự đoán liên tiếp từ `start_date`, dùng để suy ra
+    chuỗi của bất kỳ ngày bắt đầu nào mà không phải dự đoán lại (kết quả giống `run_streak`).
+
+    Attributes:
+        start_date (date): Ngày dự đoán đầu tiên (ô 0).
+        status (np.ndarray): int8[n_days] - một trong các hằng DAY_* cho từng ngày lịch.
+    """
+
+    def __init__(self, start_date, status):
+        self.start_date = start_date
+        self.status = np.asarray(status, dtype=np.int8)
+        n_days = len(self.status)
+        self._is_stop = np.isin(self.status, list(_DAY_STOP_REASONS))
+        self._cum_hits = np.concatenate(([0], np.cumsum(self.status == DAY_HIT)))
+        # Ngày dừng đầu tiên từ mỗi ô (ô cuối luôn là ngày dừng, xem compute_hit_vector)
+        stop_positions = np.flatnonzero(self._is_stop)
+        self._next_stop = stop_positions[np.searchsorted(stop_positions, np.arange(n_days))]
+
+    def __len__(self):
+        return len(self.status)
+
+    def date_at(self, position):
+        return self.start_date + datetime.timedelta(days=int(position))
+
+    def streak_from(self, start_date, streak_limit=0):
+        """
+        Chuỗi bắt đầu từ `start_date` - cùng kết quả (độ dài, lý do, ngày cuối) như `run_streak`.
+        """
+        position = (start_date - self.start_date).days
+        if not 0 <= position < len(self.status):
+            raise ValueError(f"Ngày {start_date} nằm ngoài vector trúng ({self.start_date}, {len(self.status)} ngày).")
+        stop = int(self._next_stop[position])
+        hits = int(self._cum_hits[stop] - self._cum_hits[position])
+        if streak_limit > 0 and hits >= streak_limit:
+            limit_position = int(np.searchsorted(self._cum_hits, self._cum_hits[position] + streak_limit)) - 1
+            return streak_limit, "streak_limit_reached", self.date_at(limit_position)
+        return hits, _DAY_STOP_REASONS[int(self.status[stop])], self.date_at(stop)
+
+    def runs(self, min_length=1):
+        """
+        Bảng độ dài chuỗi: mỗi chuỗi tối đa (bắt đầu ngay sau một ngày dừng) có ít nhất `min_length`
+        ngày trúng, theo thứ tự ngày.
+
+        Returns:
+            list: [(ngày bắt đầu, độ dài, lý do kết thúc, ngày dừng), ...]
+        """
+        previous_is_stop = np.concatenate(([True], self._is_stop[:-1]))
+        starts = np.flatnonzero(previous_is_stop & ~self._is_stop)
+        stops = self._next_stop[starts]
+        lengths = self._cum_hits[stops] - self._cum_hits[starts]
+        keep = lengths >= max(1, int(min_length))
+        return [(self.date_at(start), int(length), _DAY_STOP_REASONS[int(self.status[stop])], self.date_at(stop))
+                for start, stop, length in zip(starts[keep], stops[keep], lengths[keep])]
+
+    def longest(self):
+        """Chuỗi dài nhất (sớm nhất nếu bằng nhau): (độ dài, lý do kết thúc, ngày bắt đầu)."""
+        all_runs = self.runs()
+        if not all_runs:
+            streak, reason, _ = self.streak_from(self.start_date)
+            return streak, reason, self.start_date
+        best_start, best_length, best_reason, _ = max(all_runs, key=lambda run: (run[1], -run[0].toordinal()))
+        return best_length, best_reason, best_start
+
+
+def compute_hit_vector(backtest, start_date, max_results_date=None, top_k=3, should_stop=None):
+    """
+    Dự đoán một lượt (theo khối `backtest.chunk_days`) mọi ngày từ `start_date` đến hết dữ liệu
+    (hoặc `max_results_date`) và trả về HitVector trúng top `top_k`.
+
+    Returns:
+        HitVector | None: None nếu `should_stop()` trả về True giữa chừng.
+    """
+    store = backtest.store
+    one_day = datetime.timedelta(days=1)
+    end_date = store.date_range()[1]
+    if max_results_date is not None:
+        end_date = min(end_date, max_results_date)
+    # Ô cuối (ngày end_date) không có kết quả ngày kế tiếp nên luôn là ngày dừng
+    n_days = max(0, (end_date - start_date).days) + 1
+    status = np.full(n_days, DAY_NO_TARGET, dtype=np.int8)
+    predict_positions, predict_dates, target_rows = [], [], []
+    for position in range(n_days):
+        predict_date = start_date + datetime.timedelta(days=position)
+        if predict_date not in store.index:
+            status[position] = DAY_NO_HISTORY
+            continue
+        check_date = predict_date + one_day
+        actual_row = store.row_of(check_date)
+        if actual_row is None or check_date > end_date:
+            continue
+        predict_positions.append(position); predict_dates.append(predict_date); target_rows.append(actual_row)
+
+    presence = store.presence
+    chunks = backtest.iter_chunks(predict_dates, target_rows=target_rows)
+    while True:
+        if should_stop is not None and should_stop():
+            return None
+        chunk = next(chunks, None)
+        if chunk is None:
+            break
+        chunk_rows = np.asarray(chunk.target_rows)
+        chunk_positions = predict_positions[chunk.start:chunk.start + len(chunk.dates)]
+        has_result = presence[chunk_rows].any(axis=1)
+        is_hit = np.take_along_axis(presence[chunk_rows], chunk.ranked[:, :top_k], axis=1).any(axis=1)
+        status[chunk_positions] = np.where(has_result, np.where(is_hit, DAY_HIT, DAY_MISS), DAY_NO_RESULT)
+    if backtest.stopped:
+        return None
+    return HitVector(start_date, status)
+
+
+def longest_streak(backtest, start_date, max_results_date=None, streak_limit=0, top_k=3, check_interrupt=None):
+    """
+    Chuỗi dài nhất bắt đầu ở BẤT KỲ ngày nào từ `start_date` (dựa trên compute_hit_vector),
+    cùng dạng kết quả với `run_streak` nhưng phần tử cuối là ngày bắt đầu của chuỗi.
+
+    Độ dài không bị cắt ở `streak_limit`; nếu đạt mục tiêu thì lý do là "streak_limit_reached".
+    """
+    interrupt_reasons = []
+
+    def should_stop():
+        interrupt_reason = check_interrupt() if check_interrupt is not None else None
+        if interrupt_reason:
+            interrupt_reasons.append(interrupt_reason)
+        return bool(interrupt_reason)
+
+    try:
+        hit_vector = compute_hit_vector(backtest, start_date, max_results_date, top_k, should_stop)
+    except Exception as e:
+        backtest_logger.error(f"Lỗi dự đoán khi tính vector trúng từ {start_date}: {e}", exc_info=True)
+        return 0, "prediction_error", start_date
+    if hit_vector is None:
+        return (-2, "time_limit", start_date) if "time_limit" in interrupt_reasons else (-1, "stopped", start_date)
+    streak, reason, run_start = hit_vector.longest()
+    if streak_limit > 0 and streak >= streak_limit:
+        reason = "streak_limit_reached"
+    return streak, reason, run_start
+
+
+def top_hits_metric(k: int):
+    """Chỉ số: số ngày có ít nhất một số trúng trong top k."""
+    return lambda evaluation: evaluation.top_hits(k)
+
+
+def special_hits_metric(k: int):
+    """Chỉ số: số ngày giải đặc biệt nằm trong top k."""
+    return lambda evaluation: evaluation.special_hits(k)
+
+
+class BacktestChunk:
+    """
+    Kết quả của một khối ngày liên tiếp trong Backtest.
+
+    Attributes:
+        start (int): Vị trí ngày đầu khối trong danh sách ngày của lượt chạy.
+        dates (list): Các ngày dự đoán của khối.
+        target_rows (list): Hàng kết quả đối chiếu của từng ngày (None nếu không có).
+        score_tensor (np.ndarray): float[n_algos, n_days, 100], thứ tự theo `Backtest.names`.
+        algorithm_errors (int): Số (thuật toán, ngày) bị lỗi trong khối (mỗi ma trận None tính mọi ngày của khối).
+        combined (np.ndarray): float[n_days, 100] - điểm tổng hợp.
+        has_scores (np.ndarray): bool[n_days] - có ít nhất một thuật toán dự đoán.
+        comparable (np.ndarray): bool[n_days] - có kết quả đối chiếu (và có số).
+        tested (np.ndarray): bool[n_days] - ngày được tính vào đánh giá.
+        ranked (np.ndarray): int[n_days, 100] - bảng xếp hạng của MỌI ngày trong khối.
+        evaluation (RankingEvaluation): Đánh giá trên các ngày `tested`.
+    """
+    __slots__ = ('start', 'dates', 'target_rows', 'score_tensor', 'algorithm_errors', 'combined',
+                 'has_scores', 'comparable', 'tested', 'ranked', 'evaluation')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+
+class BacktestResult:
+    """
+    Kết quả gộp của một lượt Backtest.run().
+
+    Attributes:
+        names (tuple): Tên thuật toán theo thứ tự của tensor điểm.
+        dates (list): Các ngày dự đoán.
+        tested (np.ndarray): bool[n_days] - ngày được đánh giá.
+        combined (np.ndarray): float[n_days, 100].
+        ranked (np.ndarray): int[n_tested, 100] - bảng xếp hạng các ngày được đánh giá.
+        evaluation (RankingEvaluation): Đánh giá gộp trên các ngày được đánh giá.
+        score_tensor (np.ndarray | None): float[n_algos, n_days, 100] nếu Backtest(keep_scores=True).
+        algorithm_errors (int): Tổng số (thuật toán, ngày) bị lỗi, như vòng lặp từng ngày trước đây.
+        days_not_comparable (int): Số ngày không có kết quả đối chiếu.
+        days_without_scores (int): Số ngày đối chiếu được nhưng không thuật toán nào dự đoán
+                                   (chỉ bị loại khi require_scores=True).
+        metrics (dict): {tên chỉ số: giá trị} của các chỉ số gắn vào Backtest.
+        pruned (bool): True nếu lượt chạy bị cắt tỉa (xem Backtest `prune_below`) - các trường
+                       khác chỉ phản ánh những ngày đã chạy.
+    """
+    __slots__ = ('names', 'dates', 'tested', 'combined', 'ranked', 'evaluation', 'score_tensor',
+                 'algorithm_errors', 'days_not_comparable', 'days_without_scores', 'metrics', 'pruned')
+
+    def __init__(self, **fields):
+        for name in self.__slots__:
+            setattr(self, name, fields.get(name))
+
+    @property
+    def n_tested(self) -> int:
+        return self.evaluation.n_days
+
+
+class Backtest:
+    """
+    Chạy kiểm thử lại (backtest) "duyệt ngày → dự đoán → tổng hợp → xếp hạng → đối chiếu"
+    cho một bộ thuật toán, dùng chung cho mọi chức năng (tab Main, trình tối ưu, đánh giá,
+    chơi thử, date-optimize).
+
+    Args:
+        algorithms (dict): {tên: instance thuật toán} sẽ được gọi predict_range().
+        store (DrawStore): Kho dữ liệu kết quả.
+        weights (WeightSnapshot, optional): Trọng số/thứ tự cộng điểm. Mặc định trọng số 1.0
+            theo thứ tự `algorithms` rồi `precomputed_chunks`.
+        sort_mode, custom_order: Chế độ xếp hạng (xem engine.evaluator.rank_matrix).
+        decimals (int | None), base_score (float): Cách tổng hợp điểm (xem combine_score_tensor).
+        require_scores (bool): Bỏ qua (không đánh giá) ngày không có thuật toán nào dự đoán.
+        precomputed_chunks (dict, optional): {tên: list ma trận theo khối `chunk_days`} đã tính sẵn
+            cho đúng danh sách ngày của lượt chạy (xem compute_score_chunks).
+        chunk_days (int): Số ngày mỗi khối predict_range().
+        metrics (dict, optional): {tên: hàm(RankingEvaluation) -> giá trị} tính khi kết thúc.
+        progress_callback (callable, optional): Gọi (số ngày đã xử lý, tổng số ngày) sau mỗi khối.
+        should_stop (callable, optional): Trả về True để dừng; được gọi trước mỗi khối
+            (có thể chờ bên trong khi đang tạm dừng).
+        throttle_sleep (float): Số giây nghỉ cho mỗi ngày (giảm tải CPU).
+        keep_scores (bool): Giữ lại tensor điểm trong kết quả.
+        prune_below (float, optional): Cắt tỉa: dừng sớm khi tỷ lệ trúng top `prune_top_k` (%)
+            tốt nhất còn đạt được (số ngày trúng + MỌI ngày còn lại đều trúng) đã thấp hơn giá trị này,
+            tức là lượt chạy chắc chắn không vượt được bộ tốt nhất hiện tại.
+        prune_top_k (int): k của tỷ lệ trúng dùng để cắt tỉa.
+    """
+
+    def __init__(self, algorithms, store, weights=None, sort_mode=SORT_MODE_DESC, custom_order=None,
+                 decimals=2, base_score=BASE_SCORE, require_scores=True, precomputed_chunks=None,
+                 chunk_days=PREDICT_RANGE_CHUNK_DAYS, metrics=None, progress_callback=None,
+                 should_stop=None, throttle_sleep=0.0, keep_scores=False, prune_below=None, prune_top_k=3):
+        self.algorithms = dict(algorithms)
+        self.store = store
+        self.precomputed_chunks = dict(precomputed_chunks or {})
+        if weights is None:
+            names = list(self.algorithms) + [n for n in self.precomputed_chunks if n not in self.algorithms]
+            weights = WeightSnapshot(names)
+        self.weights = weights
+        self.sort_mode = sort_mode
+        self.custom_order = custom_order
+        self.decimals = decimals
+        self.base_score = base_score
+        self.require_scores = require_scores
+        self.chunk_days = max(1, int(chunk_days))
+        self.metrics = dict(metrics or {})
+        self.progress_callback = progress_callback
+        self.should_stop = should_stop
+        self.throttle_sleep = throttle_sleep
+        self.keep_scores = keep_scores
+        self.prune_below = prune_below
+        self.prune_top_k = prune_top_k
+        self.stopped = False
+        self.pruned = False
+
+    @property
+    def names(self):
+        return self.weights.names
+
+    def _default_target_rows(self, dates):
+        """Mặc định đối chiếu với kết quả của ngày kế tiếp ngày dự đoán."""
+        one_day = datetime.timedelta(days=1)
+        return [self.store.row_of(d + one_day) for d in dates]
+
+    def _rank(self, combined):
+        try:
+            return rank_matrix(combined, self.sort_mode, self.custom_order)
+        except Exception as sort_err:
+            backtest_logger.error(f"Lỗi xếp hạng ({sort_err}), dùng thứ tự điểm giảm dần.")
+            return rank_matrix(combined)
+
+    def iter_chunks(self, dates, target_rows=None, history_ends=None):
+        """
+        Chạy từng khối ngày, trả về (yield) BacktestChunk. Người gọi có thể dừng sớm
+        (ví dụ hết vốn khi chơi thử); `self.stopped` = True nếu dừng do `should_stop`,
+        `self.pruned` = True nếu dừng do cắt tỉa (`prune_below`).
+
+        Args:
+            dates (list): Ngày truyền cho predict_range() (lịch sử mặc định: các ngày TRƯỚC đó).
+            target_rows (list, optional): Hàng kết quả đối chiếu cho từng ngày.
+                                          Mặc định là hàng của ngày kế tiếp.
+            history_ends (list, optional): Giới hạn lịch sử cho từng ngày (xem predict_range()).
+        """
+        self.stopped = False
+        self.pruned = False
+        dates = list(dates)
+        if target_rows is None:
+            target_rows = self._default_target_rows(dates)
+        presence = self.store.presence
+        special = self.store.special
+        total_days = len(dates)
+        hits_so_far = 0
+        tested_so_far = 0
+
+        for chunk_index, chunk_start in enumerate(range(0, total_days, self.chunk_days)):
+            if self.should_stop is not None and self.should_stop():
+                self.stopped = True
+                return
+            if self.prune_below is not None and chunk_start > 0:
+                # Cận trên: mọi ngày còn lại đều được đánh giá và đều trúng
+                remaining = total_days - chunk_start
+                best_possible = (hits_so_far + remaining) / (tested_so_far + remaining) * 100.0
+                if best_possible < self.prune_below:
+                    backtest_logger.debug(f"Cắt tỉa sau {chunk_start}/{total_days} ngày: tối đa {best_possible:.2f}% < {self.prune_below:.2f}%.")
+                    self.pruned = True
+                    return
+            chunk_dates = dates[chunk_start:chunk_start + self.chunk_days]
+            chunk_rows = target_rows[chunk_start:chunk_start + self.chunk_days]
+            n_days = len(chunk_dates)
+            if self.throttle_sleep > 0:
+                time.sleep(self.throttle_sleep * n_days)
+
+            chunk_ends = None if history_ends is None else history_ends[chunk_start:chunk_start + self.chunk_days]
+            matrices = predict_range_matrices(self.algorithms, chunk_dates, self.store, chunk_ends)
+            for name, chunks in self.precomputed_chunks.items():
+                matrices[name] = chunks[chunk_index]
+            algorithm_errors = sum(n_days for m in matrices.values() if m is None)
+
+            score_tensor = build_score_tensor(matrices, self.names, n_days)
+            combined = combine_score_tensor(score_tensor, self.weights, self.decimals, self.base_score)
+            has_scores = (~np.isnan(score_tensor).all(axis=2)).any(axis=0)
+            comparable = np.array([row is not None and bool(presence[row].any()) for row in chunk_rows], dtype=bool)
+            tested = comparable & has_scores if self.require_scores else comparable.copy()
+
+            ranked = self._rank(combined)
+            tested_rows = [row for row, ok in zip(chunk_rows, tested.tolist()) if ok]
+            evaluation = RankingEvaluation(ranked[tested], presence[tested_rows], special[tested_rows])
+            if self.prune_below is not None:
+                hits_so_far += evaluation.top_hits(self.prune_top_k)
+                tested_so_far += evaluation.n_days
+
+            yield BacktestChunk(start=chunk_start, dates=chunk_dates, target_rows=chunk_rows,
+                                score_tensor=score_tensor, algorithm_errors=algorithm_errors,
+                                combined=combined, has_scores=has_scores, comparable=comparable,
+                                tested=tested, ranked=ranked, evaluation=evaluation)
+
+            if self.progress_callback is not None:
+                self.progress_callback(chunk_start + n_days, total_days)
+
+    def run(self, dates, target_rows=None, history_ends=None):
+        """
+        Chạy toàn bộ danh sách ngày và gộp kết quả.
+
+        Returns:
+            BacktestResult | None: None nếu bị dừng bởi `should_stop`; lượt bị cắt tỉa vẫn trả về
+                                   kết quả (một phần) với `pruned` = True.
+        """
+        dates = list(dates)
+        chunks = list(self.iter_chunks(dates, target_rows, history_ends))
+        if self.stopped:
+            return None
+        if self.pruned:
+            dates = dates[:sum(len(c.dates) for c in chunks)]
+
+        presence = self.store.presence
+        special = self.store.special
+        if chunks:
+            tested = np.concatenate([c.tested for c in chunks])
+            combined = np.concatenate([c.combined for c in chunks])
+            ranked = np.concatenate([c.ranked[c.tested] for c in chunks])
+            tested_rows = [row for c in chunks for row, ok in zip(c.target_rows, c.tested.tolist()) if ok]
+            score_tensor = np.concatenate([c.score_tensor for c in chunks], axis=1) if self.keep_scores else None
+            days_not_comparable = int(sum(np.count_nonzero(~c.comparable) for c in chunks))
+            days_without_scores = int(sum(np.count_nonzero(c.comparable & ~c.has_scores) for c in chunks))
+        else:
+            tested = np.zeros(0, dtype=bool)
+            combined = np.zeros((0, 100), dtype=np.float64)
+            ranked = np.zeros((0, 100), dtype=np.int64)
+            tested_rows = []
+            score_tensor = np.zeros((len(self.names), 0, 100), dtype=np.float64) if self.keep_scores else None
+            days_not_comparable = 0
+            days_without_scores = 0
+        evaluation = RankingEvaluation(ranked, presence[tested_rows], special[tested_rows])
+
+        return BacktestResult(
+            names=self.names, dates=dates, tested=tested, combined=combined, ranked=ranked,
+            evaluation=evaluation, score_tensor=score_tensor,
+            algorithm_errors=sum(c.algorithm_errors for c in chunks),
+            days_not_comparable=days_not_comparable, days_without_scores=days_without_scores,
+            metrics={name: metric(evaluation) for name, metric in self.metrics.items()},
+            pruned=self.pruned,
+        )
+
+# --- END OF FILE engine/backtest.py ---
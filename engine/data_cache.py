@@ -0,0 +1,233 @@
+# --- START OF FILE engine/data_cache.py ---
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import logging
+import hashlib
+import datetime
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from engine.draw_store import DrawStore, PRIZE_KEYS, NUM_PRIZES
+
+cache_logger = logging.getLogger(__name__)
+
+CACHE_FORMAT_VERSION = 1
+CACHE_DIR_NAME = ".cache"
+_ARRAY_NAMES = ("ordinals", "prizes", "counts", "special")
+
+
+def file_sha256(file_path) -> str:
+    """Mã băm sha256 nội dung file (đọc theo khối để không tốn bộ nhớ)."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_results_json(raw_data, logger=None) -> list:
+    """
+    Chuyển dữ liệu JSON thô thành list các dict {'date': date_obj, 'result': dict},
+    đã loại ngày trùng và sắp xếp tăng dần theo ngày.
+
+    Hỗ trợ các định dạng:
+        - list các bản ghi có key 'date' (kết quả nằm ở 'result' hoặc các key còn lại).
+        - dict {'results': {date_str: result_dict}} hoặc {'results': [...]}.
+        - dict {date_str: result_dict}.
+
+    Raises:
+        ValueError: Nếu định dạng JSON không được hỗ trợ.
+    """
+    log = logger or cache_logger
+    data_list_to_process = []
+    if isinstance(raw_data, list):
+        data_list_to_process = raw_data
+    elif isinstance(raw_data, dict):
+        results_val = raw_data.get('results')
+        if isinstance(results_val, dict):
+            for date_str, result_dict in results_val.items():
+                if isinstance(result_dict, dict):
+                    data_list_to_process.append({'date': date_str, 'result': result_dict})
+        elif isinstance(results_val, list):
+            data_list_to_process = results_val
+        else:
+            for date_str, result_dict in raw_data.items():
+                if not isinstance(result_dict, dict):
+                    continue
+                try:
+                    datetime.datetime.strptime(str(date_str).split('T')[0], '%Y-%m-%d')
+                except ValueError:
+                    log.warning(f"Bỏ qua key không phải ngày: {date_str}")
+                    continue
+                data_list_to_process.append({'date': date_str, 'result': result_dict})
+    else:
+        raise ValueError("Định dạng JSON không hợp lệ hoặc không được hỗ trợ.")
+
+    processed_results = []
+    unique_dates = set()
+    for item in data_list_to_process:
+        if not isinstance(item, dict):
+            continue
+        date_str_raw = item.get("date")
+        if not date_str_raw:
+            continue
+        try:
+            date_obj = datetime.datetime.strptime(str(date_str_raw).split('T')[0], '%Y-%m-%d').date()
+        except ValueError:
+            log.warning(f"Skipping invalid date format: {date_str_raw}")
+            continue
+        if date_obj in unique_dates:
+            log.warning(f"Skipping duplicate date: {date_obj}")
+            continue
+        # Bản ghi có key 'result' (kể cả None) dùng đúng giá trị đó; chỉ khi không có key mới lấy các key còn lại
+        result_dict = item.get('result', {k: v for k, v in item.items() if k != 'date'})
+        if not result_dict or not isinstance(result_dict, dict):
+            log.warning(f"Skipping entry with missing/invalid result for date {date_obj}")
+            continue
+        processed_results.append({'date': date_obj, 'result': result_dict})
+        unique_dates.add(date_obj)
+
+    processed_results.sort(key=lambda x: x['date'])
+    return processed_results
+
+
+def is_canonical_results(results_list) -> bool:
+    """
+    Dữ liệu "chuẩn" nếu mọi ngày có đúng 27 key giải theo thứ tự PRIZE_KEYS
+    và giá trị là số nguyên 0-99 (file xsmb-2-digits.json). Chỉ khi đó bản ghi
+    mới dựng lại được chính xác từ ma trận giải.
+    """
+    for rec in results_list:
+        result_dict = rec['result']
+        if len(result_dict) != NUM_PRIZES or tuple(result_dict.keys()) != PRIZE_KEYS:
+            return False
+        for value in result_dict.values():
+            if type(value) is not int or not 0 <= value <= 99:
+                return False
+    return True
+
+
+def records_from_prizes(ordinals, prizes) -> list:
+    """
+    Dựng lại các bản ghi {'date', 'result'} từ mảng ngày (ordinal) và ma trận giải.
+    Chỉ chính xác với dữ liệu dạng chuẩn (xem `is_canonical_results`).
+    """
+    fromordinal = datetime.date.fromordinal
+    return [
+        {'date': fromordinal(o), 'result': dict(zip(PRIZE_KEYS, row))}
+        for o, row in zip(np.asarray(ordinals).tolist(), np.asarray(prizes).tolist())
+    ]
+
+
+def _cache_paths(data_file_path: Path, cache_dir: Path) -> dict:
+    stem = data_file_path.stem
+    paths = {name: cache_dir / f"{stem}.{name}.npy" for name in _ARRAY_NAMES}
+    paths['meta'] = cache_dir / f"{stem}.meta.json"
+    return paths
+
+
+def _atomic_save_npy(path: Path, arr):
+    tmp_path = path.with_name(path.name + f".tmp{os.getpid()}")
+    with open(tmp_path, 'wb') as f:
+        np.save(f, arr, allow_pickle=False)
+    os.replace(tmp_path, path)
+
+
+def atomic_write_text(path: Path, text: str):
+    """Ghi file qua file tạm + os.replace: người đọc chỉ thấy nội dung cũ hoặc mới, không bao giờ dở dang."""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + f".tmp{os.getpid()}_{threading.get_ident()}")
+    tmp_path.write_text(text, encoding='utf-8')
+    os.replace(tmp_path, path)
+
+
+def _read_cache(paths: dict, source_hash: str, log):
+    """Đọc cache (memory-map). Trả về DrawStore hoặc None nếu cache không khớp/hỏng."""
+    meta_path = paths['meta']
+    if not meta_path.exists():
+        return None
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        if meta.get('format_version') != CACHE_FORMAT_VERSION or meta.get('source_hash') != source_hash:
+            log.debug("Cache dữ liệu đã cũ (hash/phiên bản khác), sẽ dựng lại.")
+            return None
+        if tuple(meta.get('prize_keys', ())) != PRIZE_KEYS:
+            return None
+        arrays = {name: np.load(paths[name], mmap_mode='r', allow_pickle=False) for name in _ARRAY_NAMES}
+        n_days = int(meta.get('n_days', -1))
+        if any(arr.shape[0] != n_days for arr in arrays.values()):
+            log.warning("Cache dữ liệu không nhất quán về kích thước, sẽ dựng lại.")
+            return None
+    except Exception as e:
+        log.warning(f"Không đọc được cache dữ liệu ({e}), sẽ dựng lại.")
+        return None
+
+    records = records_from_prizes(arrays['ordinals'], arrays['prizes'])
+    return DrawStore.from_arrays(records, arrays['ordinals'], arrays['prizes'], arrays['counts'], arrays['special'],
+                                 version=meta.get('store_version'))
+
+
+def _write_cache(paths: dict, store: DrawStore, source_hash: str, log):
+    try:
+        paths['meta'].parent.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAY_NAMES:
+            _atomic_save_npy(paths[name], np.ascontiguousarray(getattr(store, name)))
+        meta = {
+            'format_version': CACHE_FORMAT_VERSION,
+            'source_hash': source_hash,
+            'n_days': len(store),
+            'prize_keys': list(PRIZE_KEYS),
+            'store_version': store.version,
+            'created_at': datetime.datetime.now().isoformat(),
+        }
+        # Ghi metadata sau cùng: metadata chỉ tồn tại khi mọi mảng đã ghi xong
+        atomic_write_text(paths['meta'], json.dumps(meta, ensure_ascii=False, indent=2))
+        log.info(f"Đã ghi cache dữ liệu: {paths['meta'].parent}")
+    except Exception as e:
+        log.warning(f"Không ghi được cache dữ liệu: {e}")
+
+
+def load_results_cached(data_file_path, logger=None, use_cache=True):
+    """
+    Tải dữ liệu kết quả từ file JSON, dùng cache nhị phân (.npy + metadata)
+    trong thư mục `.cache/` cạnh file dữ liệu.
+
+    Cache được khóa theo sha256 nội dung JSON; khi file thay đổi cache sẽ tự dựng lại.
+    Cache chỉ được ghi khi dữ liệu ở dạng chuẩn (xem `is_canonical_results`), các định dạng
+    khác vẫn được phân tích từ JSON như trước.
+
+    Returns:
+        tuple: (results_list, draw_store) - results_list chính là `draw_store.records`
+        (các bản ghi FrozenDict chỉ đọc).
+
+    Raises:
+        json.JSONDecodeError, ValueError: Nếu file JSON không hợp lệ.
+    """
+    log = logger or cache_logger
+    data_file_path = Path(data_file_path)
+    source_hash = file_sha256(data_file_path)
+    paths = _cache_paths(data_file_path, data_file_path.parent / CACHE_DIR_NAME)
+
+    if use_cache:
+        store = _read_cache(paths, source_hash, log)
+        if store is not None:
+            log.info(f"Đã tải {len(store)} kết quả từ cache dữ liệu ({data_file_path.name}).")
+            return store.records, store
+
+    with open(data_file_path, 'r', encoding='utf-8') as f:
+        raw_data = json.load(f)
+    results_list = parse_results_json(raw_data, log)
+    store = DrawStore(results_list)
+
+    if use_cache and results_list:
+        if is_canonical_results(results_list):
+            _write_cache(paths, store, source_hash, log)
+        else:
+            log.debug("Dữ liệu không ở dạng chuẩn 27 giải, bỏ qua ghi cache.")
+    return store.records, store
+
+# --- END OF FILE engine/data_cache.py ---
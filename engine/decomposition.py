@@ -0,0 +1,87 @@
+# --- START OF FILE engine/decomposition.py ---
+# -*- coding: utf-8 -*-
+
+import logging
+import threading
+
+from engine.backtest import PREDICT_RANGE_CHUNK_DAYS
+
+decomposition_logger = logging.getLogger(__name__)
+
+# Số lần phân rã (mỗi bộ tham số cấu trúc một lần) được giữ lại cho một thuật toán đích
+DECOMPOSITION_CACHE_MAX_ENTRIES = 8
+
+
+class DecomposedScorer:
+    """
+    Ma trận điểm của thuật toán đích cho một bộ tham số bằng phép co tensor trên các ma trận
+    đặc trưng đã cache (BaseAlgorithm.decompose_range) thay vì gọi lại predict_range() cho mọi ngày.
+
+    Mỗi bộ tham số cấu trúc (cửa sổ...) được phân rã một lần; khi chỉ các hệ số tuyến tính thay đổi
+    (phần lớn các bước của trình tối ưu) điểm được tính lại trong vài mili giây. Khi không phân rã được
+    (decompose_range trả về None: thuật toán không hỗ trợ; hoặc lỗi với bộ tham số này) `score_chunks`
+    trả về None để người gọi quay về đường predict_range() thông thường.
+
+    An toàn khi dùng từ nhiều luồng.
+
+    Args:
+        base_instance (BaseAlgorithm): Instance đã tải của thuật toán đích (tạo bản sao qua with_parameters).
+        dates (list): Các ngày dự đoán của mọi lần thử.
+        store (DrawStore): Kho dữ liệu.
+        max_entries (int): Số lần phân rã giữ lại.
+    """
+
+    def __init__(self, base_instance, dates, store, max_entries=DECOMPOSITION_CACHE_MAX_ENTRIES):
+        self.base_instance = base_instance
+        self.dates = list(dates)
+        self.store = store
+        self.max_entries = max(1, int(max_entries))
+        self.supported = True
+        self._decompositions = []  # mới dùng gần nhất ở cuối
+        self._lock = threading.Lock()
+
+    def _decomposition_for(self, params):
+        for position, decomposition in enumerate(self._decompositions):
+            if decomposition.matches(params):
+                self._decompositions.append(self._decompositions.pop(position))
+                return decomposition
+        try:
+            decomposition = self.base_instance.with_parameters(params).decompose_range(self.dates, self.store)
+        except Exception as e:
+            # Chỉ bộ tham số này không phân rã được (ví dụ tham số sai kiểu): lần thử này dùng predict_range()
+            decomposition_logger.warning(f"decompose_range lỗi ({e}), dùng predict_range() cho bộ tham số này.")
+            return None
+        if decomposition is None:
+            self.supported = False
+            return None
+        self._decompositions.append(decomposition)
+        while len(self._decompositions) > self.max_entries:
+            self._decompositions.pop(0)
+        decomposition_logger.debug(f"Đã phân rã {self.base_instance.__class__.__name__}: "
+                                   f"{len(decomposition.terms)} hạng x {len(self.dates)} ngày.")
+        return decomposition
+
+    def score_matrix(self, params):
+        """Ma trận điểm float64[len(dates), 100] cho `params`, hoặc None nếu không phân rã được."""
+        # Tham số không có trong `params` lấy giá trị của instance gốc (như with_parameters)
+        base_params = self.base_instance.get_config().get('parameters', {})
+        params = {**base_params, **{name: value for name, value in params.items() if name in base_params}}
+        with self._lock:
+            if not self.supported:
+                return None
+            decomposition = self._decomposition_for(params)
+        if decomposition is None:
+            return None
+        return decomposition.scores(params)
+
+    def score_chunks(self, params, chunk_days=PREDICT_RANGE_CHUNK_DAYS):
+        """
+        Như `score_matrix` nhưng chia theo khối `chunk_days` ngày, dùng làm `precomputed_chunks`
+        của Backtest (cùng dạng với compute_score_chunks).
+        """
+        scores = self.score_matrix(params)
+        if scores is None:
+            return None
+        return [scores[start:start + chunk_days] for start in range(0, len(scores), chunk_days)]
+
+# --- END OF FILE engine/decomposition.py ---
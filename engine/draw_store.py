@@ -0,0 +1,327 @@
+# --- START OF FILE engine/draw_store.py ---
+# -*- coding: utf-8 -*-
+
+import logging
+import hashlib
+import bisect
+import itertools
+from collections.abc import Sequence
+
+import numpy as np
+
+store_logger = logging.getLogger(__name__)
+
+# Thứ tự 27 giải của XSMB, dùng cho ma trận giải (cột 0 là giải đặc biệt)
+PRIZE_KEYS = (
+    'special', 'prize1',
+    'prize2_1', 'prize2_2',
+    'prize3_1', 'prize3_2', 'prize3_3', 'prize3_4', 'prize3_5', 'prize3_6',
+    'prize4_1', 'prize4_2', 'prize4_3', 'prize4_4',
+    'prize5_1', 'prize5_2', 'prize5_3', 'prize5_4', 'prize5_5', 'prize5_6',
+    'prize6_1', 'prize6_2', 'prize6_3',
+    'prize7_1', 'prize7_2', 'prize7_3', 'prize7_4',
+)
+NUM_PRIZES = len(PRIZE_KEYS)
+NUM_NUMBERS = 100
+MISSING_PRIZE = 255   # Ô trống trong ma trận giải (uint8)
+MISSING_SPECIAL = -1  # Ngày không có giải đặc biệt
+
+# Hợp của các tập key bị bỏ qua trong main.py và tools/date-optimize.pyw
+KEYS_TO_IGNORE = {
+    'date', '_id', 'source', 'day_of_week', 'sign', 'created_at', 'updated_at',
+    'province_name', 'province_id', 'day', 'month', 'year'
+}
+
+
+class FrozenDict(dict):
+    """
+    dict chỉ đọc dùng cho bản ghi kết quả: mọi thao tác sửa đổi đều báo TypeError.
+
+    Vẫn là `dict` nên các thuật toán dùng `.get()`, `.items()` hay
+    `isinstance(x, dict)` không phải sửa. copy/deepcopy trả về chính nó
+    (không cần sao chép dữ liệu bất biến); `.copy()` trả về dict thường có thể sửa.
+    """
+
+    __slots__ = ()
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Bản ghi kết quả là chỉ đọc (FrozenDict), hãy dùng .copy() nếu cần sửa.")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+def _freeze_value(value):
+    if isinstance(value, dict):
+        return value if isinstance(value, FrozenDict) else FrozenDict((k, _freeze_value(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze_value(v) for v in value)
+    return value
+
+
+def freeze_record(record):
+    """Chuyển một bản ghi {'date':..., 'result': {...}} thành FrozenDict (list -> tuple)."""
+    if isinstance(record, FrozenDict):
+        return record
+    return _freeze_value(record)
+
+
+def parse_two_digit(item) -> int:
+    """Lấy 2 chữ số cuối của một giá trị (số/chuỗi). Trả về -1 nếu không hợp lệ."""
+    if item is None:
+        return -1
+    try:
+        s_item = str(item).strip()
+        if len(s_item) >= 2 and s_item[-2:].isdigit():
+            return int(s_item[-2:])
+        if len(s_item) == 1 and s_item.isdigit():
+            return int(s_item)
+    except (ValueError, TypeError):
+        pass
+    return -1
+
+
+def extract_number_list(result_dict: dict) -> list:
+    """
+    Trích xuất danh sách các số 2 chữ số (giữ nguyên thứ tự và số lần xuất hiện)
+    từ dict kết quả của một ngày. Cùng quy tắc với `extract_numbers_from_result_dict`.
+    """
+    numbers = []
+    if not isinstance(result_dict, dict):
+        return numbers
+    for key, value in result_dict.items():
+        if key in KEYS_TO_IGNORE or (isinstance(key, str) and key.startswith('_')):
+            continue
+        if isinstance(value, (list, tuple)):
+            values_to_check = value
+        elif value is not None:
+            values_to_check = (value,)
+        else:
+            continue
+        for item in values_to_check:
+            num = parse_two_digit(item)
+            if 0 <= num <= 99:
+                numbers.append(num)
+    return numbers
+
+
+def extract_special(result_dict: dict) -> int:
+    """Lấy 2 số cuối giải đặc biệt ('special' hoặc 'dac_biet'). Trả về -1 nếu không có."""
+    if not isinstance(result_dict, dict):
+        return MISSING_SPECIAL
+    spec_val = result_dict.get('special', result_dict.get('dac_biet'))
+    num = parse_two_digit(spec_val)
+    return num if 0 <= num <= 99 else MISSING_SPECIAL
+
+
+class DrawStore:
+    """
+    Kho dữ liệu kết quả dạng cột (NumPy), dựng một lần khi tải dữ liệu.
+
+    Thuộc tính chính (hàng i ứng với ngày thứ i, đã sắp xếp tăng dần):
+        - records  : list các FrozenDict {'date': date_obj, 'result': FrozenDict} (chỉ đọc).
+        - dates    : list các datetime.date.
+        - index    : dict date -> chỉ số hàng.
+        - prizes   : uint8[n, 27]  số 2 chữ số của từng giải (255 = trống).
+        - presence : bool[n, 100]  số có xuất hiện trong ngày hay không.
+        - counts   : uint8[n, 100] số nháy (số lần xuất hiện) của từng số.
+        - special  : int16[n]      2 số cuối giải đặc biệt (-1 = không có).
+    Các mảng được đặt ở chế độ chỉ đọc để có thể chia sẻ an toàn giữa các luồng.
+    """
+
+    def __init__(self, results_list=None):
+        records = [freeze_record(r) for r in results_list] if results_list else []
+        if any(records[i]['date'] > records[i + 1]['date'] for i in range(len(records) - 1)):
+            records.sort(key=lambda x: x['date'])
+        n_days = len(records)
+
+        self.records = records
+        self.dates = [r['date'] for r in records]
+        self.index = {d: i for i, d in enumerate(self.dates)}
+        self.ordinals = np.fromiter((d.toordinal() for d in self.dates), dtype=np.int32, count=n_days)
+
+        self.prizes = np.full((n_days, NUM_PRIZES), MISSING_PRIZE, dtype=np.uint8)
+        self.counts = np.zeros((n_days, NUM_NUMBERS), dtype=np.uint8)
+        self.special = np.full(n_days, MISSING_SPECIAL, dtype=np.int16)
+
+        flat_rows, flat_nums = [], []
+        for i, rec in enumerate(records):
+            result_dict = rec.get('result')
+            nums = extract_number_list(result_dict)
+            if nums:
+                row_vals = nums[:NUM_PRIZES]
+                self.prizes[i, :len(row_vals)] = row_vals
+                flat_rows.extend([i] * len(nums))
+                flat_nums.extend(nums)
+            self.special[i] = extract_special(result_dict)
+        if flat_nums:
+            np.add.at(self.counts, (np.asarray(flat_rows), np.asarray(flat_nums)), 1)
+
+        self.presence = self.counts > 0
+        self._version = None
+        self._presence_cumsum = None
+        for arr in (self.ordinals, self.prizes, self.counts, self.special, self.presence):
+            arr.flags.writeable = False
+        store_logger.debug(f"DrawStore đã dựng: {n_days} ngày.")
+
+    @classmethod
+    def from_arrays(cls, records, ordinals, prizes, counts, special, version=None):
+        """
+        Dựng DrawStore từ các mảng đã có sẵn (ví dụ memory-map từ cache đĩa),
+        không phân tích lại dict kết quả.
+        """
+        store = cls.__new__(cls)
+        store.records = [freeze_record(r) for r in records]
+        store.dates = [r['date'] for r in store.records]
+        store.index = {d: i for i, d in enumerate(store.dates)}
+        store.ordinals = ordinals
+        store.prizes = prizes
+        store.counts = counts
+        store.special = special
+        store.presence = np.asarray(counts) > 0
+        store._version = version
+        store._presence_cumsum = None
+        for arr in (store.ordinals, store.prizes, store.counts, store.special, store.presence):
+            try:
+                arr.flags.writeable = False
+            except (ValueError, AttributeError):
+                pass
+        return store
+
+    def __len__(self):
+        return len(self.dates)
+
+    @property
+    def version(self) -> str:
+        """Mã băm nội dung dữ liệu (dùng làm khóa cache theo phiên bản dữ liệu)."""
+        if self._version is None:
+            h = hashlib.sha1()
+            for arr in (self.ordinals, self.prizes, self.special):
+                h.update(np.ascontiguousarray(arr).tobytes())
+            self._version = h.hexdigest()
+        return self._version
+
+    def presence_cumsum(self):
+        """
+        Tổng tích lũy số ngày xuất hiện: int32[n+1, 100], hàng r = số ngày có mặt trong
+        các hàng [0, r). Số ngày xuất hiện trong [a, b) = cs[b] - cs[a]. Tính một lần rồi giữ lại.
+        """
+        if self._presence_cumsum is None:
+            cumsum = np.zeros((len(self.dates) + 1, NUM_NUMBERS), dtype=np.int32)
+            np.cumsum(self.presence, axis=0, dtype=np.int32, out=cumsum[1:])
+            cumsum.flags.writeable = False
+            self._presence_cumsum = cumsum
+        return self._presence_cumsum
+
+    def row_of(self, date_obj):
+        """Chỉ số hàng của ngày `date_obj`, hoặc None nếu không có dữ liệu ngày đó."""
+        return self.index.get(date_obj)
+
+    def rows_before(self, date_obj) -> int:
+        """Số ngày có dữ liệu TRƯỚC `date_obj` (chỉ số kết thúc của lịch sử)."""
+        return bisect.bisect_left(self.dates, date_obj)
+
+    def numbers_on(self, row: int) -> set:
+        """Tập các số (int) xuất hiện ở hàng `row`."""
+        return set(np.flatnonzero(self.presence[row]).tolist())
+
+    def special_on(self, row: int) -> int:
+        """2 số cuối giải đặc biệt ở hàng `row` (-1 nếu không có)."""
+        return int(self.special[row])
+
+    def date_range(self):
+        """Trả về (ngày đầu, ngày cuối) hoặc (None, None) nếu kho rỗng."""
+        if not self.dates:
+            return None, None
+        return self.dates[0], self.dates[-1]
+
+    def history_before(self, date_obj):
+        """Lịch sử (HistoryView) gồm các ngày có dữ liệu TRƯỚC `date_obj`."""
+        return HistoryView(self, self.rows_before(date_obj))
+
+    def history_until(self, date_obj):
+        """Lịch sử (HistoryView) gồm các ngày có dữ liệu đến HẾT ngày `date_obj`."""
+        return HistoryView(self, bisect.bisect_right(self.dates, date_obj))
+
+    def history_rows(self, stop: int, start: int = 0):
+        """Lịch sử (HistoryView) gồm các hàng [start, stop)."""
+        return HistoryView(self, stop, start)
+
+
+class HistoryView(Sequence):
+    """
+    Khung nhìn chỉ đọc lên `store.records[start:stop]`, không sao chép list.
+
+    Thay cho `sorted_results[:i]` khi truyền lịch sử vào `predict()`: hỗ trợ len,
+    duyệt, duyệt ngược, truy cập chỉ số và cắt lát (cắt lát bước 1 trả về view mới),
+    nên các thuật toán hiện có dùng được mà không phải sửa. Bản ghi là FrozenDict
+    nên copy/deepcopy trả về chính view, không sao chép dữ liệu.
+    """
+
+    __slots__ = ('_records', '_start', '_stop')
+
+    def __init__(self, store, stop, start=0):
+        records = store.records if isinstance(store, DrawStore) else store
+        n_records = len(records)
+        self._records = records
+        self._start = max(0, min(start, n_records))
+        self._stop = max(self._start, min(stop, n_records))
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step == 1:
+                return HistoryView(self._records, self._start + stop, self._start + start)
+            return [self._records[self._start + i] for i in range(start, stop, step)]
+        n_items = self._stop - self._start
+        if key < 0:
+            key += n_items
+        if not 0 <= key < n_items:
+            raise IndexError("HistoryView index out of range")
+        return self._records[self._start + key]
+
+    def __iter__(self):
+        return itertools.islice(self._records, self._start, self._stop)
+
+    def __reversed__(self):
+        records = self._records
+        for i in range(self._stop - 1, self._start - 1, -1):
+            yield records[i]
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return f"<HistoryView {len(self)} ngày [{self._start}:{self._stop}]>"
+
+
+def build_draw_store(results_list, logger=None):
+    """Dựng DrawStore an toàn: trả về None (và ghi log) nếu có lỗi."""
+    try:
+        return DrawStore(results_list)
+    except Exception as e:
+        (logger or store_logger).error(f"Không thể dựng DrawStore: {e}", exc_info=True)
+        return None
+
+# --- END OF FILE engine/draw_store.py ---
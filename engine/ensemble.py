@@ -0,0 +1,273 @@
+# --- START OF FILE engine/ensemble.py ---
+# -*- coding: utf-8 -*-
+
+import logging
+
+import numpy as np
+
+from engine.draw_store import NUM_NUMBERS
+from engine.scoring import BASE_SCORE, MAX_VECTOR_ROUND_DECIMALS, round_like_python, round_to_units
+from engine.search import ParameterSpace, make_search_strategy
+
+ensemble_logger = logging.getLogger(__name__)
+
+ENSEMBLE_WEIGHT_MIN = 0.0            # Trọng số nhỏ nhất (0 = bỏ thuật toán khỏi tổng)
+ENSEMBLE_WEIGHT_MAX = 3.0            # Trọng số lớn nhất được tìm
+ENSEMBLE_WEIGHT_STEP = 0.05          # Lưới trọng số (trọng số ghi vào settings.ini là bội của bước này)
+ENSEMBLE_MAX_EVALUATIONS = 10000     # Số vector trọng số tối đa được chấm trong một lượt
+ENSEMBLE_PROGRESS_EVERY = 250        # Báo tiến trình sau mỗi ngần này lượt chấm
+ENSEMBLE_MAX_REPEATS = 2000          # Dừng khi ngần này điểm lưới liên tiếp đều đã chấm (tìm kiếm không còn điểm mới)
+
+ENSEMBLE_METHOD_COORDINATE = "coordinate"  # Coordinate descent từ trọng số hiện tại
+ENSEMBLE_METHOD_RESTARTS = "restarts"      # Coordinate descent + khởi động lại ngẫu nhiên
+ENSEMBLE_METHOD_CMAES = "cmaes"            # CMA-ES (engine.search) trên khối [MIN, MAX]^d
+ENSEMBLE_METHODS = (ENSEMBLE_METHOD_COORDINATE, ENSEMBLE_METHOD_RESTARTS, ENSEMBLE_METHOD_CMAES)
+
+ENSEMBLE_SCORE_NONE = (-1.0, -1.0, -1.0, -100.0)  # Như get_primary_score({}) của trình tối ưu
+
+
+class EnsembleTensor:
+    """
+    Tensor điểm đã cache của các thuật toán đang bật trên các ngày kiểm tra, chấm MỘT vector trọng số
+    trong khoảng một mili giây mà không gọi predict(): cộng có trọng số các lớp → khóa nguyên
+    (điểm làm tròn, chỉ số) → argpartition lấy top 10 → đối chiếu kết quả.
+
+    Cách cộng và làm tròn giống combine_score_tensor (lớp cộng lần lượt theo thứ tự `names`, hàng NaN
+    bỏ qua, làm tròn nửa đơn vị theo giá trị thật như round() của Python) và xếp hạng như chế độ "Cao ➔ Thấp"
+    (bằng điểm thì số nhỏ trước), nên kết quả trùng với Backtest(require_scores=False) cùng trọng số.
+
+    Args:
+        names (list): Tên thuật toán theo thứ tự cộng điểm.
+        score_tensor: float[len(names), n_days, 100] - điểm của các ngày kiểm tra.
+        presence_rows: bool[n_days, 100] - kết quả thực tế của từng ngày kiểm tra.
+        decimals (int | None), base_score (float): Như combine_score_tensor.
+    """
+
+    def __init__(self, names, score_tensor, presence_rows, decimals=2, base_score=BASE_SCORE):
+        tensor = np.asarray(score_tensor, dtype=np.float64)
+        presence = np.asarray(presence_rows, dtype=bool)
+        if tensor.ndim != 3 or tensor.shape[0] != len(names) or tensor.shape[2] != NUM_NUMBERS:
+            raise ValueError(f"Tensor điểm có kích thước {tensor.shape}, cần ({len(names)}, n_days, {NUM_NUMBERS}).")
+        if presence.shape != tensor.shape[1:]:
+            raise ValueError(f"Kết quả thực tế có kích thước {presence.shape}, cần {tensor.shape[1:]}.")
+        self.names = tuple(names)
+        self.n_days = tensor.shape[1]
+        self.decimals = decimals
+        self.base_score = float(base_score)
+        # Hàng toàn NaN (không có dự đoán) thành 0: cộng 0 không đổi tổng, như khi bỏ qua hàng đó
+        has_scores = ~np.isnan(tensor).all(axis=2)
+        self.layers = np.where(has_scores[:, :, None], tensor, 0.0)
+        self.presence = presence
+        self.evaluations = 0
+        self._ranks = np.arange(NUM_NUMBERS, dtype=np.int64)
+        self._deltas = np.empty((self.n_days, NUM_NUMBERS), dtype=np.float64)
+        self._scaled = np.empty((self.n_days, NUM_NUMBERS), dtype=np.float64)
+
+    @property
+    def dim(self) -> int:
+        return len(self.names)
+
+    def combined(self, weights):
+        """Điểm tổng hợp float64[n_days, 100] (chưa làm tròn) cho vector trọng số `weights`."""
+        deltas = self._deltas
+        deltas.fill(0.0)
+        for layer, weight in zip(self.layers, np.asarray(weights, dtype=np.float64).tolist()):
+            if weight == 0.0:
+                continue
+            if weight == 1.0:
+                deltas += layer
+            else:
+                np.multiply(layer, weight, out=self._scaled)
+                deltas += self._scaled
+        return deltas + self.base_score
+
+    def top10(self, weights):
+        """int[n_days, 10] - 10 số đứng đầu mỗi ngày theo đúng thứ tự xếp hạng."""
+        totals = self.combined(weights)
+        if self.decimals is None:
+            return np.argsort(-totals, axis=1, kind='stable')[:, :10]
+        if not 0 <= self.decimals <= MAX_VECTOR_ROUND_DECIMALS:
+            return np.argsort(-round_like_python(totals, self.decimals), axis=1, kind='stable')[:, :10]
+        # Khóa nguyên duy nhất: -điểm làm tròn (theo đơn vị 10^-decimals), bằng điểm thì số nhỏ trước
+        keys = (-round_to_units(totals, self.decimals)).astype(np.int64)
+        keys *= NUM_NUMBERS
+        keys += self._ranks
+        top = np.argpartition(keys, 9, axis=1)[:, :10]
+        order = np.argsort(np.take_along_axis(keys, top, axis=1), axis=1)
+        return np.take_along_axis(top, order, axis=1)
+
+    def evaluate(self, weights) -> dict:
+        """Thống kê hiệu suất (cùng khóa với performance_summary) của vector trọng số `weights`."""
+        self.evaluations += 1
+        top10 = self.top10(weights)
+        hits = np.take_along_axis(self.presence, top10, axis=1)
+        hit_within = np.logical_or.accumulate(hits, axis=1)
+        total = self.n_days
+        stats = {'total_days_tested': total, 'avg_top10_repetition': 0.0}
+        for k in (1, 3, 5, 10):
+            stats[f'hits_top_{k}'] = int(np.count_nonzero(hit_within[:, k - 1]))
+            stats[f'acc_top_{k}_pct'] = stats[f'hits_top_{k}'] / total * 100.0 if total > 0 else 0.0
+        if total > 0:
+            unique_count = int(np.count_nonzero(np.bincount(top10.ravel(), minlength=NUM_NUMBERS)))
+            stats['avg_top10_repetition'] = top10.size / unique_count
+        return stats
+
+    def score_tuple(self, weights):
+        """(top3 %, top5 %, top1 %, -lặp top 10) - lớn hơn là tốt hơn, như get_primary_score."""
+        if self.n_days == 0:
+            return ENSEMBLE_SCORE_NONE
+        stats = self.evaluate(weights)
+        return (stats['acc_top_3_pct'], stats['acc_top_5_pct'], stats['acc_top_1_pct'],
+                -stats['avg_top10_repetition'])
+
+
+class EnsembleWeightSearch:
+    """
+    Tìm vector trọng số trên lưới [ENSEMBLE_WEIGHT_MIN, ENSEMBLE_WEIGHT_MAX] bước ENSEMBLE_WEIGHT_STEP
+    tối đa hóa score_tuple của một EnsembleTensor. Mỗi điểm lưới chỉ được chấm một lần (memo).
+
+    Args:
+        tensor (EnsembleTensor): Tensor điểm đã cache.
+        initial_weights: Trọng số hiện tại (điểm xuất phát và mốc so sánh).
+        max_evaluations (int): Số điểm lưới tối đa được chấm.
+        seed (int, optional): Hạt giống cho khởi động lại ngẫu nhiên / CMA-ES.
+        should_stop (callable, optional): Trả về True để dừng (kết quả tốt nhất đến lúc đó vẫn được trả về).
+        progress_callback (callable, optional): Gọi (số lượt chấm, tối đa, điểm tốt nhất, trọng số tốt nhất).
+    """
+
+    def __init__(self, tensor, initial_weights, max_evaluations=ENSEMBLE_MAX_EVALUATIONS, seed=None,
+                 should_stop=None, progress_callback=None):
+        self.tensor = tensor
+        self.initial_weights = np.asarray(initial_weights, dtype=np.float64)
+        if self.initial_weights.shape != (tensor.dim,):
+            raise ValueError("Số trọng số ban đầu không khớp với số thuật toán.")
+        self.n_grid = int(round((ENSEMBLE_WEIGHT_MAX - ENSEMBLE_WEIGHT_MIN) / ENSEMBLE_WEIGHT_STEP)) + 1
+        self.max_evaluations = max(1, min(int(max_evaluations), self.n_grid ** tensor.dim))
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.should_stop = should_stop
+        self.progress_callback = progress_callback
+        self.stopped = False
+        self._repeats = 0  # Số điểm lưới đã chấm gặp lại liên tiếp
+        self.best_grid = None
+        self.best_score = None
+        self._scores = {}  # {chỉ số lưới (tuple): điểm}
+
+    def weights_of(self, grid):
+        """Chỉ số lưới -> vector trọng số."""
+        return np.round(ENSEMBLE_WEIGHT_MIN + np.asarray(grid, dtype=np.float64) * ENSEMBLE_WEIGHT_STEP, 6)
+
+    def grid_of(self, weights):
+        """Vector trọng số -> chỉ số lưới gần nhất (kẹp vào miền)."""
+        grid = np.rint((np.asarray(weights, dtype=np.float64) - ENSEMBLE_WEIGHT_MIN) / ENSEMBLE_WEIGHT_STEP)
+        return np.clip(grid, 0, self.n_grid - 1).astype(np.int64)
+
+    @property
+    def evaluations(self) -> int:
+        return len(self._scores)
+
+    def _exhausted(self) -> bool:
+        if self.stopped or self._repeats >= ENSEMBLE_MAX_REPEATS:
+            return True
+        if self.should_stop is not None and self.should_stop():
+            self.stopped = True
+            return True
+        return self.evaluations >= self.max_evaluations
+
+    def _score(self, grid):
+        """Điểm của một điểm lưới (memo); None nếu đã hết lượt chấm hoặc bị dừng."""
+        key = tuple(int(g) for g in grid)
+        score = self._scores.get(key)
+        if score is not None:
+            self._repeats += 1
+            return None if self._repeats >= ENSEMBLE_MAX_REPEATS else score
+        self._repeats = 0
+        if self._exhausted():
+            return None
+        score = self.tensor.score_tuple(self.weights_of(key))
+        self._scores[key] = score
+        if self.best_score is None or score > self.best_score:
+            self.best_grid, self.best_score = np.array(key, dtype=np.int64), score
+        if self.progress_callback is not None and self.evaluations % ENSEMBLE_PROGRESS_EVERY == 0:
+            self.progress_callback(self.evaluations, self.max_evaluations, self.best_score,
+                                   self.weights_of(self.best_grid))
+        return score
+
+    def _coordinate_descent(self, start):
+        """Lần lượt thử mọi giá trị lưới của từng trọng số (giữ các trọng số khác), lặp đến khi không cải thiện."""
+        current = np.array(start, dtype=np.int64)
+        current_score = self._score(current)
+        improved = current_score is not None
+        while improved:
+            improved = False
+            for k in range(self.tensor.dim):
+                best_value, best_score = current[k], current_score
+                candidate = current.copy()
+                for value in range(self.n_grid):
+                    if value == current[k]:
+                        continue
+                    candidate[k] = value
+                    score = self._score(candidate)
+                    if score is None:
+                        return
+                    if score > best_score:
+                        best_value, best_score = value, score
+                if best_value != current[k]:
+                    current[k], current_score = best_value, best_score
+                    improved = True
+
+    def _random_restarts(self, start):
+        self._coordinate_descent(start)
+        while not self._exhausted():
+            self._coordinate_descent(self.rng.integers(0, self.n_grid, self.tensor.dim))
+
+    def _cmaes(self, start):
+        """CMA-ES trên khối trọng số (mẫu được làm tròn về lưới); khởi động lại từ điểm tốt nhất khi hội tụ."""
+        names = [f"w{k}" for k in range(self.tensor.dim)]
+        bounds = {name: (ENSEMBLE_WEIGHT_MIN, ENSEMBLE_WEIGHT_MAX) for name in names}
+        center = self.weights_of(start)
+        restart = 0
+        while not self._exhausted():
+            space = ParameterSpace(dict(zip(names, center.tolist())), bounds=bounds)
+            seed = None if self.seed is None else self.seed + restart
+            strategy = make_search_strategy("cmaes", space, seed)
+            min_sigma = ENSEMBLE_WEIGHT_STEP / (ENSEMBLE_WEIGHT_MAX - ENSEMBLE_WEIGHT_MIN) / 2
+            while strategy.sigma > min_sigma:
+                params = strategy.ask()
+                score = self._score(self.grid_of([params[name] for name in names]))
+                if score is None:
+                    return
+                strategy.tell(params, score)
+            restart += 1
+            center = self.weights_of(self.best_grid)
+            ensemble_logger.debug(f"CMA-ES hội tụ sau {self.evaluations} lượt chấm, khởi động lại lần {restart}.")
+
+    def run(self, method=ENSEMBLE_METHOD_COORDINATE) -> dict:
+        """
+        Chạy tìm kiếm.
+
+        Returns:
+            dict: {'weights': vector tốt nhất, 'score': điểm của nó, 'initial_score': điểm của trọng số
+                   ban đầu (chưa làm tròn về lưới), 'evaluations': số lượt chấm, 'stopped': bị dừng hay không}.
+        """
+        if method not in ENSEMBLE_METHODS:
+            raise ValueError(f"Phương pháp tối ưu trọng số không hợp lệ: {method}")
+        initial_score = self.tensor.score_tuple(self.initial_weights)
+        start = self.grid_of(self.initial_weights)
+        if method == ENSEMBLE_METHOD_COORDINATE:
+            self._coordinate_descent(start)
+        elif method == ENSEMBLE_METHOD_RESTARTS:
+            self._random_restarts(start)
+        else:
+            self._cmaes(start)
+
+        if self.best_score is None or initial_score >= self.best_score:
+            best_weights, best_score = self.initial_weights.copy(), initial_score
+        else:
+            best_weights, best_score = self.weights_of(self.best_grid), self.best_score
+        ensemble_logger.info(f"Tối ưu trọng số ({method}): {self.evaluations} lượt chấm, "
+                             f"{initial_score} -> {best_score}")
+        return {'weights': best_weights, 'score': best_score, 'initial_score': initial_score,
+                'evaluations': self.evaluations, 'stopped': self.stopped}
+
+# --- END OF FILE engine/ensemble.py ---
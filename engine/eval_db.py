@@ -0,0 +1,154 @@
+# --- START OF FILE engine/eval_db.py ---
+# -*- coding: utf-8 -*-
+
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import datetime
+import threading
+from pathlib import Path
+
+from engine.data_cache import file_sha256
+from engine.search import params_key
+
+ledger_logger = logging.getLogger(__name__)
+
+LEDGER_FILE_NAME = "evaluations.sqlite"
+LEDGER_SCHEMA_VERSION = 1
+
+KIND_PERFORMANCE = "performance"  # dict hiệu suất của trình tối ưu (run_combined_performance_test)
+KIND_STREAK = "streak"            # (chuỗi, lý do, ngày bắt đầu) của date-optimize
+
+
+def _encode(value):
+    """JSON giữ nguyên kiểu: dict có khóa không phải chuỗi, tuple và date được đánh dấu."""
+    if isinstance(value, dict):
+        if all(isinstance(k, str) for k in value):
+            return {k: _encode(v) for k, v in value.items()}
+        return {"__items__": [[_encode(k), _encode(v)] for k, v in value.items()]}
+    if isinstance(value, tuple):
+        return {"__tuple__": [_encode(v) for v in value]}
+    if isinstance(value, list):
+        return [_encode(v) for v in value]
+    if isinstance(value, datetime.date):
+        return {"__date__": value.isoformat()}
+    return value
+
+
+def _decode(value):
+    if isinstance(value, list):
+        return [_decode(v) for v in value]
+    if isinstance(value, dict):
+        if "__items__" in value:
+            return {_decode(k): _decode(v) for k, v in value["__items__"]}
+        if "__tuple__" in value:
+            return tuple(_decode(v) for v in value["__tuple__"])
+        if "__date__" in value:
+            return datetime.date.fromisoformat(value["__date__"])
+        return {k: _decode(v) for k, v in value.items()}
+    return value
+
+
+def algorithm_fingerprint(path) -> str:
+    """Mã băm mã nguồn thuật toán (đổi mã nguồn -> mọi kết quả cũ của nó không còn dùng)."""
+    return file_sha256(path)
+
+
+class EvaluationScope:
+    """
+    Phần khóa cố định của một phiên tối ưu (loại kết quả, thuật toán đích, bộ kết hợp,
+    khoảng ngày, phiên bản dữ liệu, tùy chọn); chỉ còn bộ tham số thay đổi giữa các lần thử.
+    Tạo bằng EvaluationLedger.scope().
+    """
+
+    def __init__(self, ledger, kind, algorithm_hash, combination, start_date, end_date, data_version, options=None):
+        self.ledger = ledger
+        self.kind = kind
+        self.algorithm_hash = algorithm_hash
+        self.combination = sorted(combination or [])
+        self.start_date = start_date.isoformat() if start_date else ""
+        self.end_date = end_date.isoformat() if end_date else ""
+        self.data_version = data_version
+        self.options = options or {}
+        self.hits = 0
+
+    def key(self, params) -> str:
+        identity = [LEDGER_SCHEMA_VERSION, self.kind, self.algorithm_hash, _encode(params_key(params)),
+                    _encode(self.combination), self.start_date, self.end_date, self.data_version,
+                    _encode(self.options)]
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, params):
+        """Kết quả đã lưu của bộ tham số, hoặc None."""
+        result = self.ledger.get(self.key(params))
+        if result is not None:
+            self.hits += 1
+        return result
+
+    def put(self, params, result):
+        self.ledger.put(self.key(params), self, params, result)
+
+
+class EvaluationLedger:
+    """
+    Sổ cái SQLite các lần chấm bộ tham số, dùng chung giữa các phiên tối ưu: lần chấm trùng
+    (cùng mã nguồn thuật toán, tham số đã làm tròn, bộ kết hợp, khoảng ngày, phiên bản dữ liệu)
+    được trả lời ngay từ file thay vì chạy lại backtest.
+
+    An toàn khi dùng từ nhiều luồng (một kết nối, có khóa).
+
+    Args:
+        db_path (Path | str): File SQLite (được tạo nếu chưa có).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS evaluations ("
+                " key TEXT PRIMARY KEY, kind TEXT, algorithm_hash TEXT, params TEXT, combination TEXT,"
+                " start_date TEXT, end_date TEXT, data_version TEXT, options TEXT, result TEXT, created_at REAL)")
+
+    def scope(self, kind, algorithm_hash, combination, start_date, end_date, data_version, options=None):
+        return EvaluationScope(self, kind, algorithm_hash, combination, start_date, end_date, data_version, options)
+
+    def get(self, key):
+        try:
+            with self._lock:
+                row = self._conn.execute("SELECT result FROM evaluations WHERE key = ?", (key,)).fetchone()
+        except sqlite3.Error as db_err:
+            ledger_logger.warning(f"Không đọc được sổ cái {self.db_path.name}: {db_err}")
+            return None
+        if row is None:
+            return None
+        try:
+            return _decode(json.loads(row[0]))
+        except (ValueError, TypeError) as decode_err:
+            ledger_logger.warning(f"Bỏ qua bản ghi hỏng trong sổ cái ({decode_err}).")
+            return None
+
+    def put(self, key, scope, params, result):
+        record = (key, scope.kind, scope.algorithm_hash, json.dumps(_encode(params), ensure_ascii=False),
+                  json.dumps(_encode(scope.combination), ensure_ascii=False), scope.start_date, scope.end_date,
+                  scope.data_version, json.dumps(_encode(scope.options), sort_keys=True),
+                  json.dumps(_encode(result), ensure_ascii=False), time.time())
+        try:
+            with self._lock, self._conn:
+                self._conn.execute("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", record)
+        except sqlite3.Error as db_err:
+            ledger_logger.warning(f"Không ghi được kết quả vào sổ cái {self.db_path.name}: {db_err}")
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+# --- END OF FILE engine/eval_db.py ---
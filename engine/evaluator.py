@@ -0,0 +1,118 @@
+# --- START OF FILE engine/evaluator.py ---
+# -*- coding: utf-8 -*-
+
+import logging
+from collections import Counter
+
+import numpy as np
+
+from engine.draw_store import NUM_NUMBERS, MISSING_SPECIAL
+
+evaluator_logger = logging.getLogger(__name__)
+
+SORT_MODE_DESC = 0    # Điểm cao trước (mặc định)
+SORT_MODE_ASC = 1     # Điểm thấp trước
+SORT_MODE_CUSTOM = 2  # Theo thứ tự trong file sắp xếp của người dùng
+CUSTOM_ORDER_MISSING = 9999  # Khóa sắp xếp cho số không có trong file sắp xếp
+
+
+def rank_matrix(combined_scores, sort_mode=SORT_MODE_DESC, custom_order=None):
+    """
+    Xếp hạng 100 số cho mọi ngày một lượt: trả về int[n_days, 100], hàng i là các số
+    của ngày i từ hạng 1 đến hạng 100.
+
+    Dùng argsort ổn định (không dùng argpartition): các số bằng điểm phải giữ thứ tự
+    tăng dần như `sorted()` trước đây, và hạng của MỌI số trúng đều cần đến nên
+    vẫn phải có thứ tự đầy đủ chứ không chỉ nhóm top-k.
+    """
+    scores = np.asarray(combined_scores, dtype=np.float64)
+    if scores.ndim != 2 or scores.shape[1] != NUM_NUMBERS:
+        raise ValueError(f"Ma trận điểm có kích thước {scores.shape}, cần (n_days, {NUM_NUMBERS}).")
+    if sort_mode == SORT_MODE_ASC:
+        return np.argsort(scores, axis=1, kind='stable')
+    if sort_mode == SORT_MODE_CUSTOM and custom_order:
+        order_keys = np.full(NUM_NUMBERS, CUSTOM_ORDER_MISSING, dtype=np.int64)
+        for i, num in enumerate(custom_order):
+            if isinstance(num, int) and 0 <= num < NUM_NUMBERS:
+                order_keys[num] = i
+        return np.tile(np.argsort(order_keys, kind='stable'), (scores.shape[0], 1))
+    return np.argsort(-scores, axis=1, kind='stable')
+
+
+def top10_repetition(ranked):
+    """
+    Mức lặp lại của nhóm top 10 qua các ngày.
+
+    Args:
+        ranked: int[n_days, >=10] - bảng xếp hạng (chỉ 10 cột đầu được dùng).
+
+    Returns:
+        tuple: (avg_top10_repetition, max_top10_repetition_count, top10_repetition_details)
+               - details là dict {số: số lần} của 5 số lặp nhiều nhất.
+    """
+    top10 = np.asarray(ranked)[:, :10]
+    if top10.size == 0:
+        return 0.0, 0, {}
+    counts = np.bincount(top10.ravel(), minlength=NUM_NUMBERS)
+    unique_count = int(np.count_nonzero(counts))
+    avg_repetition = top10.size / unique_count if unique_count > 0 else 0.0
+    # Thứ tự khi bằng số lần giữ như bản cũ: Counter theo thứ tự gặp đầu tiên,
+    # mỗi ngày duyệt các số theo thứ tự của set()
+    details_counter = Counter()
+    for row in top10.tolist():
+        details_counter.update(set(row))
+    return avg_repetition, int(counts.max()), dict(details_counter.most_common(5))
+
+
+class RankingEvaluation:
+    """
+    Kết quả đánh giá bảng xếp hạng so với kết quả thực tế của các ngày kiểm tra.
+
+    Attributes:
+        n_days (int): Số ngày được đánh giá.
+        hits_by_rank (np.ndarray): bool[n_days, 100] - ô [i, r] là True nếu số ở hạng r+1 trúng.
+        best_rank (np.ndarray): int[n_days] - hạng (tính từ 0) của số trúng tốt nhất, -1 nếu không trúng.
+        special_rank (np.ndarray): int[n_days] - hạng của giải đặc biệt, -1 nếu ngày không có giải ĐB.
+    """
+    __slots__ = ('ranked', 'n_days', 'hits_by_rank', 'best_rank', 'special_rank')
+
+    def __init__(self, ranked, presence_rows, special_numbers=None):
+        self.ranked = np.asarray(ranked)
+        self.n_days = self.ranked.shape[0]
+        self.hits_by_rank = np.take_along_axis(np.asarray(presence_rows, dtype=bool), self.ranked, axis=1)
+        has_hit = self.hits_by_rank.any(axis=1)
+        self.best_rank = np.where(has_hit, self.hits_by_rank.argmax(axis=1), -1)
+
+        self.special_rank = np.full(self.n_days, -1, dtype=np.int64)
+        if special_numbers is not None:
+            special_numbers = np.asarray(special_numbers)
+            has_special = special_numbers != MISSING_SPECIAL
+            if has_special.any():
+                is_special = self.ranked[has_special] == special_numbers[has_special, None]
+                self.special_rank[has_special] = is_special.argmax(axis=1)
+
+    def top_hits(self, k: int) -> int:
+        """Số ngày có ít nhất một số trúng trong top k."""
+        return int(np.count_nonzero((self.best_rank >= 0) & (self.best_rank < k)))
+
+    def special_hits(self, k: int) -> int:
+        """Số ngày giải đặc biệt nằm trong top k."""
+        return int(np.count_nonzero((self.special_rank >= 0) & (self.special_rank < k)))
+
+    def rank_frequency(self):
+        """int[100]: số lần một số trúng nằm ở mỗi hạng (tính từ 0)."""
+        return self.hits_by_rank.sum(axis=0)
+
+    def top10_repetition(self):
+        """Xem `top10_repetition()`."""
+        return top10_repetition(self.ranked)
+
+
+def evaluate_rankings(ranked, presence_rows, special_numbers=None) -> RankingEvaluation:
+    """
+    Đánh giá bảng xếp hạng int[n_days, 100] với ma trận có mặt bool[n_days, 100]
+    (và số giải đặc biệt int[n_days], MISSING_SPECIAL nếu không có) của các ngày kiểm tra.
+    """
+    return RankingEvaluation(ranked, presence_rows, special_numbers)
+
+# --- END OF FILE engine/evaluator.py ---
@@ -0,0 +1,387 @@
+# --- START OF FILE engine/parallel.py ---
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import bisect
+import logging
+import importlib.util
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from engine.draw_store import DrawStore
+from engine.data_cache import is_canonical_results, records_from_prizes
+from engine.backtest import Backtest, performance_summary, run_streak, longest_streak, slice_score_chunks
+from engine.decomposition import DecomposedScorer
+
+parallel_logger = logging.getLogger(__name__)
+
+_SHARED_ARRAY_NAMES = ("ordinals", "prizes", "counts", "special")
+# Số việc được gửi trước cho mỗi tiến trình (giữ các tiến trình luôn bận mà không xếp hàng quá dài)
+TASKS_IN_FLIGHT_PER_WORKER = 2
+# Trạng thái của tiến trình con (dựng một lần trong initializer, dùng lại cho mọi việc)
+_worker_state = {}
+
+
+def default_worker_count() -> int:
+    """Số tiến trình mặc định: số nhân CPU (ít nhất 1)."""
+    return max(1, os.cpu_count() or 1)
+
+
+class SharedDrawStore:
+    """
+    Đưa các mảng của DrawStore vào `multiprocessing.shared_memory` để tiến trình con
+    gắn vào (attach_draw_store) thay vì nhận bản sao pickle của dữ liệu cho mỗi việc.
+
+    Bản ghi kết quả được dựng lại từ ma trận giải nếu dữ liệu ở dạng chuẩn; nếu không,
+    danh sách bản ghi được gửi MỘT lần cho mỗi tiến trình (trong `descriptor`).
+    Người tạo phải gọi close() (hoặc dùng `with`) để giải phóng bộ nhớ chia sẻ.
+    """
+
+    def __init__(self, store: DrawStore):
+        self._blocks = []
+        arrays = {}
+        try:
+            for name in _SHARED_ARRAY_NAMES:
+                src = np.ascontiguousarray(getattr(store, name))
+                block = shared_memory.SharedMemory(create=True, size=max(1, src.nbytes))
+                self._blocks.append(block)
+                np.ndarray(src.shape, dtype=src.dtype, buffer=block.buf)[...] = src
+                arrays[name] = (block.name, src.shape, src.dtype.str)
+        except Exception:
+            self.close()
+            raise
+        records = None if is_canonical_results(store.records) else list(store.records)
+        self.descriptor = {'arrays': arrays, 'version': store.version, 'records': records}
+
+    def close(self):
+        for block in self._blocks:
+            try:
+                block.close()
+                block.unlink()
+            except FileNotFoundError:
+                pass
+        self._blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def attach_draw_store(descriptor):
+    """
+    Dựng DrawStore (chỉ đọc) trên bộ nhớ chia sẻ mô tả bởi `SharedDrawStore.descriptor`.
+
+    Returns:
+        tuple: (store, blocks) - giữ `blocks` còn sống chừng nào còn dùng store.
+    """
+    blocks = []
+    arrays = {}
+    for name, (block_name, shape, dtype) in descriptor['arrays'].items():
+        block = shared_memory.SharedMemory(name=block_name)
+        blocks.append(block)
+        arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+    records = descriptor['records']
+    if records is None:
+        records = records_from_prizes(arrays['ordinals'], arrays['prizes'])
+    store = DrawStore.from_arrays(records, arrays['ordinals'], arrays['prizes'], arrays['counts'],
+                                  arrays['special'], version=descriptor['version'])
+    return store, blocks
+
+
+def load_algorithm_class(module_name, path, class_name):
+    """Nạp lớp thuật toán từ file nguồn (giống cách trình tối ưu nạp thư mục algorithms/)."""
+    module_obj = sys.modules.get(module_name)
+    if module_obj is None:
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if not spec or not spec.loader:
+            raise ImportError(f"Không tạo được spec cho {module_name} từ {path}")
+        module_obj = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module_obj
+        spec.loader.exec_module(module_obj)
+    return getattr(module_obj, class_name)
+
+
+def _init_worker(store_descriptor, target_spec, tested_dates, precomputed_chunks, throttle_sleep):
+    store, blocks = attach_draw_store(store_descriptor)
+    algo_class = load_algorithm_class(target_spec['module_name'], target_spec['path'], target_spec['class_name'])
+    base_instance = algo_class(data_results_list=store.records, cache_dir=target_spec.get('cache_dir'))
+    _worker_state.clear()
+    _worker_state.update({
+        'store': store,
+        'blocks': blocks,
+        'target_name': target_spec['name'],
+        'base_instance': base_instance,
+        'scorer': DecomposedScorer(base_instance, tested_dates, store),
+        'tested_dates': tested_dates,
+        'precomputed_chunks': precomputed_chunks,
+        'throttle_sleep': throttle_sleep,
+        'missing_days': target_spec.get('missing_days', 0),
+    })
+
+
+def _window_chunks(first_day):
+    """Khối điểm của thuật toán kết hợp cho các ngày từ vị trí `first_day` (giữ lại cho các việc cùng đoạn)."""
+    state = _worker_state
+    cached_first_day, chunks = state.get('window_chunks', (0, state['precomputed_chunks']))
+    if cached_first_day != first_day:
+        n_days = len(state['tested_dates'])
+        chunks = {name: slice_score_chunks(name_chunks, n_days, first_day)
+                  for name, name_chunks in state['precomputed_chunks'].items()}
+        state['window_chunks'] = (first_day, chunks)
+    return chunks
+
+
+def _evaluate_params(params, first_day=0, missing_days=None):
+    """
+    Việc của tiến trình con: thống kê hiệu suất (performance_summary) cho một bộ tham số, trên các
+    ngày kiểm thử từ vị trí `first_day` (đoạn cuối của khoảng đã khởi tạo, ví dụ một vòng đua loại).
+    `missing_days` mặc định là số ngày thiếu của cả khoảng.
+    """
+    try:
+        state = _worker_state
+        n_days = len(state['tested_dates'])
+        combo_chunks = _window_chunks(first_day)
+        target_chunks = state['scorer'].score_chunks(params)
+        if target_chunks is not None:
+            algorithms = {}
+            precomputed_chunks = {state['target_name']: slice_score_chunks(target_chunks, n_days, first_day), **combo_chunks}
+        else:
+            algorithms = {state['target_name']: state['base_instance'].with_parameters(params)}
+            precomputed_chunks = combo_chunks
+        backtest = Backtest(algorithms, state['store'], decimals=None,
+                            precomputed_chunks=precomputed_chunks, throttle_sleep=state['throttle_sleep'])
+        if missing_days is None:
+            missing_days = state['missing_days']
+        return performance_summary(backtest.run(state['tested_dates'][first_day:]), missing_days), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+def _init_streak_worker(store_descriptor, target_spec, combo_specs, streak_config, stop_event, pause_event):
+    store, blocks = attach_draw_store(store_descriptor)
+    algo_class = load_algorithm_class(target_spec['module_name'], target_spec['path'], target_spec['class_name'])
+    # Thuật toán kết hợp: một instance cho mỗi tiến trình, dùng chung cho mọi bộ tham số
+    # (giống bản tuần tự dùng chung instance đã nạp; trạng thái nội bộ nếu có là riêng của từng tiến trình)
+    combo_instances = {}
+    for spec in combo_specs:
+        combo_class = load_algorithm_class(spec['module_name'], spec['path'], spec['class_name'])
+        combo_instances[spec['name']] = combo_class(data_results_list=store.records, cache_dir=spec.get('cache_dir'))
+    _worker_state.clear()
+    _worker_state.update({
+        'store': store,
+        'blocks': blocks,
+        'target_name': target_spec['name'],
+        'base_instance': algo_class(data_results_list=store.records, cache_dir=target_spec.get('cache_dir')),
+        'combo_instances': combo_instances,
+        'streak_config': streak_config,
+        'stop_event': stop_event,
+        'pause_event': pause_event,
+    })
+
+
+def _streak_interrupt():
+    state = _worker_state
+    while state['pause_event'].is_set():
+        if state['stop_event'].is_set(): break
+        time.sleep(0.2)
+    if state['stop_event'].is_set(): return "stopped"
+    deadline = state['streak_config'].get('deadline')
+    if deadline and time.time() >= deadline: return "time_limit"
+    return None
+
+
+def _evaluate_streak(params):
+    """
+    Việc của tiến trình con: (chuỗi, lý do, ngày) của `run_streak` - hoặc của `longest_streak`
+    khi tìm ngày bắt đầu tốt nhất - cho một bộ tham số.
+    """
+    state = _worker_state
+    config = state['streak_config']
+    try:
+        target_instance = state['base_instance'].with_parameters(params)
+    except Exception as e:
+        parallel_logger.error(f"Lỗi tạo instance thuật toán đích: {e}", exc_info=True)
+        return (0, "prediction_error", config['start_date']), None
+    try:
+        streak_algorithms = {state['target_name']: target_instance}
+        streak_algorithms.update(state['combo_instances'])
+        if config.get('find_best_start'):
+            backtest = Backtest(streak_algorithms, state['store'], decimals=4)
+            return longest_streak(backtest, config['start_date'], config.get('max_date'), config.get('streak_limit', 0),
+                                  check_interrupt=_streak_interrupt), None
+        backtest = Backtest(streak_algorithms, state['store'], decimals=4, chunk_days=1)
+        return run_streak(backtest, config['start_date'], config.get('max_date'), config.get('streak_limit', 0),
+                          check_interrupt=_streak_interrupt), None
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+
+
+class _SharedStorePool:
+    """
+    Nhóm tiến trình 'spawn' gắn vào một DrawStore chia sẻ; lớp con chọn initializer và
+    hàm việc (`_task`, nhận một dict tham số).
+    """
+    _task = None
+
+    def __init__(self, store, initializer, initargs, workers=None):
+        self.workers = max(1, int(workers or default_worker_count()))
+        self._shared_store = SharedDrawStore(store)
+        try:
+            # 'spawn' an toàn với Qt và giống nhau trên Windows/Linux
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                initializer=initializer, initargs=(self._shared_store.descriptor,) + tuple(initargs))
+        except Exception:
+            self._shared_store.close()
+            raise
+        parallel_logger.info(f"Đã khởi tạo {self.workers} tiến trình đánh giá song song.")
+
+    def _on_signals(self, stopped, paused):
+        """Gọi mỗi vòng chờ của map_ordered với trạng thái dừng/tạm dừng hiện tại."""
+        pass
+
+    def map_ordered(self, param_sets, should_stop=None, should_pause=None, task_args=()):
+        """
+        Đánh giá lần lượt các bộ tham số, trả về (yield) (chỉ số, tham số, kết quả | None, lỗi | None)
+        ĐÚNG thứ tự đầu vào để việc chọn bộ tốt nhất giống hệt khi chạy tuần tự.
+        `task_args` được gửi kèm sau bộ tham số cho mọi việc.
+
+        Khi `should_pause()` trả về True thì ngừng gửi việc mới (việc đang chạy vẫn hoàn tất);
+        khi `should_stop()` trả về True thì hủy các việc chưa chạy và kết thúc.
+        """
+        pending = deque()
+        param_iter = iter(enumerate(param_sets))
+        exhausted = False
+        max_in_flight = self.workers * TASKS_IN_FLIGHT_PER_WORKER
+        try:
+            while True:
+                stopped = should_stop is not None and should_stop()
+                paused = should_pause is not None and should_pause()
+                self._on_signals(stopped, paused)
+                if stopped:
+                    break
+                while not exhausted and not paused and len(pending) < max_in_flight:
+                    try:
+                        index, params = next(param_iter)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    pending.append((index, params, self._executor.submit(self._task, params, *task_args)))
+                if not pending:
+                    if exhausted:
+                        break
+                    time.sleep(0.2)
+                    continue
+                index, params, future = pending[0]
+                try:
+                    result, error_text = future.result(timeout=0.2)
+                except FutureTimeoutError:
+                    continue
+                except Exception as e:
+                    result, error_text = None, f"{type(e).__name__}: {e}"
+                pending.popleft()
+                yield index, params, result, error_text
+        finally:
+            # Bỏ các việc chưa chạy (khi dừng hoặc khi người gọi thoát vòng lặp giữa chừng)
+            for _, _, future in pending:
+                future.cancel()
+
+    def close(self):
+        try:
+            self._executor.shutdown(wait=True)
+        finally:
+            self._shared_store.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ParallelPerformanceEvaluator(_SharedStorePool):
+    """
+    Đánh giá nhiều bộ tham số của MỘT thuật toán đích song song trên nhiều tiến trình.
+
+    Mỗi tiến trình con gắn vào DrawStore chia sẻ, nạp lớp thuật toán một lần và nhận sẵn
+    ma trận điểm của các thuật toán kết hợp; mỗi việc chỉ gửi đi một dict tham số và nhận về
+    dict thống kê giống `performance_summary`. Thuật toán đích hỗ trợ phân rã tuyến tính
+    (decompose_range) được chấm bằng DecomposedScorer riêng của từng tiến trình.
+
+    Args:
+        store (DrawStore): Kho dữ liệu.
+        target_spec (dict): {'name', 'module_name', 'path', 'class_name', 'cache_dir', 'missing_days'}.
+        tested_dates (list): Các ngày dự đoán.
+        precomputed_chunks (dict): {tên: list ma trận theo khối} của thuật toán kết hợp.
+        workers (int, optional): Số tiến trình (mặc định: số nhân CPU).
+        throttle_sleep (float): Số giây nghỉ mỗi ngày trong tiến trình con.
+    """
+    _task = staticmethod(_evaluate_params)
+
+    def __init__(self, store, target_spec, tested_dates, precomputed_chunks=None, workers=None, throttle_sleep=0.0):
+        self.tested_dates = list(tested_dates)
+        super().__init__(store, _init_worker,
+                         (dict(target_spec), self.tested_dates, dict(precomputed_chunks or {}), throttle_sleep),
+                         workers)
+
+    def map_range(self, param_sets, range_start, range_days, should_stop=None, should_pause=None):
+        """
+        Như `map_ordered` nhưng chỉ chấm các ngày kiểm thử từ `range_start` (đoạn cuối của khoảng đã
+        khởi tạo, ví dụ các vòng đua loại) - dùng lại nhóm tiến trình và ma trận điểm đã có.
+
+        Args:
+            range_days (int): Số ngày lịch của đoạn; ngày không có trong `tested_dates` tính là lỗi.
+        """
+        first_day = bisect.bisect_left(self.tested_dates, range_start)
+        missing_days = range_days - (len(self.tested_dates) - first_day)
+        return self.map_ordered(param_sets, should_stop, should_pause, task_args=(first_day, missing_days))
+
+
+class ParallelStreakEvaluator(_SharedStorePool):
+    """
+    Tính chuỗi ngày trúng (`run_streak`) của nhiều bộ tham số song song - dùng cho các
+    hàng xóm của một chu kỳ Explore trong date-optimize. `map_ordered` trả về
+    (chuỗi, lý do, ngày cuối) theo đúng thứ tự gửi vào.
+
+    Dừng / tạm dừng được chuyển vào tiến trình con qua Event nên cả việc đang chạy
+    cũng dừng giữa chừng như bản tuần tự.
+
+    Args:
+        store (DrawStore): Kho dữ liệu.
+        target_spec (dict): {'name', 'module_name', 'path', 'class_name', 'cache_dir'}.
+        combo_specs (list): Các dict cùng dạng cho thuật toán kết hợp (theo thứ tự kết hợp).
+        start_date (date): Ngày bắt đầu chuỗi.
+        max_date (date, optional): Ngày kết quả cuối cùng được dùng.
+        streak_limit (int): Mục tiêu chuỗi (0: không giới hạn).
+        deadline (float, optional): Mốc `time.time()` hết giới hạn thời gian.
+        find_best_start (bool): Dùng `longest_streak` (chuỗi dài nhất ở bất kỳ ngày bắt đầu nào).
+        workers (int, optional): Số tiến trình (mặc định: số nhân CPU).
+    """
+    _task = staticmethod(_evaluate_streak)
+
+    def __init__(self, store, target_spec, combo_specs, start_date, max_date=None, streak_limit=0,
+                 deadline=None, find_best_start=False, workers=None):
+        context = multiprocessing.get_context('spawn')
+        self._stop_event = context.Event()
+        self._pause_event = context.Event()
+        streak_config = {'start_date': start_date, 'max_date': max_date, 'streak_limit': streak_limit,
+                         'deadline': deadline, 'find_best_start': find_best_start}
+        super().__init__(store, _init_streak_worker,
+                         (dict(target_spec), [dict(spec) for spec in combo_specs], streak_config,
+                          self._stop_event, self._pause_event),
+                         workers)
+
+    def _on_signals(self, stopped, paused):
+        if stopped: self._stop_event.set()
+        if paused: self._pause_event.set()
+        else: self._pause_event.clear()
+
+# --- END OF FILE engine/parallel.py ---
@@ -0,0 +1,152 @@
+# --- START OF FILE engine/scoring.py ---
+# -*- coding: utf-8 -*-
+
+import logging
+
+import numpy as np
+
+from engine.draw_store import NUM_NUMBERS
+
+scoring_logger = logging.getLogger(__name__)
+
+BASE_SCORE = 100.0  # Điểm gốc của mỗi số trước khi cộng delta của các thuật toán
+DEKKER_SPLITTER = 2.0 ** 27 + 1  # Hằng số tách một float64 thành hai nửa 26 bit (phép nhân không sai số)
+MAX_VECTOR_ROUND_DECIMALS = 11  # 5^decimals còn vừa 26 bit: phép tách Dekker với 10^decimals vẫn chính xác
+MAX_EXACT_UNITS = 2.0 ** 52     # Từ ngưỡng này tích v*10^decimals không còn phần lẻ: các ô này dùng round()
+
+
+def round_to_units(values, decimals):
+    """
+    Làm tròn `values` về bội của 10^-decimals như round() của Python (nửa đơn vị làm tròn về số chẵn
+    theo giá trị THẬT của float, không theo tích v*10^decimals đã bị làm tròn), vector hóa.
+
+    Returns:
+        np.ndarray: float64 cùng kích thước, giá trị nguyên k (kết quả round() là k / 10^decimals).
+                    Chỉ đúng khi |v|*10^decimals < MAX_EXACT_UNITS (điểm thực tế luôn thỏa).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    scale = 10.0 ** decimals
+    with np.errstate(over='ignore', invalid='ignore'):
+        scaled = values * scale
+        units = np.rint(scaled)
+        ties = np.abs(scaled - units) == 0.5
+    if ties.any():
+        # Tích đã bị làm tròn đúng vào nửa đơn vị: dấu của sai số làm tròn (tách Dekker, chính xác)
+        # cho biết giá trị thật nằm phía nào
+        tie_values, products = values[ties], scaled[ties]
+        high = tie_values * DEKKER_SPLITTER
+        high -= high - tie_values
+        error = (high * scale - products) + (tie_values - high) * scale
+        units[ties] = np.where(error > 0, np.ceil(products), np.where(error < 0, np.floor(products), units[ties]))
+    return units
+
+
+def round_like_python(values, decimals):
+    """`round(v, decimals)` của Python cho từng phần tử của mảng float64 (kết quả trùng từng bit)."""
+    values = np.asarray(values, dtype=np.float64)
+    if not 0 <= decimals <= MAX_VECTOR_ROUND_DECIMALS:
+        return np.array([round(v, decimals) for v in values.ravel().tolist()], dtype=np.float64).reshape(values.shape)
+    # k / 10^decimals (phép chia làm tròn đúng) là float gần k·10^-decimals nhất, đúng như round() trả về
+    rounded = round_to_units(values, decimals) / 10.0 ** decimals
+    with np.errstate(over='ignore', invalid='ignore'):
+        outside = ~(np.abs(values) * 10.0 ** decimals < MAX_EXACT_UNITS)  # kể cả NaN/inf
+    if outside.any():
+        rounded[outside] = [round(v, decimals) for v in values[outside].tolist()]
+    return rounded
+
+
+class WeightSnapshot:
+    """
+    Ảnh chụp bất biến cấu hình trọng số của một lượt chạy: tên thuật toán (theo đúng
+    thứ tự cộng điểm), vector trọng số và mặt nạ bật/tắt.
+
+    Được tạo MỘT lần trên luồng giao diện khi bắt đầu công việc; luồng nền chỉ đọc,
+    không chạm vào widget Qt trong vòng lặp.
+    """
+    __slots__ = ('names', 'weights', 'enabled', '_index')
+
+    def __init__(self, names, weights=None, enabled=None):
+        names = tuple(names)
+        weights_arr = np.ones(len(names), dtype=np.float64) if weights is None else np.array(weights, dtype=np.float64)
+        enabled_arr = np.ones(len(names), dtype=bool) if enabled is None else np.array(enabled, dtype=bool)
+        if weights_arr.shape != (len(names),) or enabled_arr.shape != (len(names),):
+            raise ValueError("Số trọng số/mặt nạ không khớp với số thuật toán.")
+        weights_arr.setflags(write=False)
+        enabled_arr.setflags(write=False)
+        object.__setattr__(self, 'names', names)
+        object.__setattr__(self, 'weights', weights_arr)
+        object.__setattr__(self, 'enabled', enabled_arr)
+        object.__setattr__(self, '_index', {name: i for i, name in enumerate(names)})
+
+    def __setattr__(self, name, value):
+        raise AttributeError("WeightSnapshot là bất biến.")
+
+    def __len__(self):
+        return len(self.names)
+
+    def weight_of(self, name) -> float:
+        """Trọng số của thuật toán `name` (1.0 nếu không có trong ảnh chụp)."""
+        i = self._index.get(name)
+        return 1.0 if i is None else float(self.weights[i])
+
+    def __repr__(self):
+        items = ", ".join(f"{name}={w:g}{'' if on else ' (tắt)'}"
+                          for name, w, on in zip(self.names, self.weights.tolist(), self.enabled.tolist()))
+        return f"WeightSnapshot({items})"
+
+
+def build_score_tensor(score_matrices: dict, names, n_days: int):
+    """
+    Xếp các ma trận điểm float[n_days, 100] (theo thứ tự `names`) thành tensor
+    float64[len(names), n_days, 100]. Thuật toán thiếu hoặc lỗi (None) thành lớp NaN.
+    """
+    tensor = np.full((len(names), n_days, NUM_NUMBERS), np.nan, dtype=np.float64)
+    for k, name in enumerate(names):
+        matrix = score_matrices.get(name)
+        if matrix is not None:
+            tensor[k] = matrix
+    return tensor
+
+
+def combine_score_tensor(score_tensor, snapshot: WeightSnapshot, decimals=2, base_score=BASE_SCORE):
+    """
+    Tổng hợp điểm cả lượt chạy: base_score + tổng có trọng số các delta, cho mọi ngày một lượt.
+
+    Hàng toàn NaN (thuật toán không có dự đoán ngày đó) được bỏ qua; ngày không có thuật toán
+    hợp lệ nào nhận điểm gốc. Các lớp được cộng lần lượt theo thứ tự của `snapshot`, giống hệt
+    cách cộng từng ngày trước đây nên kết quả (và thứ tự xếp hạng khi bằng điểm) không đổi.
+
+    Args:
+        score_tensor: Mảng float[n_algos, n_days, 100] theo thứ tự `snapshot.names`.
+        snapshot (WeightSnapshot): Trọng số và mặt nạ bật/tắt.
+        decimals (int | None): Số chữ số làm tròn (như `round()` của Python); None = không làm tròn.
+
+    Returns:
+        np.ndarray: float64[n_days, 100].
+    """
+    tensor = np.asarray(score_tensor, dtype=np.float64)
+    if tensor.ndim != 3 or tensor.shape[0] != len(snapshot) or tensor.shape[2] != NUM_NUMBERS:
+        raise ValueError(f"Tensor điểm có kích thước {tensor.shape}, cần ({len(snapshot)}, n_days, {NUM_NUMBERS}).")
+    n_days = tensor.shape[1]
+
+    combined_deltas = np.zeros((n_days, NUM_NUMBERS), dtype=np.float64)
+    valid_counts = np.zeros(n_days, dtype=np.int64)
+    for k in range(len(snapshot)):
+        if not snapshot.enabled[k]:
+            continue
+        layer = tensor[k]
+        has_scores = ~np.isnan(layer).all(axis=1)
+        weight = float(snapshot.weights[k])
+        combined_deltas[has_scores] += layer[has_scores] if weight == 1.0 else layer[has_scores] * weight
+        valid_counts += has_scores
+
+    combined = np.full((n_days, NUM_NUMBERS), base_score, dtype=np.float64)
+    rows = valid_counts > 0
+    totals = base_score + combined_deltas[rows]
+    if decimals is not None:
+        # Như round() của Python (làm tròn đúng) thay cho np.round để giữ nguyên kết quả cũ
+        totals = round_like_python(totals, decimals)
+    combined[rows] = totals
+    return combined
+
+# --- END OF FILE engine/scoring.py ---
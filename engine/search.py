@@ -0,0 +1,528 @@
+# --- START OF FILE engine/search.py ---
+# -*- coding: utf-8 -*-
+
+import math
+import logging
+
+import numpy as np
+
+search_logger = logging.getLogger(__name__)
+
+RACING_KEEP_FRACTION = 1.0 / 3.0  # Tỷ lệ bộ được giữ lại sau mỗi vòng đua loại
+RACING_MIN_DAYS = 30              # Khoảng ngày ngắn nhất của vòng đầu (ít hơn thì nhiễu quá lớn)
+RACING_FINALISTS = 3              # Số bộ vào vòng cuối (chạy trên toàn bộ khoảng ngày)
+
+SEARCH_RELATIVE_SPAN = 0.5        # Miền tìm kiếm của mỗi tham số: giá trị gốc ± 50%
+SEARCH_ZERO_SPAN = 0.1            # Nửa độ rộng miền tìm kiếm khi giá trị gốc bằng 0
+SEARCH_MAX_TRIALS = 200           # Số lần thử mặc định của các chiến lược ask/tell
+
+PATTERN_INITIAL_STEP = 0.05       # Bước ban đầu của pattern search: 5% giá trị (như chế độ Auto)
+PATTERN_RESOLUTION = 0.005        # Độ phân giải mặc định của tham số thực: 0.5% giá trị gốc
+PATTERN_GROWTH = 2.0              # Hệ số tăng bước khi cải thiện (bước giảm một nửa khi thất bại)
+
+
+class SuccessiveHalving:
+    """
+    Đua loại (successive halving) các bộ tham số: vòng đầu chấm MỌI bộ trên một khoảng ngày
+    ngắn gần nhất, giữ lại `keep_fraction` bộ tốt nhất rồi nhân đôi khoảng ngày ở vòng sau,
+    cho tới khi chỉ còn `finalists` bộ được chạy trên TOÀN BỘ khoảng ngày (kết quả chính xác).
+
+    Args:
+        n_candidates (int): Số bộ tham số.
+        total_days (int): Số ngày của toàn bộ khoảng kiểm thử.
+        keep_fraction (float): Tỷ lệ giữ lại sau mỗi vòng (0 < x < 1).
+        min_days (int): Số ngày tối thiểu của một vòng.
+        finalists (int): Số bộ của vòng cuối.
+
+    Attributes:
+        rounds (list): [(số bộ, số ngày), ...] - vòng cuối luôn có số ngày = `total_days`.
+        days_evaluated (int): Tổng số (bộ × ngày) đã chấm trong run().
+    """
+
+    def __init__(self, n_candidates, total_days, keep_fraction=RACING_KEEP_FRACTION,
+                 min_days=RACING_MIN_DAYS, finalists=RACING_FINALISTS):
+        if not 0.0 < keep_fraction < 1.0:
+            raise ValueError(f"keep_fraction phải trong (0, 1), nhận {keep_fraction}.")
+        self.n_candidates = max(0, int(n_candidates))
+        self.total_days = max(1, int(total_days))
+        self.keep_fraction = keep_fraction
+        self.finalists = max(1, int(finalists))
+        self.days_evaluated = 0
+
+        counts = [self.n_candidates]
+        while counts[-1] > self.finalists:
+            counts.append(max(self.finalists, math.ceil(counts[-1] * keep_fraction)))
+        last = len(counts) - 1
+        self.rounds = []
+        for round_index, count in enumerate(counts):
+            n_days = min(self.total_days, max(int(min_days), math.ceil(self.total_days / 2 ** (last - round_index))))
+            self.rounds.append((count, n_days))
+            # Khoảng ngày đã chạm toàn bộ: vòng này là vòng cuối (chấm chính xác mọi bộ còn lại)
+            if n_days >= self.total_days:
+                break
+
+    @property
+    def planned_days(self) -> int:
+        """Tổng số (bộ × ngày) theo lịch, để so với `n_candidates * total_days` khi chấm hết."""
+        return sum(count * n_days for count, n_days in self.rounds)
+
+    @staticmethod
+    def select(candidate_indices, scores, keep):
+        """
+        Giữ `keep` bộ có điểm cao nhất (điểm None = lỗi, xếp cuối; bằng điểm thì bộ đứng trước thắng),
+        trả về theo thứ tự ban đầu.
+        """
+        order = sorted(range(len(candidate_indices)), key=lambda i: _rank_key(scores[i]), reverse=True)
+        return sorted(candidate_indices[i] for i in order[:keep])
+
+    def run(self, evaluate):
+        """
+        Chạy các vòng đua.
+
+        Args:
+            evaluate (callable): evaluate(chỉ số vòng, list chỉ số bộ, số ngày) -> list điểm (so sánh được,
+                None nếu lỗi) theo đúng thứ tự, hoặc None nếu bị dừng. Vòng cuối có số ngày = `total_days`.
+
+        Returns:
+            tuple | None: (chỉ số các bộ vòng cuối, điểm của chúng), hoặc None nếu bị dừng.
+        """
+        survivors = list(range(self.n_candidates))
+        for round_index, (_, n_days) in enumerate(self.rounds):
+            scores = evaluate(round_index, survivors, n_days)
+            if scores is None:
+                return None
+            self.days_evaluated += len(survivors) * n_days
+            if round_index == len(self.rounds) - 1:
+                return survivors, scores
+            keep = self.rounds[round_index + 1][0]
+            search_logger.debug(f"Vòng {round_index + 1}: giữ {keep}/{len(survivors)} bộ.")
+            survivors = self.select(survivors, scores, keep)
+        return survivors, []
+
+
+def canonical_value(value):
+    """Làm tròn giá trị tham số như trình tối ưu: float giữ 6 chữ số có nghĩa, int làm tròn."""
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return value
+    if isinstance(value, int):
+        return int(value)
+    return float(f"{value:.6g}")
+
+
+def params_key(params):
+    """Khóa bộ nhớ kết quả của một bộ tham số (sau khi làm tròn bằng canonical_value)."""
+    return tuple(sorted((name, canonical_value(value) if isinstance(value, (int, float)) else repr(value))
+                        for name, value in params.items()))
+
+
+class ParameterGrid:
+    """
+    Lưới tích Descartes các giá trị tham số, không tạo sẵn danh sách: bộ thứ `ordinal` được
+    giải mã theo hệ cơ số hỗn hợp (tham số cuối thay đổi nhanh nhất, cùng thứ tự với
+    itertools.product) nên lưới lớn tới đâu cũng chỉ tốn bộ nhớ cho các danh sách giá trị.
+
+    Dùng như một dãy chỉ đọc: len(), grid[i], vòng for. Một lưới có thể bắt đầu từ `start`
+    (tiếp tục phiên bị ngắt): grid[0] khi đó là bộ có số thứ tự `start` của lưới đầy đủ.
+
+    Args:
+        base_params (dict): Bộ tham số gốc (các tham số không nằm trong `names` giữ nguyên).
+        names (list): Tên các tham số được thay đổi.
+        value_lists (list): Danh sách giá trị của từng tham số, cùng thứ tự với `names`.
+        limit (int | None): Chỉ lấy `limit` bộ đầu tiên (None hoặc <= 0: không giới hạn).
+        start (int): Số thứ tự (trong lưới đầy đủ) của phần tử đầu tiên.
+    """
+
+    def __init__(self, base_params, names, value_lists, limit=None, start=0):
+        if len(names) != len(value_lists):
+            raise ValueError(f"Số tên tham số ({len(names)}) khác số danh sách giá trị ({len(value_lists)}).")
+        self.base_params = dict(base_params)
+        self.names = list(names)
+        self.value_lists = [list(values) for values in value_lists]
+        self.radices = [len(values) for values in self.value_lists]
+        self.size = math.prod(self.radices) if self.names else 0
+        self.limit = limit if limit is not None and limit > 0 else None
+        self.stop = min(self.size, self.limit) if self.limit is not None else self.size
+        self.start = min(max(0, int(start)), self.stop)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def ordinal(self, index) -> int:
+        """Số thứ tự trong lưới đầy đủ của phần tử `index` (cho phép chỉ số âm)."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(f"Chỉ số {index} ngoài lưới ({len(self)} bộ).")
+        return self.start + index
+
+    def values_at(self, ordinal):
+        """Giá trị các tham số (theo thứ tự `names`) của bộ có số thứ tự `ordinal`."""
+        digits = [0] * len(self.radices)
+        for position in range(len(self.radices) - 1, -1, -1):
+            ordinal, digits[position] = divmod(ordinal, self.radices[position])
+        return [values[digit] for values, digit in zip(self.value_lists, digits)]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        params = dict(self.base_params)
+        params.update(zip(self.names, self.values_at(self.ordinal(index))))
+        return params
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def from_ordinal(self, start):
+        """Lưới cùng giá trị nhưng bắt đầu ở số thứ tự `start` (của lưới đầy đủ)."""
+        return ParameterGrid(self.base_params, self.names, self.value_lists, limit=self.limit, start=start)
+
+    def signature(self) -> dict:
+        """Mô tả lưới (dạng JSON) để kiểm tra checkpoint có thuộc đúng lưới này không."""
+        return {"base_params": self.base_params, "names": self.names,
+                "value_lists": self.value_lists, "limit": self.limit}
+
+
+class ParameterSpace:
+    """
+    Miền tìm kiếm hình hộp quanh một bộ tham số số học: mỗi tham số v được tìm trong
+    [v - |v|*span, v + |v|*span] (giữ nguyên dấu), các chiến lược làm việc trên khối [0, 1]^d.
+
+    Args:
+        params (dict): Bộ tham số gốc (chỉ các giá trị int/float được tìm kiếm, còn lại giữ nguyên).
+        span (float): Nửa độ rộng tương đối của miền (0 < span < 1).
+        bounds (dict, optional): {tên: (thấp, cao)} - miền cố định thay cho ± span (ví dụ trọng số).
+    """
+
+    def __init__(self, params, span=SEARCH_RELATIVE_SPAN, bounds=None):
+        self.base_params = dict(params)
+        self.names = [k for k, v in params.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+        self.is_int = np.array([isinstance(params[k], int) for k in self.names], dtype=bool)
+        values = np.array([float(params[k]) for k in self.names], dtype=np.float64)
+        half_width = np.where(np.abs(values) > 1e-9, np.abs(values) * span, SEARCH_ZERO_SPAN)
+        self.lower = values - half_width
+        self.upper = values + half_width
+        for i, name in enumerate(self.names):
+            if bounds and name in bounds:
+                self.lower[i], self.upper[i] = (float(b) for b in bounds[name])
+
+    @property
+    def dim(self) -> int:
+        return len(self.names)
+
+    def to_params(self, unit_vector):
+        """Điểm trong [0, 1]^d (bị kẹp vào khối) -> bộ tham số (int làm tròn, float 6 chữ số có nghĩa)."""
+        unit_vector = np.clip(np.asarray(unit_vector, dtype=np.float64), 0.0, 1.0)
+        values = self.lower + unit_vector * (self.upper - self.lower)
+        params = dict(self.base_params)
+        for name, value, is_int in zip(self.names, values.tolist(), self.is_int.tolist()):
+            params[name] = int(round(value)) if is_int else float(f"{value:.6g}")
+        return params
+
+    def to_unit(self, params):
+        """Bộ tham số -> điểm trong [0, 1]^d."""
+        values = np.array([float(params[k]) for k in self.names], dtype=np.float64)
+        return np.clip((values - self.lower) / (self.upper - self.lower), 0.0, 1.0)
+
+
+def _rank_key(score):
+    """Khóa sắp xếp điểm: điểm None (lỗi) xếp sau mọi điểm hợp lệ."""
+    return (score is not None, score if score is not None else ())
+
+
+class SearchStrategy:
+    """
+    Chiến lược tìm kiếm dạng ask/tell dùng chung hàm đánh giá và điều kiện dừng của trình tối ưu:
+    ask() -> bộ tham số cần thử, tell(bộ tham số đó, điểm) sau khi chấm. Điểm chỉ cần so sánh được
+    (ví dụ tuple điểm của trình tối ưu, lớn hơn là tốt hơn); None = lượt thử lỗi.
+
+    Args:
+        space (ParameterSpace): Miền tìm kiếm.
+        seed (int, optional): Hạt giống ngẫu nhiên (cùng seed -> cùng chuỗi thử).
+    """
+    name = "base"
+
+    def __init__(self, space, seed=None):
+        self.space = space
+        self.rng = np.random.default_rng(seed)
+        self.history = []  # [(điểm trong [0, 1]^d, điểm), ...] theo thứ tự tell
+        self.finished = False  # True khi chiến lược tự hội tụ (không còn gì để thử)
+        self._pending = []
+
+    def _propose(self):
+        raise NotImplementedError
+
+    def _observe(self, unit_vector, score):
+        pass
+
+    def ask(self):
+        unit_vector = np.asarray(self._propose(), dtype=np.float64)
+        params = self.space.to_params(unit_vector)
+        self._pending.append((params, unit_vector))
+        return params
+
+    def tell(self, params, score):
+        for position, (pending_params, unit_vector) in enumerate(self._pending):
+            if pending_params == params:
+                del self._pending[position]
+                break
+        else:
+            raise ValueError("tell() với bộ tham số chưa được ask().")
+        self.history.append((unit_vector, score))
+        self._observe(unit_vector, score)
+
+
+class RandomSearch(SearchStrategy):
+    """Tìm kiếm ngẫu nhiên đều trong miền (có seed)."""
+    name = "random"
+
+    def _propose(self):
+        return self.rng.random(self.space.dim)
+
+
+class CMAES(SearchStrategy):
+    """
+    CMA-ES (mu/mu_w, lambda) chuẩn, thuần NumPy, trên khối [0, 1]^d. Trung bình khởi đầu tại bộ
+    tham số gốc; mẫu nằm ngoài khối bị kẹp khi chấm nhưng cập nhật bằng mẫu gốc.
+
+    Args:
+        sigma0 (float): Độ lệch chuẩn ban đầu (theo đơn vị khối).
+        popsize (int, optional): lambda; mặc định 4 + 3 ln(d).
+    """
+    name = "cmaes"
+
+    def __init__(self, space, seed=None, sigma0=0.2, popsize=None):
+        super().__init__(space, seed)
+        n = max(1, space.dim)
+        self.n = n
+        self.mean = space.to_unit(space.base_params) if space.dim else np.zeros(0)
+        self.sigma = float(sigma0)
+        self.popsize = int(popsize) if popsize else 4 + int(3 * math.log(n))
+        self.mu = self.popsize // 2
+        weights = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1.0 / np.sum(self.weights ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0.0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi_n = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+        self.pc = np.zeros(space.dim)
+        self.ps = np.zeros(space.dim)
+        self.cov = np.eye(space.dim)
+        self.generation = 0
+        self._samples = []      # mẫu (chưa kẹp) của thế hệ hiện tại chưa được ask
+        self._generation_told = []  # [(mẫu, điểm), ...] của thế hệ hiện tại
+
+    def _eigen(self):
+        eigenvalues, basis = np.linalg.eigh(self.cov)
+        return basis, np.sqrt(np.maximum(eigenvalues, 1e-20))
+
+    def _propose(self):
+        if not self._samples:
+            basis, scales = self._eigen()
+            z = self.rng.standard_normal((self.popsize, self.space.dim))
+            self._samples = list(self.mean + self.sigma * (z * scales) @ basis.T)
+        return self._samples.pop(0)
+
+    def _observe(self, raw, score):
+        self._generation_told.append((raw, score))
+        if len(self._generation_told) < self.popsize:
+            return
+        order = sorted(range(len(self._generation_told)), key=lambda i: _rank_key(self._generation_told[i][1]), reverse=True)
+        selected = np.array([self._generation_told[i][0] for i in order[:self.mu]])
+        self._generation_told = []
+        self._update(selected)
+
+    def _update(self, selected):
+        n = self.n
+        old_mean = self.mean
+        self.mean = self.weights @ selected
+        y_w = (self.mean - old_mean) / self.sigma
+        basis, scales = self._eigen()
+        inv_sqrt_cov = basis @ np.diag(1.0 / scales) @ basis.T
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * (inv_sqrt_cov @ y_w)
+        self.generation += 1
+        ps_norm = np.linalg.norm(self.ps) / math.sqrt(1 - (1 - self.cs) ** (2 * self.generation))
+        h_sigma = 1.0 if ps_norm < (1.4 + 2 / (n + 1)) * self.chi_n else 0.0
+        self.pc = (1 - self.cc) * self.pc + h_sigma * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * y_w
+        y = (selected - old_mean) / self.sigma
+        rank_mu = (y.T * self.weights) @ y
+        self.cov = ((1 - self.c1 - self.cmu) * self.cov
+                    + self.c1 * (np.outer(self.pc, self.pc) + (1 - h_sigma) * self.cc * (2 - self.cc) * self.cov)
+                    + self.cmu * rank_mu)
+        self.cov = (self.cov + self.cov.T) / 2
+        self.sigma *= math.exp((self.cs / self.damps) * (np.linalg.norm(self.ps) / self.chi_n - 1))
+        self.sigma = min(self.sigma, 1.0)
+        search_logger.debug(f"CMA-ES thế hệ {self.generation}: sigma={self.sigma:.4f}")
+
+
+class TPESearch(SearchStrategy):
+    """
+    Tree-structured Parzen Estimator (tối ưu Bayes) thuần NumPy, các chiều độc lập: sau
+    `n_startup` lượt ngẫu nhiên, chia lịch sử thành nhóm tốt (tỷ lệ `gamma`) và nhóm còn lại,
+    lấy `n_candidates` mẫu từ mật độ nhóm tốt l(x) và chọn mẫu có l(x)/g(x) lớn nhất.
+    """
+    name = "tpe"
+
+    def __init__(self, space, seed=None, n_startup=10, gamma=0.25, n_candidates=24):
+        super().__init__(space, seed)
+        self.n_startup = int(n_startup)
+        self.gamma = float(gamma)
+        self.n_candidates = int(n_candidates)
+
+    @staticmethod
+    def _bandwidth(points):
+        # Quy tắc Scott; cận dưới 1/min(100, n + 1) như hyperopt để mật độ không co về một điểm
+        std = points.std(axis=0) if len(points) > 1 else np.full(points.shape[1], 0.5)
+        return np.clip(1.06 * std * len(points) ** (-0.2), 1.0 / min(100, len(points) + 1), 1.0)
+
+    @staticmethod
+    def _log_density(x, points, bandwidth):
+        """log mật độ Parzen (trộn thêm một thành phần đều trên [0, 1]) theo từng chiều, cộng lại."""
+        diffs = (x[:, None, :] - points[None, :, :]) / bandwidth
+        kernels = np.exp(-0.5 * diffs ** 2) / (bandwidth * math.sqrt(2 * math.pi))
+        density = (kernels.sum(axis=1) + 1.0) / (len(points) + 1)
+        return np.log(density).sum(axis=1)
+
+    def _propose(self):
+        if len(self.history) < self.n_startup:
+            return self.rng.random(self.space.dim)
+        order = sorted(range(len(self.history)), key=lambda i: _rank_key(self.history[i][1]), reverse=True)
+        n_good = max(1, int(math.ceil(self.gamma * len(order))))
+        good = np.array([self.history[i][0] for i in order[:n_good]])
+        bad = np.array([self.history[i][0] for i in order[n_good:]]) if len(order) > n_good else np.full((1, self.space.dim), 0.5)
+        good_bw = self._bandwidth(good)
+        centers = good[self.rng.integers(0, len(good), self.n_candidates)]
+        # Phản xạ tại biên thay vì kẹp (kẹp dồn mẫu lên đúng mép khối)
+        candidates = np.abs(centers + self.rng.standard_normal(centers.shape) * good_bw)
+        candidates = 1.0 - np.abs(1.0 - np.mod(candidates, 2.0))
+        # Thành phần đều của l(x): mỗi chiều có xác suất 1/(số điểm tốt + 1) lấy mẫu đều
+        from_prior = self.rng.random(candidates.shape) < 1.0 / (len(good) + 1)
+        candidates[from_prior] = self.rng.random(int(from_prior.sum()))
+        ratio = self._log_density(candidates, good, good_bw) - self._log_density(candidates, bad, self._bandwidth(bad))
+        return candidates[int(np.argmax(ratio))]
+
+
+class PatternSearch(SearchStrategy):
+    """
+    Pattern search thích nghi theo từng tham số, trên giá trị thật (không dùng khối [0, 1]^d):
+    thử giá trị hiện tại ± bước; cải thiện thì nhận và nhân đôi bước (tiếp tục cùng hướng),
+    cả hai hướng đều thất bại thì giảm một nửa bước, tới độ phân giải của tham số thì coi như
+    tham số đó đã hội tụ. `finished` = True khi mọi tham số đã hội tụ mà không cải thiện thêm.
+
+    Lượt ask() đầu tiên trả về chính bộ tham số gốc (điểm chuẩn để so sánh).
+
+    Args:
+        resolutions (dict, optional): {tên: bước nhỏ nhất}. Mặc định 1 cho int,
+            `PATTERN_RESOLUTION` × |giá trị gốc| (hoặc 0.001 nếu bằng 0) cho float.
+    """
+    name = "pattern"
+
+    def __init__(self, space, seed=None, resolutions=None):
+        super().__init__(space, seed)
+        resolutions = resolutions or {}
+        self.current = {k: canonical_value(v) for k, v in space.base_params.items()}
+        self.best_score = None
+        self.steps = {}
+        self.resolutions = {}
+        for name, is_int in zip(space.names, space.is_int.tolist()):
+            value = abs(float(self.current[name]))
+            if is_int:
+                self.steps[name] = max(1, int(round(value * PATTERN_INITIAL_STEP)))
+                self.resolutions[name] = max(1, int(round(resolutions.get(name, 1))))
+            else:
+                self.steps[name] = max(1e-6, value * PATTERN_INITIAL_STEP) if value > 1e-9 else 0.001
+                self.resolutions[name] = abs(resolutions.get(name, value * PATTERN_RESOLUTION if value > 1e-9 else 0.001))
+        self.converged = set()
+        self._param_index = 0
+        self._direction = 1
+        self._tried_other_direction = False
+        self._baseline_pending = True
+        self._trial = None  # (tên, hướng, bộ tham số) của lượt đang chờ tell
+
+    def _candidate(self, name, direction):
+        params = dict(self.current)
+        step = self.steps[name]
+        params[name] = canonical_value(self.current[name] + direction * step)
+        return params
+
+    def _advance(self):
+        """Sang tham số kế tiếp chưa hội tụ (hướng +)."""
+        self._direction = 1
+        self._tried_other_direction = False
+        names = self.space.names
+        for _ in range(len(names)):
+            self._param_index = (self._param_index + 1) % len(names)
+            if names[self._param_index] not in self.converged:
+                return
+        self.finished = True
+
+    def _fail(self, name):
+        """Hướng hiện tại thất bại: thử hướng còn lại, hoặc giảm bước và chuyển tham số."""
+        if not self._tried_other_direction:
+            self._direction = -self._direction
+            self._tried_other_direction = True
+            return
+        if self.steps[name] <= self.resolutions[name]:
+            self.converged.add(name)
+        else:
+            halved = self.steps[name] / 2.0
+            if isinstance(self.steps[name], int):
+                halved = int(round(halved))
+            self.steps[name] = max(self.resolutions[name], halved)
+        self._advance()
+
+    def ask(self):
+        if self._baseline_pending:
+            self._trial = (None, 0, dict(self.current))
+            return dict(self.current)
+        if not self.space.names:
+            self.finished = True
+        names = self.space.names
+        while not self.finished:
+            name = names[self._param_index]
+            params = self._candidate(name, self._direction)
+            if params[name] != self.current[name]:
+                self._trial = (name, self._direction, params)
+                return dict(params)
+            # Bước nhỏ hơn độ chính xác làm tròn: coi như thất bại
+            self._fail(name)
+        return dict(self.current)
+
+    def tell(self, params, score):
+        if self._trial is None or params != self._trial[2]:
+            raise ValueError("tell() với bộ tham số chưa được ask().")
+        name, direction, trial_params = self._trial
+        self._trial = None
+        self.history.append((params, score))
+        if self._baseline_pending:
+            self._baseline_pending = False
+            self.best_score = score
+            if not self.space.names:
+                self.finished = True
+            return
+        if score is not None and (self.best_score is None or score > self.best_score):
+            self.current = trial_params
+            self.best_score = score
+            grown = self.steps[name] * PATTERN_GROWTH
+            self.steps[name] = int(grown) if isinstance(self.steps[name], int) else grown
+            # Tham số vừa cải thiện có thể cải thiện các tham số đã hội tụ trước đó
+            self.converged.clear()
+            self._tried_other_direction = True
+            return
+        self._fail(name)
+
+
+SEARCH_STRATEGIES = {RandomSearch.name: RandomSearch, CMAES.name: CMAES, TPESearch.name: TPESearch,
+                     PatternSearch.name: PatternSearch}
+
+
+def make_search_strategy(name, space, seed=None, **options):
+    """Tạo chiến lược ask/tell theo tên ('random', 'cmaes', 'tpe', 'pattern')."""
+    if name not in SEARCH_STRATEGIES:
+        raise ValueError(f"Chiến lược tìm kiếm không hợp lệ: {name}")
+    return SEARCH_STRATEGIES[name](space, seed, **options)
+
+# --- END OF FILE engine/search.py ---
@@ -16,6 +16,7 @@ import inspect
 import random
 import copy
 import threading
+import multiprocessing
 import queue
 import time
 import ast
@@ -25,7 +26,6 @@ from importlib import reload, util
 from abc import ABC, abstractmethod
 import re
 import textwrap
-import itertools
 import xml.etree.ElementTree as ET
 from packaging.version import parse as parse_version
 import math
@@ -71,6 +71,16 @@ except ImportError as e:
         pass
     sys.exit(1)
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+    print("numpy library found.")
+except ImportError as e:
+    HAS_NUMPY = False
+    print(f"CRITICAL ERROR: numpy library not found. Please install it: pip install numpy")
+    print(f"Import Error: {e}")
+    sys.exit(1)
+
 try:
     import psutil
     HAS_PSUTIL = True
@@ -251,7 +261,7 @@ try:
         try: reload(sys.modules['algorithms']); main_logger.debug("Reloaded algorithms package.")
         except Exception: pass
 
-    from algorithms.base import BaseAlgorithm
+    from algorithms.base import BaseAlgorithm, scores_dict_to_array, scores_array_to_dict
     main_logger.info("Imported BaseAlgorithm successfully.")
 except ImportError as e:
     print(f"Lỗi: Không thể import BaseAlgorithm từ algorithms.base: {e}", file=sys.stderr)
@@ -264,6 +274,12 @@ except ImportError as e:
             self.logger = logging.getLogger(f"DummyBase_{id(self)}")
             self._log('warning', f"Using Dummy BaseAlgorithm! Instance: {id(self)}")
         def get_config(self) -> dict: return copy.deepcopy(self.config)
+        def with_parameters(self, params: dict):
+            clone = self.__class__(data_results_list=self._raw_results_list, cache_dir=self.cache_dir)
+            clone_params = clone.config.get('parameters', {})
+            for name, value in params.items():
+                if name in clone_params: clone_params[name] = copy.deepcopy(value)
+            return clone
         @abstractmethod
         def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict:
             self._log('error', "Phương thức predict() chưa được triển khai!")
@@ -291,6 +307,15 @@ except ImportError as e:
         def _log(self, level: str, message: str):
             log_func = getattr(self.logger, level.lower(), self.logger.warning)
             log_func(f"[{self.__class__.__name__}] {message}")
+    def scores_dict_to_array(scores_dict):
+        if not isinstance(scores_dict, dict) or not scores_dict: return None
+        arr = np.zeros(100, dtype=np.float64)
+        for i in range(100):
+            val = scores_dict.get(f"{i:02d}")
+            if isinstance(val, (int, float)): arr[i] = float(val)
+        return arr
+    def scores_array_to_dict(scores): return {f"{i:02d}": float(v) for i, v in enumerate(scores)}
+    BaseAlgorithm.predict_array = lambda self, date_to_predict, historical_results: scores_dict_to_array(self.predict(date_to_predict, historical_results))
     print("Cảnh báo: Sử dụng lớp BaseAlgorithm giả.", file=sys.stderr)
     main_logger.warning("Using dummy BaseAlgorithm class due to import failure.")
 except Exception as base_import_err:
@@ -298,6 +323,27 @@ except Exception as base_import_err:
     main_logger.critical(f"Unknown error importing BaseAlgorithm: {base_import_err}", exc_info=True)
     sys.exit(1)
 
+# Số ma trận điểm của thuật toán kết hợp tối đa được trình tối ưu giữ lại để dùng chung giữa các lần thử
+COMBO_SCORE_CACHE_MAX_ENTRIES = 64
+# Chu kỳ ghi checkpoint (giây) của chế độ Tạo Bộ Tham Số trong khi đang kiểm tra
+COMBO_CHECKPOINT_INTERVAL_SEC = 30
+
+try:
+    from engine.draw_store import DrawStore
+    from engine.data_cache import load_results_cached, atomic_write_text
+    from engine.scoring import WeightSnapshot, build_score_tensor, combine_score_tensor
+    from engine.backtest import Backtest, compute_score_chunks, performance_summary, PREDICT_RANGE_CHUNK_DAYS
+    from engine.parallel import ParallelPerformanceEvaluator, default_worker_count
+    from engine.decomposition import DecomposedScorer
+    from engine.ensemble import EnsembleTensor, EnsembleWeightSearch, ENSEMBLE_METHODS, ENSEMBLE_MAX_EVALUATIONS
+    from engine.search import SuccessiveHalving, ParameterGrid, ParameterSpace, make_search_strategy, params_key, SEARCH_MAX_TRIALS
+    from engine.eval_db import EvaluationLedger, algorithm_fingerprint, LEDGER_FILE_NAME, KIND_PERFORMANCE
+    main_logger.info("Imported engine modules successfully.")
+except ImportError as engine_import_err:
+    print(f"Lỗi: Không thể import các module engine: {engine_import_err}", file=sys.stderr)
+    main_logger.critical(f"Failed to import engine modules: {engine_import_err}", exc_info=True)
+    sys.exit(1)
+
 
 class PythonSyntaxHighlighter(QSyntaxHighlighter):
     def __init__(self, parent=None):
@@ -1276,11 +1322,12 @@ class EvaluationWorker(QObject):
     finished_signal = pyqtSignal(dict)
     error_signal = pyqtSignal(str)
     
-    def __init__(self, algo_instances, results_data, num_periods):
+    def __init__(self, algo_instances, results_data, num_periods, draw_store=None):
         super().__init__()
         self.algo_instances = algo_instances
         self.results_data = results_data
         self.num_periods = num_periods
+        self.draw_store = draw_store
         self._is_running = True
 
     def stop(self):
@@ -1293,6 +1340,9 @@ class EvaluationWorker(QObject):
                 return
 
             sorted_data = sorted(self.results_data, key=lambda x: x['date'])
+            store = self.draw_store
+            if store is None or len(store) != len(sorted_data):
+                store = DrawStore(sorted_data)
             current_end_date = sorted_data[-1]['date']
             
             periods = []
@@ -1324,10 +1374,6 @@ class EvaluationWorker(QObject):
             stats_per_period = {}
             rank_frequency = {i: 0 for i in range(100)}
             
-            history_cache = {}
-            for i, r in enumerate(sorted_data):
-                history_cache[r['date']] = sorted_data[:i]
-
             for period in periods:
                 if not self._is_running: break
                 
@@ -1335,57 +1381,28 @@ class EvaluationWorker(QObject):
                 stats_per_period[p_idx] = {'top1': 0, 'top2': 0, 'top3': 0, 'total': 0, 
                                            'range': f"{period['start_date']:%d/%m} - {period['end_date']:%d/%m}"}
                 
-                for entry in period['entries']:
-                    if not self._is_running: break
-                    
-                    try:
-                        idx_in_full = sorted_data.index(entry)
-                        if idx_in_full == 0: continue
-                        
-                        prev_entry = sorted_data[idx_in_full - 1]
-                        predict_date_input = prev_entry['date']
-                        actual_result_dict = entry['result']
-                        
-                        hist = history_cache.get(predict_date_input, [])
-                        
-                        combined_scores = {}
-                        for algo in self.algo_instances:
-                            try:
-                                preds = algo.predict(entry['date'], hist)
-                                if preds:
-                                    for num, score in preds.items():
-                                        combined_scores[num] = combined_scores.get(num, 0) + float(score)
-                            except Exception: pass
-                        
-                        if not combined_scores: continue
-
-                        sorted_preds = sorted(combined_scores.items(), key=lambda x: x[1], reverse=True)
-                        ranked_nums = [int(k) for k, v in sorted_preds if k.isdigit()]
-                        
-                        actual_lotos = set()
-                        for k, v in actual_result_dict.items():
-                            if k not in ['date', 'id', 'source']:
-                                vals = v if isinstance(v, list) else [v]
-                                for val in vals:
-                                    s = str(val)
-                                    if len(s) >= 2 and s[-2:].isdigit(): actual_lotos.add(int(s[-2:]))
-                        
-                        stats_per_period[p_idx]['total'] += 1
-                        
-                        hit_indices = []
-                        for rank_idx, num in enumerate(ranked_nums[:100]):
-                            if num in actual_lotos:
-                                hit_indices.append(rank_idx)
-                                rank_frequency[rank_idx] = rank_frequency.get(rank_idx, 0) + 1
-                        
-                        if any(idx == 0 for idx in hit_indices): stats_per_period[p_idx]['top1'] += 1
-                        if any(idx <= 1 for idx in hit_indices): stats_per_period[p_idx]['top2'] += 1
-                        if any(idx <= 2 for idx in hit_indices): stats_per_period[p_idx]['top3'] += 1
-
-                    except Exception: continue
-                    
-                    current_calc_count += 1
-                    self.progress_signal.emit(current_calc_count, total_days_to_calc)
+                # Dự đoán cả kỳ một lượt: lịch sử của ngày ở hàng idx là các hàng [0, idx - 1)
+                period_rows = [store.row_of(entry['date']) for entry in period['entries']]
+                period_rows = [row for row in period_rows if row]
+                if not period_rows: continue
+                # Tổng điểm thô (không cộng điểm gốc), bỏ qua ngày không có thuật toán nào dự đoán
+                period_backtest = Backtest(dict(enumerate(self.algo_instances)), store, decimals=None,
+                                           base_score=0.0, chunk_days=len(period_rows))
+                period_result = period_backtest.run([store.dates[row] for row in period_rows],
+                                                    target_rows=period_rows,
+                                                    history_ends=[row - 1 for row in period_rows])
+                evaluation = period_result.evaluation
+                if evaluation.n_days == 0: continue
+
+                stats_per_period[p_idx]['total'] += evaluation.n_days
+                stats_per_period[p_idx]['top1'] += evaluation.top_hits(1)
+                stats_per_period[p_idx]['top2'] += evaluation.top_hits(2)
+                stats_per_period[p_idx]['top3'] += evaluation.top_hits(3)
+                for rank_idx, freq in enumerate(evaluation.rank_frequency().tolist()):
+                    rank_frequency[rank_idx] += freq
+
+                current_calc_count += evaluation.n_days
+                self.progress_signal.emit(current_calc_count, total_days_to_calc)
 
             self.finished_signal.emit({
                 'periods': stats_per_period,
@@ -1601,7 +1618,8 @@ class AlgorithmEvaluationTab(QWidget):
         self.summary_label.setStyleSheet("color: #007BFF; font-size: 11pt; padding: 15px; border: 1px solid #ccc; background: #fff;")
         
         self.thread = QThread()
-        self.worker = EvaluationWorker(selected_instances, self.opt_parent.results_data, num_periods)
+        self.worker = EvaluationWorker(selected_instances, self.opt_parent.results_data, num_periods,
+                                       draw_store=self.opt_parent.draw_store)
         self.worker.moveToThread(self.thread)
         
         self.worker.progress_signal.connect(self.update_progress)
@@ -1797,7 +1815,13 @@ class OptimizerEmbedded(QWidget):
         self.calculate_dir = self.base_dir / "calculate"
         self.main_app = main_app_instance
         self.results_data = []
+        self.draw_store = None
         self.loaded_algorithms = {}
+        self.combo_score_cache = {}
+        self.decomposed_scorers = {}
+        self.evaluation_ledger = None
+        self.optimizer_checkpoint = None
+        self.optimizer_checkpoint_lock = threading.Lock()
         self.selected_algorithm_for_edit = None
         self.selected_algorithm_for_optimize = None
         self.editor_param_widgets = {}
@@ -2241,6 +2265,38 @@ class OptimizerEmbedded(QWidget):
         self.opt_mode_group.addButton(self.opt_mode_auto_radio)
         mode_outer_layout.addWidget(self.opt_mode_auto_radio)
 
+        self.search_strategy_widget = QWidget()
+        search_strategy_layout = QHBoxLayout(self.search_strategy_widget)
+        search_strategy_layout.setContentsMargins(20, 0, 0, 0)
+        search_strategy_layout.setSpacing(8)
+        search_strategy_layout.addWidget(QLabel("Chiến lược:"))
+        self.opt_search_strategy_combo = QComboBox()
+        self.opt_search_strategy_combo.addItem("Leo đồi (Auto/Custom)", "hill_climb")
+        self.opt_search_strategy_combo.addItem("Pattern search (bước thích nghi)", "pattern")
+        self.opt_search_strategy_combo.addItem("Ngẫu nhiên", "random")
+        self.opt_search_strategy_combo.addItem("CMA-ES", "cmaes")
+        self.opt_search_strategy_combo.addItem("TPE (Bayes)", "tpe")
+        self.opt_search_strategy_combo.setToolTip("Leo đồi: thử từng tham số với bước cố định (dùng bước Custom nếu có).\n"
+                                                  "Pattern search: bước bắt đầu 5%, gấp đôi khi cải thiện, giảm một nửa khi thất bại\n"
+                                                  "tới độ phân giải của tham số (bước Custom nhỏ nhất nếu có).\n"
+                                                  "Ngẫu nhiên / CMA-ES / TPE: tìm đồng thời mọi tham số trong khoảng giá trị gốc ± 50%,\n"
+                                                  "dừng khi hết số lần thử hoặc hết thời gian.")
+        search_strategy_layout.addWidget(self.opt_search_strategy_combo)
+        search_strategy_layout.addWidget(QLabel("Số lần thử:"))
+        self.opt_search_trials_spinbox = QSpinBox()
+        self.opt_search_trials_spinbox.setRange(1, 100000)
+        self.opt_search_trials_spinbox.setValue(SEARCH_MAX_TRIALS)
+        self.opt_search_trials_spinbox.setFixedWidth(80)
+        search_strategy_layout.addWidget(self.opt_search_trials_spinbox)
+        search_strategy_layout.addWidget(QLabel("Seed:"))
+        self.opt_search_seed_spinbox = QSpinBox()
+        self.opt_search_seed_spinbox.setRange(0, 999999)
+        self.opt_search_seed_spinbox.setValue(0)
+        self.opt_search_seed_spinbox.setFixedWidth(80)
+        search_strategy_layout.addWidget(self.opt_search_seed_spinbox)
+        search_strategy_layout.addStretch(1)
+        mode_outer_layout.addWidget(self.search_strategy_widget)
+
         self.opt_mode_combo_radio = QRadioButton("Tạo Bộ Tham Số")
         self.opt_mode_combo_radio.toggled.connect(self._on_optimization_mode_changed)
         self.opt_mode_group.addButton(self.opt_mode_combo_radio)
@@ -2263,6 +2319,19 @@ class OptimizerEmbedded(QWidget):
         self.combo_max_combinations_spinbox.setFixedWidth(100)
         self.combo_max_combinations_spinbox.setToolTip("Giới hạn số lượng bộ tham số tối đa sẽ được tạo và kiểm tra.")
         combo_gen_layout.addWidget(self.combo_max_combinations_spinbox)
+        self.combo_parallel_checkbox = QCheckBox("Song song, số tiến trình:")
+        self.combo_parallel_checkbox.setToolTip("Kiểm tra nhiều bộ tham số cùng lúc trên nhiều nhân CPU (mỗi tiến trình một bộ).")
+        combo_gen_layout.addWidget(self.combo_parallel_checkbox)
+        self.combo_parallel_workers_spinbox = QSpinBox()
+        self.combo_parallel_workers_spinbox.setRange(2, max(2, default_worker_count()))
+        self.combo_parallel_workers_spinbox.setValue(max(2, default_worker_count()))
+        self.combo_parallel_workers_spinbox.setFixedWidth(60)
+        self.combo_parallel_workers_spinbox.setEnabled(False)
+        self.combo_parallel_checkbox.toggled.connect(self.combo_parallel_workers_spinbox.setEnabled)
+        combo_gen_layout.addWidget(self.combo_parallel_workers_spinbox)
+        self.combo_racing_checkbox = QCheckBox("Đua loại")
+        self.combo_racing_checkbox.setToolTip("Successive halving: chấm mọi bộ trên khoảng ngày ngắn gần nhất, giữ 1/3 bộ tốt nhất và nhân đôi\nkhoảng ngày mỗi vòng; chỉ vài bộ cuối cùng chạy trên toàn bộ khoảng ngày (kết quả chính xác).")
+        combo_gen_layout.addWidget(self.combo_racing_checkbox)
         combo_gen_layout.addStretch(1)
         mode_outer_layout.addWidget(self.combo_gen_settings_widget)
         self.combo_gen_settings_widget.setEnabled(False)
@@ -2421,11 +2490,13 @@ class OptimizerEmbedded(QWidget):
         if sender == self.opt_mode_auto_radio:
             self.current_optimization_mode = 'auto_hill_climb'
             self.combo_gen_settings_widget.setEnabled(False)
+            self.search_strategy_widget.setEnabled(True)
             self.param_scroll_widget_container.setEnabled(True)
             optimizer_logger.debug("Switched to Auto/Custom optimization mode.")
         elif sender == self.opt_mode_combo_radio:
             self.current_optimization_mode = 'generated_combinations'
             self.combo_gen_settings_widget.setEnabled(True)
+            self.search_strategy_widget.setEnabled(False)
             self.param_scroll_widget_container.setEnabled(False)
             optimizer_logger.debug("Switched to Generated Combinations optimization mode.")
         self._populate_advanced_optimizer_settings()
@@ -2480,6 +2551,7 @@ class OptimizerEmbedded(QWidget):
     def load_data(self):
         optimizer_logger.info("Loading lottery data for optimizer (PyQt5)...")
         self.results_data = []
+        self.draw_store = None
         data_file_str = self.data_file_path_label.text()
 
         if not data_file_str or data_file_str == "...":
@@ -2513,33 +2585,13 @@ class OptimizerEmbedded(QWidget):
             return
 
         try:
-            with open(data_file_path, 'r', encoding='utf-8') as f: raw_data = json.load(f)
-            processed_results = []
-            unique_dates = set()
-            data_list_to_process = []
-            if isinstance(raw_data, list): data_list_to_process = raw_data
-            elif isinstance(raw_data, dict) and 'results' in raw_data and isinstance(raw_data.get('results'), dict):
-                for date_str, result_dict in raw_data['results'].items():
-                    if isinstance(result_dict, dict): data_list_to_process.append({'date': date_str, 'result': result_dict})
-            else: raise ValueError("Định dạng JSON không hợp lệ.")
-            for item in data_list_to_process:
-                if not isinstance(item, dict): continue
-                date_str_raw = item.get("date")
-                if not date_str_raw: continue
-                try:
-                    date_str_cleaned = str(date_str_raw).split('T')[0]
-                    date_obj = datetime.datetime.strptime(date_str_cleaned, '%Y-%m-%d').date()
-                except ValueError: continue
-                if date_obj in unique_dates: continue
-                result_dict = item.get('result')
-                if result_dict is None: result_dict = {k: v for k, v in item.items() if k != 'date'}
-                if not result_dict: continue
-                processed_results.append({'date': date_obj, 'result': result_dict})
-                unique_dates.add(date_obj)
+            processed_results, store = load_results_cached(data_file_path, optimizer_logger)
 
             if processed_results:
-                processed_results.sort(key=lambda x: x['date'])
                 self.results_data = processed_results
+                self.draw_store = store
+                self.combo_score_cache.clear()
+                self.decomposed_scorers.clear()
                 start_date, end_date = self.results_data[0]['date'], self.results_data[-1]['date']
                 self.data_range_label.setText(f"{start_date:%d/%m/%Y} - {end_date:%d/%m/%Y} ({len(self.results_data)} ngày)")
                 self.update_status(f"Optimizer: Đã tải {len(self.results_data)} kết quả từ {data_file_path.name}")
@@ -2600,7 +2652,7 @@ class OptimizerEmbedded(QWidget):
             return
 
         count_success, count_fail = 0, 0
-        data_copy_for_init = copy.deepcopy(self.results_data) if self.results_data else []
+        data_copy_for_init = self.results_data if self.results_data else []
         cache_dir_for_init = self.calculate_dir
 
         for f_path in algo_files:
@@ -3915,6 +3967,7 @@ class OptimizerEmbedded(QWidget):
 
         final_custom_steps_config = {}
         generation_params_for_worker = None
+        search_strategy_for_worker = None
         mode_to_run = self.current_optimization_mode
 
         if mode_to_run == 'auto_hill_climb':
@@ -3922,6 +3975,13 @@ class OptimizerEmbedded(QWidget):
             if not numeric_params_check and not any(p_config.get('steps') for p_config in final_custom_steps_config.values() if p_config.get('mode') == 'Custom'):
                  QMessageBox.information(main_window, "Thông Báo", "Thuật toán không có tham số số học và không có bước tùy chỉnh nào được định nghĩa.")
                  return
+            strategy_name = self.opt_search_strategy_combo.currentData()
+            if strategy_name and strategy_name != 'hill_climb':
+                search_strategy_for_worker = {
+                    'name': strategy_name,
+                    'max_trials': self.opt_search_trials_spinbox.value(),
+                    'seed': self.opt_search_seed_spinbox.value()
+                }
 
         elif mode_to_run == 'generated_combinations':
             num_values_per_param = self.combo_num_values_spinbox.value()
@@ -3932,7 +3992,9 @@ class OptimizerEmbedded(QWidget):
                 'original_params': original_params,
                 'num_values': num_values_per_param,
                 'method': generation_method,
-                'max_combinations': max_combinations_to_generate
+                'max_combinations': max_combinations_to_generate,
+                'parallel_workers': self.combo_parallel_workers_spinbox.value() if self.combo_parallel_checkbox.isChecked() else 0,
+                'racing': self.combo_racing_checkbox.isChecked()
             }
             optimizer_logger.info(f"Preparing to generate {num_values_per_param} adjacent values per param, max combinations: {max_combinations_to_generate}.")
 
@@ -4017,7 +4079,8 @@ class OptimizerEmbedded(QWidget):
             initial_params=initial_params,
             initial_score_tuple=initial_score_tuple,
             is_resuming=is_resuming,
-            mode=mode_to_run
+            mode=mode_to_run,
+            search_strategy=search_strategy_for_worker
         )
 
     def resume_optimization_session(self):
@@ -4323,7 +4386,7 @@ class OptimizerEmbedded(QWidget):
                                           generation_params,
                                           combination_algos,
                                           initial_params=None, initial_score_tuple=None, is_resuming=False,
-                                          mode='auto_hill_climb'):
+                                          mode='auto_hill_climb', search_strategy=None):
         """
         Sets up the environment and starts the appropriate optimization worker thread
         based on the selected mode.
@@ -4358,6 +4421,13 @@ class OptimizerEmbedded(QWidget):
                 num_vals = generation_params.get('num_values', '?') if generation_params else '?'
                 gen_meth = generation_params.get('method', '?') if generation_params else '?'
                 self._log_to_optimizer_display("INFO", f"Chế độ: Tạo Bộ Tham Số (Worker sẽ tạo ~{num_vals} giá trị/{gen_meth})", tag="GEN_COMBO")
+                parallel_workers_log = generation_params.get('parallel_workers', 0) if generation_params else 0
+                if parallel_workers_log and parallel_workers_log > 1:
+                    self._log_to_optimizer_display("INFO", f"Chạy song song: {parallel_workers_log} tiến trình", tag="GEN_COMBO")
+                if generation_params and generation_params.get('racing'):
+                    self._log_to_optimizer_display("INFO", "Đua loại (successive halving): bật", tag="GEN_COMBO")
+            elif search_strategy:
+                self._log_to_optimizer_display("INFO", f"Chế độ: Chiến lược {search_strategy['name']} (tối đa {search_strategy['max_trials']} lần thử, seed={search_strategy['seed']})", tag="CUSTOM_STEP")
             else:
                 self._log_to_optimizer_display("INFO", "Chế độ: Tối ưu Tự động / Custom", tag="CUSTOM_STEP")
                 if custom_steps_config:
@@ -4406,7 +4476,8 @@ class OptimizerEmbedded(QWidget):
                 combination_algos,
                 self.current_best_params,
                 self.current_best_score_tuple,
-                delete_old_files_flag
+                delete_old_files_flag,
+                search_strategy
             )
             optimizer_logger.debug("Worker target set to _optimization_worker")
         elif mode == 'generated_combinations':
@@ -4427,7 +4498,9 @@ class OptimizerEmbedded(QWidget):
                 custom_steps_config,
                 combination_algos,
                 self.current_best_params,
-                self.current_best_score_tuple
+                self.current_best_score_tuple,
+                False,
+                search_strategy
             )
             optimizer_logger.debug("Worker target set to _optimization_worker")
         elif mode == 'generated_combinations':
@@ -4579,6 +4652,7 @@ class OptimizerEmbedded(QWidget):
         if hasattr(self, 'combo_gen_settings_widget'): self.combo_gen_settings_widget.setEnabled(settings_enabled and is_combo_mode_selected)
 
         is_auto_mode_selected = self.current_optimization_mode == 'auto_hill_climb'
+        if hasattr(self, 'search_strategy_widget'): self.search_strategy_widget.setEnabled(settings_enabled and is_auto_mode_selected)
         if hasattr(self, 'param_scroll_widget_container'): self.param_scroll_widget_container.setEnabled(settings_enabled and is_auto_mode_selected)
         for name, widgets in self.advanced_opt_widgets.items():
              mode_combo = widgets.get('mode_combo')
@@ -4778,7 +4852,7 @@ class OptimizerEmbedded(QWidget):
     def _optimization_worker(self, target_display_name, start_date, end_date, time_limit_sec,
                              custom_steps_config, combination_algo_names,
                              initial_best_params=None, initial_best_score_tuple=None,
-                             delete_old_files_flag=False):
+                             delete_old_files_flag=False, search_strategy=None):
         start_time = time.time()
         optimizer_worker_logger = logging.getLogger("OptimizerWorker")
         is_resuming = initial_best_params is not None and initial_best_score_tuple is not None
@@ -4818,6 +4892,8 @@ class OptimizerEmbedded(QWidget):
         optimizer_worker_logger.debug(f"_optimization_worker Throttling: Enabled={throttling_enabled_opt}, Duration={sleep_duration_opt}s")
 
         finish_reason = "completed"
+        with self.optimizer_checkpoint_lock:
+            self.optimizer_checkpoint = None
         try:
             if target_display_name not in self.loaded_algorithms:
                  raise ValueError(f"Target algorithm '{target_display_name}' not loaded in worker.")
@@ -4844,11 +4920,24 @@ class OptimizerEmbedded(QWidget):
                  queue_finished("Thuật toán đích không có tham số số học.", success=False, reason="no_params")
                  return
 
-            def run_combined_perf_test_wrapper(target_params_test, combo_names, start_dt, end_dt):
-                 return self.run_combined_performance_test(
-                     target_display_name=target_display_name, target_algo_source=source_code, target_class_name=class_name,
+            # Bộ nhớ kết quả theo bộ tham số (sau khi làm tròn .6g/int): bộ đã chấm không chạy lại.
+            # Kết quả bị cắt tỉa vẫn đúng về sau vì điểm tốt nhất chỉ tăng.
+            evaluated_perf_memo = {}
+            memo_hits = [0]
+
+            def run_combined_perf_test_wrapper(target_params_test, combo_names, start_dt, end_dt, prune_below_score=None):
+                 memo_key = params_key(target_params_test)
+                 if memo_key in evaluated_perf_memo:
+                     memo_hits[0] += 1
+                     queue_log("DEBUG", "  (Bộ tham số đã thử, dùng kết quả đã lưu)")
+                     return evaluated_perf_memo[memo_key]
+                 perf_result = self.run_combined_performance_test(
+                     target_display_name=target_display_name, target_class_name=class_name,
                      target_params_to_test=target_params_test, combination_algo_display_names=combo_names,
-                     test_start_date=start_dt, test_end_date=end_dt, optimize_target_dir=target_dir)
+                     test_start_date=start_dt, test_end_date=end_dt, prune_below_score=prune_below_score)
+                 if perf_result is not None and not self.optimizer_stop_event.is_set():
+                     evaluated_perf_memo[memo_key] = perf_result
+                 return perf_result
 
             def get_primary_score(perf_dict):
                  if not perf_dict: return (-1.0, -1.0, -1.0, -100.0)
@@ -4861,7 +4950,38 @@ class OptimizerEmbedded(QWidget):
             current_best_perf = None
             current_best_score_tuple = initial_best_score_tuple if initial_best_score_tuple is not None else get_primary_score({})
 
+            # Checkpoint: định danh (mã nguồn, dữ liệu, khoảng ngày, bộ kết hợp) quyết định điểm đã lưu còn
+            # đúng không; thiết lập chạy (bước Custom, chiến lược) quyết định vị trí tìm kiếm có dùng lại được không.
+            checkpoint_path = target_dir / f"optimization_checkpoint_{original_path.stem}.json"
+            checkpoint_identity = self._optimizer_checkpoint_identity(target_display_name, combination_algo_names, start_date, end_date)
+            checkpoint_run = json.loads(json.dumps({"custom_steps_config": custom_steps_config,
+                                                    "search_strategy": search_strategy}, ensure_ascii=False))
+            resume_checkpoint = None
             if is_resuming:
+                loaded_checkpoint = self._load_optimizer_checkpoint(checkpoint_path, checkpoint_identity)
+                if (loaded_checkpoint and isinstance(loaded_checkpoint.get('params'), dict)
+                        and params_key(loaded_checkpoint['params']) == params_key(initial_best_params)
+                        and tuple(loaded_checkpoint.get('score_tuple') or ()) == tuple(initial_best_score_tuple)):
+                    resume_checkpoint = loaded_checkpoint
+
+            def publish_checkpoint(best_params, best_perf, best_score_tuple, reason="periodic", **fields):
+                """Cập nhật trạng thái checkpoint (bộ tốt nhất + `fields`: position/strategy) rồi ghi ra file."""
+                with self.optimizer_checkpoint_lock:
+                    if self.optimizer_checkpoint is None:
+                        self.optimizer_checkpoint = {"path": checkpoint_path, "optimization_mode": "auto_hill_climb",
+                                                     "identity": checkpoint_identity, "run": checkpoint_run,
+                                                     "position": None, "strategy": None}
+                    self.optimizer_checkpoint.update(params=best_params, score_tuple=list(best_score_tuple),
+                                                     performance=best_perf, **fields)
+                self._save_optimizer_checkpoint(reason=reason)
+
+            if resume_checkpoint is not None:
+                current_best_params = resume_checkpoint['params']
+                current_best_perf = resume_checkpoint.get('performance')
+                current_best_score_tuple = tuple(resume_checkpoint['score_tuple'])
+                queue_log("INFO", f"Tiếp tục tối ưu từ checkpoint {checkpoint_path.name}: mã nguồn và dữ liệu không đổi, không cần tính lại hiệu suất.", tag="RESUME")
+                queue_best_update(current_best_params, current_best_score_tuple)
+            elif is_resuming:
                 queue_log("INFO", f"Tiếp tục tối ưu với tham số, điểm số đã tải.", tag="RESUME")
                 current_best_params = initial_best_params.copy()
                 queue_status("Kiểm tra hiệu suất tham số đã tải...")
@@ -4913,11 +5033,51 @@ class OptimizerEmbedded(QWidget):
             MAX_FULL_CYCLES = 5
             steps_done_total = 0
 
-            for cycle in range(MAX_FULL_CYCLES):
+            # Vị trí đã lưu chỉ dùng lại được khi thiết lập chạy không đổi
+            resume_position = None
+            resume_strategy_state = None
+            if resume_checkpoint is not None and resume_checkpoint.get('run') == checkpoint_run:
+                resume_position = resume_checkpoint.get('position')
+                resume_strategy_state = resume_checkpoint.get('strategy')
+            publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple,
+                               position=resume_position, strategy=resume_strategy_state)
+
+            hill_climb_cycles = MAX_FULL_CYCLES
+            if search_strategy and search_strategy.get('name') == 'pattern':
+                # Độ phân giải của tham số Custom = bước Custom nhỏ nhất
+                search_strategy = dict(search_strategy, options={'resolutions': {
+                    name: min(abs(step) for step in config['steps'] if step)
+                    for name, config in custom_steps_config.items()
+                    if config.get('mode') == 'Custom' and any(config.get('steps', []))}})
+            if search_strategy:
+                # Chiến lược ask/tell thay cho leo đồi: dùng chung hàm đánh giá và điều kiện dừng
+                hill_climb_cycles = 0
+                finish_reason, current_best_params, current_best_perf, current_best_score_tuple = self._run_search_strategy(
+                    search_strategy, current_best_params, current_best_perf, current_best_score_tuple,
+                    lambda params: run_combined_perf_test_wrapper(params, combination_algo_names, start_date, end_date),
+                    get_primary_score, start_time, time_limit_sec,
+                    queue_log, queue_status, queue_progress, queue_best_update,
+                    resume_state=resume_strategy_state,
+                    on_trial=lambda best_params, best_perf, best_score, strategy_state: publish_checkpoint(
+                        best_params, best_perf, best_score, strategy=strategy_state))
+
+            start_cycle, start_param_idx = 0, 0
+            if resume_position and hill_climb_cycles:
+                start_cycle, start_param_idx = resume_position['cycle'], resume_position['param_index']
+                steps_done_total = resume_position.get('steps_done_total', 0)
+                queue_log("INFO", f"Tiếp tục leo đồi tại chu kỳ {start_cycle + 1}, tham số thứ {start_param_idx + 1}/{len(param_names_ordered)}.", tag="RESUME")
+
+            for cycle in range(start_cycle, hill_climb_cycles):
                 queue_log("INFO", f"--- Chu kỳ {cycle + 1}/{MAX_FULL_CYCLES} ---", tag="PROGRESS")
-                params_changed_in_cycle = False
+                params_changed_in_cycle = bool(resume_position.get('params_changed_in_cycle')) if resume_position and cycle == start_cycle else False
 
                 for param_idx, param_name in enumerate(param_names_ordered):
+                    if cycle == start_cycle and param_idx < start_param_idx: continue
+                    # Vị trí = đầu lượt của tham số này: tiếp tục sẽ chạy lại lượt đang dở từ bộ tốt nhất
+                    publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple,
+                                       position={"cycle": cycle, "param_index": param_idx, "param_name": param_name,
+                                                 "params_changed_in_cycle": params_changed_in_cycle,
+                                                 "steps_done_total": steps_done_total})
                     if self.optimizer_stop_event.is_set(): finish_reason = "stopped"; break
                     
                     if throttling_enabled_opt and sleep_duration_opt > 0:
@@ -4959,13 +5119,16 @@ class OptimizerEmbedded(QWidget):
                                 sign_char = '+' if step_sign > 0 else '-'
                                 queue_status(f"Thử custom {sign_char}: {param_name}={test_params_custom[param_name]} (bước {step_val_abs})...")
 
-                                perf_result_custom = run_combined_perf_test_wrapper(test_params_custom, combination_algo_names, start_date, end_date)
+                                perf_result_custom = run_combined_perf_test_wrapper(test_params_custom, combination_algo_names, start_date, end_date,
+                                                                                    prune_below_score=current_best_score_tuple[0])
                                 steps_done_total += 1
                                 queue_progress(min(0.95, (time.time() - start_time) / time_limit_sec if time_limit_sec > 0 else 0.0))
 
                                 if self.optimizer_stop_event.is_set(): finish_reason="stopped"; break
 
-                                if perf_result_custom is not None:
+                                if perf_result_custom is not None and perf_result_custom.get('pruned'):
+                                    queue_log("DEBUG", f"  -> Cắt tỉa ({sign_char} custom) {param_name}={test_params_custom[param_name]} sau {perf_result_custom['total_days_tested']} ngày: không thể vượt Top3={current_best_score_tuple[0]:.2f}%.")
+                                elif perf_result_custom is not None:
                                     new_score_custom = get_primary_score(perf_result_custom)
                                     if new_score_custom > current_best_score_tuple:
                                         queue_log("BEST", f"  -> Cải thiện ({sign_char} custom)! {param_name}={test_params_custom[param_name]}. Score mới: {new_score_custom}", tag="BEST")
@@ -4974,6 +5137,7 @@ class OptimizerEmbedded(QWidget):
                                         current_best_score_tuple = new_score_custom
                                         best_value_this_param_turn = new_value_custom
                                         queue_best_update(current_best_params, current_best_score_tuple)
+                                        publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple)
                                         params_changed_in_cycle = True
                                 else:
                                     queue_log("WARNING", f"  -> Lỗi Test {sign_char} custom {param_name}={test_params_custom[param_name]}.", tag="WARNING")
@@ -5010,13 +5174,20 @@ class OptimizerEmbedded(QWidget):
 
                                 queue_status(f"Thử {dir_text_auto} (auto): {param_name}={test_params_auto[param_name]:.4g}...")
 
-                                perf_result_auto = run_combined_perf_test_wrapper(test_params_auto, combination_algo_names, start_date, end_date)
+                                perf_result_auto = run_combined_perf_test_wrapper(test_params_auto, combination_algo_names, start_date, end_date,
+                                                                                  prune_below_score=current_best_score_tuple[0])
                                 steps_done_total += 1
                                 queue_progress(min(0.95, (time.time() - start_time) / time_limit_sec if time_limit_sec > 0 else 0.0))
 
                                 if self.optimizer_stop_event.is_set(): finish_reason="stopped"; break
 
-                                if perf_result_auto is not None:
+                                if perf_result_auto is not None and perf_result_auto.get('pruned'):
+                                    no_improve_streak_auto += 1
+                                    queue_log("DEBUG", f"  -> Cắt tỉa ({dir_char_auto} auto) {param_name}={test_params_auto[param_name]:.4g} sau {perf_result_auto['total_days_tested']} ngày: không thể vượt Top3={current_best_score_tuple[0]:.2f}%. Streak: {no_improve_streak_auto}")
+                                    if no_improve_streak_auto >= STALL_THRESHOLD:
+                                        queue_log("DEBUG", f"    Dừng hướng {dir_char_auto} cho {param_name} do không cải thiện {STALL_THRESHOLD} lần.")
+                                        break
+                                elif perf_result_auto is not None:
                                     new_score_auto = get_primary_score(perf_result_auto)
                                     if new_score_auto > current_best_score_tuple:
                                         queue_log("BEST", f"  -> Cải thiện ({dir_char_auto} auto)! {param_name}={test_params_auto[param_name]:.4g}. Score mới: {new_score_auto}", tag="BEST")
@@ -5027,6 +5198,7 @@ class OptimizerEmbedded(QWidget):
                                         current_best_perf = perf_result_auto
                                         current_best_score_tuple = new_score_auto
                                         queue_best_update(current_best_params, current_best_score_tuple)
+                                        publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple)
                                         params_changed_in_cycle = True
                                         no_improve_streak_auto = 0
                                     else:
@@ -5052,8 +5224,17 @@ class OptimizerEmbedded(QWidget):
                     queue_log("INFO", f"Không có cải thiện nào trong chu kỳ {cycle + 1}. Dừng tối ưu.", tag="PROGRESS")
                     finish_reason = "no_improvement"
                     break
+
+            if finish_reason in ["stopped", "time_limit"]:
+                publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple, reason=finish_reason)
+            else:
+                # Đã chạy xong: lần tiếp tục sau bắt đầu vòng mới từ bộ tốt nhất (vẫn không phải tính lại)
+                publish_checkpoint(current_best_params, current_best_perf, current_best_score_tuple, reason=finish_reason,
+                                   position=None, strategy=None)
             
             queue_progress(1.0)
+            if memo_hits[0]:
+                queue_log("INFO", f"Bỏ qua {memo_hits[0]} lần thử trùng lặp (dùng kết quả đã lưu của {len(evaluated_perf_memo)} bộ tham số đã chấm).", tag="PROGRESS")
             final_message_worker = ""
             if finish_reason == "stopped": final_message_worker = "Dừng bởi người dùng."
             elif finish_reason == "time_limit": final_message_worker = f"Đã hết thời gian tối ưu ({time_limit_sec/60:.0f} phút)."
@@ -5099,6 +5280,7 @@ class OptimizerEmbedded(QWidget):
                     final_json_path_save = success_dir_save / success_filename_json_save
                     final_save_data_json = {
                         "optimization_mode": "auto_hill_climb",
+                        "search_strategy": search_strategy['name'] if search_strategy else "hill_climb",
                         "target_algorithm": target_display_name,
                         "params": current_best_params,
                         "performance": current_best_perf if current_best_perf else "N/A",
@@ -5143,12 +5325,96 @@ class OptimizerEmbedded(QWidget):
         except Exception as worker_err_critical:
             finish_reason = "critical_error"
             optimizer_worker_logger.critical(f"Worker exception (Auto/Custom Mode): {worker_err_critical}", exc_info=True)
+            self._save_optimizer_checkpoint(reason=finish_reason)
             error_detail = f"Lỗi nghiêm trọng trong luồng tối ưu (Auto/Custom): {type(worker_err_critical).__name__} - {str(worker_err_critical)[:100]}"
             queue_error(error_detail) 
             queue_finished(f"Lỗi nghiêm trọng: {worker_err_critical}", success=False, reason=finish_reason)
         finally:
             optimizer_worker_logger.info(f"_optimization_worker finished. Reason: {finish_reason}")
 
+    def _run_search_strategy(self, search_strategy, best_params, best_perf, best_score_tuple,
+                             evaluate, get_score, start_time, time_limit_sec,
+                             queue_log, queue_status, queue_progress, queue_best_update,
+                             resume_state=None, on_trial=None):
+        """
+        Chạy một chiến lược ask/tell (engine.search) quanh bộ tham số tốt nhất hiện tại cho tới khi
+        hết số lần thử, hết thời gian hoặc bị dừng.
+
+        Args:
+            search_strategy (dict): {'name', 'max_trials', 'seed'} và tùy chọn 'options' (tham số của chiến lược).
+            evaluate (callable): evaluate(params) -> dict hiệu suất hoặc None nếu lỗi/bị dừng.
+            get_score (callable): dict hiệu suất -> tuple điểm (lớn hơn là tốt hơn).
+            resume_state (dict, optional): Trạng thái chiến lược từ checkpoint ({'origin_params', 'trials',
+                'rng_state'}): các lần thử đã chấm được phát lại (ask/tell, không chạy lại) để tiếp tục đúng chỗ.
+            on_trial (callable, optional): on_trial(best_params, best_perf, best_score_tuple, trạng thái chiến lược)
+                sau mỗi lần thử (dùng để ghi checkpoint).
+
+        Returns:
+            tuple: (finish_reason, best_params, best_perf, best_score_tuple).
+        """
+        def build_strategy(origin):
+            return make_search_strategy(search_strategy['name'], ParameterSpace(origin), search_strategy.get('seed'),
+                                        **search_strategy.get('options', {}))
+
+        origin_params = resume_state['origin_params'] if resume_state else best_params
+        strategy = build_strategy(origin_params)
+        trials = []  # [[bộ tham số, điểm | None], ...] theo thứ tự tell
+        if resume_state:
+            for recorded_params, recorded_score in resume_state.get('trials', []):
+                asked_params = strategy.ask()
+                if params_key(asked_params) != params_key(recorded_params):
+                    break
+                strategy.tell(asked_params, tuple(recorded_score) if recorded_score is not None else None)
+                trials.append([asked_params, recorded_score])
+            replayed_rng_state = json.loads(json.dumps(strategy.rng.bit_generator.state))
+            if len(trials) == len(resume_state.get('trials', [])) and replayed_rng_state == resume_state.get('rng_state'):
+                queue_log("INFO", f"Đã phát lại {len(trials)} lần thử {strategy.name} từ checkpoint (không chạy lại).", tag="RESUME")
+            else:
+                queue_log("WARNING", f"Không phát lại được lịch sử {strategy.name} đã lưu, bắt đầu lại chiến lược từ bộ tốt nhất.", tag="WARNING")
+                origin_params = best_params
+                strategy = build_strategy(origin_params)
+                trials = []
+        max_trials = max(1, int(search_strategy.get('max_trials', SEARCH_MAX_TRIALS)))
+        queue_log("INFO", f"Chiến lược {strategy.name}: {strategy.space.dim} tham số, tối đa {max_trials} lần thử.", tag="PROGRESS")
+
+        for trial_index in range(len(trials), max_trials):
+            while self.optimizer_pause_event.is_set():
+                if self.optimizer_stop_event.is_set(): break
+                time.sleep(0.5)
+            if self.optimizer_stop_event.is_set(): return "stopped", best_params, best_perf, best_score_tuple
+            if time.time() - start_time >= time_limit_sec: return "time_limit", best_params, best_perf, best_score_tuple
+
+            trial_params = strategy.ask()
+            if strategy.finished:
+                queue_log("INFO", f"Chiến lược {strategy.name} đã hội tụ sau {trial_index} lần thử.", tag="PROGRESS")
+                return "no_improvement", best_params, best_perf, best_score_tuple
+            queue_status(f"Thử {strategy.name} {trial_index + 1}/{max_trials}...")
+            trial_perf = evaluate(trial_params)
+            if self.optimizer_stop_event.is_set(): return "stopped", best_params, best_perf, best_score_tuple
+
+            trial_score = get_score(trial_perf) if trial_perf is not None else None
+            strategy.tell(trial_params, trial_score)
+            trials.append([trial_params, list(trial_score) if trial_score is not None else None])
+            queue_progress(min(0.95, max((trial_index + 1) / max_trials,
+                                         (time.time() - start_time) / time_limit_sec if time_limit_sec > 0 else 0.0)))
+
+            if trial_score is None:
+                queue_log("WARNING", f"  -> Lỗi Test lần thử {trial_index + 1} ({strategy.name}).", tag="WARNING")
+            elif trial_score > best_score_tuple:
+                changed = {k: v for k, v in trial_params.items() if best_params.get(k) != v}
+                queue_log("BEST", f"  -> Cải thiện ({strategy.name}, lần thử {trial_index + 1})! Score mới: {trial_score}. Thay đổi: {changed}", tag="BEST")
+                best_params, best_perf, best_score_tuple = trial_params.copy(), trial_perf, trial_score
+                queue_best_update(best_params, best_score_tuple)
+            else:
+                queue_log("DEBUG", f"  -> Không cải thiện ({strategy.name}, lần thử {trial_index + 1}). Score: {trial_score}")
+
+            if on_trial is not None:
+                on_trial(best_params, best_perf, best_score_tuple,
+                         {"origin_params": origin_params, "trials": list(trials),
+                          "rng_state": strategy.rng.bit_generator.state})
+
+        return "completed", best_params, best_perf, best_score_tuple
+
     def _combination_optimization_worker(self, target_display_name, start_date, end_date, time_limit_sec,
                                          generation_params,
                                          combination_algo_names,
@@ -5195,9 +5461,13 @@ class OptimizerEmbedded(QWidget):
         finish_reason = "completed"
         generated_combinations_list = []
         total_combinations_count = 0
+        checkpoint_path_combo = None
+        with self.optimizer_checkpoint_lock:
+            self.optimizer_checkpoint = None
         current_best_params_combo = None
         current_best_perf_combo = None
         current_best_score_tuple_combo = (-1.0, -1.0, -1.0, -100.0)
+        parallel_evaluator_combo = None
 
         try:
             optimizer_worker_logger.debug(f"Setting up combo worker for target: {target_display_name}")
@@ -5260,18 +5530,48 @@ class OptimizerEmbedded(QWidget):
             queue_status(f"Đã tạo {total_combinations_count} bộ. Bắt đầu kiểm tra...")
             queue_log("INFO", f"Đã tạo thành công {total_combinations_count} bộ tham số (giới hạn: {max_combinations_limit_worker if max_combinations_limit_worker else 'không'}).", tag="GEN_COMBO")
 
+            # Checkpoint: số thứ tự bộ kế tiếp trong lưới + bộ tốt nhất. Chỉ dùng khi quét lần lượt
+            # toàn bộ lưới (đua loại chọn bộ theo từng vòng nên không tiếp tục giữa chừng được).
+            racing_enabled_combo = bool(generation_params.get('racing')) and total_combinations_count > 1
+            resume_ordinal_combo = 0
+            if not racing_enabled_combo:
+                checkpoint_identity_combo = self._optimizer_checkpoint_identity(
+                    target_display_name, combination_algo_names, start_date, end_date,
+                    grid=generated_combinations_list.signature())
+                checkpoint_path_combo = target_dir_combo / f"combo_checkpoint_{original_path_combo.stem}.json"
+                checkpoint_data_combo = self._load_optimizer_checkpoint(checkpoint_path_combo, checkpoint_identity_combo)
+                if (checkpoint_data_combo and isinstance(checkpoint_data_combo.get('next_ordinal'), int)
+                        and 0 < checkpoint_data_combo['next_ordinal'] < total_combinations_count):
+                    resume_ordinal_combo = checkpoint_data_combo['next_ordinal']
+                    if checkpoint_data_combo.get('best_params') is not None:
+                        current_best_params_combo = checkpoint_data_combo['best_params']
+                        current_best_perf_combo = checkpoint_data_combo.get('best_performance')
+                        current_best_score_tuple_combo = tuple(checkpoint_data_combo['best_score_tuple'])
+                        queue_best_update(current_best_params_combo, current_best_score_tuple_combo)
+                    queue_log("INFO", f"Tiếp tục từ checkpoint {checkpoint_path_combo.name}: {resume_ordinal_combo}/{total_combinations_count} bộ đã kiểm tra, bắt đầu từ bộ {resume_ordinal_combo + 1}.", tag="RESUME")
+                    optimizer_worker_logger.info(f"Resuming generated combinations from ordinal {resume_ordinal_combo} (best so far: {current_best_score_tuple_combo}).")
+                with self.optimizer_checkpoint_lock:
+                    self.optimizer_checkpoint = {
+                        "path": checkpoint_path_combo,
+                        "optimization_mode": "generated_combinations",
+                        "identity": checkpoint_identity_combo,
+                        "total_combinations": total_combinations_count,
+                        "next_ordinal": resume_ordinal_combo,
+                        "best_params": current_best_params_combo,
+                        "best_score_tuple": list(current_best_score_tuple_combo),
+                        "best_performance": current_best_perf_combo
+                    }
+
 
             def run_combined_perf_test_wrapper_combo(params_to_test_in_wrapper, combo_names_in_wrapper, start_dt_in_wrapper, end_dt_in_wrapper):
                  optimizer_worker_logger.debug(f"Calling run_combined_performance_test for params: {list(params_to_test_in_wrapper.keys())}")
                  return self.run_combined_performance_test(
                      target_display_name=target_display_name,
-                     target_algo_source=source_code_combo,
                      target_class_name=class_name_combo,
                      target_params_to_test=params_to_test_in_wrapper,
                      combination_algo_display_names=combo_names_in_wrapper,
                      test_start_date=start_dt_in_wrapper,
-                     test_end_date=end_dt_in_wrapper,
-                     optimize_target_dir=target_dir_combo
+                     test_end_date=end_dt_in_wrapper
                  )
 
             def get_primary_score_combo(perf_dict):
@@ -5281,54 +5581,9 @@ class OptimizerEmbedded(QWidget):
                          perf_dict.get('acc_top_1_pct',0.0),
                          -perf_dict.get('avg_top10_repetition',100.0))
 
-            optimizer_worker_logger.info(f"Starting performance testing for {total_combinations_count} parameter combinations...")
-            queue_progress(0, total_combinations_count)
-
-            for idx_combo, test_params_combo in enumerate(generated_combinations_list):
+            def handle_perf_result_combo(idx_combo, test_params_combo, perf_result_combo):
+                nonlocal current_best_params_combo, current_best_perf_combo, current_best_score_tuple_combo
                 current_progress_idx_combo = idx_combo + 1
-
-                if self.optimizer_stop_event.is_set():
-                    finish_reason = "stopped"
-                    optimizer_worker_logger.info("Stop event detected during testing loop (Generated Combinations).")
-                    break
-                
-                if throttling_enabled_opt and sleep_duration_opt > 0:
-                    time.sleep(sleep_duration_opt)
-                    if self.optimizer_stop_event.is_set(): finish_reason = "stopped"; break
-                    while self.optimizer_pause_event.is_set():
-                        if self.optimizer_stop_event.is_set(): finish_reason = "stopped"; break
-                        time.sleep(0.1)
-                    if self.optimizer_stop_event.is_set(): finish_reason = "stopped"; break
-
-                while self.optimizer_pause_event.is_set():
-                    queue_status(f"Đã tạm dừng (đang ở bộ {current_progress_idx_combo}/{total_combinations_count})")
-                    if self.optimizer_stop_event.is_set(): finish_reason = "stopped"; break
-                    time.sleep(0.5)
-                if finish_reason == "stopped": break
-
-                elapsed_time_combo = time.time() - start_time
-                if elapsed_time_combo >= time_limit_sec:
-                    finish_reason = "time_limit"
-                    optimizer_worker_logger.info("Time limit reached during testing loop (Generated Combinations).")
-                    break
-
-                queue_status(f"Kiểm tra bộ {current_progress_idx_combo}/{total_combinations_count}...")
-                queue_progress(current_progress_idx_combo, total_combinations_count)
-
-                optimizer_worker_logger.debug(f"Running performance test for combination {current_progress_idx_combo}")
-                perf_result_combo = run_combined_perf_test_wrapper_combo(
-                    params_to_test_in_wrapper=test_params_combo,
-                    combo_names_in_wrapper=combination_algo_names,
-                    start_dt_in_wrapper=start_date,
-                    end_dt_in_wrapper=end_date
-                )
-                optimizer_worker_logger.debug(f"Performance test for combo {current_progress_idx_combo} completed.")
-
-                if self.optimizer_stop_event.is_set():
-                    finish_reason="stopped"
-                    optimizer_worker_logger.info("Stop event detected immediately after performance test (Generated Combinations).")
-                    break
-
                 if perf_result_combo is not None:
                     new_score_combo = get_primary_score_combo(perf_result_combo)
                     optimizer_worker_logger.debug(f"Combo {current_progress_idx_combo} score: {new_score_combo}")
@@ -5348,7 +5603,123 @@ class OptimizerEmbedded(QWidget):
                     queue_log("WARNING", f"Lỗi khi kiểm tra bộ tham số {current_progress_idx_combo}.", tag="WARNING")
                     optimizer_worker_logger.warning(f"Performance test returned None for combination {current_progress_idx_combo}.")
 
+            optimizer_worker_logger.info(f"Starting performance testing for {total_combinations_count} parameter combinations...")
+            queue_progress(0, total_combinations_count)
+
+            parallel_workers_combo = int(generation_params.get('parallel_workers') or 0)
+
+            def test_param_sets_combo(param_sets, range_start, range_end, result_callback, status_prefix=""):
+                """
+                Kiểm tra `param_sets` trên khoảng [range_start, range_end], gọi `result_callback(idx, params, perf)`
+                theo đúng thứ tự. Trả về lý do kết thúc: "completed", "stopped" hoặc "time_limit".
+                """
+                nonlocal parallel_workers_combo, parallel_evaluator_combo
+                total_sets = len(param_sets)
+                # Chế độ song song: nhóm tiến trình và điểm của thuật toán kết hợp được dựng MỘT lần cho cả
+                # [start_date, end_date] rồi dùng lại cho mọi lần gọi (các vòng đua loại là đoạn cuối của khoảng này).
+                # Không khởi tạo được nhóm tiến trình thì chạy tuần tự.
+                if parallel_workers_combo > 1 and parallel_evaluator_combo is None:
+                    parallel_evaluator_combo = self._open_parallel_performance_evaluator(
+                        target_display_name, combination_algo_names, start_date, end_date, parallel_workers_combo,
+                        throttle_sleep=sleep_duration_opt if throttling_enabled_opt else 0.0,
+                        queue_log=queue_log, queue_status=queue_status)
+                    if parallel_evaluator_combo is None:
+                        if self.optimizer_stop_event.is_set():
+                            return "stopped"
+                        parallel_workers_combo = 0
+                if parallel_evaluator_combo is not None:
+                    return self._run_parallel_combination_tests(
+                        parallel_evaluator_combo, target_display_name, param_sets, combination_algo_names,
+                        range_start, range_end, start_time, time_limit_sec,
+                        result_callback=result_callback, queue_log=queue_log,
+                        queue_status=queue_status, queue_progress=queue_progress)
+
+                for idx_combo, test_params_combo in enumerate(param_sets):
+                    current_progress_idx_combo = idx_combo + 1
+
+                    if self.optimizer_stop_event.is_set():
+                        optimizer_worker_logger.info("Stop event detected during testing loop (Generated Combinations).")
+                        return "stopped"
+
+                    if throttling_enabled_opt and sleep_duration_opt > 0:
+                        time.sleep(sleep_duration_opt)
+                        if self.optimizer_stop_event.is_set(): return "stopped"
+                        while self.optimizer_pause_event.is_set():
+                            if self.optimizer_stop_event.is_set(): return "stopped"
+                            time.sleep(0.1)
+                        if self.optimizer_stop_event.is_set(): return "stopped"
+
+                    while self.optimizer_pause_event.is_set():
+                        queue_status(f"Đã tạm dừng ({status_prefix}đang ở bộ {current_progress_idx_combo}/{total_sets})")
+                        if self.optimizer_stop_event.is_set(): return "stopped"
+                        time.sleep(0.5)
+
+                    elapsed_time_combo = time.time() - start_time
+                    if elapsed_time_combo >= time_limit_sec:
+                        optimizer_worker_logger.info("Time limit reached during testing loop (Generated Combinations).")
+                        return "time_limit"
+
+                    queue_status(f"{status_prefix}Kiểm tra bộ {current_progress_idx_combo}/{total_sets}...")
+                    queue_progress(current_progress_idx_combo, total_sets)
+
+                    optimizer_worker_logger.debug(f"Running performance test for combination {current_progress_idx_combo}")
+                    perf_result_combo = run_combined_perf_test_wrapper_combo(
+                        params_to_test_in_wrapper=test_params_combo,
+                        combo_names_in_wrapper=combination_algo_names,
+                        start_dt_in_wrapper=range_start,
+                        end_dt_in_wrapper=range_end
+                    )
+                    optimizer_worker_logger.debug(f"Performance test for combo {current_progress_idx_combo} completed.")
+
+                    if self.optimizer_stop_event.is_set():
+                        optimizer_worker_logger.info("Stop event detected immediately after performance test (Generated Combinations).")
+                        return "stopped"
+
+                    result_callback(idx_combo, test_params_combo, perf_result_combo)
+                return "completed"
+
+            last_checkpoint_time_combo = time.time()
+
+            def record_result_combo(idx_combo, test_params_combo, perf_result_combo):
+                """Kết quả (theo thứ tự) của phần lưới còn lại -> cập nhật bộ tốt nhất và checkpoint."""
+                nonlocal last_checkpoint_time_combo
+                ordinal_combo = resume_ordinal_combo + idx_combo
+                handle_perf_result_combo(ordinal_combo, test_params_combo, perf_result_combo)
+                with self.optimizer_checkpoint_lock:
+                    if self.optimizer_checkpoint is not None:
+                        self.optimizer_checkpoint.update(next_ordinal=ordinal_combo + 1,
+                                                     best_params=current_best_params_combo,
+                                                     best_score_tuple=list(current_best_score_tuple_combo),
+                                                     best_performance=current_best_perf_combo)
+                if time.time() - last_checkpoint_time_combo >= COMBO_CHECKPOINT_INTERVAL_SEC:
+                    last_checkpoint_time_combo = time.time()
+                    self._save_optimizer_checkpoint(reason="periodic")
+
+            if racing_enabled_combo:
+                finish_reason = self._race_combinations(
+                    generated_combinations_list, start_date, end_date, test_param_sets_combo,
+                    get_primary_score_combo, handle_perf_result_combo, queue_log)
+            else:
+                resume_prefix_combo = f"(tiếp tục từ bộ {resume_ordinal_combo + 1}) " if resume_ordinal_combo else ""
+                finish_reason = test_param_sets_combo(generated_combinations_list.from_ordinal(resume_ordinal_combo),
+                                                      start_date, end_date, record_result_combo,
+                                                      status_prefix=resume_prefix_combo)
+
             optimizer_worker_logger.info(f"Finished testing loop (Generated Combinations). Reason: {finish_reason}")
+            if parallel_evaluator_combo is not None:
+                parallel_evaluator_combo.close()
+                parallel_evaluator_combo = None
+
+            if checkpoint_path_combo is not None:
+                if finish_reason == "completed":
+                    with self.optimizer_checkpoint_lock:
+                        self.optimizer_checkpoint = None
+                    try:
+                        checkpoint_path_combo.unlink(missing_ok=True)
+                    except OSError as unlink_err:
+                        optimizer_worker_logger.warning(f"Could not remove finished checkpoint {checkpoint_path_combo.name}: {unlink_err}")
+                else:
+                    self._save_optimizer_checkpoint(reason=finish_reason)
 
             queue_progress(total_combinations_count, total_combinations_count)
 
@@ -5454,21 +5825,175 @@ class OptimizerEmbedded(QWidget):
         except Exception as worker_err_critical_combo:
             finish_reason = "critical_error"
             optimizer_worker_logger.critical(f"Combo Worker encountered a critical exception: {worker_err_critical_combo}", exc_info=True)
+            self._save_optimizer_checkpoint(reason=finish_reason)
             error_detail_combo = f"Lỗi nghiêm trọng trong luồng tạo bộ tham số: {type(worker_err_critical_combo).__name__} - {str(worker_err_critical_combo)[:100]}"
             queue_error(error_detail_combo)
             queue_finished(f"Lỗi nghiêm trọng: {worker_err_critical_combo}", success=False, reason=finish_reason)
         finally:
+            if parallel_evaluator_combo is not None:
+                parallel_evaluator_combo.close()
             optimizer_worker_logger.info("Combination optimization worker thread finished.")
 
-    def _save_optimization_state(self, reason="unknown"):
+    def _race_combinations(self, param_sets, start_date, end_date, test_param_sets, score_of, result_callback, queue_log):
+        """
+        Đua loại (engine.search.SuccessiveHalving) thay vì chạy mọi bộ trên toàn bộ khoảng ngày:
+        các vòng đầu chấm trên khoảng ngắn gần `end_date` nhất, vòng cuối chạy các bộ còn lại trên
+        toàn bộ [start_date, end_date]. Chỉ kết quả vòng cuối (chính xác) được đưa vào `result_callback`.
 
-        if not self.selected_algorithm_for_optimize or not self.current_optimize_target_dir or self.current_best_params is None:
-            optimizer_logger.warning("Attempted to save state, but required info is missing.")
-            return
+        Args:
+            test_param_sets (callable): (bộ tham số, từ ngày, đến ngày, callback, status_prefix) -> lý do kết thúc.
+            score_of (callable): dict hiệu suất -> bộ điểm so sánh được.
 
+        Returns:
+            str: Lý do kết thúc ("completed", "stopped", "time_limit").
+        """
+        worker_logger = logging.getLogger("OptimizerWorker.Racing")
+        total_days = (end_date - start_date).days + 1
+        racing = SuccessiveHalving(len(param_sets), total_days)
+        full_days = len(param_sets) * total_days
+        rounds_text = ", ".join(f"{count}×{n_days}" for count, n_days in racing.rounds)
+        queue_log("INFO", f"Đua loại {len(racing.rounds)} vòng (bộ×ngày: {rounds_text}), dự kiến {racing.planned_days:,} bộ×ngày thay vì {full_days:,}.", tag="GEN_COMBO")
+        round_finish = {'reason': "completed"}
+
+        def evaluate_round(round_index, candidate_indices, n_days):
+            round_sets = [param_sets[i] for i in candidate_indices]
+            is_final_round = n_days >= total_days
+            range_start = start_date if is_final_round else end_date - datetime.timedelta(days=n_days - 1)
+            round_label = f"Vòng {round_index + 1}/{len(racing.rounds)}"
+            queue_log("INFO", f"{round_label}: {len(round_sets)} bộ, {range_start:%d/%m/%Y} - {end_date:%d/%m/%Y} ({n_days} ngày)", tag="GEN_COMBO")
+            scores = [None] * len(round_sets)
+
+            def collect_result(idx, params, perf):
+                scores[idx] = score_of(perf) if perf is not None else None
+                if is_final_round:
+                    result_callback(candidate_indices[idx], params, perf)
+                elif perf is None:
+                    worker_logger.warning(f"{round_label}: performance test failed for combination {candidate_indices[idx] + 1}.")
+
+            round_reason = test_param_sets(round_sets, range_start, end_date, collect_result, status_prefix=f"{round_label}: ")
+            if round_reason != "completed":
+                round_finish['reason'] = round_reason
+                return None
+            return scores
+
+        if racing.run(evaluate_round) is None:
+            return round_finish['reason']
+        saving = full_days / racing.days_evaluated if racing.days_evaluated else 1.0
+        queue_log("INFO", f"Đua loại xong: đã chấm {racing.days_evaluated:,} bộ×ngày (ít hơn {saving:.1f} lần so với chấm toàn bộ).", tag="GEN_COMBO")
+        return "completed"
+
+    def _open_parallel_performance_evaluator(self, target_display_name, combination_algo_names, start_date, end_date,
+                                             workers, throttle_sleep, queue_log, queue_status):
+        """
+        Nhóm tiến trình (engine.parallel) cho các lần thử trên [start_date, end_date] hoặc một đoạn cuối
+        của nó. DrawStore được chia sẻ qua shared_memory; ma trận điểm của thuật toán kết hợp được tính
+        một lần ở đây rồi gửi cho mỗi tiến trình. Người gọi phải close() khi xong.
+
+        Returns:
+            ParallelPerformanceEvaluator | None: None nếu bị dừng khi chuẩn bị dữ liệu hoặc không
+                                                 khởi tạo được nhóm tiến trình (người gọi chạy tuần tự).
+        """
+        worker_logger = logging.getLogger("OptimizerWorker.Parallel")
+        target_algo_data = self.loaded_algorithms[target_display_name]
+        queue_status("Đang chuẩn bị dữ liệu cho chế độ song song...")
+        perf_inputs = self._prepare_combined_performance_inputs(combination_algo_names, start_date, end_date)
+        if perf_inputs is None:
+            return None
+        store, tested_dates, combo_score_chunks = perf_inputs
+        target_spec = {
+            'name': target_display_name,
+            'module_name': target_algo_data.get('module_name') or f"algorithms.{target_algo_data['path'].stem}",
+            'path': str(target_algo_data['path']),
+            'class_name': target_algo_data['class_name'],
+            'cache_dir': self.calculate_dir,
+            'missing_days': (end_date - start_date).days + 1 - len(tested_dates),
+        }
+        try:
+            evaluator = ParallelPerformanceEvaluator(store, target_spec, tested_dates, combo_score_chunks,
+                                                     workers=workers, throttle_sleep=throttle_sleep)
+        except Exception as pool_err:
+            worker_logger.error(f"Could not start process pool, falling back to sequential mode: {pool_err}", exc_info=True)
+            queue_log("WARNING", f"Không khởi tạo được chế độ song song ({pool_err}), chuyển sang chạy tuần tự.", tag="WARNING")
+            return None
+        queue_log("INFO", f"Chạy song song trên {evaluator.workers} tiến trình.", tag="GEN_COMBO")
+        return evaluator
+
+    def _run_parallel_combination_tests(self, evaluator, target_display_name, param_sets, combination_algo_names,
+                                        start_date, end_date, start_time, time_limit_sec,
+                                        result_callback, queue_log, queue_status, queue_progress):
+        """
+        Kiểm tra các bộ tham số trên nhóm tiến trình `evaluator` (xem _open_parallel_performance_evaluator;
+        [start_date, end_date] phải là đoạn cuối của khoảng đã dùng để mở). Kết quả được đưa vào
+        `result_callback(idx, params, perf)` theo đúng thứ tự bộ tham số nên việc chọn bộ tốt nhất
+        giống hệt chế độ tuần tự.
 
+        Returns:
+            str: Lý do kết thúc ("completed", "stopped", "time_limit").
+        """
+        worker_logger = logging.getLogger("OptimizerWorker.Parallel")
+        total_sets = len(param_sets)
+
+        # Bộ đã có trong sổ cái không gửi tới tiến trình con; kết quả vẫn được đưa ra theo đúng thứ tự
+        ledger_scope = self._performance_ledger_scope(target_display_name, combination_algo_names, start_date, end_date)
+        ledger_perfs = {}
+        if ledger_scope is not None:
+            for idx_ledger, params_ledger in enumerate(param_sets):
+                ledger_perf = ledger_scope.get(params_ledger)
+                if ledger_perf is not None:
+                    ledger_perfs[idx_ledger] = ledger_perf
+        pending_indices = [i for i in range(total_sets) if i not in ledger_perfs] if ledger_perfs else range(total_sets)
+        if ledger_perfs:
+            queue_log("INFO", f"{len(ledger_perfs)}/{total_sets} bộ đã có kết quả trong sổ cái, không chạy lại.", tag="GEN_COMBO")
+        processed_sets = 0
+
+        def deliver_ledger_results(up_to_index):
+            nonlocal processed_sets
+            while processed_sets < up_to_index and processed_sets in ledger_perfs:
+                queue_progress(processed_sets + 1, total_sets)
+                result_callback(processed_sets, param_sets[processed_sets], ledger_perfs[processed_sets])
+                processed_sets += 1
+
+        if not pending_indices:
+            deliver_ledger_results(total_sets)
+            return "completed"
+
+        def should_stop():
+            return self.optimizer_stop_event.is_set() or time.time() - start_time >= time_limit_sec
+
+        for pending_pos, params_combo, perf_result, error_text in evaluator.map_range(
+                (param_sets[i] for i in pending_indices), start_date, (end_date - start_date).days + 1,
+                should_stop=should_stop, should_pause=self.optimizer_pause_event.is_set):
+            idx_combo = pending_indices[pending_pos]
+            deliver_ledger_results(idx_combo)
+            if error_text:
+                worker_logger.warning(f"Parallel performance test failed for combination {idx_combo + 1}: {error_text}")
+            elif perf_result is not None and ledger_scope is not None:
+                ledger_scope.put(params_combo, perf_result)
+            queue_status(f"Kiểm tra bộ {idx_combo + 1}/{total_sets} ({evaluator.workers} tiến trình)...")
+            queue_progress(idx_combo + 1, total_sets)
+            result_callback(idx_combo, params_combo, perf_result)
+            processed_sets += 1
+        if processed_sets == pending_indices[-1] + 1:
+            deliver_ledger_results(total_sets)
+
+        if processed_sets >= total_sets:
+            return "completed"
+        if self.optimizer_stop_event.is_set():
+            return "stopped"
+        worker_logger.info("Time limit reached during parallel testing (Generated Combinations).")
+        return "time_limit"
+
+    def _save_optimization_state(self, reason="unknown"):
+
+        checkpoint_saved = self._save_optimizer_checkpoint(reason=reason)
         if self.current_optimization_mode == 'generated_combinations':
-            optimizer_logger.info("Skipping state save for 'generated_combinations' mode.")
+            # Chế độ Tạo Bộ Tham Số chỉ lưu checkpoint (số thứ tự bộ trong lưới + bộ tốt nhất)
+            if checkpoint_saved:
+                self._log_to_optimizer_display("INFO", f"Đã lưu checkpoint Tạo Bộ Tham Số (Lý do: {reason}). Chạy lại cùng thiết lập để tiếp tục.", tag="RESUME")
+            return
+
+        if not self.selected_algorithm_for_optimize or not self.current_optimize_target_dir or self.current_best_params is None:
+            optimizer_logger.warning("Attempted to save state, but required info is missing.")
             return
 
         try:
@@ -5490,7 +6015,7 @@ class OptimizerEmbedded(QWidget):
                 "save_reason": reason,
                 "save_timestamp": datetime.datetime.now().isoformat()
             }
-            state_file_path.write_text(json.dumps(state_data, indent=4, ensure_ascii=False), encoding='utf-8')
+            atomic_write_text(state_file_path, json.dumps(state_data, indent=4, ensure_ascii=False))
             self._log_to_optimizer_display("INFO", f"Đã lưu trạng thái tối ưu (Lý do: {reason}). File: {state_file_path.name}", tag="RESUME")
             self.check_resume_possibility()
         except Exception as e:
@@ -5498,13 +6023,80 @@ class OptimizerEmbedded(QWidget):
             optimizer_logger.error(f"Error saving optimization state: {e}", exc_info=True)
 
 
-    def run_combined_performance_test(self, target_display_name, target_algo_source, target_class_name,
+    def _save_optimizer_checkpoint(self, reason="unknown"):
+        """
+        Ghi checkpoint từ `self.optimizer_checkpoint` (worker cập nhật trong khi chạy): bộ tốt nhất tới
+        lúc đó cùng vị trí tìm kiếm (số thứ tự bộ trong lưới, hoặc chu kỳ/tham số leo đồi và lịch sử
+        chiến lược). Ghi nguyên tử nên gọi được từ cả luồng worker lẫn luồng giao diện.
+
+        Returns:
+            bool: True nếu đã ghi.
+        """
+        with self.optimizer_checkpoint_lock:
+            checkpoint_state = dict(self.optimizer_checkpoint) if self.optimizer_checkpoint else None
+        if checkpoint_state is None:
+            return False
+        checkpoint_path = checkpoint_state.pop('path')
+        checkpoint_state['save_reason'] = reason
+        checkpoint_state['save_timestamp'] = datetime.datetime.now().isoformat()
+        try:
+            atomic_write_text(checkpoint_path, json.dumps(checkpoint_state, indent=4, ensure_ascii=False))
+            optimizer_logger.debug(f"Saved optimizer checkpoint {checkpoint_path.name} ({reason}).")
+            return True
+        except Exception as e:
+            optimizer_logger.error(f"Error saving optimizer checkpoint: {e}", exc_info=True)
+            return False
+
+    def _load_optimizer_checkpoint(self, checkpoint_path, identity):
+        """
+        Checkpoint đã lưu nếu định danh của nó trùng `identity` (xem _optimizer_checkpoint_identity);
+        ngược lại None (mã nguồn, dữ liệu hoặc thiết lập đã đổi -> chạy lại từ đầu).
+        """
+        if not checkpoint_path.exists():
+            return None
+        try:
+            checkpoint_data = json.loads(checkpoint_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as read_err:
+            optimizer_logger.warning(f"Ignoring unreadable optimizer checkpoint {checkpoint_path.name}: {read_err}")
+            return None
+        if checkpoint_data.get('identity') != identity:
+            optimizer_logger.info(f"Optimizer checkpoint {checkpoint_path.name} belongs to a different source/data/range, ignoring it.")
+            return None
+        return checkpoint_data
+
+    def _optimizer_checkpoint_identity(self, target_display_name, combination_algo_names, start_date, end_date, **extra):
+        """
+        Định danh (dạng JSON) của những gì quyết định điểm đã lưu trong checkpoint: mã băm mã nguồn
+        thuật toán đích và các thuật toán kết hợp, khoảng ngày, phiên bản dữ liệu, cộng `extra`.
+        """
+        store = self.draw_store
+        if store is None or len(store) != len(self.results_data):
+            store = DrawStore(self.results_data)
+        identity = {
+            "target_algorithm": target_display_name,
+            "algorithm_hash": algorithm_fingerprint(self.loaded_algorithms[target_display_name]['path']),
+            "combination_algorithms": [[name, algorithm_fingerprint(self.loaded_algorithms[name]['path'])]
+                                       for name in sorted(combination_algo_names or []) if name in self.loaded_algorithms],
+            "optimization_range": f"{start_date:%Y-%m-%d}_to_{end_date:%Y-%m-%d}",
+            "data_version": store.version
+        }
+        identity.update(extra)
+        return json.loads(json.dumps(identity, ensure_ascii=False))
+
+    def run_combined_performance_test(self, target_display_name, target_class_name,
                                        target_params_to_test, combination_algo_display_names,
-                                       test_start_date, test_end_date, optimize_target_dir):
+                                       test_start_date, test_end_date, prune_below_score=None):
+        """
+        Hiệu suất của thuật toán đích (với `target_params_to_test`) kết hợp các thuật toán đã chọn.
+
+        `prune_below_score` (Top3 % của bộ tốt nhất hiện tại): dừng sớm khi lượt thử chắc chắn
+        không vượt được giá trị này; khi đó dict trả về có 'pruned' = True và chỉ tính các ngày đã chạy.
+
+        Kết quả đầy đủ được lưu vào sổ cái (engine.eval_db) và lần chấm trùng, kể cả ở phiên sau,
+        được trả lời ngay từ đó.
+        """
         target_instance = None
-        combo_instances = {}
-        temp_target_module_name = None
-        temp_target_filepath = None
+        combo_score_chunks_perf = {}
         
         worker_logger = logging.getLogger("OptimizerWorker.CombinedPerfTest")
 
@@ -5522,249 +6114,85 @@ class OptimizerEmbedded(QWidget):
 
         try:
             worker_logger.debug(f"Starting combined performance test for {target_class_name} with params: {target_params_to_test}")
+
+            ledger_scope = self._performance_ledger_scope(target_display_name, combination_algo_display_names,
+                                                          test_start_date, test_end_date)
+            if ledger_scope is not None:
+                ledger_perf = ledger_scope.get(target_params_to_test)
+                if ledger_perf is not None:
+                    worker_logger.info("Performance result answered from the evaluation ledger.")
+                    return ledger_perf
             
             try:
                 if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Stop event detected before AST modification in perf_test.")
-                    return None
-
-                modified_source = self.modify_algorithm_source_ast(target_algo_source, target_class_name, target_params_to_test)
-                if not modified_source:
-                    worker_logger.error("AST modification failed for performance test, returned no source.")
-                    raise RuntimeError("AST modification failed for performance test (modify_algorithm_source_ast returned None).")
-
-                if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Stop event detected after AST modification in perf_test.")
+                    worker_logger.info("Stop event detected before creating target instance in perf_test.")
                     return None
 
-                timestamp_suffix = int(time.time() * 10000) + random.randint(0, 9999)
-                temp_target_filename = f"temp_perf_target_{target_class_name}_{timestamp_suffix}.py"
-                
-                if not optimize_target_dir or not isinstance(optimize_target_dir, Path):
-                    worker_logger.error("optimize_target_dir is invalid or not provided to run_combined_performance_test.")
-                    return None
-                
-                optimize_target_dir.mkdir(parents=True, exist_ok=True)
-                temp_target_filepath = optimize_target_dir / temp_target_filename
-                temp_target_filepath.write_text(modified_source, encoding='utf-8')
-                worker_logger.debug(f"Temporary target file created: {temp_target_filepath}")
-
-                if not (optimize_target_dir / "__init__.py").exists():
-                    (optimize_target_dir / "__init__.py").touch()
-                if not (self.optimize_dir / "__init__.py").exists():
-                    (self.optimize_dir / "__init__.py").touch()
-                
-                relative_module_path = optimize_target_dir.relative_to(self.base_dir).parts
-                temp_target_module_name = ".".join(relative_module_path) + "." + temp_target_filename[:-3]
+                # Instance thử nghiệm được tạo trong bộ nhớ từ instance đã tải (with_parameters);
+                # sửa mã nguồn bằng AST chỉ còn dùng khi lưu file optimized_*.py cuối cùng.
+                target_algo_data = self.loaded_algorithms.get(target_display_name)
+                if not target_algo_data or not target_algo_data.get('instance'):
+                    raise RuntimeError(f"Target algorithm '{target_display_name}' is not loaded.")
+                base_target_instance = target_algo_data['instance']
+                if base_target_instance.__class__.__name__ != target_class_name:
+                    raise RuntimeError(f"Loaded class {base_target_instance.__class__.__name__} does not match target class {target_class_name}.")
 
-
-                worker_logger.debug(f"Attempting to import temporary target module: {temp_target_module_name}")
-                if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Stop event detected before importing temporary module in perf_test.")
-                    return None
-
-                target_instance = self._import_and_instantiate_temp_algo(temp_target_filepath, temp_target_module_name, target_class_name)
-
-                if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Stop event detected after importing temporary module in perf_test.")
-                    return None
-
-                if not target_instance:
-                    worker_logger.error(f"Failed to load temporary target instance {target_class_name} from {temp_target_filepath}")
-                    raise RuntimeError(f"Failed to load temporary target instance {target_class_name} from {temp_target_filepath}")
-                worker_logger.debug(f"Successfully loaded temporary target instance: {type(target_instance)}")
+                target_instance = base_target_instance.with_parameters(target_params_to_test)
+                worker_logger.debug(f"Created in-memory target instance: {type(target_instance)}")
 
             except Exception as target_load_err:
                 worker_logger.error(f"Failed loading TARGET algorithm '{target_class_name}' for performance test: {target_load_err}", exc_info=True)
                 return None
 
-            worker_logger.debug(f"Loading {len(combination_algo_display_names)} combination algorithms for perf test.")
-            data_copy_for_combo_perf = copy.deepcopy(self.results_data) if self.results_data else []
-            
-            for combo_name_perf in combination_algo_display_names:
-                if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Stop event detected during combination algorithm loading in perf_test.")
-                    return None
-                if combo_name_perf not in self.loaded_algorithms:
-                    worker_logger.warning(f"Skipping unknown combination algorithm in perf_test: {combo_name_perf}")
-                    continue
-                try:
-                     combo_data_perf = self.loaded_algorithms[combo_name_perf]
-                     combo_class_perf = combo_data_perf['instance'].__class__ 
-                     combo_instance_perf = combo_class_perf(
-                         data_results_list=data_copy_for_combo_perf,
-                         cache_dir=self.calculate_dir
-                     )
-                     combo_instances[combo_name_perf] = combo_instance_perf
-                     worker_logger.debug(f"Loaded combination instance for perf_test: {combo_name_perf}")
-                except Exception as combo_load_err_perf:
-                     worker_logger.error(f"Failed loading COMBO instance '{combo_name_perf}' for perf test: {combo_load_err_perf}", exc_info=True)
-                     if combo_name_perf in combo_instances: del combo_instances[combo_name_perf]
-
-
-            worker_logger.debug(f"Starting performance loop from {test_start_date} to {test_end_date}")
-            results_map_perf = {r['date']: r['result'] for r in self.results_data} if self.results_data else {}
-            history_cache_perf = {}
-            if self.results_data:
-                sorted_results_for_cache_perf = sorted(self.results_data, key=lambda x: x['date'])
-                for i, r_perf in enumerate(sorted_results_for_cache_perf):
-                     history_cache_perf[r_perf['date']] = sorted_results_for_cache_perf[:i]
-
-            stats_perf = {'total_days_tested': 0, 'hits_top_1': 0, 'hits_top_3': 0, 'hits_top_5': 0, 
-                          'hits_top_10': 0, 'errors': 0, 'avg_top10_repetition': 0.0, 
-                          'max_top10_repetition_count': 0, 'top10_repetition_details': {}}
-            all_top_10_combined_numbers_perf = []
-
-            current_date_perf = test_start_date
-            while current_date_perf <= test_end_date:
-                if self.optimizer_stop_event.is_set():
-                    worker_logger.info("Performance test stopped by event (start of date loop).")
-                    return None
-                
-                if throttling_enabled_opt and sleep_duration_opt > 0:
-                    time.sleep(sleep_duration_opt)
-                    if self.optimizer_stop_event.is_set(): worker_logger.info("Performance test stopped by event (after sleep)."); return None
-                    while self.optimizer_pause_event.is_set():
-                        if self.optimizer_stop_event.is_set(): worker_logger.info("Performance test stopped during pause (inside sleep block)."); return None
-                        time.sleep(0.1)
-                    if self.optimizer_stop_event.is_set(): worker_logger.info("Performance test stopped by event (after pause check in sleep block)."); return None
+            perf_inputs = self._prepare_combined_performance_inputs(combination_algo_display_names,
+                                                                    test_start_date, test_end_date)
+            if perf_inputs is None:
+                worker_logger.info("Stop event detected while preparing combination scores in perf_test.")
+                return None
+            store_perf, tested_dates_perf, combo_score_chunks_perf = perf_inputs
 
+            def should_stop_perf():
                 while self.optimizer_pause_event.is_set():
                     if self.optimizer_stop_event.is_set():
-                        worker_logger.info("Performance test stopped during pause (main loop).")
-                        return None
+                        break
                     time.sleep(0.2)
-
-                predict_date_perf = current_date_perf
-                check_date_perf = predict_date_perf + datetime.timedelta(days=1)
-
-                actual_result_dict_perf = results_map_perf.get(check_date_perf)
-                hist_data_perf = history_cache_perf.get(predict_date_perf)
-
-                if actual_result_dict_perf is None or hist_data_perf is None:
-                    worker_logger.debug(f"Skipping {predict_date_perf}: actual_result is {actual_result_dict_perf is None}, hist_data is {hist_data_perf is None}")
-                    stats_perf['errors'] +=1
-                    current_date_perf += datetime.timedelta(days=1)
-                    continue
-
-                actual_numbers_set_perf = set()
-                if target_instance: 
-                    actual_numbers_set_perf = target_instance.extract_numbers_from_dict(actual_result_dict_perf)
-                else:
-                    worker_logger.error(f"target_instance is None for {predict_date_perf} in perf_test. This indicates a critical loading error.")
-                    stats_perf['errors'] += 1
-                    current_date_perf += datetime.timedelta(days=1)
-                    continue
-                
-                if not actual_numbers_set_perf:
-                    worker_logger.debug(f"No actual numbers extracted for check_date {check_date_perf}.")
-                    stats_perf['errors'] += 1
-                    current_date_perf += datetime.timedelta(days=1)
-                    continue
-
-                all_predictions_for_day_perf = {}
-                hist_copy_for_day_perf = copy.deepcopy(hist_data_perf)
-
-                if target_instance:
-                    try:
-                        if self.optimizer_stop_event.is_set(): worker_logger.info("Stop event before target predict in perf_test."); return None
-                        all_predictions_for_day_perf[target_display_name] = target_instance.predict(predict_date_perf, hist_copy_for_day_perf)
-                    except Exception as target_pred_err_perf:
-                        worker_logger.error(f"Error predicting TARGET '{target_display_name}' for {predict_date_perf} in perf_test: {target_pred_err_perf}", exc_info=False)
-                        all_predictions_for_day_perf[target_display_name] = {}
-                        stats_perf['errors'] += 1
-                else:
-                    all_predictions_for_day_perf[target_display_name] = {}
-                    stats_perf['errors'] += 1
-
-                for combo_name_p, combo_inst_p in combo_instances.items():
-                    try:
-                        if self.optimizer_stop_event.is_set(): worker_logger.info("Stop event before combo predict in perf_test."); return None
-                        all_predictions_for_day_perf[combo_name_p] = combo_inst_p.predict(predict_date_perf, hist_copy_for_day_perf)
-                    except Exception as combo_pred_err_p:
-                        worker_logger.error(f"Error predicting COMBO '{combo_name_p}' for {predict_date_perf} in perf_test: {combo_pred_err_p}", exc_info=False)
-                        all_predictions_for_day_perf[combo_name_p] = {}
-                        stats_perf['errors'] += 1
-
-                combined_scores_raw_perf = {f"{i:02d}": 0.0 for i in range(100)}
-                valid_algo_count_day = 0
-
-                for algo_name_day, scores_dict_day in all_predictions_for_day_perf.items():
-                    if not isinstance(scores_dict_day, dict) or not scores_dict_day:
-                        continue
-
-                    valid_algo_count_day += 1
-                    for num_str_day, delta_val_day in scores_dict_day.items():
-                        if isinstance(num_str_day, str) and len(num_str_day)==2 and num_str_day.isdigit():
-                            try:
-                                combined_scores_raw_perf[num_str_day] += float(delta_val_day)
-                            except (ValueError, TypeError):
-                                worker_logger.warning(f"Invalid delta value '{delta_val_day}' for number '{num_str_day}' from {algo_name_day} on {predict_date_perf}")
-                                stats_perf['errors'] += 1
-                
-                if valid_algo_count_day == 0:
-                    worker_logger.warning(f"No valid algorithm results for {predict_date_perf} in perf_test.")
-                    stats_perf['errors'] += 1
-                    current_date_perf += datetime.timedelta(days=1)
-                    continue
-                
-                base_score_perf = 100.0
-                combined_scores_list_perf = []
-                for num_str_s, delta_s in combined_scores_raw_perf.items():
-                     try:
-                         final_score_s = base_score_perf + float(delta_s)
-                         combined_scores_list_perf.append((int(num_str_s), final_score_s))
-                     except (ValueError, TypeError):
-                         worker_logger.warning(f"Could not convert final score for '{num_str_s}' (delta: {delta_s}) on {predict_date_perf}")
-                         stats_perf['errors'] += 1
-                
-                if not combined_scores_list_perf:
-                    worker_logger.warning(f"No valid scores after combining for {predict_date_perf} in perf_test")
-                    stats_perf['errors'] += 1
-                    current_date_perf += datetime.timedelta(days=1)
-                    continue
-
-                sorted_preds_perf = sorted(combined_scores_list_perf, key=lambda x: x[1], reverse=True)
-
-                pred_top_1_p = {sorted_preds_perf[0][0]} if sorted_preds_perf else set()
-                pred_top_3_p = {p[0] for p in sorted_preds_perf[:3]}
-                pred_top_5_p = {p[0] for p in sorted_preds_perf[:5]}
-                pred_top_10_p = {p[0] for p in sorted_preds_perf[:10]}
-
-                if pred_top_1_p.intersection(actual_numbers_set_perf): stats_perf['hits_top_1'] += 1
-                if pred_top_3_p.intersection(actual_numbers_set_perf): stats_perf['hits_top_3'] += 1
-                if pred_top_5_p.intersection(actual_numbers_set_perf): stats_perf['hits_top_5'] += 1
-                if pred_top_10_p.intersection(actual_numbers_set_perf): stats_perf['hits_top_10'] += 1
-
-                all_top_10_combined_numbers_perf.extend(list(pred_top_10_p))
-                stats_perf['total_days_tested'] += 1
-                current_date_perf += datetime.timedelta(days=1)
-            
-            total_tested_perf = stats_perf['total_days_tested']
-            worker_logger.info(f"Performance loop finished for perf_test. Total days successfully tested: {total_tested_perf}")
-
-            if total_tested_perf > 0:
-                stats_perf['acc_top_1_pct'] = (stats_perf['hits_top_1'] / total_tested_perf) * 100.0
-                stats_perf['acc_top_3_pct'] = (stats_perf['hits_top_3'] / total_tested_perf) * 100.0
-                stats_perf['acc_top_5_pct'] = (stats_perf['hits_top_5'] / total_tested_perf) * 100.0
-                stats_perf['acc_top_10_pct'] = (stats_perf['hits_top_10'] / total_tested_perf) * 100.0
-
-                if all_top_10_combined_numbers_perf:
-                    top10_counts_perf = Counter(all_top_10_combined_numbers_perf)
-                    total_predictions_in_top10_p = len(all_top_10_combined_numbers_perf)
-                    unique_predictions_in_top10_p = len(top10_counts_perf)
-                    stats_perf['avg_top10_repetition'] = total_predictions_in_top10_p / unique_predictions_in_top10_p if unique_predictions_in_top10_p > 0 else 0.0
-                    stats_perf['max_top10_repetition_count'] = max(top10_counts_perf.values()) if top10_counts_perf else 0
-                    stats_perf['top10_repetition_details'] = dict(top10_counts_perf.most_common(5))
-                else:
-                    stats_perf['avg_top10_repetition'] = 0.0
-                    stats_perf['max_top10_repetition_count'] = 0
-                    stats_perf['top10_repetition_details'] = {}
-            else:
-                stats_perf['acc_top_1_pct'] = 0.0; stats_perf['acc_top_3_pct'] = 0.0; 
-                stats_perf['acc_top_5_pct'] = 0.0; stats_perf['acc_top_10_pct'] = 0.0; 
-                stats_perf['avg_top10_repetition'] = 0.0
-            
+                return self.optimizer_stop_event.is_set()
+
+            # Thuật toán đích hỗ trợ phân rã tuyến tính: ma trận điểm tính bằng phép co tensor trên
+            # các đặc trưng đã cache, không cần predict_range() lại cho mọi ngày
+            algorithms_perf = {target_display_name: target_instance}
+            precomputed_perf = combo_score_chunks_perf
+            decomposed_scorer = self._get_decomposed_scorer(target_display_name, base_target_instance, store_perf,
+                                                            tested_dates_perf, test_start_date, test_end_date)
+            target_chunks_perf = decomposed_scorer.score_chunks(target_params_to_test) if decomposed_scorer else None
+            if target_chunks_perf is not None:
+                algorithms_perf = {}
+                precomputed_perf = {target_display_name: target_chunks_perf, **combo_score_chunks_perf}
+
+            backtest_perf = Backtest(
+                algorithms_perf, store_perf, decimals=None,
+                precomputed_chunks=precomputed_perf, should_stop=should_stop_perf,
+                throttle_sleep=sleep_duration_opt if throttling_enabled_opt else 0.0,
+                prune_below=prune_below_score)
+            result_perf = backtest_perf.run(tested_dates_perf)
+            if result_perf is None:
+                worker_logger.info("Performance test stopped by event.")
+                return None
+            if result_perf.pruned:
+                stats_pruned = performance_summary(result_perf)
+                stats_pruned['pruned'] = True
+                worker_logger.info(f"Performance test pruned after {len(result_perf.dates)}/{len(tested_dates_perf)} days (cannot beat Top3={prune_below_score:.2f}%).")
+                return stats_pruned
+
+            for no_score_date_perf, tested_perf in zip(result_perf.dates, result_perf.tested.tolist()):
+                if not tested_perf:
+                    worker_logger.warning(f"No valid algorithm results for {no_score_date_perf} in perf_test.")
+            # Ngày trong khoảng nhưng thiếu lịch sử/kết quả ngày kế tiếp được tính là lỗi như trước
+            missing_days_perf = (test_end_date - test_start_date).days + 1 - len(tested_dates_perf)
+            stats_perf = performance_summary(result_perf, missing_days_perf)
+            if ledger_scope is not None:
+                ledger_scope.put(target_params_to_test, stats_perf)
+            worker_logger.info(f"Performance loop finished for perf_test. Total days successfully tested: {stats_perf['total_days_tested']}")
             worker_logger.info(f"Performance test calculation complete. Stats: {stats_perf}")
             return stats_perf
 
@@ -5772,72 +6200,137 @@ class OptimizerEmbedded(QWidget):
             worker_logger.error(f"Performance test failed critically: {e_perf_critical}", exc_info=True)
             return None
         finally:
-            worker_logger.debug("Cleaning up performance test resources (temp files, modules)...")
             target_instance = None
-            combo_instances.clear()
-            if temp_target_module_name and temp_target_module_name in sys.modules:
-                try:
-                    del sys.modules[temp_target_module_name]
-                    worker_logger.debug(f"Removed temporary module from sys.modules: {temp_target_module_name}")
-                except (KeyError, Exception) as del_err_module:
-                     worker_logger.warning(f"Could not delete temp module '{temp_target_module_name}' from sys.modules: {del_err_module}")
-            if temp_target_filepath and temp_target_filepath.exists():
-                try:
-                    temp_target_filepath.unlink()
-                    worker_logger.debug(f"Deleted temporary python file: {temp_target_filepath}")
-                except OSError as unlink_err_file:
-                    worker_logger.warning(f"Could not delete temp python file '{temp_target_filepath}': {unlink_err_file}")
+            combo_score_chunks_perf.clear()
 
-    def _import_and_instantiate_temp_algo(self, temp_filepath, temp_module_name, class_name_hint):
+    def _get_decomposed_scorer(self, target_display_name, base_target_instance, store, tested_dates,
+                               test_start_date, test_end_date):
+        """
+        DecomposedScorer (engine.decomposition) của thuật toán đích cho khoảng kiểm thử, giữ lại giữa
+        các lần thử theo (tên, hash mã nguồn, phiên bản dữ liệu, khoảng ngày).
 
-        worker_logger = logging.getLogger("OptimizerWorker.ImportHelper")
-        worker_logger.debug(f"Attempting to import {temp_module_name} from {temp_filepath}")
-        instance = None
-        module_obj = None
+        Returns:
+            DecomposedScorer | None: None nếu thuật toán không hỗ trợ phân rã.
+        """
         try:
-            if temp_module_name in sys.modules:
-                try: del sys.modules[temp_module_name]
-                except KeyError: pass
-                worker_logger.debug(f"Removed existing module cache for {temp_module_name}")
+            source_hash = algorithm_fingerprint(self.loaded_algorithms[target_display_name]['path'])
+        except Exception as hash_err:
+            optimizer_logger.warning(f"Could not hash target source, decomposition disabled: {hash_err}")
+            return None
+        cache_key = (target_display_name, source_hash, store.version, test_start_date, test_end_date)
+        scorer = self.decomposed_scorers.get(cache_key)
+        if scorer is None:
+            # Mỗi phiên tối ưu chỉ có một thuật toán đích: bỏ các bộ phân rã cũ
+            self.decomposed_scorers.clear()
+            scorer = DecomposedScorer(base_target_instance, tested_dates, store)
+            self.decomposed_scorers[cache_key] = scorer
+        return scorer if scorer.supported else None
+
+    def _performance_ledger_scope(self, target_display_name, combination_algo_display_names, test_start_date, test_end_date):
+        """
+        Phạm vi sổ cái (engine.eval_db) cho các lần thử của thuật toán đích: khóa gồm mã băm mã nguồn
+        thuật toán đích và các thuật toán kết hợp, khoảng ngày và phiên bản dữ liệu.
 
-            spec = util.spec_from_file_location(temp_module_name, temp_filepath)
-            if not spec or not spec.loader:
-                raise ImportError(f"Could not create module spec for {temp_module_name} at {temp_filepath}")
+        Returns:
+            EvaluationScope | None: None nếu không mở được sổ cái (khi đó mọi lần thử đều chạy lại).
+        """
+        try:
+            if self.evaluation_ledger is None:
+                self.evaluation_ledger = EvaluationLedger(self.optimize_dir / LEDGER_FILE_NAME)
+            store = self.draw_store
+            if store is None or len(store) != len(self.results_data):
+                store = DrawStore(self.results_data)
+            target_path = self.loaded_algorithms[target_display_name]['path']
+            combination = [[name, algorithm_fingerprint(self.loaded_algorithms[name]['path'])]
+                           for name in combination_algo_display_names if name in self.loaded_algorithms]
+            return self.evaluation_ledger.scope(KIND_PERFORMANCE, algorithm_fingerprint(target_path), combination,
+                                                test_start_date, test_end_date, store.version)
+        except Exception as ledger_err:
+            optimizer_logger.warning(f"Evaluation ledger unavailable, results will not be reused: {ledger_err}")
+            return None
 
-            module_obj = util.module_from_spec(spec)
-            if module_obj is None:
-                 raise ImportError(f"Could not create module from spec for {temp_module_name}")
-
-            sys.modules[temp_module_name] = module_obj
-            worker_logger.debug(f"Executing module {temp_module_name}")
-            spec.loader.exec_module(module_obj)
-            worker_logger.debug(f"Module {temp_module_name} executed.")
-
-            temp_class = getattr(module_obj, class_name_hint, None)
-            if not temp_class or not inspect.isclass(temp_class) or not issubclass(temp_class, BaseAlgorithm):
-                 worker_logger.debug(f"Class hint '{class_name_hint}' not found or invalid. Searching module...")
-                 for name, obj in inspect.getmembers(module_obj):
-                     if inspect.isclass(obj) and issubclass(obj, BaseAlgorithm) and obj is not BaseAlgorithm and obj.__module__ == temp_module_name:
-                         temp_class = obj
-                         worker_logger.debug(f"Found class '{name}' in {temp_module_name}")
-                         break
-
-            if not temp_class or not issubclass(temp_class, BaseAlgorithm):
-                raise TypeError(f"No valid BaseAlgorithm subclass found in temporary module {temp_module_name}.")
-
-            worker_logger.debug(f"Instantiating class {temp_class.__name__}")
-            data_copy_for_instance = copy.deepcopy(self.results_data) if self.results_data else []
-            instance = temp_class(data_results_list=data_copy_for_instance, cache_dir=self.calculate_dir)
-            worker_logger.debug(f"Successfully instantiated {temp_class.__name__}")
-            return instance
+    def _prepare_combined_performance_inputs(self, combination_algo_display_names, test_start_date, test_end_date):
+        """
+        Phần dùng chung của mọi lần thử trong một phiên tối ưu: kho dữ liệu, các ngày sẽ thực sự
+        được dự đoán (có lịch sử và có kết quả ngày kế tiếp) và ma trận điểm của các thuật toán kết hợp.
 
-        except Exception as e:
-            worker_logger.error(f"Import/Instantiate failed for {temp_filepath} (module: {temp_module_name}): {e}", exc_info=True)
-            if temp_module_name and temp_module_name in sys.modules:
-                try: del sys.modules[temp_module_name]
-                except KeyError: pass
+        Returns:
+            tuple | None: (store, tested_dates, combo_score_chunks), hoặc None nếu bị dừng.
+        """
+        worker_logger = logging.getLogger("OptimizerWorker.CombinedPerfTest")
+        store = self.draw_store
+        if store is None or len(store) != len(self.results_data):
+            store = DrawStore(self.results_data)
+
+        tested_dates = []
+        scan_date = test_start_date
+        while scan_date <= test_end_date:
+            scan_check_row = store.row_of(scan_date + datetime.timedelta(days=1))
+            if scan_date in store.index and scan_check_row is not None and store.presence[scan_check_row].any():
+                tested_dates.append(scan_date)
+            scan_date += datetime.timedelta(days=1)
+
+        # Thuật toán kết hợp không đổi giữa các lần thử: ma trận điểm lấy từ cache của trình tối ưu
+        combo_score_chunks = {}
+        worker_logger.debug(f"Loading {len(combination_algo_display_names)} combination algorithms for perf test.")
+        for combo_name in combination_algo_display_names:
+            if self.optimizer_stop_event.is_set():
+                return None
+            if combo_name not in self.loaded_algorithms:
+                worker_logger.warning(f"Skipping unknown combination algorithm in perf_test: {combo_name}")
+                continue
+            combo_chunks = self._get_combo_score_chunks(combo_name, tested_dates, store, test_start_date, test_end_date)
+            if combo_chunks is None:
+                return None
+            combo_score_chunks[combo_name] = combo_chunks
+        if self.optimizer_stop_event.is_set():
+            return None
+        return store, tested_dates, combo_score_chunks
+
+    def _get_combo_score_chunks(self, combo_name, tested_dates, store, test_start_date, test_end_date):
+        """
+        Ma trận điểm (theo từng khối ngày của Backtest) của một thuật toán kết hợp
+        cho các ngày kiểm thử. Chỉ tham số của thuật toán đích thay đổi giữa các lần thử nên
+        kết quả được cache theo (tên, mã băm mã nguồn, phiên bản dữ liệu, khoảng ngày).
+
+        Returns:
+            list | None: Danh sách ma trận (None cho khối bị lỗi; mọi khối là None nếu không tạo được
+                         thuật toán, khi đó mọi ngày của nó được tính là lỗi), hoặc None nếu bị dừng giữa chừng.
+        """
+        worker_logger = logging.getLogger("OptimizerWorker.CombinedPerfTest")
+        combo_data = self.loaded_algorithms[combo_name]
+        try:
+            source_hash = algorithm_fingerprint(combo_data['path'])
+        except Exception as hash_err:
+            worker_logger.warning(f"Could not hash source of combo '{combo_name}', score cache disabled for it: {hash_err}")
+            source_hash = None
+        cache_key = (combo_name, source_hash, store.version, test_start_date, test_end_date)
+        if source_hash is not None and cache_key in self.combo_score_cache:
+            return self.combo_score_cache[cache_key]
+
+        try:
+            combo_instance = combo_data['instance'].__class__(
+                data_results_list=self.results_data if self.results_data else [],
+                cache_dir=self.calculate_dir
+            )
+        except Exception as combo_load_err_perf:
+            # Giữ nguyên bộ kết hợp: thuật toán lỗi không có điểm ở mọi ngày và mỗi ngày tính là một lỗi,
+            # như vòng lặp từng ngày khi predict() của thuật toán kết hợp thất bại
+            worker_logger.warning(f"Failed loading COMBO instance '{combo_name}' for perf test, counting all its days as errors: {combo_load_err_perf}", exc_info=True)
+            return [None] * len(range(0, len(tested_dates), PREDICT_RANGE_CHUNK_DAYS))
+
+        combo_chunks = compute_score_chunks(combo_name, combo_instance, tested_dates, store,
+                                            should_stop=self.optimizer_stop_event.is_set)
+        if combo_chunks is None:
             return None
 
+        if source_hash is not None:
+            while len(self.combo_score_cache) >= COMBO_SCORE_CACHE_MAX_ENTRIES:
+                self.combo_score_cache.pop(next(iter(self.combo_score_cache)))
+            self.combo_score_cache[cache_key] = combo_chunks
+            worker_logger.debug(f"Cached score matrices for combo '{combo_name}' ({len(tested_dates)} days).")
+        return combo_chunks
+
     def find_latest_successful_optimization(self, success_dir: Path, algo_stem: str):
         latest_file, latest_data, latest_timestamp = None, None, 0
         if success_dir.is_dir():
@@ -6094,7 +6587,12 @@ class OptimizerEmbedded(QWidget):
             QMessageBox.critical(main_window, "Lỗi", f"Không thể mở thư mục:\n{target_dir_path}")
 
     def _generate_parameter_combinations(self, original_params, num_values_per_param, method, max_combinations_limit=None):
-        """Generates parameter value sets and their combinations, with an optional limit."""
+        """
+        Generates parameter value sets and their combinations, with an optional limit.
+
+        Returns a lazy engine.search.ParameterGrid (combination i is decoded on access,
+        same order as itertools.product), or [] if no values could be generated.
+        """
         numeric_params = {k: v for k, v in original_params.items() if isinstance(v, (int, float))}
         if not numeric_params:
             optimizer_logger.warning("No numeric parameters found for combination generation.")
@@ -6112,35 +6610,16 @@ class OptimizerEmbedded(QWidget):
             all_param_value_lists.append(values)
             optimizer_logger.debug(f"Generated values for '{name}': {values}")
 
-        combinations_iter = itertools.product(*all_param_value_lists)
-
-        if max_combinations_limit is not None and max_combinations_limit > 0:
-            estimated_total_before_limit = 1
-            for p_list in all_param_value_lists:
-                if len(p_list) > 0:
-                     estimated_total_before_limit *= len(p_list)
-                elif estimated_total_before_limit == 1 and not all_param_value_lists :
-                     estimated_total_before_limit = 0
-
-
-            if estimated_total_before_limit > max_combinations_limit:
-                optimizer_logger.info(f"Raw estimated combinations ({estimated_total_before_limit}) > user limit ({max_combinations_limit}). Slicing...")
+        combinations_grid = ParameterGrid(original_params, param_names_ordered, all_param_value_lists,
+                                          limit=max_combinations_limit)
+        if combinations_grid.limit is not None:
+            if combinations_grid.size > combinations_grid.limit:
+                optimizer_logger.info(f"Raw estimated combinations ({combinations_grid.size}) > user limit ({combinations_grid.limit}). Slicing...")
             else:
-                optimizer_logger.info(f"Raw estimated combinations ({estimated_total_before_limit}) <= user limit ({max_combinations_limit}). No slicing needed for limit itself.")
-
-            combinations_iter = itertools.islice(combinations_iter, max_combinations_limit)
-            optimizer_logger.info(f"Will generate at most {max_combinations_limit} parameter sets due to user limit.")
-
+                optimizer_logger.info(f"Raw estimated combinations ({combinations_grid.size}) <= user limit ({combinations_grid.limit}). No slicing needed for limit itself.")
 
-        param_combinations_list = []
-        for combo_values in combinations_iter:
-            param_dict = original_params.copy()
-            param_dict.update(dict(zip(param_names_ordered, combo_values)))
-            param_combinations_list.append(param_dict)
-
-
-        optimizer_logger.info(f"Total combinations actually generated: {len(param_combinations_list)}")
-        return param_combinations_list
+        optimizer_logger.info(f"Total combinations in grid: {len(combinations_grid)} (generated lazily)")
+        return combinations_grid
 
     def _generate_single_parameter_values(self, param_name, original_value, num_values, method):
         """Generates a list of N adjacent values for a single parameter."""
@@ -6231,11 +6710,12 @@ class SimulationWorker(QObject):
     error_signal = pyqtSignal(str)
     log_signal = pyqtSignal(str)
 
-    def __init__(self, algo_instances, history_data, result_map, config, bet_strategies):
+    def __init__(self, algo_instances, history_data, draw_store, config, bet_strategies):
         super().__init__()
         self.algo_instances = algo_instances 
         self.history_data = history_data
-        self.result_map = result_map
+        self.draw_store = draw_store
+        self.result_map = draw_store.index
         self.config = config
         self.bet_strategies = bet_strategies
         self._is_running = True
@@ -6283,45 +6763,36 @@ class SimulationWorker(QObject):
         }
         
         current_balance = self.config['initial_capital']
-        sorted_history = sorted(self.history_data, key=lambda x: x['date'])
         
         stop_completely = False 
 
-        for idx, predict_date in enumerate(dates_to_run):
+        # Dự đoán cho next_day với lịch sử là mọi ngày đến hết predict_date (mặc định của predict_range);
+        # tổng điểm thô không cộng điểm gốc. Các khối được tính dần khi vòng lặp chạy tới.
+        next_days = [d + datetime.timedelta(days=1) for d in dates_to_run]
+        backtest = Backtest(dict(enumerate(self.algo_instances)), self.draw_store, decimals=None,
+                            base_score=0.0, require_scores=False)
+        day_chunks = ((chunk, pos) for chunk in backtest.iter_chunks(
+                          next_days, target_rows=[self.draw_store.row_of(d) for d in next_days])
+                      for pos in range(len(chunk.dates)))
+
+        for idx, (predict_date, (day_chunk, day_pos)) in enumerate(zip(dates_to_run, day_chunks)):
             if not self._is_running or stop_completely: break
             
             if current_balance < 1000: 
                 self.log_signal.emit(f"<div style='color:red; font-weight:bold; border:1px solid red; padding:5px; margin:5px;'>⛔ Dừng chơi từ ngày {predict_date.strftime('%d/%m/%Y')}: ĐÃ HẾT VỐN!</div>")
                 break
 
-            current_history = [x for x in sorted_history if x['date'] <= predict_date]
             next_day = predict_date + datetime.timedelta(days=1)
-            
-            combined_scores = {} 
-            valid_algo_run = False
-            
-            for algo in self.algo_instances:
-                try:
-                    preds = algo.predict(next_day, current_history)
-                    if preds:
-                        valid_algo_run = True
-                        for num, score in preds.items():
-                            combined_scores[num] = combined_scores.get(num, 0) + score
-                except Exception: pass
-            
-            if not valid_algo_run or not combined_scores:
+            if not day_chunk.has_scores[day_pos]:
                 self.log_signal.emit(f"Ngày {predict_date}: Thuật toán không trả về kết quả.")
                 self.progress_signal.emit(idx + 1, total_days)
                 continue
 
-            sorted_preds = sorted(combined_scores.items(), key=lambda item: item[1], reverse=True)
-            ranked_numbers = [num for num, score in sorted_preds]
+            ranked_numbers = [f"{num:02d}" for num in day_chunk.ranked[day_pos].tolist()]
 
-            actual_result = self.result_map[next_day]
-            actual_lotos = self._get_lotos_from_result(actual_result) 
-            actual_special = self._get_special_loto(actual_result)
-            from collections import Counter
-            loto_counts = Counter(actual_lotos)
+            actual_row = self.result_map[next_day]
+            loto_counts = self._get_loto_counts(actual_row)
+            actual_special = self._get_special_loto(actual_row)
 
             day_total_cost = 0; day_total_win = 0; day_details = []
             
@@ -6420,23 +6891,14 @@ class SimulationWorker(QObject):
         summary['final_balance'] = current_balance
         self.finished_signal.emit(summary)
 
-    def _get_lotos_from_result(self, result_dict):
-        lotos = []
-        ignore_keys = {'date', '_id', 'source', 'day_of_week', 'sign', 'created_at', 'updated_at', 'province_name', 'province_id'}
-        for k, v in result_dict.items():
-            if k in ignore_keys: continue
-            vals = v if isinstance(v, list) else [v]
-            for val in vals:
-                s = str(val).strip()
-                if len(s) >= 2 and s[-2:].isdigit(): lotos.append(s[-2:])
-        return lotos
-
-    def _get_special_loto(self, result_dict):
-        val = result_dict.get('special', result_dict.get('dac_biet'))
-        if val:
-            s = str(val).strip()
-            if len(s) >= 2 and s[-2:].isdigit(): return s[-2:]
-        return None
+    def _get_loto_counts(self, row):
+        """Số nháy của từng lô trong ngày (key dạng chuỗi '00'..'99'), lấy từ DrawStore."""
+        counts_row = self.draw_store.counts[row]
+        return {f"{n:02d}": int(counts_row[n]) for n in np.flatnonzero(counts_row)}
+
+    def _get_special_loto(self, row):
+        special = self.draw_store.special_on(row)
+        return f"{special:02d}" if special >= 0 else None
 
 class VnMoneySpinBox(QSpinBox):
     """SpinBox tùy chỉnh để hiển thị dấu chấm phân cách hàng nghìn."""
@@ -6787,9 +7249,11 @@ class TrialPlayTab(QWidget):
         
         self.simulation_thread = QThread()
         history = self.main_app.results
-        res_map = {i['date']: i['result'] for i in history}
+        draw_store = self.main_app.draw_store
+        if draw_store is None or len(draw_store) != len(history):
+            draw_store = DrawStore(history)
         
-        self.simulation_worker = SimulationWorker(algo_instances, history, res_map, config, strategies)
+        self.simulation_worker = SimulationWorker(algo_instances, history, draw_store, config, strategies)
         self.simulation_worker.moveToThread(self.simulation_thread)
         self.simulation_worker.progress_signal.connect(self.update_progress_bar)
         self.simulation_worker.day_result_signal.connect(self.display_day_result)
@@ -6998,6 +7462,7 @@ class LotteryPredictionApp(QMainWindow):
         self.config = configparser.ConfigParser(interpolation=None)
 
         self.results = []
+        self.draw_store = None
         self.selected_date = None
         self.algorithms = {}
         self.algorithm_instances = {}
@@ -8649,6 +9114,30 @@ class LotteryPredictionApp(QMainWindow):
         )
         right_layout.addWidget(perf_sort_frame)
 
+        ensemble_frame = QWidget()
+        ensemble_layout = QHBoxLayout(ensemble_frame)
+        ensemble_layout.setContentsMargins(0,0,0,0)
+        ensemble_layout.setSpacing(5)
+        ensemble_layout.setAlignment(Qt.AlignLeft)
+
+        lbl_ensemble = QLabel("Trọng số:")
+        lbl_ensemble.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+        ensemble_layout.addWidget(lbl_ensemble)
+
+        self.ensemble_method_combo = QComboBox()
+        self.ensemble_method_combo.addItems(["Coordinate descent", "Khởi động lại ngẫu nhiên", "CMA-ES"])
+        self.ensemble_method_combo.setFixedWidth(160)
+        ensemble_layout.addWidget(self.ensemble_method_combo)
+
+        self.ensemble_opt_button = QPushButton("⚖️ Tối ưu trọng số")
+        self.ensemble_opt_button.setToolTip(
+            "Tính điểm các thuật toán đang bật MỘT lần trên khoảng ngày đã chọn rồi tìm bộ trọng số\n"
+            "tốt nhất (Top 3, Top 5, Top 1, ít lặp Top 10) trên điểm đã cache, xếp hạng Cao ➔ Thấp.")
+        self.ensemble_opt_button.clicked.connect(self.optimize_ensemble_weights)
+        ensemble_layout.addWidget(self.ensemble_opt_button)
+        ensemble_layout.addStretch(1)
+        right_layout.addWidget(ensemble_frame)
+
         self.perf_progress_frame = QWidget()
         perf_progress_layout = QVBoxLayout(self.perf_progress_frame)
         perf_progress_layout.setContentsMargins(5, 0, 5, 5)
@@ -11461,6 +11950,7 @@ class LotteryPredictionApp(QMainWindow):
     def load_data(self):
         """Loads lottery result data based on the path in the current config."""
         self.results = []
+        self.draw_store = None
         main_logger.info("Loading lottery data (PyQt5)...")
         try:
             if not self.config.has_section('DATA') or not self.config.has_option('DATA', 'data_file'):
@@ -11500,31 +11990,11 @@ class LotteryPredictionApp(QMainWindow):
                     return
 
             main_logger.debug(f"Reading data from: {data_file_path}")
-            with open(data_file_path, 'r', encoding='utf-8') as f: raw_data = json.load(f)
-
-            processed_count, unique_dates, results_temp, data_list_to_process = 0, set(), [], []
-            if isinstance(raw_data, list): data_list_to_process = raw_data
-            elif isinstance(raw_data, dict) and 'results' in raw_data and isinstance(raw_data.get('results'), dict):
-                for date_str, result_dict in raw_data['results'].items():
-                    if isinstance(result_dict, dict): data_list_to_process.append({'date': date_str, 'result': result_dict})
-            else: raise ValueError("Định dạng JSON không hợp lệ hoặc không được hỗ trợ.")
-
-            for item in data_list_to_process:
-                 if not isinstance(item, dict): continue
-                 date_str_raw = item.get("date");
-                 if not date_str_raw: continue
-                 date_str_cleaned = str(date_str_raw).split('T')[0]
-                 try: date_obj = datetime.datetime.strptime(date_str_cleaned, '%Y-%m-%d').date();
-                 except ValueError: continue
-                 if date_obj in unique_dates: continue
-                 result_data = item.get('result');
-                 if result_data is None: result_data = {k: v for k, v in item.items() if k != 'date'}
-                 if not result_data: continue
-                 results_temp.append({'date': date_obj, 'result': result_data}); unique_dates.add(date_obj); processed_count += 1
+            results_temp, store = load_results_cached(data_file_path, main_logger)
 
             if results_temp:
-                results_temp.sort(key=lambda x: x['date'])
                 self.results = results_temp
+                self.draw_store = store
                 start_date, end_date = self.results[0]['date'], self.results[-1]['date']
                 
                 self.available_kqxs_dates = {r['date'] for r in self.results}
@@ -11989,7 +12459,7 @@ class LotteryPredictionApp(QMainWindow):
                     self.initial_main_algo_label.setVisible(True)
 
 
-        results_copy_for_instances = copy.deepcopy(self.results) if self.results else []
+        results_copy_for_instances = self.results if self.results else []
         cache_dir_for_instances = self.calculate_dir
         
         any_card_created = False
@@ -12738,12 +13208,11 @@ class LotteryPredictionApp(QMainWindow):
              main_logger.error(f"Error setting up prediction progress UI: {ui_err}", exc_info=True)
 
 
-        hist_copy_for_threads = copy.deepcopy(historical_data_for_prediction)
         main_logger.info("Launching prediction worker threads...")
         for algo_name, instance in active_algorithm_instances.items():
             thread = threading.Thread(
                 target=self.run_single_algorithm_prediction,
-                args=(algo_name, instance, self.selected_date, hist_copy_for_threads),
+                args=(algo_name, instance, self.selected_date, historical_data_for_prediction),
                 name=f"Predict-{algo_name[:20]}",
                 daemon=True
             )
@@ -12929,105 +13398,79 @@ class LotteryPredictionApp(QMainWindow):
             return {f"{i:02d}": 100.0 for i in range(100)}
 
         main_logger.info(f"Combining scores from {len(intermediate_results)} algorithm results (applying weights)...")
-        BASE_SCORE = 100.0
-        combined_deltas = {f"{i:02d}": 0.0 for i in range(100)}
-        valid_algo_count = 0
-        algorithms_processed = []
-
+        score_arrays = {}
         for algo_name, raw_scores_dict in intermediate_results.items():
-            main_logger.debug(f"Processing results from: {algo_name}")
-            algorithms_processed.append(algo_name)
-
             if not isinstance(raw_scores_dict, dict):
                 main_logger.warning(f"Result from '{algo_name}' is not a dict. Skipping.")
                 continue
             if not raw_scores_dict:
                 main_logger.debug(f"Result from '{algo_name}' is empty. Skipping.")
                 continue
+            score_arrays[algo_name] = scores_dict_to_array(raw_scores_dict)
 
-            valid_algo_count += 1
-            processed_scores_dict = copy.deepcopy(raw_scores_dict)
-
-            weight_factor = 1.0
-            apply_weight = False
-            algo_ui_data = self.algorithms.get(algo_name)
-
-            if algo_ui_data:
-                chk_enable = algo_ui_data.get('chk_enable')
-                chk_weight = algo_ui_data.get('chk_weight')
-                weight_entry = algo_ui_data.get('weight_entry')
-
-                main_is_enabled = chk_enable.isChecked() if chk_enable else False
-                weight_is_enabled = chk_weight.isChecked() if chk_weight else False
-
-                if main_is_enabled and weight_is_enabled:
-                    if weight_entry:
-                        weight_str = weight_entry.text().strip()
-                        if self._is_valid_float_str(weight_str):
-                            try:
-                                weight_factor = float(weight_str)
-                                apply_weight = True
-                            except ValueError:
-                                main_logger.warning(f"Invalid weight format '{weight_str}' for '{algo_name}'. Using 1.0.")
-                                weight_factor = 1.0
-                        else:
-                            main_logger.warning(f"Invalid weight string '{weight_str}' for '{algo_name}'. Using 1.0.")
-                            weight_factor = 1.0
-                    else:
-                        main_logger.warning(f"Weight entry widget not found for '{algo_name}'. Using 1.0.")
-            else:
-                 main_logger.warning(f"UI data not found for '{algo_name}' when checking weight. Using 1.0.")
-
-            if apply_weight and weight_factor != 1.0:
-                main_logger.debug(f"Applying weight factor {weight_factor:.3f} to '{algo_name}'.")
-                temp_scores = {}
-                num_multiplied = 0
-                for num_str, delta_val in processed_scores_dict.items():
-                    if isinstance(num_str, str) and len(num_str) == 2 and num_str.isdigit() and isinstance(delta_val, (int, float)):
-                        try:
-                            multiplied_delta = float(delta_val) * weight_factor
-                            temp_scores[num_str] = multiplied_delta
-                            num_multiplied += 1
-                        except (ValueError, TypeError, OverflowError) as mult_err:
-                            main_logger.warning(f"Error multiplying delta '{delta_val}' by weight {weight_factor} for number '{num_str}' in '{algo_name}': {mult_err}. Keeping original delta.")
-                            temp_scores[num_str] = float(delta_val)
-                    else:
-                        pass
-                processed_scores_dict = temp_scores
-                main_logger.debug(f"Weighted scores calculated for {num_multiplied} numbers from '{algo_name}'.")
-
-            numbers_processed_in_algo = 0
-            errors_in_algo = 0
-            for num_str, delta_val in processed_scores_dict.items():
-                if isinstance(num_str, str) and len(num_str) == 2 and num_str.isdigit() and isinstance(delta_val, (int, float)):
-                    try:
-                        delta_float = float(delta_val)
-                        combined_deltas[num_str] += delta_float
-                        numbers_processed_in_algo += 1
-                    except (ValueError, TypeError):
-                        errors_in_algo += 1
-                        main_logger.warning(f"Could not convert delta '{delta_val}' to float for number '{num_str}' from {algo_name}.")
-                        continue
-                else:
-                     if isinstance(num_str, str) and num_str.isdigit():
-                          errors_in_algo += 1
-                          main_logger.warning(f"Invalid key format or non-numeric delta skipped from {algo_name}: key='{num_str}', value type={type(delta_val)}")
+        if not score_arrays:
+            main_logger.error(f"No valid results returned from processed algorithms: {list(intermediate_results.keys())}. Returning base scores.")
+        final_scores = scores_array_to_dict(self.combine_algorithm_score_arrays(score_arrays))
+        main_logger.info(f"Successfully combined scores from {len(score_arrays)} algorithms.")
+        return final_scores
 
+    def _get_algorithm_weight_factor(self, algo_name: str) -> float:
+        """Hệ số trọng số của thuật toán theo UI (1.0 nếu không bật trọng số hoặc giá trị không hợp lệ)."""
+        algo_ui_data = self.algorithms.get(algo_name)
+        if not algo_ui_data:
+            main_logger.warning(f"UI data not found for '{algo_name}' when checking weight. Using 1.0.")
+            return 1.0
+
+        chk_enable = algo_ui_data.get('chk_enable')
+        chk_weight = algo_ui_data.get('chk_weight')
+        weight_entry = algo_ui_data.get('weight_entry')
+        main_is_enabled = chk_enable.isChecked() if chk_enable else False
+        weight_is_enabled = chk_weight.isChecked() if chk_weight else False
+        if not (main_is_enabled and weight_is_enabled):
+            return 1.0
+        if not weight_entry:
+            main_logger.warning(f"Weight entry widget not found for '{algo_name}'. Using 1.0.")
+            return 1.0
+
+        weight_str = weight_entry.text().strip()
+        if not self._is_valid_float_str(weight_str):
+            main_logger.warning(f"Invalid weight string '{weight_str}' for '{algo_name}'. Using 1.0.")
+            return 1.0
+        try:
+            return float(weight_str)
+        except ValueError:
+            main_logger.warning(f"Invalid weight format '{weight_str}' for '{algo_name}'. Using 1.0.")
+            return 1.0
 
-            if errors_in_algo > 0:
-                 main_logger.warning(f"Skipped {errors_in_algo} invalid key/value pairs from '{algo_name}'.")
-            main_logger.debug(f"Added {numbers_processed_in_algo} valid deltas from '{algo_name}'.")
+    def combine_algorithm_score_arrays(self, score_arrays: dict):
+        """
+        Tổng hợp điểm dạng mảng: 100 + tổng (delta * trọng số), làm tròn 2 chữ số.
 
-        if valid_algo_count == 0:
-            if algorithms_processed:
-                 main_logger.error(f"No valid results returned from processed algorithms: {algorithms_processed}. Returning base scores.")
-            else:
-                 main_logger.error("No algorithms were processed. Returning base scores.")
-            return {num: BASE_SCORE for num in combined_deltas.keys()}
+        score_arrays: dict {tên thuật toán: np.ndarray[100] hoặc None}. Thuật toán trả về
+        None (không có dự đoán) được bỏ qua; nếu không có thuật toán hợp lệ thì mọi số
+        nhận điểm gốc 100.
+        Trả về: np.ndarray float64[100] (chỉ số i ứng với số i).
+        """
+        names = list(score_arrays.keys())
+        snapshot = self._capture_weight_snapshot(names)
+        score_tensor = build_score_tensor(
+            {name: scores.reshape(1, 100) for name, scores in score_arrays.items() if scores is not None}, names, 1)
+        return combine_score_tensor(score_tensor, snapshot)[0]
 
-        final_scores = {num: round(BASE_SCORE + delta, 2) for num, delta in combined_deltas.items()}
-        main_logger.info(f"Successfully combined scores from {valid_algo_count} algorithms.")
-        return final_scores
+    def _capture_weight_snapshot(self, algo_names) -> WeightSnapshot:
+        """
+        Chụp trọng số/trạng thái bật của các thuật toán từ UI (gọi trên luồng giao diện,
+        trước khi giao việc cho luồng nền). Thuật toán không có dữ liệu UI coi như bật, trọng số 1.0.
+        """
+        weights = []
+        enabled = []
+        for algo_name in algo_names:
+            weights.append(self._get_algorithm_weight_factor(algo_name))
+            chk_enable = self.algorithms.get(algo_name, {}).get('chk_enable')
+            enabled.append(chk_enable.isChecked() if chk_enable else True)
+        snapshot = WeightSnapshot(algo_names, weights, enabled)
+        main_logger.debug(f"Captured {snapshot}")
+        return snapshot
 
     def _get_frequency_info(self, number_to_check: int, end_date_for_stats: datetime.date, periods: list[int], historical_data: list) -> dict:
         """
@@ -13373,43 +13816,40 @@ class LotteryPredictionApp(QMainWindow):
 
 
 
-    def calculate_combined_performance(self):
-        """Prepares and starts the performance calculation worker thread."""
-        main_logger.info("Preparing for combined performance calculation...")
-
-        if self.performance_calc_running:
-            QMessageBox.warning(self, "Đang Chạy", "Quá trình tính hiệu suất khác đang diễn ra.")
-            return
-
+    def _prepare_performance_run(self):
+        """
+        Kiểm tra khoảng ngày và thuật toán đang bật của khung Hiệu suất Kết Hợp (báo lỗi cho người dùng).
+        Trả về (start_s, end_s, active_inst, draw_store, valid_predict_dates) hoặc None nếu không chạy được.
+        """
         start_d, end_d = None, None
         try:
             start_s = self.perf_start_date_edit.text()
             end_s = self.perf_end_date_edit.text()
             if not start_s or not end_s:
                 QMessageBox.warning(self, "Thiếu Ngày", "Vui lòng chọn ngày bắt đầu và kết thúc cho khoảng tính hiệu suất.")
-                return
+                return None
             try:
                 start_d = datetime.datetime.strptime(start_s, '%d/%m/%Y').date()
                 end_d = datetime.datetime.strptime(end_s, '%d/%m/%Y').date()
             except ValueError as ve:
                 QMessageBox.critical(self, "Lỗi Ngày", f"Định dạng ngày sai: {ve}")
-                return
+                return None
             if start_d > end_d:
                 QMessageBox.warning(self, "Ngày Lỗi", "Ngày bắt đầu phải nhỏ hơn hoặc bằng ngày kết thúc.")
-                return
+                return None
 
             if not self.results or len(self.results) < 2:
                 QMessageBox.warning(self, "Thiếu Dữ Liệu", "Cần ít nhất 2 ngày dữ liệu để tính hiệu suất.")
-                return
+                return None
             min_d, max_d = self.results[0]['date'], self.results[-1]['date']
             if start_d < min_d or end_d > max_d:
                 QMessageBox.warning(self, "Ngoài Phạm Vi", f"Khoảng TG ({start_s} - {end_s}) không hợp lệ.\nPhải nằm trong khoảng dữ liệu: [{min_d:%d/%m/%Y} - {max_d:%d/%m/%Y}]")
-                return
+                return None
 
         except Exception as e:
              main_logger.error(f"Error validating performance dates: {e}", exc_info=True)
              QMessageBox.critical(self, "Lỗi Ngày", f"Lỗi không xác định khi kiểm tra ngày:\n{e}")
-             return
+             return None
 
         active_inst = {}
         for algo_name, algo_data in self.algorithms.items():
@@ -13420,41 +13860,58 @@ class LotteryPredictionApp(QMainWindow):
 
         if not active_inst:
             QMessageBox.warning(self, "Không Có Thuật Toán", "Vui lòng kích hoạt ít nhất một thuật toán để tính hiệu suất.")
-            return
+            return None
         active_names = list(active_inst.keys())
         main_logger.info(f"Calculating performance from {start_d} to {end_d} for algorithms: {active_names}")
 
         try:
-            res_map = {r['date']: r['result'] for r in self.results}
-            hist_cache = {}
-            main_logger.debug("Building history cache for performance calculation...")
-            sorted_results_for_cache = sorted(self.results, key=lambda x: x['date'])
-            for i, r in enumerate(sorted_results_for_cache):
-                hist_cache[r['date']] = sorted_results_for_cache[:i]
-            main_logger.debug(f"History cache built: {len(hist_cache)} entries.")
+            draw_store = self.draw_store if self.draw_store is not None else DrawStore(self.results)
 
             predict_dates_in_range = [start_d + datetime.timedelta(days=i) for i in range((end_d - start_d).days + 1)]
             valid_predict_dates = [
                 p_date for p_date in predict_dates_in_range
-                if p_date in hist_cache and (p_date + datetime.timedelta(days=1)) in res_map
+                if p_date in draw_store.index and (p_date + datetime.timedelta(days=1)) in draw_store.index
             ]
 
             if not valid_predict_dates:
                 QMessageBox.information(self, "Không Đủ Dữ Liệu", "Không tìm thấy ngày nào hợp lệ có đủ dữ liệu lịch sử và kết quả ngày sau trong khoảng đã chọn.")
                 self.update_status("Tính hiệu suất thất bại: không đủ dữ liệu.")
-                return
+                return None
 
-            total_days_to_test = len(valid_predict_dates)
-            main_logger.info(f"Total valid days for performance test: {total_days_to_test} (From {valid_predict_dates[0]:%d/%m/%Y} to {valid_predict_dates[-1]:%d/%m/%Y})")
-            date_range_str_for_status = f"{start_s} - {end_s}"
+            main_logger.info(f"Total valid days for performance test: {len(valid_predict_dates)} (From {valid_predict_dates[0]:%d/%m/%Y} to {valid_predict_dates[-1]:%d/%m/%Y})")
 
         except Exception as prep_err:
             main_logger.error(f"Error preparing data for performance calculation: {prep_err}", exc_info=True)
             QMessageBox.critical(self, "Lỗi Chuẩn Bị Dữ Liệu", f"Đã xảy ra lỗi khi chuẩn bị dữ liệu:\n{prep_err}")
+            return None
+
+        return start_s, end_s, active_inst, draw_store, valid_predict_dates
+
+    def _set_performance_buttons_enabled(self, enabled):
+        """Bật/tắt các nút chạy của khung Hiệu suất Kết Hợp (tính hiệu suất và tối ưu trọng số)."""
+        for button_name in ('perf_calc_button', 'ensemble_opt_button'):
+            button = getattr(self, button_name, None)
+            if button is not None:
+                button.setEnabled(enabled)
+
+    def calculate_combined_performance(self):
+        """Prepares and starts the performance calculation worker thread."""
+        main_logger.info("Preparing for combined performance calculation...")
+
+        if self.performance_calc_running:
+            QMessageBox.warning(self, "Đang Chạy", "Quá trình tính hiệu suất khác đang diễn ra.")
             return
 
+        prepared = self._prepare_performance_run()
+        if prepared is None:
+            return
+        start_s, end_s, active_inst, draw_store, valid_predict_dates = prepared
+        active_names = list(active_inst.keys())
+        total_days_to_test = len(valid_predict_dates)
+        date_range_str_for_status = f"{start_s} - {end_s}"
+
         self.performance_calc_running = True
-        self.perf_calc_button.setEnabled(False)
+        self._set_performance_buttons_enabled(False)
 
         try:
             self.perf_progress_frame.setVisible(True)
@@ -13469,7 +13926,7 @@ class LotteryPredictionApp(QMainWindow):
         except Exception as ui_err:
             main_logger.error(f"Failed to initialize/show performance progress UI: {ui_err}", exc_info=True)
             self.performance_calc_running = False
-            if hasattr(self, 'perf_calc_button'): self.perf_calc_button.setEnabled(True)
+            self._set_performance_buttons_enabled(True)
             QMessageBox.critical(self, "Lỗi UI", f"Không thể hiển thị thanh tiến trình hiệu suất:\n{ui_err}")
             return
 
@@ -13480,17 +13937,20 @@ class LotteryPredictionApp(QMainWindow):
             if perf_sort_mode == 2 and not perf_custom_data:
                 QMessageBox.warning(self, "Thiếu File Sắp Xếp", "Bạn chọn sắp xếp theo file nhưng chưa tải file nào. Vui lòng chọn file .txt hoặc đổi chế độ.")
                 self.performance_calc_running = False
-                self.perf_calc_button.setEnabled(True)
+                self._set_performance_buttons_enabled(True)
                 return
         except Exception as e:
             main_logger.error(f"Error getting sort settings: {e}")
             perf_sort_mode = 0
             perf_custom_data = []
 
+        weight_snapshot = self._capture_weight_snapshot(active_names)
+
         main_logger.info("Starting performance calculation worker thread...")
         perf_thread = threading.Thread(
             target=self._performance_worker,
-            args=( active_inst, res_map, hist_cache, valid_predict_dates, start_s, end_s, total_days_to_test, perf_sort_mode, perf_custom_data ),
+            args=( active_inst, draw_store, valid_predict_dates, start_s, end_s, total_days_to_test, perf_sort_mode, perf_custom_data,
+                   weight_snapshot ),
             name="PerfCalcWorker",
             daemon=True
         )
@@ -13502,10 +13962,13 @@ class LotteryPredictionApp(QMainWindow):
         self.update_status(f"Bắt đầu tính hiệu suất ({total_days_to_test} ngày)...")
 
 
-    def _performance_worker(self, active_instances_main, results_map_main, history_cache_main,
+    def _performance_worker(self, active_instances_main, draw_store_main,
                            predict_dates_list_main, start_date_str_main, end_date_str_main, total_days_main,
-                           sort_mode, custom_sort_data):
-        """Worker thread for calculating combined performance (Tab Main)."""
+                           sort_mode, custom_sort_data, weight_snapshot):
+        """
+        Worker thread for calculating combined performance (Tab Main).
+        Trọng số lấy từ `weight_snapshot` (chụp khi bắt đầu), không đọc widget trong luồng nền.
+        """
         perf_logger_main = logging.getLogger("MainTabPerfWorker")
         perf_logger_main.info(f"MainTab PerfWorker started for {len(predict_dates_list_main)} days. Active Algos: {list(active_instances_main.keys())}")
 
@@ -13520,104 +13983,37 @@ class LotteryPredictionApp(QMainWindow):
         sleep_duration_main_tab = self.throttle_sleep_duration
         perf_logger_main.debug(f"MainTab PerfWorker Throttling: Enabled={throttling_enabled_main_tab}, Duration={sleep_duration_main_tab}s")
 
-        try:
-            for i_main, predict_dt_main in enumerate(predict_dates_list_main):
-                try:
-                    if throttling_enabled_main_tab and sleep_duration_main_tab > 0:
-                        time.sleep(sleep_duration_main_tab)
+        # Ngày thiếu lịch sử (ngày dự đoán không có trong dữ liệu) không được đối chiếu
+        check_rows_main = [draw_store_main.row_of(d + datetime.timedelta(days=1)) if d in draw_store_main.index else None
+                           for d in predict_dates_list_main]
+        backtest_main = Backtest(
+            active_instances_main, draw_store_main, weights=weight_snapshot,
+            sort_mode=sort_mode, custom_order=custom_sort_data, require_scores=False,
+            throttle_sleep=sleep_duration_main_tab if throttling_enabled_main_tab else 0.0)
 
-                    perf_logger_main.debug(f"MainTab PerfWorker processing predict_dt: {predict_dt_main}")
-                    check_dt_main = predict_dt_main + datetime.timedelta(days=1)
-                    actual_res_main = results_map_main.get(check_dt_main)
-                    hist_data_main = history_cache_main.get(predict_dt_main)
-
-                    if actual_res_main is None or hist_data_main is None:
-                        perf_logger_main.warning(f"MainTab PerfWorker skipping day {predict_dt_main}: Missing actual ({actual_res_main is None}) or history ({hist_data_main is None}).")
-                        errors_in_worker_main += 1
-                        continue
-
-                    day_results_main = {}
-                    hist_copy_for_day_main = copy.deepcopy(hist_data_main)
-
-                    for name_main, inst_main in active_instances_main.items():
-                        try:
-                            day_results_main[name_main] = inst_main.predict(predict_dt_main, hist_copy_for_day_main)
-                        except Exception as algo_e_main:
-                            perf_logger_main.error(f"MainTab PerfWorker error in {name_main}.predict() on {predict_dt_main}: {algo_e_main}", exc_info=False)
-                            day_results_main[name_main] = {}
-                            errors_in_worker_main += 1
-                    
-                    comb_scores_main = self.combine_algorithm_scores(day_results_main)
-                    if not comb_scores_main:
-                        perf_logger_main.warning(f"Combined scores empty for {predict_dt_main} in MainTab PerfWorker")
-                        errors_in_worker_main += 1
-                        continue
-                    
-                    valid_preds_day_main = []
-                    for n_str_m, s_val_m in comb_scores_main.items():
-                         if isinstance(n_str_m, str) and len(n_str_m)==2 and n_str_m.isdigit() and isinstance(s_val_m, (int,float)):
-                              try: valid_preds_day_main.append((int(n_str_m), float(s_val_m)))
-                              except (ValueError, TypeError): errors_in_worker_main += 1
-                         else: errors_in_worker_main += 1
-                    
-                    if not valid_preds_day_main:
-                        perf_logger_main.warning(f"No valid combined predictions for {predict_dt_main} (MainTab) after validation.")
-                        errors_in_worker_main += 1
-                        continue
-                    
-                    try:
-                        sorted_preds_main = self._apply_sorting_logic(
-                            valid_preds_day_main, sort_mode, custom_sort_data
-                        )
-                    except Exception as sort_err:
-                        perf_logger_main.error(f"Error sorting in worker: {sort_err}. Using default sort.")
-                        sorted_preds_main = sorted(valid_preds_day_main, key=lambda x: x[1], reverse=True)
-
-                    actual_set_main = self.extract_numbers_from_result_dict(actual_res_main)
-                    if not actual_set_main:
-                        perf_logger_main.warning(f"Could not extract actual numbers for check_dt {check_dt_main} (MainTab)")
+        try:
+            for chunk_main in backtest_main.iter_chunks(predict_dates_list_main, target_rows=check_rows_main):
+                errors_in_worker_main += chunk_main.algorithm_errors
+                for predict_dt_main, ok_main in zip(chunk_main.dates, chunk_main.comparable.tolist()):
+                    if not ok_main:
+                        perf_logger_main.warning(f"MainTab PerfWorker skipping day {predict_dt_main}: Missing actual results or history.")
                         errors_in_worker_main += 1
-                        continue
 
-                    spec_val_main = actual_res_main.get('special', actual_res_main.get('dac_biet'))
-                    actual_spec_main = -1
-                    if spec_val_main is not None:
-                         try:
-                             s_main = str(spec_val_main).strip()
-                             if len(s_main) >= 2 and s_main[-2:].isdigit(): actual_spec_main = int(s_main[-2:])
-                             elif len(s_main) == 1 and s_main.isdigit(): actual_spec_main = int(s_main)
-                         except (ValueError, TypeError): actual_spec_main = -1
-
-                    pred_top_1_main_num = sorted_preds_main[0][0] if sorted_preds_main else -1
-                    pred_top_3_main_set = {p[0] for p in sorted_preds_main[:3]}
-                    pred_top_5_main_set = {p[0] for p in sorted_preds_main[:5]}
-                    pred_top_10_main_set = {p[0] for p in sorted_preds_main[:10]}
-
-                    if pred_top_1_main_num != -1 and pred_top_1_main_num in actual_set_main: stats_main['hits_top_1'] += 1
-                    if actual_set_main.intersection(pred_top_3_main_set): stats_main['hits_top_3'] += 1
-                    if actual_set_main.intersection(pred_top_5_main_set): stats_main['hits_top_5'] += 1
-                    if actual_set_main.intersection(pred_top_10_main_set): stats_main['hits_top_10'] += 1
-
-                    if actual_spec_main != -1:
-                        if pred_top_1_main_num == actual_spec_main: stats_main['special_hits_top_1'] += 1
-                        if actual_spec_main in pred_top_5_main_set: stats_main['special_hits_top_5'] += 1
-                        if actual_spec_main in pred_top_10_main_set: stats_main['special_hits_top_10'] += 1
-                    
-                    stats_main['total_days_tested'] += 1
-
-                except Exception as day_e_main:
-                    perf_logger_main.error(f"MainTab PerfWorker unexpected error processing day {predict_dt_main}: {day_e_main}", exc_info=True)
-                    errors_in_worker_main += 1
-                
-                if (i_main + 1) % 5 == 0 or (i_main + 1) == total_days_main:
-                    progress_payload_main = {
-                        'current': i_main + 1, 'total': total_days_main,
-                        'errors': errors_in_worker_main, 'range_str': date_range_str_for_status_main
-                    }
-                    if hasattr(self, 'perf_queue') and self.perf_queue:
-                        try: self.perf_queue.put({'type': 'progress', 'payload': progress_payload_main})
-                        except Exception as q_put_err_main: perf_logger_main.error(f"Error putting progress to MainTab queue: {q_put_err_main}")
-                    else: perf_logger_main.warning("MainTab perf_queue not found in LotteryPredictionApp, cannot send progress.")
+                evaluation_main = chunk_main.evaluation
+                for k_main in (1, 3, 5, 10):
+                    stats_main[f'hits_top_{k_main}'] += evaluation_main.top_hits(k_main)
+                for k_main in (1, 5, 10):
+                    stats_main[f'special_hits_top_{k_main}'] += evaluation_main.special_hits(k_main)
+                stats_main['total_days_tested'] += evaluation_main.n_days
+
+                progress_payload_main = {
+                    'current': chunk_main.start + len(chunk_main.dates), 'total': total_days_main,
+                    'errors': errors_in_worker_main, 'range_str': date_range_str_for_status_main
+                }
+                if hasattr(self, 'perf_queue') and self.perf_queue:
+                    try: self.perf_queue.put({'type': 'progress', 'payload': progress_payload_main})
+                    except Exception as q_put_err_main: perf_logger_main.error(f"Error putting progress to MainTab queue: {q_put_err_main}")
+                else: perf_logger_main.warning("MainTab perf_queue not found in LotteryPredictionApp, cannot send progress.")
 
             finished_payload_main = {'stats': stats_main, 'errors': errors_in_worker_main}
             if hasattr(self, 'perf_queue') and self.perf_queue:
@@ -13634,6 +14030,223 @@ class LotteryPredictionApp(QMainWindow):
                 except Exception as q_put_err_main_crit: perf_logger_main.error(f"Error putting critical error to MainTab queue: {q_put_err_main_crit}")
             else: perf_logger_main.warning("MainTab perf_queue not found, cannot send critical error.")
 
+    def optimize_ensemble_weights(self):
+        """
+        Tối ưu trọng số của các thuật toán đang bật trên khoảng ngày của khung Hiệu suất Kết Hợp:
+        điểm của mỗi thuật toán được tính MỘT lần, sau đó vector trọng số được tìm trực tiếp trên
+        tensor điểm đã cache (không gọi predict trong lúc tìm).
+        """
+        main_logger.info("Preparing for ensemble weight optimization...")
+
+        if self.performance_calc_running:
+            QMessageBox.warning(self, "Đang Chạy", "Quá trình tính hiệu suất khác đang diễn ra.")
+            return
+
+        prepared = self._prepare_performance_run()
+        if prepared is None:
+            return
+        start_s, end_s, active_inst, draw_store, valid_predict_dates = prepared
+        active_names = list(active_inst.keys())
+        if len(active_names) < 2:
+            QMessageBox.warning(self, "Không Đủ Thuật Toán", "Cần kích hoạt ít nhất 2 thuật toán để tối ưu trọng số.")
+            return
+
+        if self.perf_sort_combo.currentIndex() != 0:
+            answer = QMessageBox.question(
+                self, "Chế Độ Sắp Xếp",
+                "Tối ưu trọng số luôn xếp hạng theo điểm Cao ➔ Thấp (chế độ sắp xếp đang chọn không được dùng).\n"
+                "Tiếp tục?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if answer != QMessageBox.Yes:
+                return
+
+        method = ENSEMBLE_METHODS[max(0, self.ensemble_method_combo.currentIndex())]
+        weight_snapshot = self._capture_weight_snapshot(active_names)
+        total_steps = len(valid_predict_dates) * len(active_names)
+
+        self.performance_calc_running = True
+        self._set_performance_buttons_enabled(False)
+        try:
+            self.perf_progress_frame.setVisible(True)
+            self.perf_status_label.setText(f"Đang tính điểm: ({start_s} - {end_s} / {len(valid_predict_dates)} ngày x {len(active_names)} thuật toán)")
+            self.perf_status_label.setObjectName("ProgressRunning")
+            self.perf_status_label.style().unpolish(self.perf_status_label)
+            self.perf_status_label.style().polish(self.perf_status_label)
+            self.perf_progressbar.setMaximum(total_steps)
+            self.perf_progressbar.setValue(0)
+            QApplication.processEvents()
+        except Exception as ui_err:
+            main_logger.error(f"Failed to initialize/show ensemble progress UI: {ui_err}", exc_info=True)
+            self.performance_calc_running = False
+            self._set_performance_buttons_enabled(True)
+            QMessageBox.critical(self, "Lỗi UI", f"Không thể hiển thị thanh tiến trình:\n{ui_err}")
+            return
+
+        main_logger.info(f"Starting ensemble weight worker ({method}) for {len(valid_predict_dates)} days: {active_names}")
+        ensemble_thread = threading.Thread(
+            target=self._ensemble_weight_worker,
+            args=(active_inst, draw_store, valid_predict_dates, start_s, end_s, weight_snapshot, method),
+            name="EnsembleWeightWorker",
+            daemon=True
+        )
+        ensemble_thread.start()
+
+        if not self.performance_timer.isActive():
+             self.performance_timer.start(self.performance_timer_interval)
+
+        self.update_status(f"Bắt đầu tối ưu trọng số ({len(active_names)} thuật toán, {len(valid_predict_dates)} ngày)...")
+
+    def _ensemble_weight_worker(self, active_instances, draw_store, predict_dates, start_s, end_s, weight_snapshot, method):
+        """
+        Worker thread tối ưu trọng số: ma trận điểm của mỗi thuật toán được tính một lần, vector trọng số
+        được tìm trên tensor đã cache (EnsembleWeightSearch), rồi bộ ban đầu và bộ tốt nhất được chấm lại
+        bằng Backtest (cùng cách tính với nút "Tính Toán", xếp hạng Cao ➔ Thấp).
+        """
+        ensemble_logger = logging.getLogger("EnsembleWeightWorker")
+        names = list(weight_snapshot.names)
+        n_days = len(predict_dates)
+        range_str = f"{start_s} - {end_s}"
+
+        def put_message(msg_type, payload):
+            try: self.perf_queue.put({'type': msg_type, 'payload': payload})
+            except Exception as q_err: ensemble_logger.error(f"Error putting '{msg_type}' to perf_queue: {q_err}")
+
+        try:
+            started = time.time()
+            score_chunks = {}
+            for algo_index, name in enumerate(names):
+                score_chunks[name] = compute_score_chunks(name, active_instances[name], predict_dates, draw_store)
+                put_message('ensemble_progress', {
+                    'current': (algo_index + 1) * n_days, 'total': n_days * len(names),
+                    'text': f"Đang tính điểm: ({range_str} / {algo_index + 1}/{len(names)} thuật toán)"})
+            algorithm_errors = sum(len(predict_dates[chunk_index * PREDICT_RANGE_CHUNK_DAYS:(chunk_index + 1) * PREDICT_RANGE_CHUNK_DAYS])
+                                   for chunks in score_chunks.values() for chunk_index, m in enumerate(chunks) if m is None)
+            scoring_elapsed = time.time() - started
+
+            chunk_tensors = []
+            for chunk_index, chunk_start in enumerate(range(0, n_days, PREDICT_RANGE_CHUNK_DAYS)):
+                chunk_len = len(predict_dates[chunk_start:chunk_start + PREDICT_RANGE_CHUNK_DAYS])
+                chunk_tensors.append(build_score_tensor(
+                    {name: score_chunks[name][chunk_index] for name in names}, names, chunk_len))
+            score_tensor = np.concatenate(chunk_tensors, axis=1)
+
+            one_day = datetime.timedelta(days=1)
+            target_rows = [draw_store.row_of(d + one_day) for d in predict_dates]
+            comparable = np.array([row is not None and bool(draw_store.presence[row].any()) for row in target_rows], dtype=bool)
+            tested_rows = [row for row, ok in zip(target_rows, comparable.tolist()) if ok]
+            ensemble_tensor = EnsembleTensor(names, score_tensor[:, comparable], draw_store.presence[tested_rows])
+
+            def report_search(evaluations, max_evaluations, best_score, best_weights):
+                put_message('ensemble_progress', {
+                    'current': evaluations, 'total': max_evaluations,
+                    'text': f"Đang tối ưu trọng số: {evaluations}/{max_evaluations} bộ - Top 3 tốt nhất {best_score[0]:.1f}%"})
+
+            search_started = time.time()
+            search = EnsembleWeightSearch(ensemble_tensor, weight_snapshot.weights, ENSEMBLE_MAX_EVALUATIONS,
+                                          progress_callback=report_search)
+            search_result = search.run(method)
+            search_elapsed = time.time() - search_started
+
+            def exact_stats(weights):
+                backtest = Backtest({}, draw_store, weights=WeightSnapshot(names, weights), require_scores=False,
+                                    precomputed_chunks=score_chunks)
+                return performance_summary(backtest.run(predict_dates, target_rows))
+
+            put_message('ensemble_finished', {
+                'names': names, 'method': method,
+                'initial_weights': weight_snapshot.weights.tolist(),
+                'best_weights': search_result['weights'].tolist(),
+                'initial_stats': exact_stats(weight_snapshot.weights),
+                'best_stats': exact_stats(search_result['weights']),
+                'evaluations': search_result['evaluations'], 'errors': algorithm_errors,
+                'scoring_elapsed': scoring_elapsed, 'search_elapsed': search_elapsed})
+            ensemble_logger.info(f"Ensemble weight search finished: {search_result['evaluations']} evaluations in "
+                                 f"{search_elapsed:.1f}s (scoring {scoring_elapsed:.1f}s), best {search_result['score']}")
+
+        except Exception as worker_err:
+            ensemble_logger.critical(f"Ensemble weight worker failed critically: {worker_err}", exc_info=True)
+            put_message('error', f"Lỗi nghiêm trọng khi tối ưu trọng số: {worker_err}")
+
+    def _show_ensemble_result(self, payload):
+        """Hiển thị kết quả tối ưu trọng số (trước/sau) và hỏi có áp dụng trọng số mới không."""
+        names = payload.get('names', [])
+        initial_weights = payload.get('initial_weights', [])
+        best_weights = payload.get('best_weights', [])
+        initial_stats = payload.get('initial_stats', {})
+        best_stats = payload.get('best_stats', {})
+
+        def score_of(stats):
+            return (stats.get('acc_top_3_pct', 0.0), stats.get('acc_top_5_pct', 0.0),
+                    stats.get('acc_top_1_pct', 0.0), -stats.get('avg_top10_repetition', 100.0))
+
+        improved = score_of(best_stats) > score_of(initial_stats) and best_weights != initial_weights
+        try:
+            self.performance_text.clear()
+            cursor = self.performance_text.textCursor()
+
+            def insert_perf_text(text, fmt_name="normal"):
+                fmt = self.perf_text_formats.get(fmt_name, self.perf_text_formats["normal"])
+                cursor.insertText(text, fmt)
+
+            insert_perf_text("=== TỐI ƯU TRỌNG SỐ ===\n", "section_header")
+            insert_perf_text(f"Phương pháp: {payload.get('method')} - {payload.get('evaluations', 0)} bộ trọng số trong "
+                             f"{payload.get('search_elapsed', 0.0):.1f}s (tính điểm {payload.get('scoring_elapsed', 0.0):.1f}s)\n")
+            if payload.get('errors', 0) > 0:
+                insert_perf_text(f"Số lỗi khi tính điểm: {payload['errors']}\n", "error")
+
+            insert_perf_text("\n--- Trọng số (hiện tại ➔ đề xuất) ---\n")
+            for name, old_w, new_w in zip(names, initial_weights, best_weights):
+                insert_perf_text(f"{name.split(' (')[0]}: {old_w:g} ➔ {new_w:g}\n")
+
+            insert_perf_text(f"\n--- Hiệu suất trên {best_stats.get('total_days_tested', 0)} ngày (hiện tại ➔ đề xuất) ---\n")
+            for k in (1, 3, 5, 10):
+                insert_perf_text(f"Top {k:<2}: {initial_stats.get(f'acc_top_{k}_pct', 0.0):6.1f}% ➔ {best_stats.get(f'acc_top_{k}_pct', 0.0):6.1f}%\n")
+            insert_perf_text(f"Lặp Top 10: {initial_stats.get('avg_top10_repetition', 0.0):.2f} ➔ {best_stats.get('avg_top10_repetition', 0.0):.2f}\n")
+            if not improved:
+                insert_perf_text("\nKhông tìm được bộ trọng số tốt hơn bộ hiện tại.\n")
+        except Exception as text_err:
+            main_logger.error(f"Error updating ensemble result text: {text_err}")
+            self.performance_text.setPlainText(f"Lỗi hiển thị kết quả:\n{text_err}")
+
+        if not improved:
+            self.update_status("Tối ưu trọng số xong: trọng số hiện tại đã tốt nhất.")
+            return
+        answer = QMessageBox.question(
+            self, "Áp Dụng Trọng Số",
+            f"Top 3: {initial_stats.get('acc_top_3_pct', 0.0):.1f}% ➔ {best_stats.get('acc_top_3_pct', 0.0):.1f}%\n"
+            "Áp dụng bộ trọng số đề xuất và lưu vào settings.ini?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes)
+        if answer == QMessageBox.Yes:
+            self._apply_ensemble_weights(dict(zip(names, best_weights)))
+        else:
+            self.update_status("Tối ưu trọng số xong (chưa áp dụng).")
+
+    def _apply_ensemble_weights(self, weights_by_name):
+        """Đặt trọng số cho các thuật toán (bật hệ số nhân) trên UI và lưu vào settings.ini."""
+        for algo_name, weight in weights_by_name.items():
+            algo_data = self.algorithms.get(algo_name)
+            if not algo_data: continue
+            chk_weight = algo_data.get('chk_weight')
+            weight_entry = algo_data.get('weight_entry')
+            if not chk_weight or not weight_entry: continue
+            weight_text = f"{weight:g}"
+            # Chặn tín hiệu: toggle_algorithm_weight/save_algorithm_weight_from_ui sẽ lưu config từng lần
+            for widget in (chk_weight, weight_entry): widget.blockSignals(True)
+            try:
+                chk_weight.setChecked(True)
+                weight_entry.setText(weight_text)
+                weight_entry.setEnabled(True)
+            finally:
+                for widget in (chk_weight, weight_entry): widget.blockSignals(False)
+            if not self.config.has_section(algo_name): self.config.add_section(algo_name)
+            self.config.set(algo_name, 'weight_enabled', 'True')
+            self.config.set(algo_name, 'weight_value', weight_text)
+        try:
+            self.save_config("settings.ini")
+            self.update_status("Đã áp dụng và lưu bộ trọng số tối ưu.")
+        except Exception as save_err:
+            main_logger.error(f"Failed to save config after applying ensemble weights: {save_err}", exc_info=True)
+            QMessageBox.critical(self, "Lỗi Lưu Hệ Số", f"Đã áp dụng trọng số nhưng không lưu được cấu hình:\n{save_err}")
+
     def _check_perf_queue(self):
         """Checks the performance queue and updates the UI (Identical logic, targets PyQt widgets)."""
         widgets_to_check = ['perf_status_label', 'perf_progressbar', 'perf_calc_button', 'performance_text']
@@ -13667,6 +14280,28 @@ class LotteryPredictionApp(QMainWindow):
                         self.perf_status_label.style().polish(self.perf_status_label)
                     except Exception as ui_err: main_logger.error(f"Error updating perf progress UI: {ui_err}")
 
+                elif msg_type == "ensemble_progress":
+                    try:
+                        self.perf_progressbar.setMaximum(max(1, payload.get('total', 1)))
+                        self.perf_progressbar.setValue(payload.get('current', 0))
+                        self.perf_status_label.setText(payload.get('text', ''))
+                    except Exception as ui_err: main_logger.error(f"Error updating ensemble progress UI: {ui_err}")
+
+                elif msg_type == "ensemble_finished":
+                    main_logger.info("Ensemble weight optimization finished signal received.")
+                    if self.performance_timer.isActive(): self.performance_timer.stop()
+                    self.performance_calc_running = False
+                    try:
+                        self._set_performance_buttons_enabled(True)
+                        self.perf_status_label.setText(f"Hoàn thành: {payload.get('evaluations', 0)} bộ trọng số")
+                        self.perf_status_label.setObjectName("ProgressSuccess")
+                        self.perf_status_label.style().unpolish(self.perf_status_label)
+                        self.perf_status_label.style().polish(self.perf_status_label)
+                        QTimer.singleShot(3000, lambda: self.perf_progress_frame.setVisible(False) if hasattr(self, 'perf_progress_frame') else None)
+                    except Exception as ui_err: main_logger.error(f"Error in final ensemble UI update: {ui_err}")
+                    self._show_ensemble_result(payload)
+                    return
+
                 elif msg_type == "error":
                     error_msg = payload
                     main_logger.error(f"Error from performance worker: {error_msg}")
@@ -13674,7 +14309,7 @@ class LotteryPredictionApp(QMainWindow):
                     if self.performance_timer.isActive(): self.performance_timer.stop()
                     self.performance_calc_running = False
                     try:
-                        self.perf_calc_button.setEnabled(True)
+                        self._set_performance_buttons_enabled(True)
                         self.perf_status_label.setText(f"Thất bại: {error_msg}")
                         self.perf_status_label.setObjectName("ProgressError")
                         self.perf_status_label.style().unpolish(self.perf_status_label)
@@ -13693,7 +14328,7 @@ class LotteryPredictionApp(QMainWindow):
                     total_tested = stats.get('total_days_tested', 0)
 
                     try:
-                        self.perf_calc_button.setEnabled(True)
+                        self._set_performance_buttons_enabled(True)
                         start_s = self.perf_start_date_edit.text()
                         end_s = self.perf_end_date_edit.text()
                         date_range_str_final = f"{start_s} - {end_s}"
@@ -13811,7 +14446,7 @@ class LotteryPredictionApp(QMainWindow):
             if self.performance_timer.isActive(): self.performance_timer.stop()
             self.performance_calc_running = False
             try:
-                self.perf_calc_button.setEnabled(True)
+                self._set_performance_buttons_enabled(True)
                 self.perf_status_label.setText(f"Lỗi Queue: {e}")
                 self.perf_status_label.setObjectName("ProgressError")
                 self.perf_status_label.style().unpolish(self.perf_status_label)
@@ -14554,6 +15189,7 @@ def main():
 
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     print(f"Running Python: {sys.version.split()[0]}")
     print(f"Base Directory: {Path(__file__).parent.resolve()}")
     print(f"Using PyQt5: {HAS_PYQT5}")
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import datetime
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engine.draw_store import DrawStore, PRIZE_KEYS  # noqa: E402
+
+START_DATE = datetime.date(2024, 1, 1)
+
+
+@pytest.fixture
+def make_store():
+    """
+    Dựng DrawStore tổng hợp từ {số thứ tự ngày: danh sách số (tối đa 27)} tính từ START_DATE.
+    Danh sách rỗng = ngày có bản ghi nhưng không có số nào; ngày không có trong dict = thiếu dữ liệu.
+    """
+    def build(days):
+        results = []
+        for offset, numbers in sorted(days.items()):
+            result = {key: f"{num:02d}" for key, num in zip(PRIZE_KEYS, numbers)}
+            results.append({'date': START_DATE + datetime.timedelta(days=offset), 'result': result})
+        return DrawStore(results)
+    return build
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""Backtest.run phải cho đúng kết quả của vòng lặp từng ngày trước đây; cắt tỉa không được đổi kết quả."""
+
+import datetime
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from engine.backtest import Backtest, performance_summary, slice_score_chunks
+from engine.scoring import WeightSnapshot
+
+NAMES = ('algo_a', 'algo_b')
+WEIGHTS = (1.0, 0.5)
+N_DAYS = 75
+GAP_DAY = 40         # Không có bản ghi: ngày 39 không có kết quả đối chiếu
+EMPTY_DAY = 20       # Có bản ghi nhưng không có số: ngày 19 không đối chiếu được
+NO_SCORES_DAY = 33   # Không thuật toán nào dự đoán
+
+
+@pytest.fixture
+def store(make_store):
+    rng = np.random.default_rng(13)
+    days = {offset: rng.integers(0, 100, size=27).tolist() for offset in range(N_DAYS) if offset != GAP_DAY}
+    days[EMPTY_DAY] = []
+    return make_store(days)
+
+
+@pytest.fixture
+def score_matrices(store):
+    """
+    Điểm delta là bội của 0.005 (không biểu diễn chính xác được ở hệ nhị phân) trong một khoảng hẹp:
+    tổng điểm rơi đúng vào biên làm tròn x.xx5 và có nhiều số bằng điểm.
+    """
+    rng = np.random.default_rng(31)
+    n_dates = len(store.dates)
+    matrices = {name: rng.integers(-40, 40, size=(n_dates, 100)) * 0.005 for name in NAMES}
+    matrices['algo_b'][rng.choice(n_dates, size=10, replace=False)] = np.nan
+    for matrix in matrices.values():
+        matrix[store.row_of(store.dates[0] + datetime.timedelta(days=NO_SCORES_DAY))] = np.nan
+    return matrices
+
+
+def naive_performance(store, score_matrices, decimals):
+    """Vòng lặp từng ngày như trình kiểm tra hiệu suất cũ: cộng delta, làm tròn bằng round(), sorted()."""
+    stats = {'total_days_tested': 0, 'hits_top_1': 0, 'hits_top_3': 0, 'hits_top_5': 0,
+             'hits_top_10': 0, 'errors': 0}
+    all_top10 = []
+    boundary_ties = 0
+    for row, predict_date in enumerate(store.dates):
+        actual_row = store.row_of(predict_date + datetime.timedelta(days=1))
+        actual_numbers = store.numbers_on(actual_row) if actual_row is not None else set()
+        if not actual_numbers:
+            stats['errors'] += 1
+            continue
+        deltas = [0.0] * 100
+        valid_algos = 0
+        for name, weight in zip(NAMES, WEIGHTS):
+            scores = score_matrices[name][row]
+            if np.isnan(scores).all():
+                continue
+            valid_algos += 1
+            for num in range(100):
+                deltas[num] += float(scores[num]) if weight == 1.0 else float(scores[num]) * weight
+        if valid_algos == 0:
+            stats['errors'] += 1
+            continue
+        raw_totals = [100.0 + d for d in deltas]
+        totals = raw_totals if decimals is None else [round(t, decimals) for t in raw_totals]
+        if len(set(totals)) < len(set(raw_totals)):
+            boundary_ties += 1
+        sorted_preds = sorted(enumerate(totals), key=lambda x: x[1], reverse=True)
+        for k in (1, 3, 5, 10):
+            if {num for num, _ in sorted_preds[:k]} & actual_numbers:
+                stats[f'hits_top_{k}'] += 1
+        all_top10.extend(list({num for num, _ in sorted_preds[:10]}))
+        stats['total_days_tested'] += 1
+    counts = Counter(all_top10)
+    stats['avg_top10_repetition'] = len(all_top10) / len(counts)
+    stats['max_top10_repetition_count'] = max(counts.values())
+    stats['top10_repetition_details'] = dict(counts.most_common(5))
+    return stats, boundary_ties
+
+
+def split_chunks(matrix, chunk_days):
+    return [matrix[start:start + chunk_days] for start in range(0, len(matrix), chunk_days)]
+
+
+@pytest.mark.parametrize('decimals', [2, 1, None])
+@pytest.mark.parametrize('chunk_days', [30, 7])
+def test_run_matches_naive_daily_loop(store, score_matrices, decimals, chunk_days):
+    expected, boundary_ties = naive_performance(store, score_matrices, decimals)
+    if decimals is not None:
+        assert boundary_ties > 0  # Dữ liệu phải thật sự có số bằng điểm sau khi làm tròn
+
+    backtest = Backtest({}, store, weights=WeightSnapshot(NAMES, WEIGHTS), decimals=decimals,
+                        precomputed_chunks={name: split_chunks(m, chunk_days) for name, m in score_matrices.items()},
+                        chunk_days=chunk_days)
+    stats = performance_summary(backtest.run(store.dates))
+
+    for key, value in expected.items():
+        assert stats[key] == value, key
+
+
+def test_errors_count_untested_days(store, score_matrices):
+    backtest = Backtest({}, store, weights=WeightSnapshot(NAMES, WEIGHTS),
+                        precomputed_chunks={name: split_chunks(m, 30) for name, m in score_matrices.items()})
+    result = backtest.run(store.dates)
+
+    # Ngày cuối, ngày trước chỗ thiếu dữ liệu, ngày trước ngày rỗng và ngày không có điểm
+    assert result.days_not_comparable == 3
+    assert result.days_without_scores == 1
+    assert performance_summary(result, missing_days=2)['errors'] == 6
+
+
+@pytest.mark.parametrize('start', [0, 1, 7, 29, 30, 45])
+def test_slice_score_chunks_matches_chunks_of_suffix(store, score_matrices, start):
+    matrix = score_matrices['algo_a']
+    chunks = split_chunks(matrix, 30)
+    chunks[1] = None  # Khối lỗi: ngày 30-59
+    sliced = slice_score_chunks(chunks, len(matrix), start)
+
+    expected = split_chunks(matrix[start:], 30)
+    assert len(sliced) == len(expected)
+    for position, (got, want) in enumerate(zip(sliced, expected)):
+        days = np.arange(start + position * 30, start + position * 30 + len(want))
+        failed = (days >= 30) & (days < 60)
+        if failed.all():
+            assert got is None
+        else:
+            assert np.array_equal(got[~failed], want[~failed], equal_nan=True)
+            assert np.isnan(got[failed]).all()
+
+
+def top_rate(result, k):
+    evaluation = result.evaluation
+    return evaluation.top_hits(k) / evaluation.n_days * 100.0 if evaluation.n_days else 0.0
+
+
+@pytest.mark.parametrize('prune_top_k', [1, 3, 10])
+@pytest.mark.parametrize('chunk_days', [30, 7, 1])
+def test_prune_below_never_drops_a_better_run(store, score_matrices, prune_top_k, chunk_days):
+    chunks = {name: split_chunks(m, chunk_days) for name, m in score_matrices.items()}
+
+    def run(prune_below=None):
+        backtest = Backtest({}, store, weights=WeightSnapshot(NAMES, WEIGHTS), precomputed_chunks=chunks,
+                            chunk_days=chunk_days, prune_below=prune_below, prune_top_k=prune_top_k)
+        return backtest.run(store.dates)
+
+    full = run()
+    full_rate = top_rate(full, prune_top_k)
+    assert not full.pruned
+    bounds = [0.0, full_rate - 1.0, full_rate, full_rate + 1e-9, full_rate + 1.0, full_rate + 15.0, 100.0, 101.0]
+    n_pruned = 0
+    for prune_below in bounds:
+        result = run(prune_below)
+        if result.pruned:
+            n_pruned += 1
+            # Chỉ cắt khi lượt chạy đầy đủ chắc chắn thấp hơn cận; phần đã chạy cũng thấp hơn cận
+            assert full_rate < prune_below
+            assert top_rate(result, prune_top_k) < prune_below
+            assert 0 < len(result.dates) < len(full.dates)
+            assert result.dates == full.dates[:len(result.dates)]
+        else:
+            # Không bị cắt: kết quả phải trùng với lượt chạy không có cận
+            assert result.dates == full.dates
+            assert np.array_equal(result.tested, full.tested)
+            assert np.array_equal(result.ranked, full.ranked)
+            assert np.array_equal(result.combined, full.combined, equal_nan=True)
+            assert performance_summary(result) == performance_summary(full)
+    assert n_pruned >= 2  # Cận 101% luôn bị cắt sau khối đầu tiên
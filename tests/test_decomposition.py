@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""DecomposedScorer phải cho đúng ma trận điểm của predict_range() với mọi bộ tham số."""
+
+import datetime
+import logging
+
+import numpy as np
+import pytest
+
+from algorithms.thuat_toan_01 import HistoryAppearancePointAlgorithm
+from engine.decomposition import DecomposedScorer
+from engine.draw_store import DrawStore, PRIZE_KEYS
+
+N_DAYS = 230
+GAP_DAYS = (60, 61, 200)   # Không có bản ghi: các đặc trưng theo "n ngày trước" phải bỏ qua
+EMPTY_DAY = 150            # Có bản ghi nhưng không có số
+TEST_DAYS = range(185, N_DAYS + 1)
+
+LINEAR_PARAMS = ('base_point_short', 'base_point_long', 'frequency_weight_short', 'frequency_weight_long',
+                 'neighbor_bonus', 'increment', 'bonus_after_3_days', 'bonus_long_absence',
+                 'deduction_if_appeared_last_day', 'bonus_freq_5', 'cycle_7_bonus', 'cycle_30_bonus',
+                 'special_multiplier', 'special_freq_multiplier', 'repeat_penalty_top')
+STRUCTURAL_CHOICES = {'short_term_days': [14, 9, 20], 'frequency_window_short': [45, 30],
+                      'frequency_window_long': [180, 120], 'neighbor_range': [5, 3]}
+
+
+@pytest.fixture(autouse=True)
+def quiet_algorithm_logs():
+    # predict() ghi log mỗi ngày; tắt để bài kiểm thử không bị chậm vì log
+    logger = logging.getLogger('algorithms.base')
+    previous = logger.level
+    logger.setLevel(logging.WARNING)
+    yield
+    logger.setLevel(previous)
+
+
+@pytest.fixture(scope='module')
+def store():
+    rng = np.random.default_rng(24)
+    start = datetime.date(2024, 1, 1)
+    results = []
+    for offset in range(N_DAYS):
+        if offset in GAP_DAYS:
+            continue
+        # Số nhỏ dày đặc hơn để tần suất vượt các ngưỡng (> 5, > 10) của thuật toán
+        numbers = [] if offset == EMPTY_DAY else rng.choice(100, size=27, p=np.linspace(2.0, 0.5, 100) / 125.0).tolist()
+        results.append({'date': start + datetime.timedelta(days=offset),
+                        'result': {key: f"{num:02d}" for key, num in zip(PRIZE_KEYS, numbers)}})
+    return DrawStore(results)
+
+
+@pytest.fixture(scope='module')
+def dates(store):
+    return [store.dates[0] + datetime.timedelta(days=offset) for offset in TEST_DAYS]
+
+
+def random_params(rng, base_params, structural=True):
+    params = dict(base_params)
+    for name in LINEAR_PARAMS:
+        params[name] = float(f"{base_params[name] * rng.uniform(0.5, 1.5):.6g}")
+    if structural:
+        for name, choices in STRUCTURAL_CHOICES.items():
+            params[name] = choices[rng.integers(len(choices))]
+    return params
+
+
+def assert_matches_predict_range(scorer, base, params, dates, store):
+    expected = base.with_parameters(params).predict_range(dates, store)
+    got = scorer.score_matrix(params)
+    assert got is not None
+    assert np.array_equal(got, expected, equal_nan=True)
+    chunks = scorer.score_chunks(params, chunk_days=7)
+    assert np.array_equal(np.vstack(chunks), expected, equal_nan=True)
+
+
+def test_linear_parameter_changes_reuse_one_decomposition(store, dates):
+    base = HistoryAppearancePointAlgorithm()
+    scorer = DecomposedScorer(base, dates, store)
+    rng = np.random.default_rng(1)
+    base_params = base.get_config()['parameters']
+    assert_matches_predict_range(scorer, base, base_params, dates, store)
+    for _ in range(6):
+        assert_matches_predict_range(scorer, base, random_params(rng, base_params, structural=False), dates, store)
+    assert len(scorer._decompositions) == 1
+
+
+def test_structural_parameter_change_rebuilds_features(store, dates):
+    base = HistoryAppearancePointAlgorithm()
+    scorer = DecomposedScorer(base, dates, store, max_entries=2)
+    base_params = base.get_config()['parameters']
+    assert_matches_predict_range(scorer, base, base_params, dates, store)
+    first = scorer._decompositions[-1]
+
+    # short_term_days đổi số hạng: phải phân rã lại chứ không dùng đặc trưng cũ
+    shorter = {**base_params, 'short_term_days': 9, 'base_point_short': 4.1}
+    assert not first.matches(shorter)
+    assert_matches_predict_range(scorer, base, shorter, dates, store)
+    assert scorer._decompositions[-1] is not first
+    assert scorer._decompositions[-1].structural['short_term_days'] == 9
+
+    # Quay về bộ gốc dùng lại lần phân rã đầu; vượt max_entries thì lần cũ nhất bị bỏ
+    assert_matches_predict_range(scorer, base, base_params, dates, store)
+    assert scorer._decompositions[-1] is first
+    assert_matches_predict_range(scorer, base, {**base_params, 'neighbor_range': 3}, dates, store)
+    assert len(scorer._decompositions) == 2 and first in scorer._decompositions
+
+
+def test_random_parameter_sets_match_predict_range(store, dates):
+    base = HistoryAppearancePointAlgorithm()
+    scorer = DecomposedScorer(base, dates, store, max_entries=3)
+    rng = np.random.default_rng(2024)
+    base_params = base.get_config()['parameters']
+    for _ in range(8):
+        assert_matches_predict_range(scorer, base, random_params(rng, base_params), dates, store)
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""EnsembleTensor phải xếp hạng và chấm điểm đúng như combine_score_tensor + rank_matrix và Backtest."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from engine.backtest import Backtest, performance_summary
+from engine.ensemble import ENSEMBLE_WEIGHT_MAX, ENSEMBLE_WEIGHT_STEP, EnsembleTensor
+from engine.evaluator import rank_matrix
+from engine.scoring import WeightSnapshot, combine_score_tensor
+
+NAMES = ('algo_a', 'algo_b', 'algo_c')
+N_DAYS = 90
+CHUNK_DAYS = 30
+GAP_DAY = 50         # Không có bản ghi: ngày 49 không đối chiếu được
+NO_SCORES_DAY = 17   # Không thuật toán nào dự đoán: tổng = điểm gốc
+
+
+@pytest.fixture
+def store(make_store):
+    rng = np.random.default_rng(25)
+    return make_store({offset: rng.integers(0, 100, size=27).tolist() for offset in range(N_DAYS) if offset != GAP_DAY})
+
+
+@pytest.fixture
+def score_matrices(store):
+    """
+    Điểm delta là bội của 0.005 trong một khoảng hẹp (tổng rơi vào biên làm tròn x.xx5, nhiều số bằng
+    điểm), thêm các hàng NaN (thuật toán không dự đoán ngày đó).
+    """
+    rng = np.random.default_rng(52)
+    n_dates = len(store.dates)
+    matrices = {name: rng.integers(-40, 40, size=(n_dates, 100)) * 0.005 for name in NAMES}
+    matrices['algo_c'] = rng.integers(-3, 4, size=(n_dates, 100)) * 0.25
+    matrices['algo_b'][rng.choice(n_dates, size=12, replace=False)] = np.nan
+    for matrix in matrices.values():
+        matrix[NO_SCORES_DAY] = np.nan
+    return matrices
+
+
+def random_weights(rng, n):
+    """Trọng số trên lưới của EnsembleWeightSearch, cả 0 (bỏ thuật toán) và 1 (không nhân)."""
+    weights = rng.integers(0, int(round(ENSEMBLE_WEIGHT_MAX / ENSEMBLE_WEIGHT_STEP)) + 1, size=n) * ENSEMBLE_WEIGHT_STEP
+    return np.round(weights, 6)
+
+
+WEIGHT_CASES = [np.ones(3), np.zeros(3), np.array([0.0, 1.0, 0.35]), np.array([2.95, 0.05, 1.0]),
+                np.array([0.3, 0.7, 1.1])] + [random_weights(np.random.default_rng(seed), 3) for seed in range(12)]
+
+
+def ensemble_inputs(store, score_matrices):
+    """Tensor và kết quả thực tế của các ngày đối chiếu được, dựng như _ensemble_weight_worker."""
+    tensor = np.stack([score_matrices[name] for name in NAMES])
+    one_day = datetime.timedelta(days=1)
+    target_rows = [store.row_of(d + one_day) for d in store.dates]
+    comparable = np.array([row is not None and bool(store.presence[row].any()) for row in target_rows], dtype=bool)
+    tested_rows = [row for row, ok in zip(target_rows, comparable.tolist()) if ok]
+    return tensor[:, comparable], store.presence[tested_rows]
+
+
+@pytest.mark.parametrize('decimals', [2, 1, 0, None, 12])
+def test_top10_matches_rank_matrix_of_combined_scores(store, score_matrices, decimals):
+    tensor, presence = ensemble_inputs(store, score_matrices)
+    ensemble = EnsembleTensor(NAMES, tensor, presence, decimals=decimals)
+    for weights in WEIGHT_CASES:
+        combined = combine_score_tensor(tensor, WeightSnapshot(NAMES, weights), decimals)
+        expected = rank_matrix(combined)[:, :10]
+        assert np.array_equal(ensemble.top10(weights), expected), weights
+
+
+@pytest.mark.parametrize('decimals', [2, None])
+def test_evaluate_matches_backtest(store, score_matrices, decimals):
+    tensor, presence = ensemble_inputs(store, score_matrices)
+    ensemble = EnsembleTensor(NAMES, tensor, presence, decimals=decimals)
+    chunks = {name: [m[start:start + CHUNK_DAYS] for start in range(0, len(m), CHUNK_DAYS)]
+              for name, m in score_matrices.items()}
+    for weights in WEIGHT_CASES:
+        backtest = Backtest({}, store, weights=WeightSnapshot(NAMES, weights), decimals=decimals,
+                            require_scores=False, precomputed_chunks=chunks, chunk_days=CHUNK_DAYS)
+        expected = performance_summary(backtest.run(store.dates))
+        stats = ensemble.evaluate(weights)
+        assert expected['total_days_tested'] == ensemble.n_days == len(store.dates) - 2
+        for key, value in stats.items():
+            assert value == expected[key], (key, weights)
+        assert ensemble.score_tuple(weights) == (expected['acc_top_3_pct'], expected['acc_top_5_pct'],
+                                                 expected['acc_top_1_pct'], -expected['avg_top10_repetition'])
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+"""Sổ cái kết quả: lưu/đọc đúng kiểu dữ liệu và không bao giờ trả về kết quả cũ khi khóa đã đổi."""
+
+import json
+import datetime
+
+import pytest
+
+from engine.eval_db import (EvaluationLedger, KIND_PERFORMANCE, KIND_STREAK, _decode, _encode,
+                            algorithm_fingerprint)
+
+START = datetime.date(2024, 1, 1)
+END = datetime.date(2024, 6, 30)
+PARAMS = {'window': 20, 'weight': 0.35, 'milestones': [3, 7, 10], 'mode': 'fast'}
+PERFORMANCE = {
+    'total_days_tested': 170, 'hits_top_1': 12, 'hits_top_3': 51, 'hits_top_5': 80, 'hits_top_10': 122,
+    'errors': 3, 'avg_top10_repetition': 4.25, 'max_top10_repetition_count': 19,
+    'top10_repetition_details': {7: 19, 42: 17, 0: 15, 99: 12, 13: 11},
+    'score_tuple': (30.0, 47.06, -2.5),
+    'streak': (9, 'streak_limit_reached', datetime.date(2024, 3, 2)),
+    'per_period': [{'range': '01/01 - 31/01', 'top3': (11, 31)}, {(1, 2): [0.5, None]}],
+    'empty': {},
+}
+
+
+def write_algorithm(path, body):
+    path.write_text(f"# -*- coding: utf-8 -*-\nVALUE = {body!r}\n", encoding='utf-8')
+    return path
+
+
+@pytest.mark.parametrize('value', [
+    PERFORMANCE,
+    {0: 1, '0': 2},                       # Khóa int và khóa chuỗi cùng "0" không được gộp
+    {(3, 'a'): (1, (2, [3, (4,)]))},      # Tuple lồng nhau, làm khóa lẫn giá trị
+    [(), [], {}, None, True, 1.5, 'x'],
+])
+def test_encode_decode_round_trip(value):
+    restored = _decode(json.loads(json.dumps(_encode(value))))
+    assert restored == value
+    assert repr(restored) == repr(value)  # Cả kiểu tuple/list và int/str của khóa
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = EvaluationLedger(tmp_path / "optimize" / "evaluations.sqlite")
+    yield ledger
+    ledger.close()
+
+
+@pytest.fixture
+def sources(tmp_path):
+    return {name: write_algorithm(tmp_path / f"{name}.py", name) for name in ('target', 'combo_a', 'combo_b')}
+
+
+def make_scope(ledger, sources, combo_names=('combo_a', 'combo_b'), data_version='v1',
+               start=START, end=END, kind=KIND_PERFORMANCE):
+    """Khóa phạm vi dựng như _performance_ledger_scope của main.py."""
+    combination = [[name, algorithm_fingerprint(sources[name])] for name in combo_names]
+    return ledger.scope(kind, algorithm_fingerprint(sources['target']), combination, start, end, data_version)
+
+
+def test_put_get_and_reopen(tmp_path, ledger, sources):
+    scope = make_scope(ledger, sources)
+    assert scope.get(PARAMS) is None
+    scope.put(PARAMS, PERFORMANCE)
+    assert scope.get(PARAMS) == PERFORMANCE
+    # Cùng khóa dựng lại (thứ tự bộ kết hợp khác, tham số float lệch dưới 6 chữ số có nghĩa)
+    same = make_scope(ledger, sources, combo_names=('combo_b', 'combo_a'))
+    assert same.get({**PARAMS, 'weight': 0.35000000001}) == PERFORMANCE
+    assert (scope.hits, same.hits) == (1, 1)
+
+    ledger.close()
+    reopened = EvaluationLedger(tmp_path / "optimize" / "evaluations.sqlite")
+    try:
+        assert len(reopened) == 1
+        assert make_scope(reopened, sources).get(PARAMS) == PERFORMANCE
+    finally:
+        reopened.close()
+
+
+def test_changed_key_misses_instead_of_returning_stale_row(ledger, sources):
+    make_scope(ledger, sources).put(PARAMS, PERFORMANCE)
+
+    misses = {
+        'params': lambda: make_scope(ledger, sources).get({**PARAMS, 'window': 21}),
+        'list param': lambda: make_scope(ledger, sources).get({**PARAMS, 'milestones': [3, 7, 11]}),
+        'combination': lambda: make_scope(ledger, sources, combo_names=('combo_a',)).get(PARAMS),
+        'data version': lambda: make_scope(ledger, sources, data_version='v2').get(PARAMS),
+        'date range': lambda: make_scope(ledger, sources, end=END - datetime.timedelta(days=1)).get(PARAMS),
+        'kind': lambda: make_scope(ledger, sources, kind=KIND_STREAK).get(PARAMS),
+    }
+    for reason, lookup in misses.items():
+        assert lookup() is None, reason
+
+    # Sửa mã nguồn thuật toán đích rồi của một thuật toán kết hợp: cả hai đều phải trượt
+    write_algorithm(sources['target'], 'target v2')
+    assert make_scope(ledger, sources).get(PARAMS) is None
+    make_scope(ledger, sources).put(PARAMS, {'hits_top_3': 1})
+    write_algorithm(sources['combo_b'], 'combo_b v2')
+    assert make_scope(ledger, sources).get(PARAMS) is None
+
+    # Hoàn nguyên mã nguồn: kết quả ban đầu dùng lại được
+    write_algorithm(sources['target'], 'target')
+    write_algorithm(sources['combo_b'], 'combo_b')
+    assert make_scope(ledger, sources).get(PARAMS) == PERFORMANCE
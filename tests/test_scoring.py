@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""round_like_python/round_to_units phải trùng từng bit với round() của Python."""
+
+import math
+
+import numpy as np
+import pytest
+
+from engine.scoring import MAX_VECTOR_ROUND_DECIMALS, round_like_python, round_to_units
+
+
+def random_values(seed, size=4000):
+    """Số ngẫu nhiên ở nhiều độ lớn, cả âm lẫn dương, như điểm gốc 100 cộng delta."""
+    rng = np.random.default_rng(seed)
+    magnitudes = 10.0 ** rng.integers(-4, 7, size=size)
+    values = rng.uniform(-1.0, 1.0, size=size) * magnitudes
+    values[: size // 4] += 100.0
+    return values
+
+
+def halfway_values(decimals):
+    """
+    Các giá trị viết ở hệ thập phân nằm đúng giữa hai bội của 10^-decimals (x.xx5 khi decimals=2).
+    Phần lớn không biểu diễn chính xác được nên float thật nằm lệch về một phía.
+    """
+    values = []
+    for whole in (0, 1, 2, 7, 99, 100, 101, 12345):
+        for digits in range(0, 10 ** decimals, max(1, 10 ** decimals // 40)):
+            text = f"{whole}.{digits:0{decimals}d}5" if decimals else f"{whole}.5"
+            values.extend([float(text), -float(text)])
+    return np.array(values)
+
+
+def assert_matches_round(values, decimals):
+    got = round_like_python(values, decimals)
+    assert got.shape == np.shape(values)
+    for value, result in zip(np.ravel(values).tolist(), got.ravel().tolist()):
+        expected = round(value, decimals)
+        if math.isnan(expected):
+            assert math.isnan(result), value
+        else:
+            # So sánh cả dấu của số 0 (round(-0.001, 2) == -0.0)
+            assert (result, math.copysign(1.0, result)) == (expected, math.copysign(1.0, expected)), (value, decimals)
+
+
+@pytest.mark.parametrize('decimals', range(0, MAX_VECTOR_ROUND_DECIMALS + 1))
+def test_random_floats_match_round(decimals):
+    assert_matches_round(random_values(decimals), decimals)
+
+
+@pytest.mark.parametrize('decimals', [0, 1, 2, 3, 5])
+def test_halfway_values_match_round(decimals):
+    values = halfway_values(decimals)
+    assert_matches_round(values, decimals)
+    # Tích v*10^decimals rơi đúng vào .5 ở nhiều giá trị: đây là nhánh sửa bằng phép tách Dekker
+    scaled = values * 10.0 ** decimals
+    assert (np.abs(scaled - np.rint(scaled)) == 0.5).any()
+
+
+def test_exact_binary_halves_round_to_even():
+    # Các giá trị này biểu diễn chính xác: nửa đơn vị thật, round() làm tròn về số chẵn
+    values = np.array([0.5, 1.5, 2.5, -0.5, -2.5, 0.125, 0.375, -0.625, 100.25, 100.75, -100.25])
+    for decimals in (0, 1, 2):
+        assert_matches_round(values, decimals)
+    assert round_like_python(np.array([0.125, 0.375]), 2).tolist() == [0.12, 0.38]
+
+
+@pytest.mark.parametrize('decimals', [0, 2, 11, 12, 15, -1, -2])
+def test_special_and_out_of_range_values(decimals):
+    values = np.array([[np.nan, np.inf, -np.inf, 0.0], [-0.0, 3e15, -4.5e17, 1e300]])
+    assert_matches_round(np.vstack([values, random_values(99, size=4).reshape(1, 4)]), decimals)
+
+
+@pytest.mark.parametrize('decimals', [0, 1, 2, 4, 8, 11])
+def test_round_to_units_scales_round(decimals):
+    values = np.concatenate([random_values(7 + decimals, size=1000), halfway_values(min(decimals, 3))])
+    values = values[np.abs(values) * 10.0 ** decimals < 2.0 ** 52]
+    units = round_to_units(values, decimals)
+    assert np.array_equal(units, np.round(units))
+    expected = [round(value, decimals) for value in values.tolist()]
+    assert (units / 10.0 ** decimals).tolist() == expected
@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""Các bộ sinh và chiến lược tìm kiếm tham số của engine/search.py."""
+
+import itertools
+import json
+
+import numpy as np
+import pytest
+
+from engine.search import (ParameterGrid, ParameterSpace, PatternSearch, SuccessiveHalving, make_search_strategy,
+                           params_key)
+
+BASE_PARAMS = {'window': 10, 'weight': 0.5, 'bonus': 1.0, 'mode': 'fast'}
+NAMES = ['window', 'weight', 'bonus']
+VALUE_LISTS = [[5, 10, 15], [0.25, 0.5], [0.5, 1.0, 1.5, 2.0]]
+
+
+def product_params(limit=None):
+    combos = itertools.product(*VALUE_LISTS)
+    if limit is not None:
+        combos = itertools.islice(combos, limit)
+    return [{**BASE_PARAMS, **dict(zip(NAMES, values))} for values in combos]
+
+
+@pytest.mark.parametrize('limit', [None, 0, 1, 7, 24, 100])
+def test_grid_matches_itertools_product(limit):
+    grid = ParameterGrid(BASE_PARAMS, NAMES, VALUE_LISTS, limit=limit)
+    expected = product_params(limit if limit else None)
+
+    assert len(grid) == len(expected)
+    assert list(grid) == expected
+    assert [grid[i] for i in range(len(grid))] == expected
+    assert grid[-1] == expected[-1]
+    assert grid[2:9] == expected[2:9]
+    with pytest.raises(IndexError):
+        grid[len(grid)]
+
+
+@pytest.mark.parametrize('limit', [None, 17])
+def test_resume_from_every_checkpoint(limit):
+    grid = ParameterGrid(BASE_PARAMS, NAMES, VALUE_LISTS, limit=limit)
+    expected = list(grid)
+    for next_ordinal in range(len(grid) + 1):
+        # Checkpoint lưu số thứ tự bộ kế tiếp; phiên tiếp tục đánh số lại từ đó
+        resumed = grid.from_ordinal(next_ordinal)
+        done_before = [grid[i] for i in range(next_ordinal)]
+        assert done_before + list(resumed) == expected
+        assert [resumed.ordinal(i) for i in range(len(resumed))] == list(range(next_ordinal, len(grid)))
+        assert resumed.signature() == grid.signature()
+
+
+def test_resume_twice_and_past_the_end():
+    grid = ParameterGrid(BASE_PARAMS, NAMES, VALUE_LISTS)
+    resumed = grid.from_ordinal(5).from_ordinal(11)
+    assert list(resumed) == product_params()[11:]
+    assert len(grid.from_ordinal(len(grid) + 3)) == 0
+
+
+# --- SuccessiveHalving ---
+
+@pytest.mark.parametrize('n_candidates, total_days, expected_rounds', [
+    (100, 360, [(100, 30), (34, 45), (12, 90), (4, 180), (3, 360)]),
+    (100, 40, [(100, 30), (34, 30), (12, 30), (4, 30), (3, 40)]),
+    (10, 61, [(10, 30), (4, 31), (3, 61)]),
+    (27, 200, [(27, 50), (9, 100), (3, 200)]),
+    (100, 20, [(100, 20)]),   # Khoảng ngày ngắn hơn vòng tối thiểu: chấm hết một lượt
+    (3, 360, [(3, 360)]),
+    (0, 100, [(0, 100)]),
+])
+def test_racing_schedule(n_candidates, total_days, expected_rounds):
+    racing = SuccessiveHalving(n_candidates, total_days)
+    assert racing.rounds == expected_rounds
+    assert racing.planned_days == sum(count * days for count, days in expected_rounds)
+
+
+def reference_survivors(survivors, scores, keep):
+    """Giữ `keep` bộ điểm cao nhất; điểm None xếp cuối, bằng điểm thì bộ đứng trước thắng."""
+    ranked = sorted(range(len(survivors)), key=lambda i: (scores[i] is None, -(scores[i] or 0.0), i))
+    return sorted(survivors[i] for i in ranked[:keep])
+
+
+@pytest.mark.parametrize('n_candidates, total_days', [(100, 360), (57, 120), (10, 61), (4, 90)])
+def test_racing_keeps_best_survivors_each_round(n_candidates, total_days):
+    rng = np.random.default_rng(n_candidates)
+    quality = rng.integers(0, 8, size=n_candidates) * 0.5  # Nhiều bộ bằng điểm
+    failing = set(rng.choice(n_candidates, size=n_candidates // 10, replace=False).tolist())
+    racing = SuccessiveHalving(n_candidates, total_days)
+    calls = []
+
+    def evaluate(round_index, survivors, n_days):
+        # Điểm đổi theo số ngày để mỗi vòng xếp hạng khác nhau
+        scores = [None if i in failing else float(quality[i] + (i * n_days) % 7 * 0.25) for i in survivors]
+        calls.append((round_index, list(survivors), n_days, scores))
+        return scores
+
+    finalists, final_scores = racing.run(evaluate)
+
+    assert [(len(survivors), n_days) for _, survivors, n_days, _ in calls] == racing.rounds
+    assert [round_index for round_index, _, _, _ in calls] == list(range(len(racing.rounds)))
+    assert calls[0][1] == list(range(n_candidates))
+    for (_, survivors, _, scores), (_, next_survivors, _, _) in zip(calls, calls[1:]):
+        assert next_survivors == reference_survivors(survivors, scores, len(next_survivors))
+    assert calls[-1][2] == total_days
+    assert (finalists, final_scores) == (calls[-1][1], calls[-1][3])
+    assert racing.days_evaluated == racing.planned_days
+
+
+def test_racing_stops_when_evaluate_returns_none():
+    racing = SuccessiveHalving(40, 200)
+    seen_rounds = []
+
+    def evaluate(round_index, survivors, n_days):
+        seen_rounds.append(round_index)
+        return None if round_index == 1 else [float(i % 5) for i in survivors]
+
+    assert racing.run(evaluate) is None
+    assert seen_rounds == [0, 1]
+    assert racing.days_evaluated == racing.rounds[0][0] * racing.rounds[0][1]
+
+
+# --- Chiến lược ask/tell ---
+
+SEARCH_PARAMS = {'window': 20, 'weight': 0.5, 'penalty': -2.0, 'bonus': 1.5, 'mode': 'fast'}
+SEARCH_TARGET = {'window': 24, 'weight': 0.61, 'penalty': -1.7, 'bonus': 1.2}
+
+
+def objective(params, trial_index):
+    """Điểm dạng tuple như get_score của trình tối ưu; một số lượt thử lỗi (None)."""
+    if trial_index % 9 == 4:
+        return None
+    distance = sum((float(params[k]) - v) ** 2 / max(abs(v), 1.0) for k, v in SEARCH_TARGET.items())
+    return (round(-distance, 9), -abs(params['window'] - SEARCH_TARGET['window']))
+
+
+def run_trials(strategy, n_trials, trials=None):
+    """Vòng ask/tell của _run_search_strategy; trả về danh sách [bộ tham số, điểm] như checkpoint."""
+    trials = [] if trials is None else trials
+    for _ in range(n_trials):
+        params = strategy.ask()
+        if strategy.finished:
+            break
+        score = objective(params, len(trials))
+        strategy.tell(params, score)
+        trials.append([params, list(score) if score is not None else None])
+    return trials
+
+
+def restore(name, checkpoint, seed):
+    """Dựng lại chiến lược và phát lại các lần thử đã lưu như khi tiếp tục từ checkpoint."""
+    strategy = make_search_strategy(name, ParameterSpace(checkpoint['origin_params']), seed)
+    trials = []
+    for recorded_params, recorded_score in checkpoint['trials']:
+        params = strategy.ask()
+        assert params_key(params) == params_key(recorded_params)
+        strategy.tell(params, tuple(recorded_score) if recorded_score is not None else None)
+        trials.append([params, recorded_score])
+    assert json.loads(json.dumps(strategy.rng.bit_generator.state)) == checkpoint['rng_state']
+    return strategy, trials
+
+
+def assert_same_seed_same_sequence(name, n_trials):
+    first = run_trials(make_search_strategy(name, ParameterSpace(SEARCH_PARAMS), 123), n_trials)
+    second = run_trials(make_search_strategy(name, ParameterSpace(SEARCH_PARAMS), 123), n_trials)
+    assert len(first) == n_trials
+    assert first == second
+    return first
+
+
+def assert_resume_continues_identically(name, seed, checkpoint_at, n_more):
+    strategy = make_search_strategy(name, ParameterSpace(SEARCH_PARAMS), seed)
+    trials = run_trials(strategy, checkpoint_at)
+    # Checkpoint được ghi ra JSON: tuple điểm thành list, trạng thái rng thành dict thuần
+    checkpoint = json.loads(json.dumps({'origin_params': SEARCH_PARAMS, 'trials': trials,
+                                        'rng_state': strategy.rng.bit_generator.state}))
+    resumed, resumed_trials = restore(name, checkpoint, seed)
+    assert run_trials(resumed, n_more, resumed_trials) == run_trials(strategy, n_more, trials)
+
+
+@pytest.mark.parametrize('name', ['random', 'cmaes', 'tpe'])
+def test_same_seed_same_ask_sequence(name):
+    trials = assert_same_seed_same_sequence(name, 40)
+    other_seed = run_trials(make_search_strategy(name, ParameterSpace(SEARCH_PARAMS), 321), 40)
+    assert other_seed != trials
+    space = ParameterSpace(SEARCH_PARAMS)
+    for params, _ in trials:
+        assert params['mode'] == 'fast' and isinstance(params['window'], int)
+        assert all(space.lower[i] <= params[k] <= space.upper[i] for i, k in enumerate(space.names))
+
+
+# Điểm dừng: giữa/cuối một thế hệ CMA-ES (popsize = 8), trước/sau giai đoạn khởi động của TPE (10)
+@pytest.mark.parametrize('checkpoint_at', [0, 1, 5, 8, 9, 10, 11, 23])
+@pytest.mark.parametrize('name', ['random', 'cmaes', 'tpe'])
+def test_resume_from_checkpoint_continues_identically(name, checkpoint_at):
+    assert_resume_continues_identically(name, 7, checkpoint_at, 25)
+
+
+def test_pattern_search_is_deterministic_and_resumes():
+    trials = assert_same_seed_same_sequence('pattern', 40)
+    assert trials[0][0] == SEARCH_PARAMS  # Lượt đầu chấm bộ gốc
+    for checkpoint_at in (0, 1, 2, 3, 7, 20):
+        assert_resume_continues_identically('pattern', 7, checkpoint_at, 30)
+
+
+def test_pattern_search_converges_on_quadratic():
+    strategy = PatternSearch(ParameterSpace(SEARCH_PARAMS))
+
+    def quadratic(params):
+        return (-sum((float(params[k]) - v) ** 2 for k, v in SEARCH_TARGET.items()),)
+
+    for _ in range(1000):
+        params = strategy.ask()
+        if strategy.finished:
+            break
+        strategy.tell(params, quadratic(params))
+    assert strategy.finished
+
+    best = strategy.current
+    assert best['window'] == SEARCH_TARGET['window'] and best['mode'] == 'fast'
+    for name in ('weight', 'penalty', 'bonus'):
+        assert abs(best[name] - SEARCH_TARGET[name]) <= strategy.resolutions[name], name
+    assert strategy.best_score == quadratic(best)
+    assert all(score <= strategy.best_score for _, score in strategy.history)
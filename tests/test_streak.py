@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""HitVector/longest_streak phải cho cùng kết quả với run_streak (dự đoán từng ngày)."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+from algorithms.base import BaseAlgorithm
+from engine.backtest import Backtest, compute_hit_vector, longest_streak, run_streak
+
+# Kết quả dự đoán ngày thứ i (đối chiếu với ngày i+1): H = trúng, M = trượt, N = không có điểm
+PATTERN = "HHHMHHNHHHHHHHHHMHHHHHHHMMHHHHHHHHHHHMHHHHHHH"
+GAP_DAY = 29     # Không có bản ghi: ngày 28 hết dữ liệu đối chiếu, ngày 29 thiếu lịch sử
+EMPTY_DAY = 12   # Có bản ghi nhưng không có số: ngày 11 được bỏ qua, chuỗi không ngắt
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def number_on(offset):
+    # Mỗi ngày đúng một số, không bao giờ là 00-09 (các số bằng điểm đứng đầu sau số được chọn)
+    return 10 + offset % 90
+
+
+class ScriptedAlgorithm(BaseAlgorithm):
+    """Đẩy lên đầu số của ngày kế tiếp (trúng) hoặc một số khác (trượt) theo PATTERN."""
+
+    def __init__(self, start_date):
+        super().__init__()
+        self.start_date = start_date
+
+    def predict(self, date_to_predict, historical_results):
+        return {}
+
+    def predict_array(self, date_to_predict, historical_results):
+        offset = (date_to_predict - self.start_date).days
+        outcome = PATTERN[offset]
+        if outcome == 'N':
+            return None
+        scores = np.zeros(100)
+        scores[number_on(offset + 1) if outcome == 'H' else number_on(offset + 46)] = 1.0
+        return scores
+
+
+@pytest.fixture
+def backtests(make_store):
+    days = {offset: [number_on(offset)] for offset in range(len(PATTERN) + 1) if offset != GAP_DAY}
+    days[EMPTY_DAY] = []
+    store = make_store(days)
+    algorithm = ScriptedAlgorithm(store.dates[0])
+    # run_streak dự đoán từng ngày; vector trúng dự đoán theo khối như các chức năng khác
+    return Backtest({'scripted': algorithm}, store, chunk_days=1), Backtest({'scripted': algorithm}, store, chunk_days=7)
+
+
+def all_dates(store):
+    first, last = store.date_range()
+    return [first + ONE_DAY * i for i in range((last - first).days + 1)]
+
+
+@pytest.mark.parametrize('streak_limit', [0, 1, 4, 7])
+@pytest.mark.parametrize('max_results_offset', [None, 40])
+def test_streak_from_matches_run_streak(backtests, streak_limit, max_results_offset):
+    daily, chunked = backtests
+    start_date = chunked.store.dates[0]
+    max_results_date = None if max_results_offset is None else start_date + ONE_DAY * max_results_offset
+    hit_vector = compute_hit_vector(chunked, start_date, max_results_date)
+    for date in all_dates(chunked.store):
+        if max_results_date is not None and date > max_results_date:
+            break
+        assert hit_vector.streak_from(date, streak_limit) == run_streak(daily, date, max_results_date, streak_limit), date
+
+
+@pytest.mark.parametrize('streak_limit', [0, 4, 7, 50])
+def test_longest_streak_matches_best_run_streak(backtests, streak_limit):
+    daily, chunked = backtests
+    dates = all_dates(chunked.store)
+    for start_index, start_date in enumerate(dates):
+        # Chuỗi dài nhất (sớm nhất khi bằng nhau) trong các chuỗi bắt đầu từ mọi ngày >= start_date
+        streaks = [(run_streak(daily, date), date) for date in dates[start_index:]]
+        (best_length, best_reason, _), best_start = max(streaks, key=lambda s: (s[0][0], -s[1].toordinal()))
+        if streak_limit > 0 and best_length >= streak_limit:
+            best_reason = "streak_limit_reached"
+        expected = (best_length, best_reason, best_start)
+        assert longest_streak(chunked, start_date, streak_limit=streak_limit) == expected, start_date
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""predict_range (streaming hoặc cửa sổ trượt) phải cho đúng kết quả của predict() từng ngày."""
+
+import datetime
+import sys
+import threading
+
+import numpy as np
+import pytest
+
+from algorithms.base import scores_dict_to_array
+from algorithms.thuat_toan_test_01 import DaysSinceLastAppearanceAlgorithm
+from algorithms.thuat_toan_test_02 import PrizePositionPenaltyAlgorithm
+from algorithms.thuat_toan_test_03 import ThirtyDayFrequencyPenaltyAlgorithm
+
+ALGORITHMS = [DaysSinceLastAppearanceAlgorithm, ThirtyDayFrequencyPenaltyAlgorithm]
+N_DAYS = 80
+GAP_DAYS = (17, 18, 51)   # Không có bản ghi
+EMPTY_DAY = 34            # Có bản ghi nhưng không có số
+NEW_PARAMS = {
+    DaysSinceLastAppearanceAlgorithm: {'base_increment_per_day': 0.3, 'milestones': [2, 5],
+                                       'last_day_multiplier': 0.2, 'progressive_start_day': 4},
+    ThirtyDayFrequencyPenaltyAlgorithm: {'history_days': 9, 'min_appearance_penalty': -0.3,
+                                         'never_appeared_bonus': 1.5},
+}
+
+
+def random_days(seed, n_days):
+    rng = np.random.default_rng(seed)
+    days = {offset: rng.integers(0, 100, size=27).tolist() for offset in range(n_days) if offset not in GAP_DAYS}
+    days[EMPTY_DAY] = []
+    return days
+
+
+def daily_scores(algorithm, dates, store, history_ends=None):
+    """Vòng lặp từng ngày gọi predict() với lịch sử cắt từ store."""
+    scores = np.full((len(dates), 100), np.nan)
+    for i, date in enumerate(dates):
+        history_end = store.rows_before(date)
+        if history_ends is not None:
+            history_end = min(history_end, history_ends[i])
+        day_scores = scores_dict_to_array(algorithm.predict(date, list(store.history_rows(history_end))))
+        if day_scores is not None:
+            scores[i] = day_scores
+    return scores
+
+
+def all_dates(store, extra_days=1):
+    first, last = store.date_range()
+    return [first + datetime.timedelta(days=i) for i in range((last - first).days + 1 + extra_days)]
+
+
+def assert_same_scores(got, expected):
+    np.testing.assert_allclose(got, expected, rtol=0, atol=1e-12)
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(random_days(7, N_DAYS))
+
+
+@pytest.mark.parametrize('algorithm_class', ALGORITHMS)
+def test_predict_range_matches_daily_predict(store, algorithm_class):
+    algorithm = algorithm_class()
+    dates = all_dates(store)
+    expected = daily_scores(algorithm_class(), dates, store)
+    assert_same_scores(algorithm.predict_range(dates, store), expected)
+    # Chia thành nhiều khối như Backtest, rồi chạy lại từ đầu trên cùng instance
+    chunked = np.vstack([algorithm.predict_range(dates[start:start + 7], store) for start in range(0, len(dates), 7)])
+    assert_same_scores(chunked, expected)
+    assert_same_scores(algorithm.predict_range(dates[40:], store), expected[40:])
+    assert_same_scores(algorithm.predict_range(dates[:10], store), expected[:10])
+
+
+# Thuật toán 2 dùng vòng lặp mặc định của BaseAlgorithm.predict_range
+@pytest.mark.parametrize('algorithm_class', ALGORITHMS + [PrizePositionPenaltyAlgorithm])
+def test_history_ends_are_clamped_to_rows_before(store, algorithm_class):
+    dates = all_dates(store, extra_days=0)
+    history_ends = [max(0, store.rows_before(date) - offset % 3) + offset % 2 * 5
+                    for offset, date in enumerate(dates)]
+    expected = daily_scores(algorithm_class(), dates, store, history_ends)
+    assert_same_scores(algorithm_class().predict_range(dates, store, history_ends), expected)
+
+
+@pytest.mark.parametrize('algorithm_class', ALGORITHMS)
+def test_predict_range_after_appending_a_row(make_store, algorithm_class):
+    algorithm = algorithm_class()
+    short_days = random_days(11, N_DAYS)
+    short_store = make_store(short_days)
+    dates = all_dates(short_store)
+    algorithm.predict_range(dates, short_store)
+
+    # Cùng dữ liệu cộng thêm kỳ quay của ngày kế tiếp: ngày cuối giờ có thêm lịch sử
+    long_days = dict(short_days)
+    long_days[N_DAYS] = [3, 3, 42, 97]
+    long_store = make_store(long_days)
+    long_dates = all_dates(long_store)
+    expected = daily_scores(algorithm_class(), long_dates, long_store)
+    assert_same_scores(algorithm.predict_range(long_dates[-5:], long_store), expected[-5:])
+    assert_same_scores(algorithm.predict_range(long_dates, long_store), expected)
+
+
+@pytest.mark.parametrize('algorithm_class', ALGORITHMS)
+def test_predict_range_after_changing_parameters(store, algorithm_class):
+    dates = all_dates(store)
+    algorithm = algorithm_class()
+    algorithm.predict_range(dates[:30], store)
+
+    reference = algorithm_class().with_parameters(NEW_PARAMS[algorithm_class])
+    expected = daily_scores(reference, dates, store)
+    assert not np.allclose(expected, daily_scores(algorithm_class(), dates, store))
+
+    clone = algorithm.with_parameters(NEW_PARAMS[algorithm_class])
+    assert_same_scores(clone.predict_range(dates, store), expected)
+    # Trình tối ưu cũng có thể sửa tham số ngay trên instance đang dùng
+    algorithm.config['parameters'].update(NEW_PARAMS[algorithm_class])
+    assert_same_scores(algorithm.predict_range(dates[30:], store), expected[30:])
+
+
+@pytest.mark.parametrize('algorithm_class', ALGORITHMS)
+def test_shared_instance_across_threads(store, algorithm_class):
+    algorithm = algorithm_class()
+    dates = all_dates(store)
+    expected = daily_scores(algorithm_class(), dates, store)
+    mismatches = []
+
+    def worker(offset):
+        # Mỗi luồng đi qua các khối theo thứ tự riêng, xen kẽ với luồng còn lại
+        for _ in range(3):
+            for start in range(offset, len(dates), 6):
+                got = algorithm.predict_range(dates[start:start + 6], store)
+                if not np.allclose(got, expected[start:start + 6], rtol=0, atol=1e-12, equal_nan=True):
+                    mismatches.append(start)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in (0, 3)]
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Đổi luồng liên tục để hai luồng thật sự chen vào nhau
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+    assert mismatches == []
@@ -10,6 +10,7 @@ import shutil
 import random
 import copy
 import threading
+import multiprocessing
 import queue
 import time
 import ast
@@ -61,6 +62,16 @@ except ImportError as e:
     except ImportError: pass
     sys.exit(1)
 
+try:
+    import numpy as np
+    HAS_NUMPY = True
+    print("numpy library found for Training App.")
+except ImportError as e:
+    HAS_NUMPY = False
+    print(f"CRITICAL ERROR: numpy library not found. Please install it: pip install numpy")
+    print(f"Import Error: {e}")
+    sys.exit(1)
+
 try:
     if sys.version_info < (3, 9):
         import astor
@@ -116,6 +127,12 @@ except ImportError as e:
             self.logger = logging.getLogger(f"DummyBase_{id(self)}")
             self._log('warning', f"Using Dummy BaseAlgorithm! Instance: {id(self)}")
         def get_config(self) -> dict: return copy.deepcopy(self.config)
+        def with_parameters(self, params: dict):
+            clone = self.__class__(data_results_list=self._raw_results_list, cache_dir=self.cache_dir)
+            clone_params = clone.config.get('parameters', {})
+            for name, value in params.items():
+                if name in clone_params: clone_params[name] = copy.deepcopy(value)
+            return clone
         @abstractmethod
         def predict(self, date_to_predict: datetime.date, historical_results: list) -> dict: return {}
         def get_results_in_range(self, start_date: datetime.date, end_date: datetime.date) -> list: return []
@@ -128,6 +145,18 @@ except Exception as base_import_err:
     trainer_logger.critical(f"Unknown error importing BaseAlgorithm: {base_import_err}", exc_info=True)
     sys.exit(1)
 
+try:
+    from engine.draw_store import DrawStore
+    from engine.data_cache import load_results_cached
+    from engine.backtest import Backtest, run_streak, longest_streak, compute_hit_vector
+    from engine.parallel import ParallelStreakEvaluator, default_worker_count
+    from engine.eval_db import EvaluationLedger, algorithm_fingerprint, LEDGER_FILE_NAME, KIND_STREAK
+    trainer_logger.info("Imported engine modules successfully.")
+except ImportError as engine_import_err:
+    print(f"Lỗi: Không thể import các module engine: {engine_import_err}", file=sys.stderr)
+    trainer_logger.critical(f"Failed to import engine modules: {engine_import_err}", exc_info=True)
+    sys.exit(1)
+
 
 COLOR_PRIMARY='#007BFF'
 COLOR_PRIMARY_DARK='#0056b3'
@@ -185,6 +214,7 @@ class TrainingApp(QMainWindow):
         self.config = configparser.ConfigParser(interpolation=None)
         self.loaded_algorithms = {}
         self.results_data = []
+        self.draw_store = None
 
         self.selected_algorithm_for_train = None
         self.training_thread = None
@@ -674,6 +704,11 @@ class TrainingApp(QMainWindow):
         settings_layout.addWidget(QLabel("👑Mục tiêu chuỗi:"), 2, 0)
         self.train_streak_limit_spinbox = QSpinBox(); self.train_streak_limit_spinbox.setRange(0, 999); self.train_streak_limit_spinbox.setValue(self.default_streak_limit_days); self.train_streak_limit_spinbox.setAlignment(Qt.AlignCenter); self.train_streak_limit_spinbox.setFixedWidth(70); self.train_streak_limit_spinbox.setToolTip("Dừng khi đạt chuỗi này. 0 = không giới hạn.")
         settings_layout.addWidget(self.train_streak_limit_spinbox, 2, 1, Qt.AlignLeft)
+        settings_layout.addWidget(QLabel("⚡Số tiến trình:"), 3, 0)
+        self.train_workers_spinbox = QSpinBox(); self.train_workers_spinbox.setRange(1, default_worker_count()); self.train_workers_spinbox.setValue(1); self.train_workers_spinbox.setAlignment(Qt.AlignCenter); self.train_workers_spinbox.setFixedWidth(70); self.train_workers_spinbox.setToolTip("Explore: kiểm tra các hàng xóm của một chu kỳ song song trên nhiều tiến trình. 1 = tuần tự.")
+        settings_layout.addWidget(self.train_workers_spinbox, 3, 1, Qt.AlignLeft)
+        self.train_best_start_checkbox = QCheckBox("🔎Tìm ngày bắt đầu tốt nhất"); self.train_best_start_checkbox.setToolTip("Dự đoán một lượt mọi ngày từ 'Ngày bắt đầu' đến hết dữ liệu và dùng chuỗi dài nhất\nbắt đầu ở BẤT KỲ ngày nào làm mục tiêu (thay vì chuỗi bắt đầu đúng ngày đã chọn).")
+        settings_layout.addWidget(self.train_best_start_checkbox, 4, 0, 1, 3)
         settings_layout.setColumnStretch(3, 1)
         col1_v_layout.addWidget(settings_groupbox)
 
@@ -867,7 +902,7 @@ class TrainingApp(QMainWindow):
             self.load_data()
 
     def load_data(self):
-        trainer_logger.info("Loading lottery data for optimization..."); self.results_data = []
+        trainer_logger.info("Loading lottery data for optimization..."); self.results_data = []; self.draw_store = None
         data_file_str = self.config.get('DATA', 'data_file', fallback="")
         config_changed = False
         if not data_file_str:
@@ -896,35 +931,11 @@ class TrainingApp(QMainWindow):
             return
 
         try:
-            with open(data_file_path, 'r', encoding='utf-8') as f: raw_data = json.load(f)
-            processed_results = []; unique_dates = set(); data_list_to_process = []
-            if isinstance(raw_data, list): data_list_to_process = raw_data
-            elif isinstance(raw_data, dict):
-                results_val = raw_data.get('results')
-                if isinstance(results_val, dict):
-                    for date_str, result_dict in results_val.items():
-                        if isinstance(result_dict, dict): result_dict_with_date = result_dict.copy(); result_dict_with_date['date'] = date_str; data_list_to_process.append(result_dict_with_date)
-                elif isinstance(results_val, list): data_list_to_process = results_val
-                else:
-                     for date_str, result_dict in raw_data.items():
-                         if isinstance(result_dict, dict):
-                             try: datetime.datetime.strptime(date_str, '%Y-%m-%d'); result_dict_with_date = result_dict.copy(); result_dict_with_date['date'] = date_str; data_list_to_process.append(result_dict_with_date)
-                             except ValueError: trainer_logger.warning(f"Skipping dict item with non-date key: {date_str}")
-            else: raise ValueError("Định dạng JSON không được hỗ trợ hoặc không hợp lệ.")
-            for item in data_list_to_process:
-                if not isinstance(item, dict): continue
-                date_str_raw = item.get("date")
-                if not date_str_raw: continue
-                try: date_obj = datetime.datetime.strptime(str(date_str_raw).split('T')[0], '%Y-%m-%d').date()
-                except ValueError: trainer_logger.warning(f"Skipping invalid date format: {date_str_raw}"); continue
-                if date_obj in unique_dates: trainer_logger.warning(f"Skipping duplicate date: {date_obj}"); continue
-                result_dict = item.get('result', {k: v for k, v in item.items() if k != 'date'})
-                if not result_dict or not isinstance(result_dict, dict): trainer_logger.warning(f"Skipping entry with missing/invalid result for date {date_obj}"); continue
-                processed_results.append({'date': date_obj, 'result': result_dict}); unique_dates.add(date_obj)
+            processed_results, store = load_results_cached(data_file_path, trainer_logger)
 
             if processed_results:
-                processed_results.sort(key=lambda x: x['date'])
                 self.results_data = processed_results
+                self.draw_store = store
                 start_date, end_date = self.results_data[0]['date'], self.results_data[-1]['date']
                 date_range_str = f"{start_date:%d/%m/%Y} - {end_date:%d/%m/%Y} ({len(self.results_data)} ngày)"
                 if hasattr(self, 'data_range_label'): self.data_range_label.setText(date_range_str)
@@ -974,7 +985,7 @@ class TrainingApp(QMainWindow):
 
         algo_files = [f for f in self.algorithms_dir.glob('*.py') if f.is_file() and f.name not in ["__init__.py", "base.py"]]
         count_success, count_fail = 0, 0
-        data_copy = copy.deepcopy(self.results_data) if self.results_data else []
+        data_copy = self.results_data if self.results_data else []
         cache_dir = self.calculate_dir
         loaded_widgets = False
 
@@ -1369,7 +1380,9 @@ class TrainingApp(QMainWindow):
             optimization_mode=optimization_mode, initial_param_sets_list=initial_param_sets_for_worker,
             custom_steps_config=custom_steps_config, generation_config=gen_config, combination_algos=combos,
             initial_base_params=initial_params_for_worker, initial_best_streak=initial_streak_for_worker,
-            is_resuming_explore=is_resuming_explore
+            is_resuming_explore=is_resuming_explore,
+            parallel_workers=self.train_workers_spinbox.value() if hasattr(self, 'train_workers_spinbox') else 1,
+            find_best_start=self.train_best_start_checkbox.isChecked() if hasattr(self, 'train_best_start_checkbox') else False
         )
 
     def _generate_parameter_sets(self, base_params, num_values_per_param, mode):
@@ -1601,7 +1614,7 @@ class TrainingApp(QMainWindow):
                                          optimization_mode, initial_param_sets_list, custom_steps_config,
                                          generation_config, combination_algos,
                                          initial_base_params, initial_best_streak,
-                                         is_resuming_explore):
+                                         is_resuming_explore, parallel_workers=1, find_best_start=False):
         """Starts the optimization worker thread based on the selected mode."""
         try:
             algo_data = self.loaded_algorithms[display_name]
@@ -1640,6 +1653,10 @@ class TrainingApp(QMainWindow):
         streak_str = f"{streak_limit} ngày" if streak_limit > 0 else "Không giới hạn"
         self._log_to_display("INFO", f"Giới hạn TG: {time_str}", tag=log_tag)
         self._log_to_display("INFO", f"Mục tiêu chuỗi: {streak_str}", tag=log_tag)
+        if optimization_mode == "Explore" and parallel_workers > 1:
+             self._log_to_display("INFO", f"Số tiến trình song song: {parallel_workers}", tag=log_tag)
+        if find_best_start:
+             self._log_to_display("INFO", "Mục tiêu: chuỗi dài nhất ở bất kỳ ngày bắt đầu nào (từ Ngày bắt đầu)", tag=log_tag)
         if is_resuming_explore:
              self._log_to_display("INFO", f"Tiếp tục từ chuỗi: {initial_best_streak}", tag=log_tag)
              self._log_to_display("INFO", f"Tiếp tục từ params: {initial_base_params}", tag="RESUME")
@@ -1694,6 +1711,7 @@ class TrainingApp(QMainWindow):
                 self.current_best_params,
                 self.current_best_streak,
             ),
+            kwargs={'parallel_workers': parallel_workers, 'find_best_start': find_best_start},
             name=f"Optimizer-{algo_data['path'].stem}",
             daemon=True
         )
@@ -1706,6 +1724,25 @@ class TrainingApp(QMainWindow):
         status_extra = " (Đang tạo bộ tham số...)" if optimization_mode == "GenerateSets" else ""
         self.update_status(f"Tìm chuỗi ngày {verb} tối ưu: {algo_data['class_name']}...{status_extra}")
 
+    def _log_best_start_runs(self, best_params, target_display_name, combination_algo_names, draw_store,
+                             start_date, max_date, streak_limit, queue_log, max_lines=20):
+        """Ghi bảng các chuỗi (>= mục tiêu, hoặc dài nhất nếu không đặt mục tiêu) của bộ tham số tốt nhất."""
+        try:
+            algorithms = {target_display_name: self.loaded_algorithms[target_display_name]['instance'].with_parameters(best_params)}
+            for combo_name in combination_algo_names:
+                if combo_name in self.loaded_algorithms: algorithms[combo_name] = self.loaded_algorithms[combo_name]['instance']
+            hit_vector = compute_hit_vector(Backtest(algorithms, draw_store, decimals=4), start_date, max_date)
+            if hit_vector is None: return
+            from_start, _, _ = hit_vector.streak_from(start_date)
+            queue_log("BEST", f"Chuỗi tính từ {start_date:%d/%m/%Y}: {from_start}", tag="BEST")
+            runs = hit_vector.runs(streak_limit) if streak_limit > 0 else sorted(hit_vector.runs(), key=lambda r: -r[1])
+            title = f"Các chuỗi >= {streak_limit} ngày" if streak_limit > 0 else "Các chuỗi dài nhất"
+            queue_log("BEST", f"{title}: {len(runs)}", tag="BEST")
+            for run_start, run_length, run_reason, run_stop in runs[:max_lines]:
+                queue_log("BEST", f"  {run_start:%d/%m/%Y} → {run_stop:%d/%m/%Y}: {run_length} ngày ({run_reason})", tag="BEST")
+        except Exception as e:
+            worker_logger.error(f"Error building best-start run table: {e}", exc_info=True)
+
     def _get_fixed_max_stall_cycles(self) -> int:
         """
         Trả về giá trị cố định được sử dụng cho MAX_STALL_CYCLES trong chế độ Explore.
@@ -1719,7 +1756,7 @@ class TrainingApp(QMainWindow):
     def _optimization_worker(self, target_display_name, start_date, time_limit_sec, streak_limit,
                              optimization_mode, initial_param_sets_list, custom_steps_config,
                              generation_config, combination_algo_names,
-                             initial_base_params, initial_best_streak):
+                             initial_base_params, initial_best_streak, parallel_workers=1, find_best_start=False):
         """The core optimization logic running in a separate thread."""
         start_time = time.time()
         worker_logger.info(f"Worker starting ({optimization_mode} mode) for {target_display_name} from {start_date}.")
@@ -1745,7 +1782,10 @@ class TrainingApp(QMainWindow):
         # --- End Queue Helper Functions ---
 
         finish_reason = "completed"; current_best_params_worker = copy.deepcopy(initial_base_params); current_best_streak_worker = initial_best_streak
+        current_best_start_worker = None # Ngày bắt đầu của chuỗi tốt nhất (chế độ tìm ngày bắt đầu)
         param_sets_to_test_in_worker = []; total_sets_tested_count = 0
+        explore_pool = None
+        ledger_db = None
 
         try:
             # --- Algorithm and Data Setup ---
@@ -1759,10 +1799,11 @@ class TrainingApp(QMainWindow):
             except Exception as e: raise RuntimeError(f"Failed to read source code {orig_path}: {e}")
             target_dir = self.current_training_target_dir
             if not self.results_data or len(self.results_data) < 2: raise RuntimeError("Insufficient data loaded.");
-            res_map = {r['date']: r['result'] for r in self.results_data}; hist_cache = {}; sorted_res = sorted(self.results_data, key=lambda x: x['date'])
-            for i, r in enumerate(sorted_res): hist_cache[r['date']] = sorted_res[:i];
-            max_date = sorted_res[-1]['date']; min_date = sorted_res[0]['date']
-            if start_date not in hist_cache:
+            draw_store = self.draw_store
+            if draw_store is None or len(draw_store) != len(self.results_data): draw_store = DrawStore(self.results_data)
+            res_map = draw_store.index
+            min_date, max_date = draw_store.date_range()
+            if start_date not in res_map:
                  if start_date == min_date: raise RuntimeError(f"Start date {start_date:%d/%m/%Y} is first date, cannot use for prediction.")
                  else: raise RuntimeError(f"Internal Error: History cache missing for start date {start_date:%d/%m/%Y}.")
             # --- End Algorithm and Data Setup ---
@@ -1782,72 +1823,58 @@ class TrainingApp(QMainWindow):
             # --- End Parameter Set Preparation ---
 
             # --- Simulation and Prediction Helpers ---
-            def simulate_streak(params_to_test, simulation_start_date, history_lookup, results_lookup, max_results_date):
-                current_streak = 0; last_successful_date = None; simulation_current_date = simulation_start_date; day_index = 0
-                while True:
-                    day_index += 1
-                    if self.training_stop_event.is_set(): return -1, "stopped", simulation_current_date
-                    while self.training_pause_event.is_set():
-                        if self.training_stop_event.is_set(): return -1, "stopped", simulation_current_date; time.sleep(0.2)
-                    elapsed_time_total = time.time() - start_time
-                    if time_limit_sec > 0 and elapsed_time_total >= time_limit_sec: return -2, "time_limit", simulation_current_date
-                    predict_for_date = simulation_current_date; check_results_date = predict_for_date + datetime.timedelta(days=1)
-                    historical_data_slice = history_lookup.get(predict_for_date); actual_result_dict = results_lookup.get(check_results_date)
-                    if historical_data_slice is None: return current_streak, "missing_history", predict_for_date
-                    if actual_result_dict is None or check_results_date > max_results_date: return current_streak, "end_of_data", predict_for_date
-                    top3_predicted_numbers = get_combined_top3_prediction(params_to_test, predict_for_date, historical_data_slice)
-                    if top3_predicted_numbers is None: return current_streak, "prediction_error", predict_for_date
-                    actual_winning_numbers = self.extract_numbers_from_result_dict(actual_result_dict)
-                    if not actual_winning_numbers: simulation_current_date += datetime.timedelta(days=1); continue
-                    hit = bool(top3_predicted_numbers.intersection(actual_winning_numbers))
-                    if hit:
-                        current_streak += 1; last_successful_date = simulation_current_date
-                        if streak_limit > 0 and current_streak >= streak_limit: return current_streak, "streak_limit_reached", predict_for_date
-                        simulation_current_date += datetime.timedelta(days=1)
-                    else: return current_streak, "streak_broken", predict_for_date
-
-            def get_combined_top3_prediction(current_params, prediction_date, historical_data):
-                temp_instance = None; temp_module_name = None; temp_filepath = None
-                try:
-                    modified_source = self._modify_algorithm_source_ast(src_code, cls_name, current_params)
-                    if not modified_source: raise RuntimeError("AST modification failed.")
-                    timestamp = int(time.time()*10000) + random.randint(0,9999); temp_filename = f"temp_train_target_{cls_name}_{timestamp}.py"; temp_filepath = target_dir / temp_filename
-                    temp_filepath.write_text(modified_source, encoding='utf-8')
-                    if not (target_dir.parent / "__init__.py").exists(): (target_dir.parent / "__init__.py").touch()
-                    if not (target_dir / "__init__.py").exists(): (target_dir / "__init__.py").touch()
-                    temp_module_name = f"training.{target_dir.name}.{temp_filename[:-3]}"
-                    temp_instance = self._import_and_instantiate_temp_algo(temp_filepath, temp_module_name, cls_name)
-                    if not temp_instance: raise RuntimeError("Failed to import/instantiate temp algo.")
-                except Exception as setup_err: worker_logger.error(f"Error setting up temp algo: {setup_err}", exc_info=True); return None
-                day_results = {}; history_copy = copy.deepcopy(historical_data)
-                try:
-                    pred_target = temp_instance.predict(prediction_date, history_copy)
-                    day_results[target_display_name] = pred_target if isinstance(pred_target, dict) else {}
-                except Exception as e: worker_logger.error(f"ERROR predicting TEMP {target_display_name}: {e}", exc_info=False); day_results[target_display_name] = {}
+            def check_streak_interrupt():
+                while self.training_pause_event.is_set():
+                    if self.training_stop_event.is_set(): break
+                    time.sleep(0.2)
+                if self.training_stop_event.is_set(): return "stopped"
+                if time_limit_sec > 0 and time.time() - start_time >= time_limit_sec: return "time_limit"
+                return None
+
+            # Sổ cái kết quả (engine.eval_db): bộ tham số đã chấm ở phiên trước (cùng mã nguồn, bộ kết hợp,
+            # ngày bắt đầu, dữ liệu, giới hạn chuỗi) được trả lời ngay, không mô phỏng lại.
+            streak_ledger = None
+            try:
+                ledger_db = EvaluationLedger(self.training_dir / LEDGER_FILE_NAME)
+                streak_ledger = ledger_db.scope(
+                    KIND_STREAK, algorithm_fingerprint(orig_path),
+                    [[n, algorithm_fingerprint(self.loaded_algorithms[n]['path'])] for n in combination_algo_names if n in self.loaded_algorithms],
+                    start_date, max_date, draw_store.version,
+                    options={'streak_limit': streak_limit, 'find_best_start': bool(find_best_start)})
+            except Exception as ledger_err:
+                worker_logger.warning(f"Evaluation ledger unavailable: {ledger_err}")
+            def ledger_streak(params_to_test):
+                if streak_ledger is None: return None
+                return streak_ledger.get(params_to_test)
+            def record_ledger_streak(params_to_test, streak_result):
+                # Chỉ lưu kết quả hoàn chỉnh (không lưu lượt bị dừng/hết giờ giữa chừng hay lỗi dự đoán)
+                if streak_ledger is not None and streak_result[1] not in ("stopped", "time_limit", "prediction_error"):
+                    streak_ledger.put(params_to_test, tuple(streak_result))
+
+            def simulate_streak(params_to_test, simulation_start_date, history_store, results_lookup, max_results_date):
+                ledger_result = ledger_streak(params_to_test)
+                if ledger_result is not None: return ledger_result
+                streak_result = simulate_streak_uncached(params_to_test, simulation_start_date, history_store, results_lookup, max_results_date)
+                record_ledger_streak(params_to_test, streak_result)
+                return streak_result
+            def simulate_streak_uncached(params_to_test, simulation_start_date, history_store, results_lookup, max_results_date):
+                # Một instance cho cả chuỗi ngày (tạo trong bộ nhớ, không sửa/import lại mã nguồn mỗi ngày)
+                try: target_instance = self.loaded_algorithms[target_display_name]['instance'].with_parameters(params_to_test)
+                except Exception as setup_err: worker_logger.error(f"Error creating target instance: {setup_err}", exc_info=True); return 0, "prediction_error", simulation_start_date
+                streak_algorithms = {target_display_name: target_instance}
                 for combo_name in combination_algo_names:
-                    if combo_name in self.loaded_algorithms:
-                        try:
-                            history_copy_combo = copy.deepcopy(historical_data)
-                            pred_combo = self.loaded_algorithms[combo_name]['instance'].predict(prediction_date, history_copy_combo)
-                            day_results[combo_name] = pred_combo if isinstance(pred_combo, dict) else {}
-                        except Exception as e: worker_logger.error(f"ERROR predicting COMBO {combo_name}: {e}", exc_info=False); day_results[combo_name] = {}
+                    if combo_name in self.loaded_algorithms: streak_algorithms[combo_name] = self.loaded_algorithms[combo_name]['instance']
                     else: worker_logger.warning(f"Combo algo '{combo_name}' not found.")
-                try:
-                    combined_scores = self.combine_algorithm_scores(day_results); scores_list = []
-                    for num_str, score in combined_scores.items():
-                         if isinstance(num_str, str) and len(num_str) == 2 and num_str.isdigit() and isinstance(score, (int, float)):
-                              try: scores_list.append((int(num_str), float(score)))
-                              except (ValueError, TypeError): pass
-                    scores_list.sort(key=lambda x: x[1], reverse=True); top3_numbers = {item[0] for item in scores_list[:3]}; return top3_numbers
-                except Exception as combine_err: worker_logger.error(f"Error combining scores: {combine_err}", exc_info=True); return None
-                finally:
-                    if temp_instance: temp_instance = None
-                    if temp_module_name and temp_module_name in sys.modules:
-                        try: del sys.modules[temp_module_name]
-                        except KeyError: pass
-                    if temp_filepath and temp_filepath.exists():
-                        try: temp_filepath.unlink()
-                        except OSError as e: worker_logger.warning(f"Could not delete temp file {temp_filepath}: {e}")
+                if find_best_start:
+                    # Một lượt cho cả khoảng ngày (vector trúng), lấy chuỗi dài nhất ở bất kỳ ngày bắt đầu nào
+                    return longest_streak(Backtest(streak_algorithms, history_store, decimals=4), simulation_start_date,
+                                          max_results_date, streak_limit, check_interrupt=check_streak_interrupt)
+                # Từng ngày một (chunk_days=1): chuỗi dừng ngay khi trượt nên không dự đoán trước các ngày sau
+                streak_backtest = Backtest(streak_algorithms, history_store, decimals=4, chunk_days=1)
+                return run_streak(streak_backtest, simulation_start_date, max_results_date, streak_limit,
+                                  check_interrupt=check_streak_interrupt)
+            def best_start_suffix(run_start):
+                return f" (Bắt đầu: {run_start:%d/%m/%Y})" if find_best_start and run_start else ""
             # --- End Simulation and Prediction Helpers ---
 
             # ==============================================
@@ -1868,15 +1895,15 @@ class TrainingApp(QMainWindow):
                     if time_limit_sec > 0 and elapsed_time_total >= time_limit_sec: finish_reason = "time_limit"; break
                     params_str_short = {k: f'{v:.3g}' if isinstance(v,float) else v for k, v in current_params_set.items() if k in numeric_param_keys}
                     queue_log("INFO", f"--- Bắt đầu kiểm tra bộ #{set_number}/{total_sets_to_test}: {params_str_short}", tag="PARAM_SET"); queue_status(f"Kiểm tra bộ {set_number}/{total_sets_to_test}...")
-                    set_streak, sim_reason, _ = simulate_streak(current_params_set, start_date, hist_cache, res_map, max_date)
+                    set_streak, sim_reason, set_run_start = simulate_streak(current_params_set, start_date, draw_store, res_map, max_date)
                     if sim_reason == "stopped": finish_reason = "stopped"; break
                     if sim_reason == "time_limit": finish_reason = "time_limit"; break
                     if sim_reason == "prediction_error": queue_log("ERROR", f"Lỗi dự đoán khi kiểm tra bộ #{set_number}. Chuỗi cuối cùng: {max(0, set_streak)}", tag="ERROR")
                     elif sim_reason == "missing_history": queue_log("ERROR", f"Lỗi thiếu dữ liệu lịch sử khi kiểm tra bộ #{set_number}. Chuỗi cuối cùng: {max(0, set_streak)}", tag="ERROR")
                     queue_log("INFO", f"--- Kết thúc bộ #{set_number}: Chuỗi = {max(0, set_streak)} (Lý do: {sim_reason})", tag="PARAM_SET")
                     if set_streak > current_best_streak_worker:
-                        current_best_streak_worker = set_streak; current_best_params_worker = copy.deepcopy(current_params_set)
-                        queue_log("BEST", f"*** New Best Streak: {current_best_streak_worker}! (Set #{set_number}) Params: {params_str_short}", tag="BEST")
+                        current_best_streak_worker = set_streak; current_best_params_worker = copy.deepcopy(current_params_set); current_best_start_worker = set_run_start
+                        queue_log("BEST", f"*** New Best Streak: {current_best_streak_worker}!{best_start_suffix(set_run_start)} (Set #{set_number}) Params: {params_str_short}", tag="BEST")
                         queue_best_update(current_best_params_worker, current_best_streak_worker);
                         self._save_training_state(reason="new_best_streak")
                     queue_progress({"current_set_idx": set_number, "total_sets": total_sets_to_test, "current_streak": max(0, set_streak), "best_streak": current_best_streak_worker})
@@ -1902,6 +1929,57 @@ class TrainingApp(QMainWindow):
                 total_tests_count = 0
                 current_params_explore = None # Khởi tạo
 
+                def record_explore_result(params_tested, explore_streak, sim_reason_explore, run_start=None):
+                    """Ghi nhận kết quả của một bộ (theo đúng thứ tự kiểm tra). Trả về lý do kết thúc hoặc None."""
+                    nonlocal current_best_streak_worker, current_best_params_worker, current_best_start_worker, stall_cycle_count
+                    if sim_reason_explore in ("stopped", "time_limit"): return sim_reason_explore
+                    params_str_short_explore = {k: f'{v:.3g}' if isinstance(v,float) else v for k, v in params_tested.items() if k in numeric_param_keys}
+                    if sim_reason_explore == "prediction_error": queue_log("ERROR", f"Lỗi dự đoán khi kiểm tra bộ #{total_tests_count}. Chuỗi cuối cùng: {max(0, explore_streak)}", tag="ERROR")
+                    elif sim_reason_explore == "missing_history": queue_log("ERROR", f"Lỗi thiếu lịch sử khi kiểm tra bộ #{total_tests_count}. Chuỗi cuối cùng: {max(0, explore_streak)}", tag="ERROR")
+
+                    # --- Update Best Results ---
+                    if explore_streak > current_best_streak_worker:
+                        previous_best = current_best_streak_worker
+                        current_best_streak_worker = explore_streak
+                        current_best_params_worker = copy.deepcopy(params_tested)
+                        current_best_start_worker = run_start
+                        queue_log("BEST", f"*** New Best Streak: {current_best_streak_worker}!{best_start_suffix(run_start)} (Explore #{total_tests_count}, Prev Best: {previous_best}) Params: {params_str_short_explore}", tag="BEST")
+                        queue_best_update(current_best_params_worker, current_best_streak_worker)
+                        worker_logger.info(f"Reset stall count from {stall_cycle_count} to 0 due to new best streak: {current_best_streak_worker}")
+                        stall_cycle_count = 0 # Reset stall count on improvement!
+                        self._save_training_state(reason="new_best_streak")
+                    # --- End Update Best Results ---
+
+                    queue_progress({"current_streak": max(0, explore_streak), "best_streak": current_best_streak_worker})
+
+                    # --- Check Streak Limit ---
+                    if streak_limit > 0 and current_best_streak_worker >= streak_limit:
+                        worker_logger.info(f"Best streak ({current_best_streak_worker}) meets target ({streak_limit}). Stopping Explore.")
+                        return "streak_limit_reached"
+                    # --- End Check Streak Limit ---
+                    return None
+
+                # --- Parallel Pool (tùy chọn) ---
+                # Cả hàng đợi (các hàng xóm của một chu kỳ) được gửi cùng lúc tới các tiến trình con và kết quả
+                # được ghi nhận theo đúng thứ tự hàng đợi, nên quyết định "New Best" giống hệt khi chạy tuần tự.
+                # visited_params chỉ nằm ở luồng này và lọc trùng TRƯỚC khi gửi, nên mọi tiến trình dùng chung nó.
+                if parallel_workers > 1:
+                    try:
+                        target_spec = {'name': target_display_name, 'module_name': target_data['module_name'], 'path': str(orig_path), 'class_name': cls_name, 'cache_dir': self.calculate_dir}
+                        combo_specs = []
+                        for combo_name in combination_algo_names:
+                            if combo_name not in self.loaded_algorithms: worker_logger.warning(f"Combo algo '{combo_name}' not found."); continue
+                            combo_data = self.loaded_algorithms[combo_name]
+                            combo_specs.append({'name': combo_name, 'module_name': combo_data['module_name'], 'path': str(combo_data['path']), 'class_name': combo_data['class_name'], 'cache_dir': self.calculate_dir})
+                        explore_pool = ParallelStreakEvaluator(draw_store, target_spec, combo_specs, start_date, max_date, streak_limit,
+                                                               deadline=start_time + time_limit_sec if time_limit_sec > 0 else None,
+                                                               find_best_start=find_best_start, workers=parallel_workers)
+                        queue_log("INFO", f"Explore song song trên {explore_pool.workers} tiến trình.", tag="PROGRESS")
+                    except Exception as pool_err:
+                        worker_logger.error(f"Failed to start parallel Explore pool: {pool_err}", exc_info=True)
+                        queue_log("WARNING", f"Không khởi tạo được tiến trình song song ({pool_err}). Chạy tuần tự.", tag="WARNING")
+                        explore_pool = None
+
                 while True: # Main Explore loop
                     # --- Check Stop Conditions ---
                     if self.training_stop_event.is_set(): finish_reason = "stopped"; break
@@ -1912,6 +1990,35 @@ class TrainingApp(QMainWindow):
                     if time_limit_sec > 0 and elapsed_time_total >= time_limit_sec: finish_reason = "time_limit"; break
                     # --- End Check Stop Conditions ---
 
+                    # --- Parallel: Test the Whole Queue at Once ---
+                    if explore_pool is not None and not params_q.empty():
+                        batch_params = []
+                        while not params_q.empty(): batch_params.append(params_q.get())
+                        queue_status(f"Explore Cycle {exploration_cycle}: Thử nghiệm song song {len(batch_params)} bộ (Stall: {stall_cycle_count}/{MAX_STALL_CYCLES})...")
+                        # Bộ đã có trong sổ cái không gửi đi; ghi nhận vẫn theo đúng thứ tự hàng đợi
+                        batch_ledger = [ledger_streak(p) for p in batch_params]
+                        batch_results = explore_pool.map_ordered([p for p, r in zip(batch_params, batch_ledger) if r is None],
+                                                                 should_stop=self.training_stop_event.is_set, should_pause=self.training_pause_event.is_set)
+                        try:
+                            for params_tested, ledger_result in zip(batch_params, batch_ledger):
+                                if ledger_result is not None: streak_result = ledger_result
+                                else:
+                                    pool_item = next(batch_results, None)
+                                    if pool_item is None: break # Bị dừng giữa chừng
+                                    _, params_tested, streak_result, error_text = pool_item
+                                    if streak_result is None:
+                                        worker_logger.error(f"Parallel Explore set #{total_tests_count + 1} failed: {error_text}")
+                                        streak_result = (0, "prediction_error", start_date)
+                                    else: record_ledger_streak(params_tested, streak_result)
+                                total_tests_count += 1
+                                result_reason = record_explore_result(params_tested, *streak_result)
+                                if result_reason: finish_reason = result_reason; break
+                        finally: batch_results.close()
+                        if finish_reason == "completed" and self.training_stop_event.is_set(): finish_reason = "stopped"
+                        if finish_reason != "completed": break
+                        continue
+                    # --- End Parallel ---
+
                     # --- Get Params or Generate Neighbors ---
                     if not params_q.empty():
                         current_params_explore = params_q.get() # Lấy từ hàng đợi
@@ -2003,6 +2110,8 @@ class TrainingApp(QMainWindow):
                         if neighbors:
                             worker_logger.info(f"Explore Cycle {exploration_cycle}: Added {len(neighbors)} new neighbors to queue.")
                             for p in neighbors: params_q.put(p)
+                            # Song song: cả chu kỳ được gửi một lượt ở vòng lặp sau
+                            if explore_pool is not None: continue
                             # Lấy hàng xóm ĐẦU TIÊN ra để kiểm tra NGAY trong vòng lặp này
                             current_params_explore = params_q.get()
                             total_tests_count += 1 # Tăng bộ đếm vì sắp kiểm tra hàng xóm đầu tiên này
@@ -2028,36 +2137,15 @@ class TrainingApp(QMainWindow):
                     queue_status(f"Explore Cycle {exploration_cycle}: Thử nghiệm #{total_tests_count} (Stall: {stall_cycle_count}/{MAX_STALL_CYCLES})...")
                     worker_logger.debug(f"Testing Explore set #{total_tests_count}: {params_str_short_explore}")
 
-                    explore_streak, sim_reason_explore, _ = simulate_streak(current_params_explore, start_date, hist_cache, res_map, max_date)
+                    explore_streak, sim_reason_explore, explore_run_start = simulate_streak(current_params_explore, start_date, draw_store, res_map, max_date)
 
-                    if sim_reason_explore == "stopped": finish_reason = "stopped"; break
-                    if sim_reason_explore == "time_limit": finish_reason = "time_limit"; break
-                    if sim_reason_explore == "prediction_error": queue_log("ERROR", f"Lỗi dự đoán khi kiểm tra bộ #{total_tests_count}. Chuỗi cuối cùng: {max(0, explore_streak)}", tag="ERROR")
-                    elif sim_reason_explore == "missing_history": queue_log("ERROR", f"Lỗi thiếu lịch sử khi kiểm tra bộ #{total_tests_count}. Chuỗi cuối cùng: {max(0, explore_streak)}", tag="ERROR")
-
-                    # --- Update Best Results ---
-                    if explore_streak > current_best_streak_worker:
-                        previous_best = current_best_streak_worker
-                        current_best_streak_worker = explore_streak
-                        current_best_params_worker = copy.deepcopy(current_params_explore)
-                        queue_log("BEST", f"*** New Best Streak: {current_best_streak_worker}! (Explore #{total_tests_count}, Prev Best: {previous_best}) Params: {params_str_short_explore}", tag="BEST")
-                        queue_best_update(current_best_params_worker, current_best_streak_worker)
-                        worker_logger.info(f"Reset stall count from {stall_cycle_count} to 0 due to new best streak: {current_best_streak_worker}")
-                        stall_cycle_count = 0 # Reset stall count on improvement!
-                        self._save_training_state(reason="new_best_streak")
-                    # --- End Update Best Results ---
-
-                    queue_progress({"current_streak": max(0, explore_streak), "best_streak": current_best_streak_worker})
-
-                    # --- Check Streak Limit ---
-                    if streak_limit > 0 and current_best_streak_worker >= streak_limit:
-                        worker_logger.info(f"Best streak ({current_best_streak_worker}) meets target ({streak_limit}). Stopping Explore.")
-                        finish_reason = "streak_limit_reached"; break
-                    # --- End Check Streak Limit ---
+                    result_reason = record_explore_result(current_params_explore, explore_streak, sim_reason_explore, explore_run_start)
+                    if result_reason: finish_reason = result_reason; break
 
                     current_params_explore = None # Reset cho vòng lặp tiếp theo
 
                 # --- End Main Explore Loop ---
+                if explore_pool is not None: explore_pool.close(); explore_pool = None
             # --- End Explore Mode Logic ---
 
             # =========================================
@@ -2086,6 +2174,10 @@ class TrainingApp(QMainWindow):
                       queue_log("BEST", f"Lý do: {finish_reason}", tag="BEST")
                       queue_log("BEST", f"Chuỗi dài nhất: {current_best_streak_worker}", tag="BEST")
                       queue_log("BEST", f"Với tham số: {params_str_final}", tag="BEST")
+                      if find_best_start and current_best_start_worker:
+                          queue_log("BEST", f"Ngày bắt đầu chuỗi: {current_best_start_worker:%d/%m/%Y}", tag="BEST")
+                          self._log_best_start_runs(current_best_params_worker, target_display_name, combination_algo_names,
+                                                    draw_store, start_date, max_date, streak_limit, queue_log)
                       succ_flag = True
                       try:
                           final_timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -2110,6 +2202,9 @@ class TrainingApp(QMainWindow):
             worker_logger.critical(f"Unhandled exception in worker thread ({optimization_mode}): {worker_err}", exc_info=True)
             queue_error(f"Lỗi worker ({optimization_mode}): {worker_err}")
             queue_finished(f"Lỗi nghiêm trọng worker: {worker_err}", success=False, reason=finish_reason)
+        finally:
+            if explore_pool is not None: explore_pool.close()
+            if ledger_db is not None: ledger_db.close()
 
     def _validate_training_settings(self):
         """Validates start date and optimization limits."""
@@ -2222,6 +2317,8 @@ class TrainingApp(QMainWindow):
         if hasattr(self,'train_start_date_button'): self.train_start_date_button.setEnabled(settings_enabled)
         if hasattr(self,'train_time_limit_spinbox'): self.train_time_limit_spinbox.setEnabled(settings_enabled)
         if hasattr(self,'train_streak_limit_spinbox'): self.train_streak_limit_spinbox.setEnabled(settings_enabled)
+        if hasattr(self,'train_workers_spinbox'): self.train_workers_spinbox.setEnabled(settings_enabled)
+        if hasattr(self,'train_best_start_checkbox'): self.train_best_start_checkbox.setEnabled(settings_enabled)
         for chk in self.combination_selection_checkboxes.values(): chk.setEnabled(settings_enabled)
         if hasattr(self, 'param_gen_enable_checkbox'):
             self.param_gen_enable_checkbox.setEnabled(settings_enabled); gen_widgets_enabled = settings_enabled and self.param_gen_enable_checkbox.isChecked()
@@ -2484,69 +2581,6 @@ class TrainingApp(QMainWindow):
             return modified_code
         except Exception as e: modifier_logger.error(f"AST Unparse Error: {e}", exc_info=True); return None
 
-    def _import_and_instantiate_temp_algo(self, temp_filepath, temp_module_name, class_name_hint):
-        """Imports a temporary algorithm module, finds the class, and instantiates it."""
-        import_logger.debug(f"Importing temporary algo: Module='{temp_module_name}', File='{temp_filepath}'"); instance = None; module_obj = None
-        if temp_module_name in sys.modules:
-            try: del sys.modules[temp_module_name]; import_logger.debug(f"Removed cache for: {temp_module_name}")
-            except KeyError: pass
-        try:
-            spec = util.spec_from_file_location(temp_module_name, temp_filepath);
-            if not spec or not spec.loader: raise ImportError(f"No spec/loader for {temp_filepath}")
-            module_obj = util.module_from_spec(spec);
-            if not module_obj: raise ImportError(f"module_from_spec failed for {temp_module_name}")
-            sys.modules[temp_module_name] = module_obj; import_logger.debug(f"Executing module {temp_module_name}..."); spec.loader.exec_module(module_obj); import_logger.debug(f"Module {temp_module_name} executed.")
-            temp_class = None;
-            if class_name_hint: temp_class = getattr(module_obj, class_name_hint, None);
-            if not (inspect.isclass(temp_class) and issubclass(temp_class, BaseAlgorithm) and temp_class is not BaseAlgorithm): temp_class = None
-            if temp_class is None:
-                 for name, obj in inspect.getmembers(module_obj):
-                     if inspect.isclass(obj) and issubclass(obj, BaseAlgorithm) and obj is not BaseAlgorithm and obj.__module__ == temp_module_name: temp_class = obj; import_logger.debug(f"Found class by search: '{name}'"); break
-            if not temp_class or not issubclass(temp_class, BaseAlgorithm):
-                 if temp_module_name in sys.modules: del sys.modules[temp_module_name]; raise TypeError(f"No valid BaseAlgorithm subclass in {temp_module_name}.")
-            import_logger.debug(f"Instantiating {temp_class.__name__}..."); data_copy = copy.deepcopy(self.results_data) if self.results_data else []; instance = temp_class(data_results_list=data_copy, cache_dir=self.calculate_dir); import_logger.debug(f"Instantiated {temp_class.__name__}"); return instance
-        except Exception as e:
-             import_logger.error(f"Failed import/instantiate {temp_filepath}: {e}", exc_info=True);
-             if temp_module_name and temp_module_name in sys.modules:
-                 try: del sys.modules[temp_module_name]
-                 except KeyError: pass
-             return None
-
-    def extract_numbers_from_result_dict(self, result_dict: dict) -> set:
-        """Extracts 2-digit lottery numbers from a result dictionary."""
-        numbers = set(); keys_to_ignore = {'date', '_id', 'source', 'day_of_week', 'sign', 'created_at', 'updated_at', 'province_name', 'province_id', 'day', 'month', 'year'}
-        if not isinstance(result_dict, dict): return numbers
-        for key, value in result_dict.items():
-            if key in keys_to_ignore or (isinstance(key, str) and key.startswith('_')): continue
-            values_to_check = [];
-            if isinstance(value, (list, tuple)): values_to_check.extend(value)
-            elif value is not None: values_to_check.append(value)
-            for item in values_to_check:
-                if item is None: continue
-                try:
-                    s_item = str(item).strip(); num = -1
-                    if len(s_item) >= 2 and s_item[-2:].isdigit(): num = int(s_item[-2:])
-                    elif len(s_item) == 2 and s_item.isdigit(): num = int(s_item)
-                    elif len(s_item) == 1 and s_item.isdigit(): num = int(s_item)
-                    if 0 <= num <= 99: numbers.add(num)
-                except (ValueError, TypeError): pass
-        return numbers
-
-    def combine_algorithm_scores(self, intermediate_results: dict) -> dict:
-        """Combines prediction scores from multiple algorithms."""
-        if not intermediate_results: return {f"{i:02d}": 100.0 for i in range(100)}
-        BASE_SCORE = 100.0; combined_deltas = {f"{i:02d}": 0.0 for i in range(100)}; valid_algo_count = 0
-        for algo_name, raw_scores in intermediate_results.items():
-            if not isinstance(raw_scores, dict) or not raw_scores: continue
-            valid_algo_count += 1
-            for num_str, delta_or_score in raw_scores.items():
-                 if isinstance(num_str, str) and len(num_str) == 2 and num_str.isdigit() and isinstance(delta_or_score, (int, float)):
-                      try: combined_deltas[num_str] += float(delta_or_score)
-                      except (ValueError, TypeError, KeyError): pass
-        if valid_algo_count == 0: return {num: BASE_SCORE for num in combined_deltas.keys()}
-        final_scores = {num: round(BASE_SCORE + delta, 4) for num, delta in combined_deltas.items()}
-        return final_scores
-
     def show_calendar_dialog_qt(self, target_line_edit: QLineEdit, callback=None):
         """Shows a calendar dialog to select a date."""
         if not self.results_data or len(self.results_data) < 2: QMessageBox.warning(self, "Thiếu Dữ Liệu", "Cần ít nhất 2 ngày dữ liệu."); return
@@ -2608,6 +2642,7 @@ def main_optimizer():
     finally: trainer_logger.info("Application shutdown sequence."); logging.shutdown()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     print("="*20 + " Lottery Optimizer Starting " + "="*20)
     print(f"Python Version: {sys.version.split()[0]}")
     base_app_dir = Path(__file__).parent.resolve(); print(f"App Base Dir: {base_app_dir}")